@@ -10,16 +10,23 @@ This module contains functions that interact directly with the database:
 """
 
 import os
+import re
 import json
+import time
 import uuid
 import logging
 import copy
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List, Tuple, Callable, Sequence
 from datetime import datetime, timezone
 import psycopg2
-from psycopg2.extras import RealDictCursor, Json
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, Json, execute_values
 from fastapi import HTTPException
 
+from app.utils.metrics import DB_CONNECTIONS, DB_CONNECT_DURATION
+from app.utils.tracing import TRACE_ID_PATTERN, current_trace_id
+from app.utils.query_stats import get_connection_factory
+
 logger = logging.getLogger(__name__)
 
 
@@ -75,10 +82,15 @@ def get_db_connection():
         if db_host and db_host not in ('localhost', '127.0.0.1', '::1'):
             db_config['sslmode'] = 'require'
     
+    connect_start = time.perf_counter()
     try:
-        conn = psycopg2.connect(**db_config)
+        # Statement timings for GET /admin/queries (see app.utils.query_stats)
+        conn = psycopg2.connect(**db_config, connection_factory=get_connection_factory())
+        DB_CONNECT_DURATION.observe(time.perf_counter() - connect_start)
+        DB_CONNECTIONS.labels(outcome='success').inc()
         return conn
     except psycopg2.Error as e:
+        DB_CONNECTIONS.labels(outcome='error').inc()
         raise HTTPException(
             status_code=500,
             detail=f"Database connection error: {str(e)}"
@@ -104,7 +116,14 @@ def fetch_pending_records(
     cursor,
     location_id: Optional[str],
     limit: Optional[int],
+    statuses: Optional[List[str]] = None,
 ) -> List[Dict[str, Any]]:
+    """Fetch pending patients, newest captured first.
+
+    `statuses` filters on the stored effective_status column, so together with
+    `limit` the rows are read straight from the (location_id, captured_at)
+    indexes.
+    """
     query = """
         SELECT 
             pending_id AS id,
@@ -125,6 +144,7 @@ def fetch_pending_records(
             updated_at,
             raw_payload,
             status,
+            effective_status,
             raw_payload->>'status' AS patient_status,
             raw_payload->>'appointment_date' AS appointment_date,
             raw_payload->>'appointment_date_at_clinic_tz' AS appointment_date_at_clinic_tz,
@@ -139,10 +159,14 @@ def fetch_pending_records(
         conditions.append("location_id = %s")
         params.append(location_id)
 
+    if statuses:
+        conditions.append("effective_status = ANY(%s)")
+        params.append(list(statuses))
+
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
 
-    query += " ORDER BY captured_at DESC NULLS LAST, updated_at DESC"
+    query += " ORDER BY captured_at DESC NULLS LAST, updated_at DESC NULLS LAST, pending_id DESC"
 
     if limit is not None:
         query += " LIMIT %s"
@@ -156,7 +180,13 @@ def fetch_confirmed_records(
     cursor,
     location_id: Optional[str],
     limit: Optional[int],
+    statuses: Optional[List[str]] = None,
 ) -> List[Dict[str, Any]]:
+    """Fetch confirmed patients, newest captured first.
+
+    `statuses` filters on the stored effective_status column (status, or
+    'confirmed' when empty).
+    """
     query = """
         SELECT 
             id,
@@ -167,6 +197,7 @@ def fetch_confirmed_records(
             location_id,
             location_name,
             status,
+            effective_status,
             legal_first_name,
             legal_last_name,
             dob,
@@ -186,10 +217,292 @@ def fetch_confirmed_records(
         conditions.append("location_id = %s")
         params.append(location_id)
 
+    if statuses:
+        conditions.append("effective_status = ANY(%s)")
+        params.append(list(statuses))
+
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    query += " ORDER BY captured_at DESC NULLS LAST, updated_at DESC NULLS LAST, id DESC"
+
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+
+    cursor.execute(query, tuple(params))
+    return cursor.fetchall()
+
+
+DASHBOARD_RECORDS_QUERY = """
+    SELECT
+        'confirmed' AS source,
+        id,
+        emr_id,
+        booking_id,
+        location_id,
+        location_name,
+        legal_first_name,
+        legal_last_name,
+        dob,
+        mobile_phone,
+        sex_at_birth,
+        captured_at,
+        reason_for_visit,
+        created_at,
+        updated_at,
+        search_name,
+        mobile_phone_digits,
+        effective_status AS status
+    FROM patients
+    UNION ALL
+    SELECT
+        'pending' AS source,
+        pending_id AS id,
+        emr_id,
+        booking_id,
+        location_id,
+        location_name,
+        legal_first_name,
+        legal_last_name,
+        dob,
+        mobile_phone,
+        sex_at_birth,
+        captured_at,
+        reason_for_visit,
+        created_at,
+        updated_at,
+        search_name,
+        mobile_phone_digits,
+        effective_status AS status
+    FROM pending_patients
+"""
+
+
+PHONE_SEARCH_PATTERN = re.compile(r'^[\d\s().+-]*\d[\d\s().+-]*$')
+
+_pg_trgm_available: Optional[bool] = None
+
+
+def _escape_like(text: str) -> str:
+    """Escape LIKE wildcards in user-supplied search text."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _like_pattern(text: str) -> str:
+    """Build a substring LIKE pattern, escaping LIKE wildcards in the search text."""
+    return f"%{_escape_like(text)}%"
+
+
+def normalize_search_term(search: str) -> Tuple[str, Optional[str]]:
+    """Normalize a patient search term.
+
+    Returns:
+        Tuple of (lower-cased term, phone digits or None). Phone digits are only
+        returned when the term looks like a phone number, e.g. "(555) 123-4567".
+    """
+    term = " ".join(search.split()).lower()
+    digits = re.sub(r'\D', '', term) if PHONE_SEARCH_PATTERN.match(term) else None
+    return term, digits or None
+
+
+def _patient_search_condition(search: str) -> Tuple[str, List[Any]]:
+    """Build the WHERE condition matching a search term against one patient table.
+
+    The condition only uses the search_name, emr_id and mobile_phone_digits
+    columns, which carry pg_trgm indexes, so substring matches are index-backed.
+    """
+    term, digits = normalize_search_term(search)
+    pattern = _like_pattern(term)
+    clauses = ["search_name LIKE %s", "emr_id ILIKE %s"]
+    params: List[Any] = [pattern, pattern]
+
+    if digits:
+        clauses.append("mobile_phone_digits LIKE %s")
+        params.append(_like_pattern(digits))
+
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+def pg_trgm_available(cursor) -> bool:
+    """Return whether the pg_trgm extension is installed (checked once per process)."""
+    global _pg_trgm_available
+    if _pg_trgm_available is None:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') AS available")
+        row = cursor.fetchone()
+        _pg_trgm_available = bool(row['available'] if isinstance(row, dict) else row[0])
+    return _pg_trgm_available
+
+
+def _dashboard_query(
+    location_id: Optional[str],
+    statuses: Optional[List[str]],
+    search: Optional[str],
+    captured_since: Optional[datetime],
+) -> Tuple[str, List[Any]]:
+    """Build the filtered UNION of confirmed and pending patients used by the dashboard."""
+    conditions: List[str] = []
+    params: List[Any] = []
+
+    if location_id:
+        conditions.append("location_id = %s")
+        params.append(location_id)
+
+    # Patients without captured_at fall back to created_at for the window
+    if captured_since is not None:
+        conditions.append("COALESCE(captured_at, created_at) >= %s")
+        params.append(captured_since)
+
+    if statuses:
+        conditions.append("status = ANY(%s)")
+        params.append(list(statuses))
+
+    if search:
+        search_condition, search_params = _patient_search_condition(search)
+        conditions.append(search_condition)
+        params.extend(search_params)
+
+    # Conditions on the union are pushed down into both tables. Keeping them
+    # outside (rather than in each SELECT) also lets the planner treat
+    # location_id as fixed, so both (location_id, captured_at ...) index scans
+    # are merged in order and LIMIT stops after one page.
+    query = "SELECT * FROM (" + DASHBOARD_RECORDS_QUERY + ") AS dashboard_patients"
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
 
-    query += " ORDER BY captured_at DESC NULLS LAST, updated_at DESC"
+    return query, params
+
+
+def fetch_dashboard_records(
+    cursor,
+    location_id: Optional[str],
+    statuses: Optional[List[str]],
+    search: Optional[str] = None,
+    captured_since: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """Fetch one page of confirmed and pending patients in a single query.
+
+    Status, location, time window and search filters, ordering and pagination
+    all run in the database. Each row carries its `source` ('confirmed' or
+    'pending') and its normalized `status`.
+
+    Args:
+        cursor: Database cursor (RealDictCursor)
+        location_id: Optional location filter
+        statuses: Normalized statuses to include (all when empty)
+        search: Optional case-insensitive substring matched against the full
+            name and EMR ID, and against the phone digits when it looks like
+            a phone number
+        captured_since: Optional lower bound on captured_at (created_at when
+            captured_at is missing)
+        limit: Maximum number of rows to return (all when None)
+        offset: Number of rows to skip
+
+    Returns:
+        List of patient records, newest captured first
+    """
+    query, params = _dashboard_query(location_id, statuses, search, captured_since)
+    query += " ORDER BY captured_at DESC NULLS LAST, updated_at DESC NULLS LAST, id DESC, source"
+
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+
+    if offset:
+        query += " OFFSET %s"
+        params.append(offset)
+
+    cursor.execute(query, tuple(params))
+    return cursor.fetchall()
+
+
+def count_dashboard_records(
+    cursor,
+    location_id: Optional[str],
+    statuses: Optional[List[str]],
+    search: Optional[str] = None,
+    captured_since: Optional[datetime] = None,
+) -> int:
+    """Count the patients fetch_dashboard_records would return without a limit."""
+    query, params = _dashboard_query(location_id, statuses, search, captured_since)
+    cursor.execute(f"SELECT COUNT(*) AS total FROM ({query}) AS matching", tuple(params))
+    row = cursor.fetchone()
+    return int(row['total']) if row else 0
+
+
+def fetch_dashboard_fingerprint(
+    cursor,
+    location_id: Optional[str],
+    statuses: Optional[List[str]],
+    search: Optional[str] = None,
+    captured_since: Optional[datetime] = None,
+) -> Tuple[int, Optional[datetime], datetime]:
+    """Summarize the patients fetch_dashboard_records would return, for ETags.
+
+    Every write to a patient bumps its updated_at (trigger), so the count and
+    the latest updated_at change whenever a row is modified, enters or leaves
+    the filtered set.
+
+    Returns:
+        Tuple of (matching count, latest updated_at or None, database time of the read)
+    """
+    query, params = _dashboard_query(location_id, statuses, search, captured_since)
+    cursor.execute(
+        f"""
+        SELECT COUNT(*) AS total, MAX(updated_at) AS last_updated_at, LOCALTIMESTAMP AS read_at
+        FROM ({query}) AS matching
+        """,
+        tuple(params)
+    )
+    row = cursor.fetchone()
+    return int(row['total']), row['last_updated_at'], row['read_at']
+
+
+def fetch_patient_changes(
+    cursor,
+    location_id: Optional[str],
+    after: Tuple[datetime, str, int],
+    settle_seconds: float = 0,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Fetch confirmed and pending patients changed after a sync position.
+
+    Rows are returned in (updated_at, source, id) order regardless of status,
+    so callers can tell rows that left a status filter apart from unchanged
+    ones. Rows updated in the last settle_seconds are held back:
+    updated_at is the start time of the writing transaction, and a slow
+    transaction could otherwise commit a row behind a position already handed
+    out.
+
+    Args:
+        cursor: Database cursor (RealDictCursor)
+        location_id: Optional location filter
+        after: Exclusive (updated_at, source, id) position of the last synced row
+        settle_seconds: Hold back rows updated more recently than this
+        limit: Maximum number of rows to return (all when None)
+
+    Returns:
+        List of patient records (same columns as fetch_dashboard_records)
+    """
+    updated_after, source, row_id = after
+    conditions = [
+        # The plain bound lets each table use its (location_id, updated_at) index
+        "updated_at >= %s",
+        "(updated_at, source, id) > (%s, %s, %s)",
+        "updated_at <= LOCALTIMESTAMP - make_interval(secs => %s)",
+    ]
+    params: List[Any] = [updated_after, updated_after, source, row_id, settle_seconds]
+    if location_id:
+        conditions.insert(0, "location_id = %s")
+        params.insert(0, location_id)
+
+    query = f"""
+        SELECT * FROM ({DASHBOARD_RECORDS_QUERY}) AS changed_patients
+        WHERE {" AND ".join(conditions)}
+        ORDER BY updated_at, source, id
+    """
 
     if limit is not None:
         query += " LIMIT %s"
@@ -199,6 +512,390 @@ def fetch_confirmed_records(
     return cursor.fetchall()
 
 
+def search_patient_records(
+    cursor,
+    search: str,
+    location_id: Optional[str] = None,
+    limit: int = 10,
+) -> List[Dict[str, Any]]:
+    """Rank confirmed and pending patients matching a typeahead search term.
+
+    Matches are ranked exact (full name, EMR ID or phone digits) before prefix
+    (full name, last name, EMR ID or phone digits) before any other substring.
+    Within a rank, rows are ordered by trigram word similarity when pg_trgm is
+    installed, then by most recently captured.
+
+    Args:
+        cursor: Database cursor (RealDictCursor)
+        search: Search term
+        location_id: Optional location filter
+        limit: Maximum number of rows to return
+
+    Returns:
+        List of patient records with `source`, `status`, `match_rank` (0 exact,
+        1 prefix, 2 substring) and `score` (None without pg_trgm)
+    """
+    term, digits = normalize_search_term(search)
+    search_condition, search_params = _patient_search_condition(search)
+    conditions = [search_condition]
+    condition_params = list(search_params)
+
+    if location_id:
+        conditions.append("location_id = %s")
+        condition_params.append(location_id)
+
+    prefix = f"{_escape_like(term)}%"
+    digits_prefix = f"{digits}%" if digits else None
+
+    if pg_trgm_available(cursor):
+        score = "GREATEST(word_similarity(%s, search_name), similarity(%s, COALESCE(LOWER(emr_id), '')))"
+        score_params = [term, term]
+    else:
+        score = "NULL::real"
+        score_params = []
+
+    query = f"""
+        SELECT
+            matches.*,
+            CASE
+                WHEN search_name = %s OR LOWER(emr_id) = %s OR mobile_phone_digits = %s THEN 0
+                WHEN search_name LIKE %s
+                    OR LOWER(legal_last_name) LIKE %s
+                    OR LOWER(emr_id) LIKE %s
+                    OR mobile_phone_digits LIKE %s THEN 1
+                ELSE 2
+            END AS match_rank,
+            {score} AS score
+        FROM ({DASHBOARD_RECORDS_QUERY}) AS matches
+        WHERE {" AND ".join(conditions)}
+        ORDER BY match_rank, score DESC NULLS LAST, captured_at DESC NULLS LAST, source, id DESC
+        LIMIT %s
+    """
+    params = (
+        [term, term, digits, prefix, prefix, prefix, digits_prefix]
+        + score_params
+        + condition_params
+        + [limit]
+    )
+
+    cursor.execute(query, tuple(params))
+    return cursor.fetchall()
+
+
+PATIENT_UPSERT_COLUMNS = (
+    "emr_id",
+    "booking_id",
+    "booking_number",
+    "patient_number",
+    "location_id",
+    "location_name",
+    "status",
+    "legal_first_name",
+    "legal_last_name",
+    "dob",
+    "mobile_phone",
+    "sex_at_birth",
+    "captured_at",
+    "reason_for_visit",
+)
+
+
+def fetch_patients_by_emr_ids(cursor, emr_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Load the confirmed patients for a set of EMR IDs with one query.
+
+    Args:
+        cursor: Database cursor (RealDictCursor)
+        emr_ids: EMR identifiers to look up
+
+    Returns:
+        Patient rows keyed by emr_id (EMR IDs without a row are absent)
+    """
+    if not emr_ids:
+        return {}
+    cursor.execute("SELECT * FROM patients WHERE emr_id = ANY(%s)", (list(emr_ids),))
+    return {row['emr_id']: row for row in cursor.fetchall()}
+
+
+def _sync_patient_emr_ids(cursor, records: List[Dict[str, Any]]) -> None:
+    """Move existing rows onto the EMR IDs of records sharing a booking or patient number.
+
+    Set-based version of the per-record lookups in insert_patients: each record
+    is matched on booking_id, then booking_number, then patient_number (first
+    identifier with a match wins, most recently updated row first). A row is
+    only re-keyed when no other row holds the new EMR ID yet.
+    """
+    lookups = [
+        (record['booking_id'], record['booking_number'], record['patient_number'])
+        for record in records
+    ]
+    if not any(any(values) for values in lookups):
+        return
+
+    cursor.execute(
+        """
+        SELECT keys.ord, matched.id, matched.emr_id
+        FROM unnest(%s::text[], %s::text[], %s::text[])
+            WITH ORDINALITY AS keys(booking_id, booking_number, patient_number, ord)
+        CROSS JOIN LATERAL (
+            SELECT candidates.id, candidates.emr_id
+            FROM (
+                (SELECT id, emr_id, 1 AS priority FROM patients
+                 WHERE keys.booking_id IS NOT NULL AND booking_id = keys.booking_id
+                 ORDER BY updated_at DESC NULLS LAST, captured_at DESC NULLS LAST LIMIT 1)
+                UNION ALL
+                (SELECT id, emr_id, 2 AS priority FROM patients
+                 WHERE keys.booking_number IS NOT NULL AND booking_number = keys.booking_number
+                 ORDER BY updated_at DESC NULLS LAST, captured_at DESC NULLS LAST LIMIT 1)
+                UNION ALL
+                (SELECT id, emr_id, 3 AS priority FROM patients
+                 WHERE keys.patient_number IS NOT NULL AND patient_number = keys.patient_number
+                 ORDER BY updated_at DESC NULLS LAST, captured_at DESC NULLS LAST LIMIT 1)
+            ) AS candidates
+            ORDER BY candidates.priority
+            LIMIT 1
+        ) AS matched
+        """,
+        tuple(list(column) for column in zip(*lookups)),
+    )
+
+    # Later records win when several point at the same row
+    renames: Dict[Any, str] = {}
+    for ord_, patient_id, existing_emr in cursor.fetchall():
+        emr_id = records[ord_ - 1]['emr_id']
+        if existing_emr != emr_id:
+            renames[patient_id] = emr_id
+    if not renames:
+        return
+
+    execute_values(
+        cursor,
+        """
+            UPDATE patients AS p
+            SET emr_id = v.emr_id,
+                updated_at = CURRENT_TIMESTAMP
+            FROM (VALUES %s) AS v(id, emr_id)
+            WHERE p.id = v.id
+              AND NOT EXISTS (SELECT 1 FROM patients other WHERE other.emr_id = v.emr_id)
+        """,
+        list(renames.items()),
+        page_size=len(renames),
+    )
+
+
+def upsert_patient_records(conn, records: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Insert or update a batch of normalized patient records in one transaction.
+
+    Existing rows sharing a booking_id, booking_number or patient_number are
+    first moved onto the record's EMR ID (as insert_patients does), then all
+    records are written with one multi-row INSERT ... ON CONFLICT (emr_id)
+    DO UPDATE. location_id is kept on conflict and status only changes when
+    the record carries one.
+
+    Args:
+        conn: PostgreSQL database connection
+        records: Normalized patient records (see normalize_patient_record) with
+            unique, non-empty emr_id and location_id
+
+    Returns:
+        Dict mapping each emr_id to 'created' or 'updated'
+
+    Raises:
+        psycopg2.Error: If database operation fails (nothing is saved)
+    """
+    if not records:
+        return {}
+
+    cursor = conn.cursor()
+
+    try:
+        _sync_patient_emr_ids(cursor, records)
+
+        rows = execute_values(
+            cursor,
+            f"""
+                INSERT INTO patients ({", ".join(PATIENT_UPSERT_COLUMNS)})
+                VALUES %s
+                ON CONFLICT (emr_id) DO UPDATE SET
+                    booking_id = EXCLUDED.booking_id,
+                    booking_number = EXCLUDED.booking_number,
+                    patient_number = EXCLUDED.patient_number,
+                    location_name = EXCLUDED.location_name,
+                    legal_first_name = EXCLUDED.legal_first_name,
+                    legal_last_name = EXCLUDED.legal_last_name,
+                    status = COALESCE(EXCLUDED.status, patients.status),
+                    dob = EXCLUDED.dob,
+                    mobile_phone = EXCLUDED.mobile_phone,
+                    sex_at_birth = EXCLUDED.sex_at_birth,
+                    captured_at = EXCLUDED.captured_at,
+                    reason_for_visit = EXCLUDED.reason_for_visit,
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING emr_id, (xmax = 0) AS inserted
+            """,
+            [tuple(record[column] for column in PATIENT_UPSERT_COLUMNS) for record in records],
+            page_size=len(records),
+            fetch=True
+        )
+        conn.commit()
+        return {emr_id: 'created' if inserted else 'updated' for emr_id, inserted in rows}
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def promote_pending_patients(conn, batch_size: int = 500) -> Dict[str, Any]:
+    """
+    Promote one batch of pending patients that have an EMR ID into patients.
+
+    In one transaction: the longest waiting rows (status pending/ready with an
+    EMR ID and a location) are locked with SKIP LOCKED, so concurrent workers
+    take disjoint batches; rows sharing a booking or patient number are moved
+    onto the new EMR IDs (as save_patient_to_db does); the most recently
+    updated pending row per EMR ID is upserted with INSERT ... SELECT ...
+    ON CONFLICT (emr_id); and every claimed row is marked completed with
+    promoted_at set.
+
+    Args:
+        conn: PostgreSQL database connection
+        batch_size: Maximum number of pending rows to claim
+
+    Returns:
+        Dictionary with:
+        - promoted: pending rows marked completed
+        - inserted / updated: patients rows created / updated
+        - superseded: claimed rows skipped for a newer row with the same EMR ID
+        - lag_seconds: seconds each promoted row waited since its EMR ID was set
+
+    Raises:
+        psycopg2.Error: If database operation fails (nothing is promoted)
+    """
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """
+            SELECT pending_id, emr_id, booking_id, booking_number, patient_number, updated_at,
+                   EXTRACT(EPOCH FROM (LOCALTIMESTAMP - COALESCE(emr_id_set_at, created_at)))
+            FROM pending_patients
+            WHERE emr_id IS NOT NULL
+              AND status IN ('pending', 'ready')
+              AND emr_id <> ''
+              AND location_id IS NOT NULL
+            ORDER BY emr_id_set_at, pending_id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            (batch_size,)
+        )
+        claimed = cursor.fetchall()
+        if not claimed:
+            conn.commit()
+            return {'promoted': 0, 'inserted': 0, 'updated': 0, 'superseded': 0, 'lag_seconds': []}
+
+        # The most recently updated row per EMR ID wins
+        latest: Dict[str, Dict[str, Any]] = {}
+        ordered = sorted(claimed, key=lambda row: (row[5] or datetime.min, row[0]))
+        for pending_id, emr_id, booking_id, booking_number, patient_number, _updated_at, _lag in ordered:
+            latest[emr_id] = {
+                'pending_id': pending_id,
+                'emr_id': emr_id,
+                'booking_id': booking_id,
+                'booking_number': booking_number,
+                'patient_number': patient_number,
+            }
+        records = list(latest.values())
+        _sync_patient_emr_ids(cursor, records)
+
+        cursor.execute(
+            """
+            INSERT INTO patients (
+                emr_id, booking_id, booking_number, patient_number, location_id, location_name,
+                legal_first_name, legal_last_name, dob, mobile_phone, sex_at_birth, captured_at,
+                reason_for_visit
+            )
+            SELECT emr_id, booking_id, booking_number, patient_number, location_id, location_name,
+                   legal_first_name, legal_last_name, dob, mobile_phone, sex_at_birth,
+                   COALESCE(captured_at, created_at), reason_for_visit
+            FROM pending_patients
+            WHERE pending_id = ANY(%s)
+            ON CONFLICT (emr_id) DO UPDATE SET
+                booking_id = EXCLUDED.booking_id,
+                booking_number = EXCLUDED.booking_number,
+                patient_number = EXCLUDED.patient_number,
+                location_name = EXCLUDED.location_name,
+                legal_first_name = EXCLUDED.legal_first_name,
+                legal_last_name = EXCLUDED.legal_last_name,
+                dob = EXCLUDED.dob,
+                mobile_phone = EXCLUDED.mobile_phone,
+                sex_at_birth = EXCLUDED.sex_at_birth,
+                captured_at = EXCLUDED.captured_at,
+                reason_for_visit = EXCLUDED.reason_for_visit,
+                updated_at = CURRENT_TIMESTAMP
+            RETURNING (xmax = 0)
+            """,
+            ([record['pending_id'] for record in records],)
+        )
+        inserted = sum(1 for (was_inserted,) in cursor.fetchall() if was_inserted)
+
+        cursor.execute(
+            """
+            UPDATE pending_patients
+            SET status = 'completed',
+                promoted_at = CURRENT_TIMESTAMP,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE pending_id = ANY(%s)
+            """,
+            ([row[0] for row in claimed],)
+        )
+        conn.commit()
+
+        return {
+            'promoted': len(claimed),
+            'inserted': inserted,
+            'updated': len(records) - inserted,
+            'superseded': len(claimed) - len(records),
+            'lag_seconds': [max(float(row[6] or 0), 0.0) for row in claimed],
+        }
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def get_pending_promotion_backlog(conn) -> Dict[str, Any]:
+    """
+    Count pending patients waiting for promotion and the age of the oldest.
+
+    Returns:
+        Dictionary with waiting (row count) and oldest_waiting_seconds (None when empty)
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT COUNT(*), EXTRACT(EPOCH FROM (LOCALTIMESTAMP - MIN(COALESCE(emr_id_set_at, created_at))))
+            FROM pending_patients
+            WHERE emr_id IS NOT NULL
+              AND status IN ('pending', 'ready')
+              AND emr_id <> ''
+              AND location_id IS NOT NULL
+            """
+        )
+        waiting, oldest = cursor.fetchone()
+        conn.commit()
+        return {
+            'waiting': int(waiting),
+            'oldest_waiting_seconds': round(float(oldest), 3) if oldest is not None else None,
+        }
+    finally:
+        cursor.close()
+
+
 def remove_excluded_fields(encounter_payload: Dict[str, Any]) -> Dict[str, Any]:
     """Remove excluded fields from encounter payload for queue storage.
     
@@ -385,6 +1082,7 @@ def save_queue(conn, queue_data: Dict[str, Any]) -> Dict[str, Any]:
             - raw_payload: Optional JSON payload (JSONB)
             - parsed_payload: Optional parsed JSON payload (JSONB)
             - attempts: Optional integer (default: 0)
+            - trace_id: Optional trace id of the creating request (kept on update if omitted)
         
     Returns:
         Dictionary with the saved queue data
@@ -427,9 +1125,9 @@ def save_queue(conn, queue_data: Dict[str, Any]) -> Dict[str, Any]:
         query = """
             INSERT INTO queue (
                 queue_id, encounter_id, emr_id, status,
-                raw_payload, parsed_payload, attempts
+                raw_payload, parsed_payload, attempts, trace_id
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             ON CONFLICT (encounter_id) 
             DO UPDATE SET
                 emr_id = EXCLUDED.emr_id,
@@ -437,6 +1135,7 @@ def save_queue(conn, queue_data: Dict[str, Any]) -> Dict[str, Any]:
                 raw_payload = EXCLUDED.raw_payload,
                 parsed_payload = EXCLUDED.parsed_payload,
                 attempts = EXCLUDED.attempts,
+                trace_id = COALESCE(EXCLUDED.trace_id, queue.trace_id),
                 updated_at = CURRENT_TIMESTAMP
             RETURNING *
         """
@@ -451,6 +1150,7 @@ def save_queue(conn, queue_data: Dict[str, Any]) -> Dict[str, Any]:
                 raw_payload_json,
                 parsed_payload_json,
                 attempts,
+                queue_data.get('trace_id'),
             )
         )
         
@@ -484,36 +1184,121 @@ def save_queue(conn, queue_data: Dict[str, Any]) -> Dict[str, Any]:
         cursor.close()
 
 
-def save_vm_health(conn, vm_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Save or update a VM health record in the database.
-    
-    Args:
-        conn: PostgreSQL database connection
-        vm_data: Dictionary containing VM health data with:
-            - vm_id: string (required) - VM identifier
-            - server_id: Optional string - Server identifier
-            - status: string (required) - VM status: healthy, unhealthy, or idle
-            - processing_queue_id: Optional UUID - Queue ID that the VM is processing
-            - workflow_status: Optional string - AI Agent Workflow status
-            - metadata: Optional dict - Metadata object with system metrics
-        
+def _heartbeat_metadata_update_clause(table: str, data: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """
+    Build the ON CONFLICT SET fragment for heartbeat metadata columns.
+
+    The metadata column is only assigned when the heartbeat carries a full
+    snapshot ('metadata' key) or changed metrics ('metadata_delta'). A full
+    snapshot equal to the stored value keeps the stored datum, so resending
+    unchanged metadata does not rewrite the JSONB value.
+
     Returns:
-        Dictionary with the saved/updated VM health data
-        
-    Raises:
-        psycopg2.Error: If database operation fails
+        Tuple of (SQL fragment ending in a comma or empty, parameter values)
     """
-    import json
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    
-    try:
-        # Extract required fields
+    clauses: List[str] = []
+    values: List[Any] = []
+
+    if 'metadata' in data:
+        clauses.append(
+            f"metadata = CASE WHEN {table}.metadata IS DISTINCT FROM EXCLUDED.metadata "
+            f"THEN EXCLUDED.metadata ELSE {table}.metadata END,"
+        )
+    elif data.get('metadata_delta') or data.get('metadata_removed'):
+        clauses.append(
+            f"metadata = (COALESCE({table}.metadata, '{{}}'::jsonb) || %s::jsonb) - %s::text[],"
+        )
+        values.extend([
+            json.dumps(data.get('metadata_delta') or {}),
+            list(data.get('metadata_removed') or []),
+        ])
+
+    if data.get('metadata_version') is not None:
+        clauses.append("metadata_version = EXCLUDED.metadata_version,")
+
+    return " ".join(clauses), values
+
+
+def get_heartbeat_metadata_state(conn, kind: str, entity_id: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """
+    Get the stored heartbeat metadata and version for a VM or server.
+
+    Args:
+        conn: PostgreSQL database connection
+        kind: 'vm' or 'server'
+        entity_id: VM or server identifier
+
+    Returns:
+        Tuple of (metadata_version, metadata); (0, None) if no row exists
+
+    Raises:
+        ValueError: If kind is not 'vm' or 'server'
+        psycopg2.Error: If database operation fails
+    """
+    tables = {'vm': ('vm_health', 'vm_id'), 'server': ('server_health', 'server_id')}
+    if kind not in tables:
+        raise ValueError(f"Invalid heartbeat kind: {kind}")
+    table, key_column = tables[kind]
+
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    try:
+        cursor.execute(
+            f"SELECT metadata_version, metadata FROM {table} WHERE {key_column} = %s",
+            (entity_id,)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return 0, None
+
+        metadata = row.get('metadata')
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata)
+        return int(row.get('metadata_version') or 0), metadata
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def save_vm_health(conn, vm_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Save or update a VM health record in the database.
+    
+    Args:
+        conn: PostgreSQL database connection
+        vm_data: Dictionary containing VM health data with:
+            - vm_id: string (required) - VM identifier
+            - server_id: Optional string - Server identifier
+            - status: string (required) - VM status: healthy, unhealthy, or idle
+            - processing_queue_id: Optional UUID - Queue ID that the VM is processing
+            - workflow_status: Optional string - AI Agent Workflow status
+            - metadata: Optional dict - Metadata object with system metrics; replaces
+              the stored metadata. Omit the key to leave stored metadata untouched.
+            - metadata_delta: Optional dict - Changed metrics to merge into the stored
+              metadata (used instead of metadata)
+            - metadata_removed: Optional list - Metadata keys to drop with metadata_delta
+            - metadata_version: Optional int - Heartbeat metadata version counter
+        
+    Returns:
+        Dictionary with the saved/updated VM health data
+        
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    import json
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    
+    try:
+        # Extract required fields
         vm_id = vm_data.get('vm_id')
         status = vm_data.get('status')
         processing_queue_id = vm_data.get('processing_queue_id')
         server_id = vm_data.get('server_id')
         workflow_status = vm_data.get('workflow_status')
         metadata = vm_data.get('metadata')
+        metadata_delta = vm_data.get('metadata_delta')
         
         # Validate required fields
         if not vm_id:
@@ -530,14 +1315,19 @@ def save_vm_health(conn, vm_data: Dict[str, Any]) -> Dict[str, Any]:
         metadata_json = None
         if metadata:
             metadata_json = json.dumps(metadata)
+        elif metadata_delta:
+            metadata_json = json.dumps(metadata_delta)
+        
+        # Only rewrite the metadata JSONB when the heartbeat changes it
+        metadata_clause, metadata_values = _heartbeat_metadata_update_clause('vm_health', vm_data)
         
         # Use INSERT ... ON CONFLICT to handle duplicates (update on conflict)
-        query = """
+        query = f"""
             INSERT INTO vm_health (
                 vm_id, server_id, last_heartbeat, status, processing_queue_id, 
-                workflow_status, metadata, updated_at
+                workflow_status, metadata, metadata_version, updated_at
             )
-            VALUES (%s, %s, CURRENT_TIMESTAMP, %s, %s, %s, %s::jsonb, CURRENT_TIMESTAMP)
+            VALUES (%s, %s, CURRENT_TIMESTAMP, %s, %s, %s, %s::jsonb, %s, CURRENT_TIMESTAMP)
             ON CONFLICT (vm_id) 
             DO UPDATE SET
                 server_id = EXCLUDED.server_id,
@@ -545,7 +1335,7 @@ def save_vm_health(conn, vm_data: Dict[str, Any]) -> Dict[str, Any]:
                 status = EXCLUDED.status,
                 processing_queue_id = EXCLUDED.processing_queue_id,
                 workflow_status = EXCLUDED.workflow_status,
-                metadata = EXCLUDED.metadata,
+                {metadata_clause}
                 updated_at = CURRENT_TIMESTAMP
             RETURNING *
         """
@@ -559,6 +1349,8 @@ def save_vm_health(conn, vm_data: Dict[str, Any]) -> Dict[str, Any]:
                 processing_queue_id,
                 workflow_status,
                 metadata_json,
+                vm_data.get('metadata_version') or 0,
+                *metadata_values,
             )
         )
         
@@ -606,7 +1398,12 @@ def save_server_health(conn, server_data: Dict[str, Any]) -> Dict[str, Any]:
         server_data: Dictionary containing server health data with:
             - server_id: string (required) - Server identifier
             - status: string (required) - Server status: healthy, unhealthy, or down
-            - metadata: Optional dict - Metadata object with system metrics
+            - metadata: Optional dict - Metadata object with system metrics; replaces
+              the stored metadata. Omit the key to leave stored metadata untouched.
+            - metadata_delta: Optional dict - Changed metrics to merge into the stored
+              metadata (used instead of metadata)
+            - metadata_removed: Optional list - Metadata keys to drop with metadata_delta
+            - metadata_version: Optional int - Heartbeat metadata version counter
         
     Returns:
         Dictionary with the saved/updated server health data
@@ -621,6 +1418,7 @@ def save_server_health(conn, server_data: Dict[str, Any]) -> Dict[str, Any]:
         server_id = server_data.get('server_id')
         status = server_data.get('status')
         metadata = server_data.get('metadata')
+        metadata_delta = server_data.get('metadata_delta')
         
         # Validate required fields
         if not server_id:
@@ -637,18 +1435,23 @@ def save_server_health(conn, server_data: Dict[str, Any]) -> Dict[str, Any]:
         metadata_json = None
         if metadata:
             metadata_json = json.dumps(metadata)
+        elif metadata_delta:
+            metadata_json = json.dumps(metadata_delta)
+        
+        # Only rewrite the metadata JSONB when the heartbeat changes it
+        metadata_clause, metadata_values = _heartbeat_metadata_update_clause('server_health', server_data)
         
         # Use INSERT ... ON CONFLICT to handle duplicates (update on conflict)
-        query = """
+        query = f"""
             INSERT INTO server_health (
-                server_id, last_heartbeat, status, metadata, updated_at
+                server_id, last_heartbeat, status, metadata, metadata_version, updated_at
             )
-            VALUES (%s, CURRENT_TIMESTAMP, %s, %s::jsonb, CURRENT_TIMESTAMP)
+            VALUES (%s, CURRENT_TIMESTAMP, %s, %s::jsonb, %s, CURRENT_TIMESTAMP)
             ON CONFLICT (server_id) 
             DO UPDATE SET
                 last_heartbeat = CURRENT_TIMESTAMP,
                 status = EXCLUDED.status,
-                metadata = EXCLUDED.metadata,
+                {metadata_clause}
                 updated_at = CURRENT_TIMESTAMP
             RETURNING *
         """
@@ -659,6 +1462,8 @@ def save_server_health(conn, server_data: Dict[str, Any]) -> Dict[str, Any]:
                 server_id,
                 status,
                 metadata_json,
+                server_data.get('metadata_version') or 0,
+                *metadata_values,
             )
         )
         
@@ -1162,6 +1967,7 @@ def create_queue_from_encounter(conn, encounter_data: Dict[str, Any]) -> Dict[st
         'raw_payload': raw_payload,  # Cleaned encounter payload (excluded fields removed)
         'parsed_payload': parsed_payload,  # Simplified parsed structure (internal use only)
         'attempts': 0,
+        'trace_id': current_trace_id(),  # Links the queue entry to the creating request's trace
     }
     
     logger.info(
@@ -1384,7 +2190,141 @@ def update_queue_status_and_experity_action(
         cursor.close()
 
 
-def save_alert(conn, alert_dict: Dict[str, Any]) -> Dict[str, Any]:
+def recover_orphaned_queue_entries(
+    conn,
+    stale_after_seconds: int = 120,
+    max_attempts: int = 5
+) -> List[Dict[str, Any]]:
+    """
+    Requeue PROCESSING queue entries whose VM has stopped sending heartbeats.
+
+    A queue entry is considered orphaned when it is still PROCESSING and the
+    vm_health row pointing at it (via processing_queue_id) has not sent a
+    heartbeat within stale_after_seconds. Orphaned entries are moved back to
+    PENDING with attempts incremented. Entries whose attempts would exceed
+    max_attempts are dead-lettered instead (status ERROR with dlq=true in
+    parsed_payload, same as PATCH /queue/{queue_id}/status with dlq).
+
+    The stale VM's processing_queue_id is cleared in the same transaction so
+    the entry is not picked up again on the next run. Rows are locked with
+    FOR UPDATE SKIP LOCKED so concurrent runs from several workers are safe.
+
+    Args:
+        conn: PostgreSQL database connection
+        stale_after_seconds: Heartbeat age after which a VM is considered dead
+        max_attempts: Retry ceiling before an entry is dead-lettered
+
+    Returns:
+        List of dicts with queue_id, vm_id, status and attempts for each
+        recovered entry
+
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    try:
+        query = """
+            WITH orphaned AS (
+                SELECT q.queue_id, vh.vm_id, vh.last_heartbeat
+                FROM queue q
+                JOIN vm_health vh ON vh.processing_queue_id = q.queue_id
+                WHERE q.status = 'PROCESSING'
+                  AND vh.last_heartbeat < CURRENT_TIMESTAMP - (%s * INTERVAL '1 second')
+                FOR UPDATE OF q SKIP LOCKED
+            )
+            UPDATE queue q
+            SET status = CASE WHEN q.attempts + 1 > %s THEN 'ERROR' ELSE 'PENDING' END,
+                attempts = q.attempts + 1,
+                parsed_payload = COALESCE(q.parsed_payload, '{}'::jsonb) || CASE
+                    WHEN q.attempts + 1 > %s THEN jsonb_build_object(
+                        'dlq', TRUE,
+                        'error_message', 'Exceeded ' || %s || ' attempts; VM ' || o.vm_id || ' stopped sending heartbeats'
+                    )
+                    ELSE jsonb_build_object(
+                        'requeue_message', 'Recovered from VM ' || o.vm_id || ' (no heartbeat since ' || o.last_heartbeat || ')'
+                    )
+                END,
+                updated_at = CURRENT_TIMESTAMP
+            FROM orphaned o
+            WHERE q.queue_id = o.queue_id
+            RETURNING q.queue_id, o.vm_id, q.status, q.attempts
+        """
+        cursor.execute(query, (stale_after_seconds, max_attempts, max_attempts, max_attempts))
+        recovered = [dict(row) for row in cursor.fetchall()]
+
+        if recovered:
+            cursor.execute(
+                """
+                UPDATE vm_health
+                SET processing_queue_id = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE vm_id = ANY(%s)
+                """,
+                ([row['vm_id'] for row in recovered],)
+            )
+
+        conn.commit()
+
+        for row in recovered:
+            row['queue_id'] = str(row['queue_id'])
+
+        return recovered
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def _enqueue_alert_notifications(
+    cursor,
+    alert_id: Any,
+    event: str,
+    channels: Optional[List[str]],
+    digest_key: Optional[str] = None,
+    digest_window_seconds: int = 0
+) -> None:
+    """
+    Write one outbox row per channel for an alert event (caller commits).
+
+    Digest rows are held until the end of the current digest window, a
+    multiple of digest_window_seconds on the database clock, so they come due
+    together with the rows other workers queued for the same window.
+    """
+    if not channels:
+        return
+    window = digest_window_seconds if digest_key and digest_window_seconds > 0 else 0
+    cursor.execute(
+        """
+            INSERT INTO alert_notification_outbox (alert_id, event, channel, payload, digest_key, next_attempt_at)
+            SELECT a.alert_id, %(event)s, c.channel, to_jsonb(a), %(digest_key)s,
+                   CASE WHEN %(window)s > 0
+                        THEN to_timestamp((floor(extract(epoch FROM CURRENT_TIMESTAMP) / %(window)s) + 1) * %(window)s)
+                        ELSE CURRENT_TIMESTAMP
+                   END
+            FROM alerts a
+            CROSS JOIN unnest(%(channels)s::text[]) AS c(channel)
+            WHERE a.alert_id = %(alert_id)s
+        """,
+        {
+            'event': event,
+            'digest_key': digest_key,
+            'window': window,
+            'channels': list(channels),
+            'alert_id': str(alert_id),
+        }
+    )
+
+
+def save_alert(
+    conn,
+    alert_dict: Dict[str, Any],
+    notify_channels: Optional[List[str]] = None,
+    digest_key: Optional[str] = None,
+    digest_window_seconds: int = 0
+) -> Dict[str, Any]:
     """
     Save or create an alert record in the alerts table.
     
@@ -1397,6 +2337,12 @@ def save_alert(conn, alert_dict: Dict[str, Any]) -> Dict[str, Any]:
             - message: str (required) - Alert message
             - details: dict (optional) - Additional details as JSONB
             - timestamp: str (optional) - ISO 8601 timestamp (defaults to now)
+        notify_channels: Notification channels ('email', 'slack') to queue a
+            'created' notification for, in the same transaction as the alert
+        digest_key: Queue the notification for a digest with this key
+            (see app.utils.alert_digest) instead of as a single alert
+        digest_window_seconds: Digest window length; a digest notification is
+            held until the current window closes
     
     Returns:
         Dictionary with the saved alert data including alert_id and created_at
@@ -1465,6 +2411,10 @@ def save_alert(conn, alert_dict: Dict[str, Any]) -> Dict[str, Any]:
         
         cursor.execute(query, (source, source_id, severity, message, details_jsonb, created_at))
         result = cursor.fetchone()
+        _enqueue_alert_notifications(
+            cursor, result['alert_id'], 'created', notify_channels,
+            digest_key=digest_key, digest_window_seconds=digest_window_seconds
+        )
         conn.commit()
         
         # Format the result
@@ -1481,10 +2431,56 @@ def save_alert(conn, alert_dict: Dict[str, Any]) -> Dict[str, Any]:
         cursor.close()
 
 
-def get_alerts(conn, filters: Optional[Dict[str, Any]] = None, limit: int = 50, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+def _alert_filter_conditions(filters: Optional[Dict[str, Any]], include_source_id: bool = True) -> Tuple[List[str], List[Any]]:
+    """Build WHERE conditions and parameters for alert list filters."""
+    where_conditions = []
+    query_params = []
+    
+    if filters:
+        if 'source' in filters and filters['source']:
+            where_conditions.append("source = %s")
+            query_params.append(filters['source'])
+        
+        if include_source_id and 'source_id' in filters and filters['source_id']:
+            where_conditions.append("source_id = %s")
+            query_params.append(filters['source_id'])
+        
+        if 'severity' in filters and filters['severity']:
+            where_conditions.append("severity = %s")
+            query_params.append(filters['severity'])
+        
+        if 'resolved' in filters:
+            resolved = filters['resolved']
+            if isinstance(resolved, bool):
+                where_conditions.append("resolved = %s")
+                query_params.append(resolved)
+            elif isinstance(resolved, str):
+                # Handle string "true"/"false"
+                resolved_bool = resolved.lower() in ('true', '1', 'yes')
+                where_conditions.append("resolved = %s")
+                query_params.append(resolved_bool)
+    
+    return where_conditions, query_params
+
+
+def get_alerts(
+    conn,
+    filters: Optional[Dict[str, Any]] = None,
+    limit: int = 50,
+    offset: int = 0,
+    after: Optional[Tuple[datetime, str]] = None
+) -> Tuple[List[Dict[str, Any]], int]:
     """
     Retrieve alerts with optional filtering and pagination.
     
+    Alerts are ordered by (created_at, alert_id) descending. Pass `after` (the
+    last row of the previous page) for keyset pagination; it reads the next
+    page straight from the index instead of skipping `offset` rows.
+    
+    The total comes from the trigger-maintained alert_counts table unless a
+    source_id filter is given, in which case the (index-selective) matching
+    rows are counted.
+    
     Args:
         conn: PostgreSQL database connection
         filters: Optional dictionary with filter keys:
@@ -1493,7 +2489,8 @@ def get_alerts(conn, filters: Optional[Dict[str, Any]] = None, limit: int = 50,
             - severity: str - Filter by severity
             - resolved: bool - Filter by resolved status
         limit: Maximum number of alerts to return (default: 50)
-        offset: Pagination offset (default: 0)
+        offset: Pagination offset (default: 0), ignored when `after` is given
+        after: Optional (created_at, alert_id) of the last alert already returned
     
     Returns:
         Tuple of (list of alert dictionaries, total count)
@@ -1504,49 +2501,33 @@ def get_alerts(conn, filters: Optional[Dict[str, Any]] = None, limit: int = 50,
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
-        # Build WHERE clause
-        where_conditions = []
-        query_params = []
-        
-        if filters:
-            if 'source' in filters and filters['source']:
-                where_conditions.append("source = %s")
-                query_params.append(filters['source'])
-            
-            if 'source_id' in filters and filters['source_id']:
-                where_conditions.append("source_id = %s")
-                query_params.append(filters['source_id'])
-            
-            if 'severity' in filters and filters['severity']:
-                where_conditions.append("severity = %s")
-                query_params.append(filters['severity'])
-            
-            if 'resolved' in filters:
-                resolved = filters['resolved']
-                if isinstance(resolved, bool):
-                    where_conditions.append("resolved = %s")
-                    query_params.append(resolved)
-                elif isinstance(resolved, str):
-                    # Handle string "true"/"false"
-                    resolved_bool = resolved.lower() in ('true', '1', 'yes')
-                    where_conditions.append("resolved = %s")
-                    query_params.append(resolved_bool)
-        
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-        
         # Get total count
-        count_query = f"SELECT COUNT(*) as total FROM alerts {where_clause}"
+        if filters and filters.get('source_id'):
+            where_conditions, query_params = _alert_filter_conditions(filters)
+            where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+            count_query = f"SELECT COUNT(*) as total FROM alerts {where_clause}"
+        else:
+            where_conditions, query_params = _alert_filter_conditions(filters, include_source_id=False)
+            where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+            count_query = f"SELECT COALESCE(SUM(alert_count), 0) as total FROM alert_counts {where_clause}"
         cursor.execute(count_query, tuple(query_params))
         total_result = cursor.fetchone()
-        total = total_result['total'] if total_result else 0
+        total = int(total_result['total']) if total_result else 0
         
         # Get paginated results
+        where_conditions, query_params = _alert_filter_conditions(filters)
+        if after is not None:
+            where_conditions.append("(created_at, alert_id) < (%s, %s::uuid)")
+            query_params.extend([after[0], after[1]])
+            offset = 0
+        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+        
         query = f"""
             SELECT alert_id, source, source_id, severity, message, details,
                    resolved, resolved_at, resolved_by, created_at, updated_at
             FROM alerts
             {where_clause}
-            ORDER BY created_at DESC
+            ORDER BY created_at DESC, alert_id DESC
             LIMIT %s OFFSET %s
         """
         
@@ -1566,7 +2547,12 @@ def get_alerts(conn, filters: Optional[Dict[str, Any]] = None, limit: int = 50,
         cursor.close()
 
 
-def resolve_alert(conn, alert_id: str, resolved_by: Optional[str] = None) -> Dict[str, Any]:
+def resolve_alert(
+    conn,
+    alert_id: str,
+    resolved_by: Optional[str] = None,
+    notify_channels: Optional[List[str]] = None
+) -> Dict[str, Any]:
     """
     Mark an alert as resolved.
     
@@ -1574,6 +2560,8 @@ def resolve_alert(conn, alert_id: str, resolved_by: Optional[str] = None) -> Dic
         conn: PostgreSQL database connection
         alert_id: Alert UUID to resolve
         resolved_by: Optional identifier of who/what resolved the alert
+        notify_channels: Notification channels to queue a 'resolved'
+            notification for, in the same transaction as the update
     
     Returns:
         Dictionary with the updated alert data
@@ -1607,11 +2595,13 @@ def resolve_alert(conn, alert_id: str, resolved_by: Optional[str] = None) -> Dic
         
         cursor.execute(update_query, (resolved_by, alert_id))
         result = cursor.fetchone()
-        conn.commit()
         
         if not result:
             raise ValueError(f"Failed to resolve alert: {alert_id}")
         
+        _enqueue_alert_notifications(cursor, alert_id, 'resolved', notify_channels)
+        conn.commit()
+        
         # Format the result
         alert_record = dict(result)
         return alert_record
@@ -1626,196 +2616,895 @@ def resolve_alert(conn, alert_id: str, resolved_by: Optional[str] = None) -> Dic
         cursor.close()
 
 
-def save_experity_process_time(conn, process_time_dict: Dict[str, Any]) -> Dict[str, Any]:
+def claim_alert_notifications(conn, limit: int = 50, lease_seconds: int = 300) -> List[Dict[str, Any]]:
     """
-    Save or create an Experity process time record.
+    Claim due outbox notifications for delivery.
+    
+    Claimed rows stay PENDING with attempts incremented and next_attempt_at
+    pushed out by the lease, so a worker that dies mid-delivery releases them
+    when the lease runs out. SKIP LOCKED lets several workers claim at once
+    without picking the same rows.
+    
+    Digest groups are claimed whole: when the batch includes a digest row, all
+    other due rows with the same digest key and channel are claimed with it,
+    so a digest is never split across batches.
     
     Args:
         conn: PostgreSQL database connection
-        process_time_dict: Dictionary containing process time data with keys:
-            - process_name: str (required) - 'Encounter process time' or 'Experity process time'
-            - started_at: str (required) - ISO 8601 timestamp
-            - ended_at: str (required) - ISO 8601 timestamp
-            - encounter_id: str (optional) - Encounter ID UUID
+        limit: Number of notifications to claim, before digest groups in the
+            batch are completed
+        lease_seconds: How long the claim holds before the rows are due again
     
     Returns:
-        Dictionary with the saved process time data including process_time_id and created_at
+        List of claimed outbox rows (outbox_id, alert_id, event, channel, payload,
+        attempts, digest_key)
     
     Raises:
         psycopg2.Error: If database operation fails
-        ValueError: If required fields are missing or invalid
     """
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
-        # Validate required fields
-        required_fields = ['process_name', 'started_at', 'ended_at']
-        for field in required_fields:
-            if field not in process_time_dict or not process_time_dict[field]:
-                raise ValueError(f"Missing required field: {field}")
-        
-        # Validate process_name
-        valid_names = ['Encounter process time', 'Experity process time']
-        if process_time_dict['process_name'] not in valid_names:
-            raise ValueError(f"Invalid process_name: {process_time_dict['process_name']}. Must be one of: {', '.join(valid_names)}")
-        
-        # Parse timestamps
-        started_at = process_time_dict['started_at']
-        if isinstance(started_at, str):
-            started_at_clean = started_at.replace('Z', '').replace('+00:00', '')
-            try:
-                started_at_dt = datetime.fromisoformat(started_at_clean)
-                if started_at_dt.tzinfo is None:
-                    started_at_dt = started_at_dt.replace(tzinfo=timezone.utc)
-                started_at = started_at_dt
-            except ValueError:
-                raise ValueError(f"Invalid started_at timestamp format: {started_at}")
-        
-        ended_at = process_time_dict['ended_at']
-        if isinstance(ended_at, str):
-            ended_at_clean = ended_at.replace('Z', '').replace('+00:00', '')
-            try:
-                ended_at_dt = datetime.fromisoformat(ended_at_clean)
-                if ended_at_dt.tzinfo is None:
-                    ended_at_dt = ended_at_dt.replace(tzinfo=timezone.utc)
-                ended_at = ended_at_dt
-            except ValueError:
-                raise ValueError(f"Invalid ended_at timestamp format: {ended_at}")
-        
-        # Get encounter_id if provided
-        encounter_id = process_time_dict.get('encounter_id')
-        
-        # Insert process time record
         query = """
-            INSERT INTO experity_process_time (process_name, started_at, ended_at, encounter_id)
-            VALUES (%s, %s, %s, %s)
-            RETURNING process_time_id, process_name, started_at, ended_at, 
-                      duration_seconds, created_at, updated_at, encounter_id
+            WITH due AS (
+                SELECT outbox_id, event, channel, digest_key
+                FROM alert_notification_outbox
+                WHERE status = 'PENDING'
+                  AND next_attempt_at <= CURRENT_TIMESTAMP
+                ORDER BY next_attempt_at, digest_key
+                LIMIT %(limit)s
+                FOR UPDATE SKIP LOCKED
+            ),
+            digest_rest AS (
+                SELECT o.outbox_id
+                FROM alert_notification_outbox o
+                JOIN (
+                    SELECT DISTINCT digest_key, channel
+                    FROM due
+                    WHERE digest_key IS NOT NULL AND event = 'created'
+                ) g ON g.digest_key = o.digest_key AND g.channel = o.channel
+                WHERE o.status = 'PENDING'
+                  AND o.event = 'created'
+                  AND o.next_attempt_at <= CURRENT_TIMESTAMP
+                  AND o.outbox_id NOT IN (SELECT outbox_id FROM due)
+                FOR UPDATE OF o SKIP LOCKED
+            )
+            UPDATE alert_notification_outbox o
+            SET attempts = o.attempts + 1,
+                next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %(lease_seconds)s)
+            WHERE o.outbox_id IN (
+                SELECT outbox_id FROM due
+                UNION ALL
+                SELECT outbox_id FROM digest_rest
+            )
+            RETURNING o.outbox_id, o.alert_id, o.event, o.channel, o.payload, o.attempts, o.digest_key
         """
-        
-        cursor.execute(query, (process_time_dict['process_name'], started_at, ended_at, encounter_id))
-        result = cursor.fetchone()
+        cursor.execute(query, {'limit': limit, 'lease_seconds': lease_seconds})
+        results = cursor.fetchall()
         conn.commit()
-        
-        # Format the result
-        process_time_record = dict(result)
-        return process_time_record
+        return [dict(row) for row in results]
         
     except psycopg2.Error as e:
         conn.rollback()
         raise e
-    except ValueError as e:
-        conn.rollback()
-        raise e
     finally:
         cursor.close()
 
 
-def get_experity_process_times(conn, filters: Optional[Dict[str, Any]] = None, limit: int = 50, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+def complete_alert_notifications(
+    conn,
+    sent_ids: List[str],
+    failures: List[Tuple[str, str, bool, int]]
+) -> None:
     """
-    Retrieve Experity process time records with optional filtering and pagination.
+    Record the outcome of a delivery batch.
     
     Args:
         conn: PostgreSQL database connection
-        filters: Optional dictionary with filter keys:
-            - process_name: str - Filter by process name
-            - started_after: str - ISO 8601 timestamp (only records started after this)
-            - started_before: str - ISO 8601 timestamp (only records started before this)
-            - completed_only: bool - Only return records with ended_at set
-            - encounter_id: str - Filter by encounter ID
-        limit: Maximum number of records to return (default: 50, max: 100)
-        offset: Number of records to skip (default: 0)
+        sent_ids: Outbox ids that were delivered
+        failures: (outbox_id, error, give_up, retry_in_seconds) per failed delivery;
+            give_up marks the row FAILED, otherwise it is due again after the delay
     
-    Returns:
-        Tuple of (list of process time records, total count)
+    Raises:
+        psycopg2.Error: If database operation fails
     """
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor = conn.cursor()
     
     try:
-        # Build WHERE clause
-        where_conditions = []
-        params = []
-        
-        if filters:
-            if 'process_name' in filters:
-                where_conditions.append("process_name = %s")
-                params.append(filters['process_name'])
-            
-            if 'encounter_id' in filters:
-                where_conditions.append("encounter_id = %s")
-                params.append(filters['encounter_id'])
-            
-            if 'started_after' in filters:
-                where_conditions.append("started_at >= %s")
-                started_after = filters['started_after']
-                if isinstance(started_after, str):
-                    started_at_clean = started_after.replace('Z', '').replace('+00:00', '')
-                    started_at_dt = datetime.fromisoformat(started_at_clean)
-                    if started_at_dt.tzinfo is None:
-                        started_at_dt = started_at_dt.replace(tzinfo=timezone.utc)
-                    params.append(started_at_dt)
-                else:
-                    params.append(started_after)
-            
-            if 'started_before' in filters:
-                where_conditions.append("started_at <= %s")
-                started_before = filters['started_before']
-                if isinstance(started_before, str):
-                    started_before_clean = started_before.replace('Z', '').replace('+00:00', '')
-                    started_before_dt = datetime.fromisoformat(started_before_clean)
-                    if started_before_dt.tzinfo is None:
-                        started_before_dt = started_before_dt.replace(tzinfo=timezone.utc)
-                    params.append(started_before_dt)
-                else:
-                    params.append(started_before)
-            
-            if filters.get('completed_only', False):
-                where_conditions.append("ended_at IS NOT NULL")
-        
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
-        
-        # Get total count
-        count_query = f"SELECT COUNT(*) as total FROM experity_process_time WHERE {where_clause}"
-        cursor.execute(count_query, tuple(params))
-        total = cursor.fetchone()['total']
-        
-        # Get paginated results
-        query = f"""
-            SELECT process_time_id, process_name, started_at, ended_at, 
-                   duration_seconds, created_at, updated_at, encounter_id
-            FROM experity_process_time
-            WHERE {where_clause}
-            ORDER BY started_at DESC
-            LIMIT %s OFFSET %s
-        """
-        params.extend([limit, offset])
-        
-        cursor.execute(query, tuple(params))
-        results = cursor.fetchall()
-        
-        # Convert to list of dicts
-        process_times = [dict(row) for row in results]
-        
-        return process_times, total
+        if sent_ids:
+            cursor.execute(
+                """
+                    UPDATE alert_notification_outbox
+                    SET status = 'SENT', sent_at = CURRENT_TIMESTAMP, last_error = NULL
+                    WHERE outbox_id = ANY(%s::uuid[])
+                """,
+                (list(sent_ids),)
+            )
+        if failures:
+            execute_values(
+                cursor,
+                """
+                    UPDATE alert_notification_outbox o
+                    SET status = CASE WHEN f.give_up THEN 'FAILED' ELSE 'PENDING' END,
+                        last_error = f.error,
+                        next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => f.retry_in)
+                    FROM (VALUES %s) AS f(outbox_id, error, give_up, retry_in)
+                    WHERE o.outbox_id = f.outbox_id::uuid
+                """,
+                failures
+            )
+        conn.commit()
         
     except psycopg2.Error as e:
+        conn.rollback()
         raise e
     finally:
         cursor.close()
 
 
-def update_server_health_partial(conn, server_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Partially update a server health record (only updates provided fields).
+def prune_alert_notifications(conn, retention_days: int = 7) -> int:
+    """
+    Delete delivered and failed outbox rows older than the retention window.
     
     Args:
         conn: PostgreSQL database connection
-        server_data: Dictionary containing server health data with:
-            - server_id: string (required) - Server identifier
-            - status: Optional string - Server status
-            - metadata: Optional dict - Metadata object with system metrics
+        retention_days: Days of finished notifications to keep
+    
+    Returns:
+        Number of rows deleted
+    
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(
+            """
+                DELETE FROM alert_notification_outbox
+                WHERE status IN ('SENT', 'FAILED')
+                  AND updated_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+            """,
+            (retention_days,)
+        )
+        deleted = cursor.rowcount
+        conn.commit()
+        return deleted
+        
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def ensure_alert_partitions(conn, months_ahead: int = 3) -> int:
+    """
+    Create monthly alert partitions from the current month through months_ahead.
+    
+    Args:
+        conn: PostgreSQL database connection
+        months_ahead: Number of future months to create partitions for
+    
+    Returns:
+        Number of partitions created (0 if another worker holds the maintenance lock)
+    
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext('alert_partition_maintenance'))")
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return 0
+        
+        cursor.execute("SELECT ensure_alert_partitions(%s)", (months_ahead,))
+        created = cursor.fetchone()[0]
+        conn.commit()
+        return created
+        
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def archive_alert_partitions(conn, retention_days: int = 90, drop: bool = False) -> List[str]:
+    """
+    Detach monthly alert partitions that ended more than retention_days ago.
+    
+    A partition is only detached when every alert in it is resolved; months that
+    still hold unresolved alerts stay attached. Detached partitions are moved to
+    the alerts_archive schema, or dropped when drop is True. alert_counts is
+    adjusted for the rows that leave the alerts table.
+    
+    Args:
+        conn: PostgreSQL database connection
+        retention_days: Days after a partition's month ends before it is archived
+        drop: Drop detached partitions instead of archiving them
+    
+    Returns:
+        Names of the partitions archived or dropped
+    
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor()
+    archived = []
+    
+    try:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext('alert_partition_maintenance'))")
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return archived
+        
+        # Monthly partitions (alerts_pYYYYMM) whose month ended before the cutoff
+        cursor.execute(
+            """
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'alerts'::regclass
+                  AND c.relname ~ '^alerts_p[0-9]{6}$'
+                  AND to_date(substring(c.relname FROM 9), 'YYYYMM') + INTERVAL '1 month'
+                      <= CURRENT_DATE - make_interval(days => %s)
+                ORDER BY c.relname
+            """,
+            (retention_days,)
+        )
+        candidates = [row[0] for row in cursor.fetchall()]
+        
+        for partition_name in candidates:
+            partition = sql.Identifier(partition_name)
+            cursor.execute(sql.SQL("LOCK TABLE {} IN SHARE MODE").format(partition))
+            cursor.execute(
+                sql.SQL("SELECT EXISTS (SELECT 1 FROM {} WHERE resolved IS NOT TRUE)").format(partition)
+            )
+            if cursor.fetchone()[0]:
+                logger.info(f"Keeping alert partition {partition_name}: it still has unresolved alerts")
+                continue
+            
+            cursor.execute(
+                sql.SQL("""
+                    INSERT INTO alert_counts (source, severity, resolved, alert_count)
+                    SELECT source, severity, COALESCE(resolved, FALSE), -COUNT(*)
+                    FROM {}
+                    GROUP BY source, severity, COALESCE(resolved, FALSE)
+                    ON CONFLICT (source, severity, resolved, shard)
+                    DO UPDATE SET alert_count = alert_counts.alert_count + EXCLUDED.alert_count
+                """).format(partition)
+            )
+            cursor.execute(sql.SQL("ALTER TABLE alerts DETACH PARTITION {}").format(partition))
+            if drop:
+                cursor.execute(sql.SQL("DROP TABLE {}").format(partition))
+            else:
+                cursor.execute("CREATE SCHEMA IF NOT EXISTS alerts_archive")
+                cursor.execute(sql.SQL("ALTER TABLE {} SET SCHEMA alerts_archive").format(partition))
+            archived.append(partition_name)
+        
+        conn.commit()
+        return archived
+        
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def sync_resource_alerts(
+    conn,
+    evaluate: Callable[
+        [List[Dict[str, Any]], List[Dict[str, Any]]],
+        Tuple[List[Dict[str, Any]], List[str]]
+    ],
+    resolved_by: str = 'system-auto-recovery'
+) -> Optional[Dict[str, Any]]:
+    """
+    Evaluate resource alerts for all servers in one transaction.
+
+    Reads every server's latest metadata and all unresolved resource alerts,
+    passes them to evaluate, then inserts the new alerts and resolves the
+    recovered ones with one statement each. Runs under an advisory lock so only
+    one worker evaluates per cycle.
+
+    Args:
+        conn: PostgreSQL database connection
+        evaluate: Function (servers, open_alerts) -> (alerts to create, alert_ids to resolve).
+            servers have server_id and metadata; open_alerts have alert_id,
+            source_id, severity and resource. Alerts to create have source,
+            source_id, severity, message and details.
+        resolved_by: Value recorded in resolved_by for resolved alerts
+
+    Returns:
+        Dictionary with 'created' and 'resolved' lists of alert records, or None
+        if another worker holds the evaluation lock
+
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    try:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext('resource_alert_evaluation')) AS locked")
+        if not cursor.fetchone()['locked']:
+            conn.rollback()
+            return None
+
+        cursor.execute(
+            """
+                SELECT server_id, metadata
+                FROM server_health
+                WHERE metadata IS NOT NULL
+            """
+        )
+        servers = [dict(row) for row in cursor.fetchall()]
+
+        cursor.execute(
+            """
+                SELECT alert_id, source_id, severity, details->>'resource' AS resource
+                FROM alerts
+                WHERE source = 'server'
+                  AND resolved = FALSE
+                  AND details->>'resource' IS NOT NULL
+            """
+        )
+        open_alerts = [dict(row) for row in cursor.fetchall()]
+
+        to_create, to_resolve = evaluate(servers, open_alerts)
+
+        created = []
+        if to_create:
+            created = execute_values(
+                cursor,
+                """
+                    INSERT INTO alerts (source, source_id, severity, message, details)
+                    VALUES %s
+                    RETURNING alert_id, source, source_id, severity, message, details,
+                              resolved, resolved_at, resolved_by, created_at, updated_at
+                """,
+                [
+                    (a['source'], a['source_id'], a['severity'], a['message'], Json(a.get('details')))
+                    for a in to_create
+                ],
+                page_size=max(len(to_create), 1),
+                fetch=True
+            )
+
+        resolved = []
+        if to_resolve:
+            cursor.execute(
+                """
+                    UPDATE alerts
+                    SET resolved = TRUE,
+                        resolved_at = CURRENT_TIMESTAMP,
+                        resolved_by = %s,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE alert_id = ANY(%s::uuid[])
+                      AND resolved = FALSE
+                    RETURNING alert_id, source, source_id, severity, message, details,
+                              resolved, resolved_at, resolved_by, created_at, updated_at
+                """,
+                (resolved_by, [str(alert_id) for alert_id in to_resolve])
+            )
+            resolved = cursor.fetchall()
+
+        conn.commit()
+        return {
+            'created': [dict(row) for row in created],
+            'resolved': [dict(row) for row in resolved],
+        }
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def _parse_experity_process_time(process_time_dict: Dict[str, Any]) -> Tuple[Any, ...]:
+    """
+    Validate a process time record and return its column values.
+    
+    Returns:
+        Tuple of (process_name, started_at, ended_at, encounter_id, idempotency_key, trace_id)
+    
+    Raises:
+        ValueError: If required fields are missing or invalid
+    """
+    # Validate required fields
+    required_fields = ['process_name', 'started_at', 'ended_at']
+    for field in required_fields:
+        if field not in process_time_dict or not process_time_dict[field]:
+            raise ValueError(f"Missing required field: {field}")
+    
+    # Validate process_name
+    valid_names = ['Encounter process time', 'Experity process time']
+    if process_time_dict['process_name'] not in valid_names:
+        raise ValueError(f"Invalid process_name: {process_time_dict['process_name']}. Must be one of: {', '.join(valid_names)}")
+    
+    # Parse timestamps
+    started_at = process_time_dict['started_at']
+    if isinstance(started_at, str):
+        started_at_clean = started_at.replace('Z', '').replace('+00:00', '')
+        try:
+            started_at_dt = datetime.fromisoformat(started_at_clean)
+            if started_at_dt.tzinfo is None:
+                started_at_dt = started_at_dt.replace(tzinfo=timezone.utc)
+            started_at = started_at_dt
+        except ValueError:
+            raise ValueError(f"Invalid started_at timestamp format: {started_at}")
+    
+    ended_at = process_time_dict['ended_at']
+    if isinstance(ended_at, str):
+        ended_at_clean = ended_at.replace('Z', '').replace('+00:00', '')
+        try:
+            ended_at_dt = datetime.fromisoformat(ended_at_clean)
+            if ended_at_dt.tzinfo is None:
+                ended_at_dt = ended_at_dt.replace(tzinfo=timezone.utc)
+            ended_at = ended_at_dt
+        except ValueError:
+            raise ValueError(f"Invalid ended_at timestamp format: {ended_at}")
+    
+    trace_id = process_time_dict.get('trace_id')
+    if trace_id and not re.match(TRACE_ID_PATTERN, trace_id):
+        raise ValueError(f"Invalid trace_id: {trace_id}. Must be 32 lowercase hex characters")
+    
+    return (
+        process_time_dict['process_name'],
+        started_at,
+        ended_at,
+        process_time_dict.get('encounter_id'),
+        process_time_dict.get('idempotency_key'),
+        trace_id,
+    )
+
+
+def save_experity_process_time(conn, process_time_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Save or create an Experity process time record.
+    
+    Args:
+        conn: PostgreSQL database connection
+        process_time_dict: Dictionary containing process time data with keys:
+            - process_name: str (required) - 'Encounter process time' or 'Experity process time'
+            - started_at: str (required) - ISO 8601 timestamp
+            - ended_at: str (required) - ISO 8601 timestamp
+            - encounter_id: str (optional) - Encounter ID UUID
+            - idempotency_key: str (optional) - Client key; a repeat returns the existing record
+            - trace_id: str (optional) - Trace id of the encounter; defaults to the trace id
+              of the encounter's queue entry
+    
+    Returns:
+        Dictionary with the saved process time data including process_time_id and created_at
+    
+    Raises:
+        psycopg2.Error: If database operation fails
+        ValueError: If required fields are missing or invalid
+    """
+    return save_experity_process_times(conn, [process_time_dict])[0]
+
+
+def save_experity_process_times(conn, process_time_dicts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Save a batch of Experity process time records with one multi-row INSERT.
+    
+    Records carrying an idempotency_key that was already stored (or repeated
+    within the batch) are not inserted again; the existing record is returned
+    with duplicate=True.
+    
+    Args:
+        conn: PostgreSQL database connection
+        process_time_dicts: Process time records (see save_experity_process_time)
+    
+    Returns:
+        Saved process time records in input order, each with a duplicate flag
+    
+    Raises:
+        psycopg2.Error: If database operation fails
+        ValueError: If any record is missing fields or invalid (nothing is saved)
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    
+    try:
+        parsed = []
+        for index, process_time_dict in enumerate(process_time_dicts):
+            try:
+                parsed.append(_parse_experity_process_time(process_time_dict))
+            except ValueError as e:
+                if len(process_time_dicts) == 1:
+                    raise
+                raise ValueError(f"Record {index}: {str(e)}")
+        
+        # Assign ids up front so returned rows can be matched to input records;
+        # a key repeated within the batch is inserted once
+        rows = []
+        record_ids: List[Any] = []
+        ids_by_key: Dict[str, str] = {}
+        keys_by_id: Dict[str, str] = {}
+        for process_name, started_at, ended_at, encounter_id, idempotency_key, trace_id in parsed:
+            if idempotency_key and idempotency_key in ids_by_key:
+                record_ids.append(('key', idempotency_key))
+                continue
+            process_time_id = str(uuid.uuid4())
+            if idempotency_key:
+                ids_by_key[idempotency_key] = process_time_id
+                keys_by_id[process_time_id] = idempotency_key
+            rows.append((
+                process_time_id, process_name, started_at, ended_at, encounter_id, idempotency_key,
+                trace_id, encounter_id
+            ))
+            record_ids.append(('id', process_time_id))
+        
+        columns = """process_time_id, process_name, started_at, ended_at,
+                      duration_seconds, created_at, updated_at, encounter_id, idempotency_key, trace_id"""
+        inserted = execute_values(
+            cursor,
+            f"""
+                INSERT INTO experity_process_time (
+                    process_time_id, process_name, started_at, ended_at, encounter_id, idempotency_key,
+                    trace_id
+                )
+                VALUES %s
+                ON CONFLICT (idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+                RETURNING {columns}
+            """,
+            rows,
+            # Without an explicit trace id, inherit the one stored on the encounter's queue entry
+            template=(
+                "(%s::uuid, %s, %s, %s, %s, %s, "
+                "COALESCE(%s, (SELECT q.trace_id FROM queue q WHERE q.encounter_id = %s::uuid)))"
+            ),
+            page_size=max(len(rows), 1),
+            fetch=True
+        )
+        by_id = {str(row['process_time_id']): dict(row, duplicate=False) for row in inserted}
+        
+        # Keys that conflicted with stored records: return the stored record
+        existing_keys = [
+            key for key, process_time_id in ids_by_key.items() if process_time_id not in by_id
+        ]
+        by_key = {
+            row['idempotency_key']: row for row in by_id.values() if row.get('idempotency_key')
+        }
+        if existing_keys:
+            cursor.execute(
+                f"SELECT {columns} FROM experity_process_time WHERE idempotency_key = ANY(%s)",
+                (existing_keys,)
+            )
+            by_key.update({row['idempotency_key']: dict(row, duplicate=True) for row in cursor.fetchall()})
+        conn.commit()
+        
+        results = []
+        for kind, value in record_ids:
+            if kind == 'key':
+                results.append(dict(by_key[value], duplicate=True))
+            elif value in by_id:
+                results.append(by_id[value])
+            else:
+                results.append(by_key[keys_by_id[value]])
+        return results
+        
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    except ValueError as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def get_experity_process_times(conn, filters: Optional[Dict[str, Any]] = None, limit: int = 50, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Retrieve Experity process time records with optional filtering and pagination.
+    
+    Args:
+        conn: PostgreSQL database connection
+        filters: Optional dictionary with filter keys:
+            - process_name: str - Filter by process name
+            - started_after: str - ISO 8601 timestamp (only records started after this)
+            - started_before: str - ISO 8601 timestamp (only records started before this)
+            - completed_only: bool - Only return records with ended_at set
+            - encounter_id: str - Filter by encounter ID
+            - trace_id: str - Filter by trace ID
+        limit: Maximum number of records to return (default: 50, max: 100)
+        offset: Number of records to skip (default: 0)
+    
+    Returns:
+        Tuple of (list of process time records, total count)
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    
+    try:
+        # Build WHERE clause
+        where_conditions = []
+        params = []
         
+        if filters:
+            if 'process_name' in filters:
+                where_conditions.append("process_name = %s")
+                params.append(filters['process_name'])
+            
+            if 'encounter_id' in filters:
+                where_conditions.append("encounter_id = %s")
+                params.append(filters['encounter_id'])
+            
+            if 'trace_id' in filters:
+                where_conditions.append("trace_id = %s")
+                params.append(filters['trace_id'])
+            
+            if 'started_after' in filters:
+                where_conditions.append("started_at >= %s")
+                started_after = filters['started_after']
+                if isinstance(started_after, str):
+                    started_at_clean = started_after.replace('Z', '').replace('+00:00', '')
+                    started_at_dt = datetime.fromisoformat(started_at_clean)
+                    if started_at_dt.tzinfo is None:
+                        started_at_dt = started_at_dt.replace(tzinfo=timezone.utc)
+                    params.append(started_at_dt)
+                else:
+                    params.append(started_after)
+            
+            if 'started_before' in filters:
+                where_conditions.append("started_at <= %s")
+                started_before = filters['started_before']
+                if isinstance(started_before, str):
+                    started_before_clean = started_before.replace('Z', '').replace('+00:00', '')
+                    started_before_dt = datetime.fromisoformat(started_before_clean)
+                    if started_before_dt.tzinfo is None:
+                        started_before_dt = started_before_dt.replace(tzinfo=timezone.utc)
+                    params.append(started_before_dt)
+                else:
+                    params.append(started_before)
+            
+            if filters.get('completed_only', False):
+                where_conditions.append("ended_at IS NOT NULL")
+        
+        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
+        
+        # Get total count
+        count_query = f"SELECT COUNT(*) as total FROM experity_process_time WHERE {where_clause}"
+        cursor.execute(count_query, tuple(params))
+        total = cursor.fetchone()['total']
+        
+        # Get paginated results
+        query = f"""
+            SELECT process_time_id, process_name, started_at, ended_at, 
+                   duration_seconds, created_at, updated_at, encounter_id, trace_id
+            FROM experity_process_time
+            WHERE {where_clause}
+            ORDER BY started_at DESC
+            LIMIT %s OFFSET %s
+        """
+        params.extend([limit, offset])
+        
+        cursor.execute(query, tuple(params))
+        results = cursor.fetchall()
+        
+        # Convert to list of dicts
+        process_times = [dict(row) for row in results]
+        
+        return process_times, total
+        
+    except psycopg2.Error as e:
+        raise e
+    finally:
+        cursor.close()
+
+
+def get_experity_process_time_stats(
+    conn,
+    process_names: List[str],
+    started_after: datetime,
+    started_before: datetime,
+    slowest_limit: int = 5
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Compute process time statistics per process over a started_at window.
+
+    Percentiles and the slowest runs are computed from completed records using
+    the (process_name, started_at) index; hourly throughput is read from the
+    experity_process_time_hourly rollups.
+
+    Args:
+        conn: PostgreSQL database connection
+        process_names: Process names to include
+        started_after: Window start (inclusive)
+        started_before: Window end (exclusive)
+        slowest_limit: Number of slowest records to return per process
+
     Returns:
-        Dictionary with the updated server health data
+        Dictionary with:
+        - stats: rows with process_name, completed, mean_seconds, max_seconds and
+          percentiles ([p50, p90, p95, p99])
+        - hourly: rollup rows with process_name, hour_start, started_count,
+          completed_count, total_duration_seconds, max_duration_seconds
+        - slowest: process time records, slowest first within each process
+
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    try:
+        window = (list(process_names), started_after, started_before)
+
+        cursor.execute(
+            """
+                SELECT process_name,
+                       COUNT(*) AS completed,
+                       AVG(duration_seconds)::float AS mean_seconds,
+                       MAX(duration_seconds)::float AS max_seconds,
+                       percentile_cont(ARRAY[0.5, 0.9, 0.95, 0.99])
+                           WITHIN GROUP (ORDER BY duration_seconds) AS percentiles
+                FROM experity_process_time
+                WHERE process_name = ANY(%s)
+                  AND started_at >= %s
+                  AND started_at < %s
+                  AND duration_seconds IS NOT NULL
+                GROUP BY process_name
+                ORDER BY process_name
+            """,
+            window
+        )
+        stats = [dict(row) for row in cursor.fetchall()]
+
+        cursor.execute(
+            """
+                SELECT process_name, hour_start, started_count, completed_count,
+                       total_duration_seconds, max_duration_seconds
+                FROM experity_process_time_hourly
+                WHERE process_name = ANY(%s)
+                  AND hour_start >= date_trunc('hour', %s::timestamptz)
+                  AND hour_start < %s
+                ORDER BY process_name, hour_start
+            """,
+            window
+        )
+        hourly = [dict(row) for row in cursor.fetchall()]
+
+        cursor.execute(
+            """
+                SELECT s.*
+                FROM unnest(%s::text[]) AS p(process_name)
+                CROSS JOIN LATERAL (
+                    SELECT process_time_id, process_name, started_at, ended_at,
+                           duration_seconds, created_at, updated_at, encounter_id
+                    FROM experity_process_time e
+                    WHERE e.process_name = p.process_name
+                      AND e.started_at >= %s
+                      AND e.started_at < %s
+                      AND e.duration_seconds IS NOT NULL
+                    ORDER BY e.duration_seconds DESC
+                    LIMIT %s
+                ) s
+                ORDER BY s.process_name, s.duration_seconds DESC
+            """,
+            window + (slowest_limit,)
+        )
+        slowest = [dict(row) for row in cursor.fetchall()]
+
+        return {'stats': stats, 'hourly': hourly, 'slowest': slowest}
+
+    except psycopg2.Error as e:
+        raise e
+    finally:
+        cursor.close()
+
+
+def refresh_experity_process_time_rollups(conn, batch_size: int = 5000) -> int:
+    """
+    Recompute hourly process time rollups for hours whose records changed.
+
+    A trigger on experity_process_time queues the hour of every inserted,
+    deleted or updated row (old and new started_at) in
+    experity_process_time_dirty_hours. This takes up to batch_size queue
+    entries and re-aggregates their hours. The entries are removed in one
+    statement and the hours aggregated in the next, so every change whose
+    entry was taken is already visible to the aggregation; entries of
+    writers still in progress stay queued for the next refresh. Hours left
+    without records keep a rollup with zero counts.
+
+    Args:
+        conn: PostgreSQL database connection
+        batch_size: Maximum number of queue entries taken per call
+
+    Returns:
+        Number of hourly rollups written (0 if another worker is refreshing)
+
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext('experity_process_time_rollups'))")
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return 0
+
+        cursor.execute(
+            """
+                DELETE FROM experity_process_time_dirty_hours
+                WHERE entry_id IN (
+                    SELECT entry_id FROM experity_process_time_dirty_hours
+                    ORDER BY entry_id
+                    LIMIT %s
+                )
+                RETURNING process_name, hour_start
+            """,
+            (batch_size,)
+        )
+        hours = set(cursor.fetchall())
+        if not hours:
+            conn.commit()
+            return 0
+
+        cursor.execute(
+            """
+                WITH touched AS (
+                    SELECT * FROM unnest(%(process_names)s::varchar[], %(hour_starts)s::timestamptz[])
+                        AS t(process_name, hour_start)
+                )
+                INSERT INTO experity_process_time_hourly (
+                    process_name, hour_start, started_count, completed_count,
+                    total_duration_seconds, max_duration_seconds, refreshed_at
+                )
+                SELECT t.process_name, t.hour_start,
+                       COUNT(e.process_time_id),
+                       COUNT(e.duration_seconds),
+                       COALESCE(SUM(e.duration_seconds), 0),
+                       MAX(e.duration_seconds),
+                       CURRENT_TIMESTAMP
+                FROM touched t
+                LEFT JOIN experity_process_time e
+                  ON e.process_name = t.process_name
+                 AND e.started_at >= t.hour_start
+                 AND e.started_at < t.hour_start + INTERVAL '1 hour'
+                GROUP BY t.process_name, t.hour_start
+                ON CONFLICT (process_name, hour_start) DO UPDATE SET
+                    started_count = EXCLUDED.started_count,
+                    completed_count = EXCLUDED.completed_count,
+                    total_duration_seconds = EXCLUDED.total_duration_seconds,
+                    max_duration_seconds = EXCLUDED.max_duration_seconds,
+                    refreshed_at = EXCLUDED.refreshed_at
+            """,
+            {
+                'process_names': [process_name for process_name, _ in hours],
+                'hour_starts': [hour_start for _, hour_start in hours],
+            }
+        )
+        refreshed = cursor.rowcount
+        conn.commit()
+        return refreshed
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def update_server_health_partial(conn, server_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Partially update a server health record (only updates provided fields).
+    
+    Runs as a single UPDATE ... RETURNING so concurrent PATCHes cannot lose each
+    other's changes. A provided metadata dict is merged into the stored JSONB
+    (metadata || patch) instead of replacing it; an explicit None clears it.
+    
+    Args:
+        conn: PostgreSQL database connection
+        server_data: Dictionary containing server health data with:
+            - server_id: string (required) - Server identifier
+            - status: Optional string - Server status
+            - metadata: Optional dict - Metadata keys to merge into the stored metadata
+        
+    Returns:
+        Dictionary with the updated server health data, or None if the server does not exist
         
     Raises:
         psycopg2.Error: If database operation fails
@@ -1836,20 +3525,16 @@ def update_server_health_partial(conn, server_data: Dict[str, Any]) -> Dict[str,
             update_values.append(server_data['status'])
         
         if 'metadata' in server_data:
-            metadata_json = None
             if server_data['metadata']:
-                metadata_json = json.dumps(server_data['metadata'])
-            update_fields.append("metadata = %s::jsonb")
-            update_values.append(metadata_json)
+                update_fields.append("metadata = COALESCE(metadata, '{}'::jsonb) || %s::jsonb")
+                update_values.append(json.dumps(server_data['metadata']))
+            elif server_data['metadata'] is None:
+                update_fields.append("metadata = NULL")
         
         # Always update last_heartbeat and updated_at
         update_fields.append("last_heartbeat = CURRENT_TIMESTAMP")
         update_fields.append("updated_at = CURRENT_TIMESTAMP")
         
-        if not update_fields:
-            # No fields to update, just return existing record
-            return get_server_health_by_server_id(conn, server_id)
-        
         query = f"""
             UPDATE server_health
             SET {', '.join(update_fields)}
@@ -1864,7 +3549,7 @@ def update_server_health_partial(conn, server_data: Dict[str, Any]) -> Dict[str,
         conn.commit()
         
         if not result:
-            raise ValueError(f"Server with ID '{server_id}' not found")
+            return None
         
         # Format the result
         formatted_result = dict(result)
@@ -1892,45 +3577,63 @@ def update_server_health_partial(conn, server_data: Dict[str, Any]) -> Dict[str,
         cursor.close()
 
 
-def sync_server_health_from_vms(conn, server_id: str) -> Optional[Dict[str, Any]]:
-    """
-    Recalculate a server's status from all of its VMs.
-    
-    Rules:
-      - If any VM is 'unhealthy'          -> server = 'unhealthy'
-      - Else if any VM is healthy or idle -> server = 'healthy'
-      - Else (no VMs or only unknown)     -> 'down'
-    """
-    if not server_id:
-        return None
-
-    # Get all VMs for this server
-    vms = get_vms_by_server_id(conn, server_id)
-
-    if not vms:
-        # No VMs for this server; just return current server record (if any)
-        return get_server_health_by_server_id(conn, server_id)
-
-    # Determine aggregate server status from VM statuses
-    vm_statuses = [str(vm.get("status", "")).lower() for vm in vms]
-
-    if any(status == "unhealthy" for status in vm_statuses):
-        new_status = "unhealthy"
-    elif any(status in ("healthy", "idle") for status in vm_statuses):
-        new_status = "healthy"
-    else:
-        new_status = "down"
-
-    # Use existing partial update helper so timestamps/metadata are handled consistently
-    return update_server_health_partial(
-        conn,
-        {
-            "server_id": server_id,
-            "status": new_status,
-        },
-    )
-
-
+def sync_server_health_from_vms(conn, server_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Recalculate server status from VM statuses in one set-based statement.
+    
+    Rules:
+      - If any VM is 'unhealthy'          -> server = 'unhealthy'
+      - Else if any VM is healthy or idle -> server = 'healthy'
+      - Else (only unknown statuses)      -> 'down'
+    
+    Servers without VMs are left untouched.
+    
+    Args:
+        conn: PostgreSQL database connection
+        server_id: Optional server to roll up. If None, all servers are rolled up.
+    
+    Returns:
+        List of updated server health records (status and server_id)
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    try:
+        where_clause = "WHERE server_id = %s" if server_id else "WHERE server_id IS NOT NULL"
+        params = (server_id,) if server_id else ()
+
+        cursor.execute(
+            f"""
+            UPDATE server_health sh
+            SET status = rollup.new_status,
+                last_heartbeat = CURRENT_TIMESTAMP,
+                updated_at = CURRENT_TIMESTAMP
+            FROM (
+                SELECT
+                    server_id,
+                    CASE
+                        WHEN bool_or(LOWER(status) = 'unhealthy') THEN 'unhealthy'
+                        WHEN bool_or(LOWER(status) IN ('healthy', 'idle')) THEN 'healthy'
+                        ELSE 'down'
+                    END AS new_status
+                FROM vm_health
+                {where_clause}
+                GROUP BY server_id
+            ) rollup
+            WHERE sh.server_id = rollup.server_id
+            RETURNING sh.server_id, sh.status
+            """,
+            params,
+        )
+        results = [dict(row) for row in cursor.fetchall()]
+        conn.commit()
+        return results
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
 def sync_vms_from_server_status(conn, server_id: str, server_status: str) -> None:
     """
     Propagate a server status change down to its VMs.
@@ -1963,9 +3666,13 @@ def sync_vms_from_server_status(conn, server_id: str, server_status: str) -> Non
         cursor.close()
         
         
-def update_vm_health_partial(conn, vm_data: Dict[str, Any]) -> Dict[str, Any]:
+def update_vm_health_partial(conn, vm_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Partially update a VM health record (only updates provided fields).
     
+    Runs as a single UPDATE ... RETURNING so concurrent PATCHes cannot lose each
+    other's changes. A provided metadata dict is merged into the stored JSONB
+    (metadata || patch) instead of replacing it; an explicit None clears it.
+    
     Args:
         conn: PostgreSQL database connection
         vm_data: Dictionary containing VM health data with:
@@ -1974,10 +3681,10 @@ def update_vm_health_partial(conn, vm_data: Dict[str, Any]) -> Dict[str, Any]:
             - status: Optional string - VM status
             - processing_queue_id: Optional UUID - Queue ID
             - workflow_status: Optional string - Workflow status
-            - metadata: Optional dict - Metadata object
+            - metadata: Optional dict - Metadata keys to merge into the stored metadata
         
     Returns:
-        Dictionary with the updated VM health data
+        Dictionary with the updated VM health data, or None if the VM does not exist
         
     Raises:
         psycopg2.Error: If database operation fails
@@ -2010,20 +3717,16 @@ def update_vm_health_partial(conn, vm_data: Dict[str, Any]) -> Dict[str, Any]:
             update_values.append(vm_data['workflow_status'])
         
         if 'metadata' in vm_data:
-            metadata_json = None
             if vm_data['metadata']:
-                metadata_json = json.dumps(vm_data['metadata'])
-            update_fields.append("metadata = %s::jsonb")
-            update_values.append(metadata_json)
+                update_fields.append("metadata = COALESCE(metadata, '{}'::jsonb) || %s::jsonb")
+                update_values.append(json.dumps(vm_data['metadata']))
+            elif vm_data['metadata'] is None:
+                update_fields.append("metadata = NULL")
         
         # Always update last_heartbeat and updated_at
         update_fields.append("last_heartbeat = CURRENT_TIMESTAMP")
         update_fields.append("updated_at = CURRENT_TIMESTAMP")
         
-        if not update_fields:
-            # No fields to update, just return existing record
-            return get_vm_health_by_vm_id(conn, vm_id)
-        
         query = f"""
             UPDATE vm_health
             SET {', '.join(update_fields)}
@@ -2038,7 +3741,7 @@ def update_vm_health_partial(conn, vm_data: Dict[str, Any]) -> Dict[str, Any]:
         conn.commit()
         
         if not result:
-            raise ValueError(f"VM with ID '{vm_id}' not found")
+            return None
         
         # Format the result
         formatted_result = dict(result)
@@ -2064,3 +3767,457 @@ def update_vm_health_partial(conn, vm_data: Dict[str, Any]) -> Dict[str, Any]:
         raise e
     finally:
         cursor.close()
+
+
+def get_fleet_throughput_counters(conn, window_minutes: int = 15) -> Dict[str, Any]:
+    """
+    Read the incremental fleet counters for capacity planning.
+
+    Counters are kept per VM per minute in vm_throughput_minute (see
+    schema.sql and rollup_vm_heartbeats), so this reads only the buckets
+    inside the window; it never scans the queue or heartbeat history.
+
+    Args:
+        conn: PostgreSQL database connection
+        window_minutes: Number of trailing minutes to aggregate (current minute included)
+
+    Returns:
+        Dictionary with:
+        - vms: list of per-VM counter sums (vm_id, server_id, status, heartbeats,
+          idle_heartbeats, completed, failed, processing_seconds)
+
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    try:
+        cursor.execute(
+            """
+            SELECT
+                t.vm_id,
+                COALESCE(vh.server_id, MAX(t.server_id)) AS server_id,
+                vh.status,
+                SUM(t.heartbeats) AS heartbeats,
+                SUM(t.idle_heartbeats) AS idle_heartbeats,
+                SUM(t.completed) AS completed,
+                SUM(t.failed) AS failed,
+                SUM(t.processing_seconds) AS processing_seconds
+            FROM vm_throughput_minute t
+            LEFT JOIN vm_health vh ON vh.vm_id = t.vm_id
+            WHERE t.bucket_start > date_trunc('minute', LOCALTIMESTAMP) - (%s * INTERVAL '1 minute')
+            GROUP BY t.vm_id, vh.server_id, vh.status
+            ORDER BY t.vm_id
+            """,
+            (window_minutes,)
+        )
+        vms = [
+            {
+                'vm_id': row['vm_id'],
+                'server_id': row['server_id'],
+                'status': row['status'],
+                'heartbeats': int(row['heartbeats'] or 0),
+                'idle_heartbeats': int(row['idle_heartbeats'] or 0),
+                'completed': int(row['completed'] or 0),
+                'failed': int(row['failed'] or 0),
+                'processing_seconds': float(row['processing_seconds'] or 0),
+            }
+            for row in cursor.fetchall()
+        ]
+
+        return {'vms': vms}
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def rollup_vm_heartbeats(conn) -> int:
+    """
+    Move heartbeats counted on vm_health rows into the current minute bucket.
+
+    Heartbeats only increment heartbeat_count/idle_heartbeat_count on the row
+    they already rewrite; this adds the increase since the previous rollup
+    (kept in vm_heartbeat_rollup_state) to vm_throughput_minute. Concurrent
+    runs from other workers are skipped.
+
+    Args:
+        conn: PostgreSQL database connection
+
+    Returns:
+        Number of VMs whose heartbeats were rolled up
+
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext('vm_heartbeat_rollup'))")
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return 0
+
+        cursor.execute(
+            """
+            WITH deltas AS (
+                SELECT
+                    vh.vm_id,
+                    vh.server_id,
+                    vh.heartbeat_count,
+                    vh.idle_heartbeat_count,
+                    -- A lower count than rolled up means the vm_health row was recreated
+                    CASE WHEN vh.heartbeat_count >= COALESCE(s.heartbeat_count, 0)
+                        THEN vh.heartbeat_count - COALESCE(s.heartbeat_count, 0)
+                        ELSE vh.heartbeat_count
+                    END AS heartbeats,
+                    CASE WHEN vh.heartbeat_count >= COALESCE(s.heartbeat_count, 0)
+                        THEN GREATEST(vh.idle_heartbeat_count - COALESCE(s.idle_heartbeat_count, 0), 0)
+                        ELSE vh.idle_heartbeat_count
+                    END AS idle_heartbeats
+                FROM vm_health vh
+                LEFT JOIN vm_heartbeat_rollup_state s ON s.vm_id = vh.vm_id
+                WHERE vh.heartbeat_count IS DISTINCT FROM s.heartbeat_count
+            ),
+            buckets AS (
+                INSERT INTO vm_throughput_minute (vm_id, bucket_start, server_id, heartbeats, idle_heartbeats)
+                SELECT vm_id, date_trunc('minute', LOCALTIMESTAMP), server_id, heartbeats, idle_heartbeats
+                FROM deltas
+                WHERE heartbeats > 0
+                ON CONFLICT (vm_id, bucket_start) DO UPDATE SET
+                    server_id = EXCLUDED.server_id,
+                    heartbeats = vm_throughput_minute.heartbeats + EXCLUDED.heartbeats,
+                    idle_heartbeats = vm_throughput_minute.idle_heartbeats + EXCLUDED.idle_heartbeats
+            )
+            INSERT INTO vm_heartbeat_rollup_state (vm_id, heartbeat_count, idle_heartbeat_count)
+            SELECT vm_id, heartbeat_count, idle_heartbeat_count
+            FROM deltas
+            ON CONFLICT (vm_id) DO UPDATE SET
+                heartbeat_count = EXCLUDED.heartbeat_count,
+                idle_heartbeat_count = EXCLUDED.idle_heartbeat_count
+            """
+        )
+        rolled_up = cursor.rowcount
+        conn.commit()
+        return rolled_up
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def count_queue_by_status(conn, statuses: Sequence[str] = ('PENDING', 'PROCESSING')) -> Dict[str, int]:
+    """
+    Count queue entries per status for the given statuses.
+
+    The default in-progress statuses are served by the idx_queue_in_progress
+    partial index, so the count does not grow with finished entries.
+
+    Args:
+        conn: PostgreSQL database connection
+        statuses: Statuses to count
+
+    Returns:
+        Dictionary mapping queue status to entry count (statuses without entries are omitted)
+
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            "SELECT status, COUNT(*) FROM queue WHERE status = ANY(%s) GROUP BY status",
+            (list(statuses),)
+        )
+        counts = {status: int(count) for status, count in cursor.fetchall() if status}
+        conn.commit()
+        return counts
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def prune_vm_throughput(conn, retention_hours: int = 48) -> int:
+    """
+    Delete per-minute VM throughput buckets older than the retention window,
+    and pickups of queue entries that never reached a final status (e.g. deleted).
+
+    Args:
+        conn: PostgreSQL database connection
+        retention_hours: Number of hours of buckets to keep
+
+    Returns:
+        Number of buckets deleted
+
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """
+            DELETE FROM vm_throughput_minute
+            WHERE bucket_start < LOCALTIMESTAMP - (%s * INTERVAL '1 hour')
+            """,
+            (retention_hours,)
+        )
+        deleted = cursor.rowcount
+        cursor.execute(
+            """
+            DELETE FROM vm_queue_assignments
+            WHERE started_at < LOCALTIMESTAMP - (%s * INTERVAL '1 hour')
+            """,
+            (retention_hours,)
+        )
+        conn.commit()
+        return deleted
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def explain_query(conn, statement: str, timeout_ms: int = 30000) -> Any:
+    """
+    Run a read-only statement under EXPLAIN (ANALYZE, BUFFERS) and return its plan.
+
+    The statement runs in a transaction that is always rolled back, with a
+    statement_timeout so a pathological plan cannot hold the connection.
+
+    Args:
+        conn: PostgreSQL database connection
+        statement: Complete SQL statement (parameters already interpolated)
+        timeout_ms: statement_timeout for the EXPLAIN
+
+    Returns:
+        Plan in EXPLAIN's JSON format
+
+    Raises:
+        psycopg2.Error: If the EXPLAIN fails
+    """
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement)
+        return cursor.fetchone()[0]
+    finally:
+        conn.rollback()
+        cursor.close()
+
+
+def save_slow_query_plan(conn, query_id: str, query: str, duration_ms: float, plan: Any) -> None:
+    """
+    Store a captured plan for a slow statement.
+
+    Args:
+        conn: PostgreSQL database connection
+        query_id: Identifier of the normalized statement
+        query: Normalized statement text
+        duration_ms: Duration of the execution that triggered the capture
+        plan: EXPLAIN plan (JSON)
+
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """
+            INSERT INTO slow_query_plans (query_id, query, duration_ms, plan)
+            VALUES (%s, %s, %s, %s)
+            """,
+            (query_id, query, duration_ms, Json(plan))
+        )
+        conn.commit()
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def delete_old_slow_query_plans(conn, retention_days: int = 7) -> int:
+    """
+    Delete slow query plans older than the retention window.
+
+    Args:
+        conn: PostgreSQL database connection
+        retention_days: Number of days of plans to keep
+
+    Returns:
+        Number of plans deleted
+
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            "DELETE FROM slow_query_plans WHERE captured_at < CURRENT_TIMESTAMP - (%s * INTERVAL '1 day')",
+            (retention_days,)
+        )
+        deleted = cursor.rowcount
+        conn.commit()
+        return deleted
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+def get_slow_query_plans(conn, query_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Retrieve captured slow query plans, newest first.
+
+    Args:
+        conn: PostgreSQL database connection
+        query_id: Only plans of this normalized statement
+        limit: Maximum number of plans to return
+
+    Returns:
+        List of plans with plan_id, query_id, query, duration_ms, plan and captured_at
+
+    Raises:
+        psycopg2.Error: If database operation fails
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    try:
+        cursor.execute(
+            """
+            SELECT plan_id, query_id, query, duration_ms, plan, captured_at
+            FROM slow_query_plans
+            WHERE %(query_id)s::text IS NULL OR query_id = %(query_id)s
+            ORDER BY captured_at DESC
+            LIMIT %(limit)s
+            """,
+            {'query_id': query_id, 'limit': limit}
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+
+
+# dataset -> (SELECT ... FROM ..., date column, location column, ORDER BY)
+EXPORT_QUERIES: Dict[str, Tuple[str, str, str, str]] = {
+    'patients': (
+        """
+        SELECT id, emr_id, booking_id, booking_number, patient_number,
+               location_id, location_name, status, legal_first_name,
+               legal_last_name, dob, mobile_phone, sex_at_birth, captured_at,
+               reason_for_visit, created_at, updated_at
+        FROM patients
+        """,
+        'created_at',
+        'location_id',
+        'id',
+    ),
+    'encounters': (
+        """
+        SELECT e.encounter_id, e.emr_id, p.location_id, q.created_at AS queued_at,
+               e.encounter_payload
+        FROM encounters e
+        LEFT JOIN queue q ON q.encounter_id = e.encounter_id
+        LEFT JOIN patients p ON p.emr_id = e.emr_id
+        """,
+        'q.created_at',
+        'p.location_id',
+        'e.encounter_id',
+    ),
+    'queue': (
+        """
+        SELECT q.queue_id, q.encounter_id, q.emr_id, p.location_id, q.status,
+               q.attempts, q.trace_id, q.created_at, q.updated_at, q.parsed_payload
+        FROM queue q
+        LEFT JOIN patients p ON p.emr_id = q.emr_id
+        """,
+        'q.created_at',
+        'p.location_id',
+        'q.created_at, q.queue_id',
+    ),
+}
+
+
+def open_export_cursor(
+    conn,
+    dataset: str,
+    location_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    fetch_size: int = 2000,
+):
+    """
+    Open a server-side cursor over one export dataset.
+
+    Rows stay on the server until they are fetched, so callers can stream
+    exports of any size (see app.utils.export.stream_export). The connection
+    is switched to a read-only session and must not be shared.
+
+    Args:
+        conn: PostgreSQL database connection (dedicated to the export)
+        dataset: One of EXPORT_QUERIES (patients, encounters, queue)
+        location_id: Only rows of this location
+        created_after: Only rows created at or after this time (encounters: queued at)
+        created_before: Only rows created before this time
+        fetch_size: Rows fetched per round trip when the cursor is iterated
+
+    Returns:
+        Executed named cursor returning tuples
+
+    Raises:
+        ValueError: If dataset is unknown
+        psycopg2.Error: If database operation fails
+    """
+    if dataset not in EXPORT_QUERIES:
+        raise ValueError(f"Unknown export dataset: {dataset}")
+    select, date_column, location_column, order_by = EXPORT_QUERIES[dataset]
+
+    conditions = []
+    params: List[Any] = []
+    if location_id:
+        conditions.append(f"{location_column} = %s")
+        params.append(location_id)
+    if created_after:
+        conditions.append(f"{date_column} >= %s")
+        params.append(created_after)
+    if created_before:
+        conditions.append(f"{date_column} < %s")
+        params.append(created_before)
+
+    query = select
+    if conditions:
+        query += "WHERE " + " AND ".join(conditions) + "\n"
+    query += f"ORDER BY {order_by}"
+
+    conn.set_session(readonly=True)
+    cursor = conn.cursor(name=f"export_{dataset}_{uuid.uuid4().hex[:12]}")
+    cursor.itersize = fetch_size
+
+    try:
+        cursor.execute(query, params)
+        return cursor
+    except psycopg2.Error as e:
+        cursor.close()
+        conn.rollback()
+        raise e
@@ -34,6 +34,14 @@ class PatientPayload(BaseModel):
         populate_by_name = True
 
 
+class PatientSearchResult(PatientPayload):
+    """Patient matched by the typeahead search, with its rank."""
+
+    source: Optional[str] = Field(None, description="Table the record came from: confirmed or pending.")
+    matchType: Optional[str] = Field(None, description="How the term matched: exact, prefix or contains.")
+    score: Optional[float] = Field(None, description="Trigram similarity (0-1), present when pg_trgm is installed.")
+
+
 # Patient data submission models
 class PatientCreateRequest(BaseModel):
     """Request model for creating a single patient record."""
@@ -83,7 +91,47 @@ class PatientCreateRequest(BaseModel):
 
 class PatientBatchRequest(BaseModel):
     """Request model for creating multiple patient records."""
-    patients: List[PatientCreateRequest] = Field(..., description="List of patient records to create.")
+    patients: List[PatientCreateRequest] = Field(..., description="List of patient records to create (1-1000).", min_length=1, max_length=1000)
+
+
+class PatientBatchResult(BaseModel):
+    """Outcome of one record of a patient batch."""
+    index: int = Field(..., description="Position of the record in the request", example=0)
+    emrId: Optional[str] = Field(None, description="EMR identifier of the record", example="EMR12345", alias="emr_id")
+    status: str = Field(..., description="created, updated, skipped (superseded by a later record with the same emrId) or failed", example="created")
+    error: Optional[str] = Field(None, description="Why the record was skipped or failed")
+
+    class Config:
+        populate_by_name = True
+
+
+class PatientBatchResponse(BaseModel):
+    """Response model for a batch of patient records."""
+    received: int = Field(..., description="Records in the request", example=3)
+    created: int = Field(..., description="New patient records", example=1)
+    updated: int = Field(..., description="Existing patient records updated", example=1)
+    skipped: int = Field(..., description="Records superseded by a later record with the same emrId", example=0)
+    failed: int = Field(..., description="Records rejected (missing emrId or location, location not permitted)", example=1)
+    results: List[PatientBatchResult] = Field(..., description="Per-record outcomes in request order")
+
+    class Config:
+        populate_by_name = True
+
+
+class PatientPromotionResponse(BaseModel):
+    """Response model for a pending patient promotion run."""
+    promoted: int = Field(..., description="Pending patients marked completed", example=12)
+    inserted: int = Field(..., description="Patient records created", example=10)
+    updated: int = Field(..., description="Existing patient records updated", example=1)
+    superseded: int = Field(..., description="Pending rows skipped for a newer pending row with the same EMR ID", example=1)
+    batches: int = Field(..., description="Transactions run", example=1)
+    maxLagSeconds: Optional[float] = Field(None, description="Longest wait of a promoted row since its EMR ID was set", example=14.2, alias="max_lag_seconds")
+    avgLagSeconds: Optional[float] = Field(None, description="Average wait of the promoted rows", example=6.8, alias="avg_lag_seconds")
+    waiting: int = Field(..., description="Pending patients with an EMR ID still waiting after the run", example=0)
+    oldestWaitingSeconds: Optional[float] = Field(None, description="Age of the oldest waiting row", example=None, alias="oldest_waiting_seconds")
+
+    class Config:
+        populate_by_name = True
 
 
 class StatusUpdateRequest(BaseModel):
@@ -278,6 +326,13 @@ class QueueResponse(BaseModel):
         example="2026-02-11T00:55:01.117116",
         alias="updated_at"
     )
+    traceId: Optional[str] = Field(
+        None,
+        description="Trace id of the request that created the queue entry. VMs send it back as the "
+                    "traceparent header or traceId field when reporting process times.",
+        example="4bf92f3577b34da6a3ce929d0e0e4736",
+        alias="trace_id"
+    )
     
     class Config:
         populate_by_name = True
@@ -304,6 +359,33 @@ class QueueResponse(BaseModel):
         extra = "allow"
 
 
+class QueueRecoveryResponse(BaseModel):
+    """Response model for a queue recovery (orphaned entry reconciliation) run."""
+    requeued: int = Field(..., description="Number of orphaned entries moved back to PENDING", example=2)
+    deadLettered: int = Field(..., description="Number of entries moved to ERROR with dlq=true after exceeding the retry ceiling", example=0, alias="dead_lettered")
+    entries: List[Dict[str, Any]] = Field(
+        default_factory=list,
+        description="Recovered entries with queueId, vmId, status and attempts"
+    )
+
+    class Config:
+        populate_by_name = True
+        json_schema_extra = {
+            "example": {
+                "requeued": 1,
+                "deadLettered": 0,
+                "entries": [
+                    {
+                        "queueId": "660e8400-e29b-41d4-a716-446655440000",
+                        "vmId": "server1-vm1",
+                        "status": "PENDING",
+                        "attempts": 1
+                    }
+                ]
+            }
+        }
+
+
 # Experity mapping endpoint models
 class ExperityMapRequest(BaseModel):
     """Request model for mapping queue entry to Experity actions via Azure AI.
@@ -521,6 +603,25 @@ class VmHeartbeatRequest(BaseModel):
             "diskUsage": 30.1
         }
     )
+    metadataDelta: Optional[Dict[str, Any]] = Field(
+        None,
+        description=(
+            "Optional changed metrics only, merged into the stored metadata instead of "
+            "sending the full metadata object. A null value removes the key. "
+            "Requires metadataVersion."
+        ),
+        example={"cpuUsage": 51.0},
+        alias="metadata_delta"
+    )
+    metadataVersion: Optional[int] = Field(
+        None,
+        description=(
+            "Client metadata version counter. Increment it on every metadata change; "
+            "a delta is only applied when it follows the stored version."
+        ),
+        example=42,
+        alias="metadata_version"
+    )
     
     class Config:
         populate_by_name = True
@@ -549,6 +650,8 @@ class VmHeartbeatResponse(BaseModel):
     lastHeartbeat: str = Field(..., description="ISO 8601 timestamp of the last heartbeat", example="2025-01-22T10:30:00Z", alias="last_heartbeat")
     status: str = Field(..., description="Current VM status", example="healthy")
     workflowStatus: Optional[str] = Field(None, description="AI Agent Workflow status", example="running", alias="workflow_status")
+    metadataVersion: Optional[int] = Field(None, description="Stored metadata version counter", example=42, alias="metadata_version")
+    resyncRequired: Optional[bool] = Field(None, description="True when a metadataDelta was not applied because of a version gap; send the full metadata on the next heartbeat", example=False, alias="resync_required")
     
     class Config:
         populate_by_name = True
@@ -619,6 +722,25 @@ class ServerHeartbeatRequest(BaseModel):
             "diskUsage": 30.1
         }
     )
+    metadataDelta: Optional[Dict[str, Any]] = Field(
+        None,
+        description=(
+            "Optional changed metrics only, merged into the stored metadata instead of "
+            "sending the full metadata object. A null value removes the key. "
+            "Requires metadataVersion."
+        ),
+        example={"cpuUsage": 51.0},
+        alias="metadata_delta"
+    )
+    metadataVersion: Optional[int] = Field(
+        None,
+        description=(
+            "Client metadata version counter. Increment it on every metadata change; "
+            "a delta is only applied when it follows the stored version."
+        ),
+        example=42,
+        alias="metadata_version"
+    )
     
     class Config:
         populate_by_name = True
@@ -642,6 +764,8 @@ class ServerHeartbeatResponse(BaseModel):
     status: str = Field(..., description="Current server status", example="healthy")
     lastHeartbeat: str = Field(..., description="ISO 8601 timestamp of the last heartbeat", example="2025-01-22T10:30:00Z", alias="last_heartbeat")
     metadata: Optional[Dict[str, Any]] = Field(None, description="Server metadata with metrics")
+    metadataVersion: Optional[int] = Field(None, description="Stored metadata version counter", example=42, alias="metadata_version")
+    resyncRequired: Optional[bool] = Field(None, description="True when a metadataDelta was not applied because of a version gap; send the full metadata on the next heartbeat", example=False, alias="resync_required")
     
     class Config:
         populate_by_name = True
@@ -792,6 +916,89 @@ class HealthDashboardResponse(BaseModel):
         extra = "allow"
 
 
+class ThroughputMetrics(BaseModel):
+    """Throughput and utilization over the metrics window."""
+    completed: int = Field(..., description="Encounters finished with the queue entry DONE", example=42)
+    failed: int = Field(..., description="Encounters released without reaching DONE (errored or requeued)", example=1)
+    throughputPerMinute: float = Field(..., description="Completed encounters per minute", example=2.8, alias="throughput_per_minute")
+    meanProcessingSeconds: Optional[float] = Field(None, description="Mean time from pick-up to completion", example=95.4, alias="mean_processing_seconds")
+    idleRatio: Optional[float] = Field(None, description="Share of heartbeats reporting idle status", example=0.12, alias="idle_ratio")
+    heartbeats: int = Field(..., description="Heartbeats received in the window", example=450)
+
+    class Config:
+        populate_by_name = True
+
+
+class VmThroughputMetrics(ThroughputMetrics):
+    """Per-VM throughput metrics."""
+    vmId: str = Field(..., description="VM identifier", example="server1-vm1", alias="vm_id")
+    serverId: Optional[str] = Field(None, description="Server identifier", example="server1", alias="server_id")
+    status: Optional[str] = Field(None, description="Current VM status", example="healthy")
+
+
+class ServerThroughputMetrics(ThroughputMetrics):
+    """Per-server throughput metrics (sum over the server's VMs)."""
+    serverId: str = Field(..., description="Server identifier", example="server1", alias="server_id")
+    vmCount: int = Field(..., description="VMs that reported in the window", example=8, alias="vm_count")
+
+
+class FleetThroughputMetrics(ThroughputMetrics):
+    """Fleet-wide throughput metrics."""
+    vmCount: int = Field(..., description="VMs that reported in the window", example=32, alias="vm_count")
+
+
+class FleetMetricsResponse(BaseModel):
+    """Response model for fleet capacity and throughput metrics."""
+    windowMinutes: int = Field(..., description="Length of the aggregation window in minutes", example=15, alias="window_minutes")
+    fleet: FleetThroughputMetrics = Field(..., description="Fleet-wide totals")
+    servers: List[ServerThroughputMetrics] = Field(..., description="Per-server metrics")
+    vms: List[VmThroughputMetrics] = Field(..., description="Per-VM metrics")
+    queueDepth: Dict[str, int] = Field(..., description="Current queue entry count per in-progress status (PENDING, PROCESSING)", alias="queue_depth")
+
+    class Config:
+        populate_by_name = True
+        json_schema_extra = {
+            "example": {
+                "windowMinutes": 15,
+                "fleet": {
+                    "vmCount": 1,
+                    "completed": 12,
+                    "failed": 0,
+                    "throughputPerMinute": 0.8,
+                    "meanProcessingSeconds": 71.5,
+                    "idleRatio": 0.2,
+                    "heartbeats": 30
+                },
+                "servers": [
+                    {
+                        "serverId": "server1",
+                        "vmCount": 1,
+                        "completed": 12,
+                        "failed": 0,
+                        "throughputPerMinute": 0.8,
+                        "meanProcessingSeconds": 71.5,
+                        "idleRatio": 0.2,
+                        "heartbeats": 30
+                    }
+                ],
+                "vms": [
+                    {
+                        "vmId": "server1-vm1",
+                        "serverId": "server1",
+                        "status": "healthy",
+                        "completed": 12,
+                        "failed": 0,
+                        "throughputPerMinute": 0.8,
+                        "meanProcessingSeconds": 71.5,
+                        "idleRatio": 0.2,
+                        "heartbeats": 30
+                    }
+                ],
+                "queueDepth": {"PENDING": 5, "PROCESSING": 1, "DONE": 1200, "ERROR": 3}
+            }
+        }
+
+
 class ImageUploadResponse(BaseModel):
     """Response model for image upload."""
     success: bool
@@ -855,7 +1062,7 @@ class AlertResponse(BaseModel):
     """Response model for alert creation."""
     alertId: str = Field(..., description="Unique alert identifier (UUID)", example="550e8400-e29b-41d4-a716-446655440000", alias="alert_id")
     success: bool = Field(..., description="Whether the alert was created successfully", example=True)
-    notificationSent: bool = Field(..., description="Whether notification was sent", example=True, alias="notification_sent")
+    notificationSent: bool = Field(..., description="Whether notifications were queued for delivery", example=True, alias="notification_sent")
     createdAt: str = Field(..., description="ISO 8601 timestamp when alert was created", example="2025-01-22T10:30:00Z", alias="created_at")
     
     class Config:
@@ -896,6 +1103,7 @@ class AlertListResponse(BaseModel):
     total: int = Field(..., description="Total number of alerts matching filters", example=15)
     limit: int = Field(..., description="Number of alerts per page", example=50)
     offset: int = Field(..., description="Pagination offset", example=0)
+    nextCursor: Optional[str] = Field(None, description="Cursor for the next page (pass as `cursor`); absent on the last page", alias="next_cursor")
     
     class Config:
         populate_by_name = True
@@ -943,6 +1151,20 @@ class ExperityProcessTimeRequest(BaseModel):
         example="96e8b1bd-10e9-476c-9725-f14bb1d54397",
         alias="encounter_id"
     )
+    idempotencyKey: Optional[str] = Field(
+        None,
+        description="Client-generated key identifying this record; a retry with the same key returns the stored record instead of creating a duplicate",
+        example="server1-vm1:96e8b1bd-10e9-476c-9725-f14bb1d54397:experity",
+        max_length=255,
+        alias="idempotency_key"
+    )
+    traceId: Optional[str] = Field(
+        None,
+        description="Trace id of the encounter (traceId returned when the queue entry was claimed). Defaults to the traceparent header, then to the encounter's queue entry",
+        example="4bf92f3577b34da6a3ce929d0e0e4736",
+        pattern=r"^[0-9a-f]{32}$",
+        alias="trace_id"
+    )
     
     @field_validator('processName')
     @classmethod
@@ -974,6 +1196,7 @@ class ExperityProcessTimeResponse(BaseModel):
     durationSeconds: Optional[int] = Field(None, description="Duration in seconds (calculated)", example=300, alias="duration_seconds")
     createdAt: str = Field(..., description="ISO 8601 timestamp when record was created", example="2025-01-22T10:35:00Z", alias="created_at")
     encounterId: Optional[str] = Field(None, description="Encounter ID associated with this process time", example="96e8b1bd-10e9-476c-9725-f14bb1d54397", alias="encounter_id")
+    traceId: Optional[str] = Field(None, description="Trace id linking this record to the encounter's trace", example="4bf92f3577b34da6a3ce929d0e0e4736", alias="trace_id")
     
     class Config:
         populate_by_name = True
@@ -988,6 +1211,7 @@ class ExperityProcessTimeItem(BaseModel):
     durationSeconds: Optional[int] = Field(None, description="Duration in seconds", example=300, alias="duration_seconds")
     createdAt: str = Field(..., description="ISO 8601 timestamp when record was created", example="2025-01-22T10:35:00Z", alias="created_at")
     encounterId: Optional[str] = Field(None, description="Encounter ID associated with this process time", example="96e8b1bd-10e9-476c-9725-f14bb1d54397", alias="encounter_id")
+    traceId: Optional[str] = Field(None, description="Trace id linking this record to the encounter's trace", example="4bf92f3577b34da6a3ce929d0e0e4736", alias="trace_id")
     
     class Config:
         populate_by_name = True
@@ -1003,3 +1227,146 @@ class ExperityProcessTimeListResponse(BaseModel):
     class Config:
         populate_by_name = True
 
+
+class ExperityProcessTimeBatchRequest(BaseModel):
+    """Request model for submitting multiple Experity process times."""
+    processTimes: List[ExperityProcessTimeRequest] = Field(..., description="Process time records (1-1000)", min_length=1, max_length=1000, alias="process_times")
+
+    class Config:
+        populate_by_name = True
+
+
+class ExperityProcessTimeBatchResponse(BaseModel):
+    """Response model for a batch of Experity process times."""
+    success: bool = Field(..., description="Whether the batch was saved", example=True)
+    received: int = Field(..., description="Records in the request", example=3)
+    inserted: int = Field(..., description="Records stored by this request", example=2)
+    duplicates: int = Field(..., description="Records already stored under the same idempotency key", example=1)
+    processTimeIds: List[str] = Field(..., description="Process time IDs in request order (existing IDs for duplicates)", alias="process_time_ids")
+
+    class Config:
+        populate_by_name = True
+
+
+class ProcessTimeHourlyBucket(BaseModel):
+    """Process time throughput for one hour (from the hourly rollups)."""
+    hourStart: str = Field(..., description="ISO 8601 start of the hour", example="2025-01-22T10:00:00Z", alias="hour_start")
+    started: int = Field(..., description="Processes started in the hour", example=14)
+    completed: int = Field(..., description="Processes started in the hour that completed", example=13)
+    meanSeconds: Optional[float] = Field(None, description="Mean duration of completed processes", example=284.5, alias="mean_seconds")
+    maxSeconds: Optional[float] = Field(None, description="Longest duration", example=610.0, alias="max_seconds")
+
+    class Config:
+        populate_by_name = True
+
+
+class ProcessTimeStats(BaseModel):
+    """Latency percentiles, throughput and slowest records for one process."""
+    processName: str = Field(..., description="Process name", example="Encounter process time", alias="process_name")
+    completed: int = Field(..., description="Completed processes started in the window", example=312)
+    throughputPerHour: Optional[float] = Field(None, description="Completed processes per hour over the window", example=13.0, alias="throughput_per_hour")
+    meanSeconds: Optional[float] = Field(None, description="Mean duration", example=284.5, alias="mean_seconds")
+    p50Seconds: Optional[float] = Field(None, description="Median duration", example=240.0, alias="p50_seconds")
+    p90Seconds: Optional[float] = Field(None, description="90th percentile duration", example=420.0, alias="p90_seconds")
+    p95Seconds: Optional[float] = Field(None, description="95th percentile duration", example=515.0, alias="p95_seconds")
+    p99Seconds: Optional[float] = Field(None, description="99th percentile duration", example=600.0, alias="p99_seconds")
+    maxSeconds: Optional[float] = Field(None, description="Longest duration", example=610.0, alias="max_seconds")
+    hourly: List[ProcessTimeHourlyBucket] = Field(..., description="Throughput per hour")
+    slowest: List[ExperityProcessTimeItem] = Field(..., description="Slowest records, slowest first")
+
+    class Config:
+        populate_by_name = True
+
+
+class ExperityProcessTimeAnalyticsResponse(BaseModel):
+    """Response model for Experity process time analytics."""
+    startedAfter: str = Field(..., description="ISO 8601 window start", example="2025-01-21T10:30:00Z", alias="started_after")
+    startedBefore: str = Field(..., description="ISO 8601 window end", example="2025-01-22T10:30:00Z", alias="started_before")
+    processes: List[ProcessTimeStats] = Field(..., description="Statistics per process")
+
+    class Config:
+        populate_by_name = True
+
+
+
+class ProfileSummary(BaseModel):
+    """A stored request profile without its stacks."""
+    profileId: str = Field(..., description="Profile identifier (UUID)", example="3f1c2b7a-6e0d-4a55-9d0e-2b8f1a7c9e10", alias="profile_id")
+    route: str = Field(..., description="Route template", example="/experity/map")
+    method: str = Field(..., description="HTTP method", example="POST")
+    path: str = Field(..., description="Request path", example="/experity/map")
+    statusCode: int = Field(..., description="Response status code", example=200, alias="status_code")
+    startedAt: str = Field(..., description="ISO 8601 time the request started", example="2025-01-22T10:30:00Z", alias="started_at")
+    durationMs: float = Field(..., description="Request duration in milliseconds", example=2481.7, alias="duration_ms")
+    intervalMs: float = Field(..., description="Delay between stack samples in milliseconds", example=5.0, alias="interval_ms")
+    samples: int = Field(..., description="Number of stack samples", example=472)
+
+    class Config:
+        populate_by_name = True
+
+
+class ProfileListResponse(BaseModel):
+    """Response model for the list of stored request profiles."""
+    profiles: List[ProfileSummary] = Field(..., description="Profiles, newest first")
+
+    class Config:
+        populate_by_name = True
+
+
+class ProfileStack(BaseModel):
+    """Sample count for one folded stack."""
+    stack: str = Field(..., description="Frames from outermost to innermost, separated by ';'")
+    samples: int = Field(..., description="Number of samples with this stack", example=12)
+
+
+class ProfileResponse(ProfileSummary):
+    """Response model for one request profile."""
+    stacks: List[ProfileStack] = Field(..., description="Folded stacks, most sampled first")
+
+
+class QueryStat(BaseModel):
+    """Timing statistics for one normalized SQL statement."""
+    queryId: str = Field(..., description="Identifier of the normalized statement", example="9f86d081884c7d65", alias="query_id")
+    query: str = Field(..., description="Normalized statement (literals and parameters replaced by ?)", example="SELECT * FROM queue WHERE status = ? ORDER BY created_at ASC LIMIT ?")
+    calls: int = Field(..., description="Number of executions", example=5234)
+    totalMs: float = Field(..., description="Total execution time in milliseconds", example=48211.4, alias="total_ms")
+    meanMs: float = Field(..., description="Mean execution time in milliseconds", example=9.21, alias="mean_ms")
+    maxMs: float = Field(..., description="Longest execution in milliseconds", example=812.3, alias="max_ms")
+    rows: int = Field(..., description="Rows returned or affected", example=5234)
+    slowCalls: int = Field(..., description="Executions at or above the slow query threshold", example=3, alias="slow_calls")
+    percentOfTotal: float = Field(..., description="Share of all statement time, in percent", example=41.7, alias="percent_of_total")
+
+    class Config:
+        populate_by_name = True
+
+
+class QueryStatsResponse(BaseModel):
+    """Response model for the query timing report."""
+    since: str = Field(..., description="ISO 8601 time statistics were started or reset", example="2025-01-22T08:00:00Z")
+    thresholdMs: float = Field(..., description="Slow query threshold in milliseconds", example=500.0, alias="threshold_ms")
+    totalMs: float = Field(..., description="Total time of all tracked statements in milliseconds", example=115602.9, alias="total_ms")
+    queries: List[QueryStat] = Field(..., description="Statements, ordered as requested")
+
+    class Config:
+        populate_by_name = True
+
+
+class SlowQueryPlanItem(BaseModel):
+    """An EXPLAIN (ANALYZE, BUFFERS) plan captured for a slow statement."""
+    planId: str = Field(..., description="Plan identifier (UUID)", alias="plan_id")
+    queryId: str = Field(..., description="Identifier of the normalized statement", example="9f86d081884c7d65", alias="query_id")
+    query: str = Field(..., description="Normalized statement")
+    durationMs: float = Field(..., description="Duration of the execution that triggered the capture", example=812.3, alias="duration_ms")
+    plan: Any = Field(..., description="Plan in EXPLAIN's JSON format")
+    capturedAt: str = Field(..., description="ISO 8601 time the plan was captured", example="2025-01-22T10:30:05Z", alias="captured_at")
+
+    class Config:
+        populate_by_name = True
+
+
+class SlowQueryPlanListResponse(BaseModel):
+    """Response model for captured slow query plans."""
+    plans: List[SlowQueryPlanItem] = Field(..., description="Plans, newest first")
+
+    class Config:
+        populate_by_name = True
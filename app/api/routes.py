@@ -5,6 +5,7 @@ FastAPI application to expose patient data via REST API.
 
 import os
 import sys
+import time
 import asyncio
 import random
 import uuid
@@ -409,6 +410,10 @@ from app.api.routes.images import router as images_router
 from app.api.routes.validation import router as validation_router
 from app.api.routes.alerts import router as alerts_router
 from app.api.routes.experity_process_time import router as experity_process_time_router
+from app.api.routes.metrics import router as metrics_router
+from app.api.routes.profiling import router as profiling_router
+from app.api.routes.query_stats import router as query_stats_router
+from app.api.routes.exports import router as exports_router
 
 # Include modularized routers
 app.include_router(ui_router)
@@ -423,6 +428,158 @@ app.include_router(images_router, tags=["Images"])
 app.include_router(validation_router, tags=["Validation"])
 app.include_router(alerts_router, tags=["Alerts"])
 app.include_router(experity_process_time_router, tags=["Experity"])
+app.include_router(metrics_router)
+app.include_router(profiling_router, tags=["Admin"])
+app.include_router(query_stats_router, tags=["Admin"])
+app.include_router(exports_router, tags=["Exports"])
+
+# ============================================================================
+# REQUEST METRICS
+# ============================================================================
+from app.utils.metrics import (
+    METRICS_ENABLED,
+    HTTP_REQUESTS,
+    HTTP_REQUEST_DURATION,
+    mark_worker_stopped,
+)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests and record latency per route template (not raw path, to bound cardinality)."""
+    if not METRICS_ENABLED:
+        return await call_next(request)
+
+    start_time = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", None) or "unmatched"
+        HTTP_REQUESTS.labels(
+            method=request.method, route=route_path, status=str(status_code)
+        ).inc()
+        HTTP_REQUEST_DURATION.labels(
+            method=request.method, route=route_path
+        ).observe(time.perf_counter() - start_time)
+
+# ============================================================================
+# REQUEST TRACING
+# ============================================================================
+from app.utils.tracing import (
+    TRACING_ENABLED,
+    span,
+    parse_traceparent,
+    register_tracing_jobs,
+    flush_spans,
+)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Record each request as the root span of its trace, continuing an incoming traceparent."""
+    if not TRACING_ENABLED:
+        return await call_next(request)
+
+    parent = parse_traceparent(request.headers.get("traceparent")) or {}
+    with span(
+        f"{request.method} {request.url.path}",
+        trace_id=parent.get("trace_id"),
+        parent_span_id=parent.get("span_id"),
+        **{"http.method": request.method, "http.target": request.url.path},
+    ) as request_span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if getattr(route, "path", None):
+            request_span.name = f"{request.method} {route.path}"
+            request_span.set_attribute("http.route", route.path)
+        request_span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            request_span.set_error(f"HTTP {response.status_code}")
+        response.headers["traceparent"] = request_span.traceparent
+        return response
+
+# ============================================================================
+# REQUEST PROFILING
+# ============================================================================
+from app.utils.profiling import (
+    PROFILING_ENABLED,
+    PROFILE_HEADER,
+    SamplingProfiler,
+    should_profile,
+    store_profile,
+)
+
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    """Profile sampled requests (or requests sent with the X-Profile token) with a stack sampler."""
+    if not PROFILING_ENABLED or not should_profile(request.url.path, request.headers.get(PROFILE_HEADER)):
+        return await call_next(request)
+
+    started_at = datetime.now(timezone.utc)
+    start_time = time.perf_counter()
+    profiler = SamplingProfiler().start()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        stacks = profiler.stop()
+        route = request.scope.get("route")
+        profile = store_profile(
+            route=getattr(route, "path", None) or "unmatched",
+            method=request.method,
+            path=request.url.path,
+            status_code=status_code,
+            started_at=started_at,
+            duration_ms=(time.perf_counter() - start_time) * 1000,
+            stacks=stacks,
+        )
+    response.headers["X-Profile-Id"] = profile["profile_id"]
+    return response
+
+# ============================================================================
+# BACKGROUND JOBS
+# ============================================================================
+from app.utils.background_jobs import start_background_jobs, stop_background_jobs
+from app.utils.queue_recovery import register_queue_recovery_job
+from app.utils.patient_promotion import register_patient_promotion_job
+from app.utils.fleet_metrics import register_fleet_metrics_jobs
+from app.utils.notification_dispatcher import register_notification_jobs, close_notification_clients
+from app.utils.alert_retention import register_alert_retention_jobs
+from app.utils.resource_alerts import register_resource_alert_jobs
+from app.utils.process_time_analytics import register_process_time_jobs
+from app.utils.query_stats import register_query_stats_jobs
+from app.utils.remote_reads import close_remote_http_clients
+
+
+@app.on_event("startup")
+async def start_jobs():
+    """Register and start periodic background jobs."""
+    register_queue_recovery_job()
+    register_patient_promotion_job()
+    register_fleet_metrics_jobs()
+    register_notification_jobs()
+    register_alert_retention_jobs()
+    register_resource_alert_jobs()
+    register_process_time_jobs()
+    register_tracing_jobs()
+    register_query_stats_jobs()
+    start_background_jobs()
+
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    """Stop periodic background jobs."""
+    await stop_background_jobs()
+    close_notification_clients()
+    await close_remote_http_clients()
+    flush_spans()
+    mark_worker_stopped()
 
 # Import from new modules
 from app.api.models import (
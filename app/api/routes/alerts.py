@@ -30,6 +30,17 @@ from app.api.routes.dependencies import (
     AlertResolveResponse,
 )
 from app.utils.auth import verify_api_key_auth
+from app.utils.notifications import get_notification_channels
+from app.utils.pagination import encode_keyset_cursor, decode_keyset_cursor
+from app.utils.alert_digest import (
+    ALERT_DEDUP_WINDOW_SECONDS,
+    ALERT_DIGEST_WINDOW_SECONDS,
+    alert_dedup_key,
+    get_recent_alert,
+    remember_alert,
+    forget_alert,
+    plan_alert_notification,
+)
 
 router = APIRouter()
 
@@ -54,6 +65,29 @@ async def verify_alert_api_key_auth(request: Request) -> TokenData:
     return await verify_api_key_auth(request, "alert endpoints", "API_KEY")
 
 
+def _duplicate_alert_response(existing_alert: Dict[str, Any]) -> JSONResponse:
+    """Answer a duplicate alert with the existing alert, without another notification."""
+    created_at = existing_alert.get('created_at')
+    if isinstance(created_at, datetime):
+        created_at_str = created_at.isoformat() + 'Z'
+    elif isinstance(created_at, str):
+        created_at_str = created_at
+    else:
+        created_at_str = datetime.now(timezone.utc).isoformat() + 'Z'
+    
+    response_data = {
+        'alertId': str(existing_alert['alert_id']),
+        'success': True,
+        'notificationSent': False,  # No notification for duplicate
+        'createdAt': created_at_str,
+        'duplicate': True,  # Indicate this is a duplicate
+    }
+    
+    alert_response = AlertResponse(**response_data)
+    response_dict = alert_response.model_dump(exclude_none=True, exclude_unset=True, by_alias=False)
+    return JSONResponse(content=response_dict)
+
+
 @router.post(
     "/alerts",
     tags=["Alerts"],
@@ -103,6 +137,8 @@ async def create_alert(
     
     **Response:**
     Returns the created alert with `alertId`, `success`, `notificationSent`, and `createdAt`.
+    `notificationSent` is true when notifications were queued; they are delivered
+    in the background, so the request does not wait on email or Slack.
     
     **Example Request:**
     ```bash
@@ -159,30 +195,45 @@ async def create_alert(
             'timestamp': alert_data.timestamp,
         }
         
-        # Get database connection
-        conn = get_db_connection()
-        
         # Check for duplicate alerts (prevent recursive/spam alerts)
         # Only create alert if there's no recent unresolved alert with same source, source_id, and severity
         # Note: We don't check exact message match because messages may contain timestamps or dynamic content
+        # Repeats seen by this worker only need a primary key lookup to confirm the
+        # remembered alert is still open: it may have been resolved through another worker
+        dedup_key = alert_dedup_key(alert_dict['source'], alert_dict['source_id'], alert_dict['severity'])
+        recent_alert = get_recent_alert(dedup_key)
+        
+        # Get database connection
+        conn = get_db_connection()
+        
         from psycopg2.extras import RealDictCursor
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         try:
+            if recent_alert:
+                cursor.execute(
+                    "SELECT 1 FROM alerts WHERE alert_id = %s AND resolved = FALSE",
+                    (str(recent_alert['alert_id']),)
+                )
+                if cursor.fetchone():
+                    return _duplicate_alert_response(recent_alert)
+            
             duplicate_check_query = """
-                SELECT alert_id, created_at
+                SELECT alert_id, created_at,
+                       EXTRACT(EPOCH FROM (NOW()::timestamp - created_at)) AS age_seconds
                 FROM alerts
                 WHERE source = %s
                   AND source_id = %s
                   AND severity = %s
                   AND resolved = FALSE
-                  AND created_at > NOW() - INTERVAL '5 minutes'
+                  AND created_at > NOW() - make_interval(secs => %s)
                 ORDER BY created_at DESC
                 LIMIT 1
             """
             cursor.execute(duplicate_check_query, (
                 alert_dict['source'],
                 alert_dict['source_id'],
-                alert_dict['severity']
+                alert_dict['severity'],
+                ALERT_DEDUP_WINDOW_SECONDS
             ))
             duplicate = cursor.fetchone()
             
@@ -193,60 +244,27 @@ async def create_alert(
                     f"message={alert_dict['message'][:50]}..."
                 )
                 # Return the existing alert instead of creating a new one
-                existing_alert_query = """
-                    SELECT alert_id, source, source_id, severity, message, details,
-                           resolved, resolved_at, resolved_by, created_at, updated_at
-                    FROM alerts
-                    WHERE alert_id = %s
-                """
-                cursor.execute(existing_alert_query, (duplicate['alert_id'],))
-                result = cursor.fetchone()
-                if result:
-                    saved_alert = dict(result)
-                    # Format the response without sending another notification
-                    created_at = saved_alert.get('created_at')
-                    if isinstance(created_at, datetime):
-                        created_at_str = created_at.isoformat() + 'Z'
-                    elif isinstance(created_at, str):
-                        created_at_str = created_at
-                    else:
-                        created_at_str = datetime.now(timezone.utc).isoformat() + 'Z'
-                    
-                    response_data = {
-                        'alertId': str(saved_alert['alert_id']),
-                        'success': True,
-                        'notificationSent': False,  # No notification for duplicate
-                        'createdAt': created_at_str,
-                        'duplicate': True,  # Indicate this is a duplicate
-                    }
-                    
-                    alert_response = AlertResponse(**response_data)
-                    response_dict = alert_response.model_dump(exclude_none=True, exclude_unset=True, by_alias=False)
-                    return JSONResponse(content=response_dict)
+                remember_alert(dedup_key, duplicate, age_seconds=float(duplicate['age_seconds'] or 0))
+                return _duplicate_alert_response(duplicate)
         finally:
             cursor.close()
         
-        # Save the alert (no duplicate found)
-        saved_alert = save_alert(conn, alert_dict)
-        
-        # Try to send notification (non-blocking, don't fail if it fails)
-        notification_sent = False
-        try:
-            # Import notification function if available
-            try:
-                from app.utils.notifications import send_alert_notification
-                notification_sent = send_alert_notification(saved_alert)
-            except ImportError:
-                # Notification service not available, skip
-                logger.debug("Notification service not available, skipping notification")
-                notification_sent = False
-            except Exception as e:
-                # Log but don't fail
-                logger.warning(f"Failed to send notification: {str(e)}")
-                notification_sent = False
-        except Exception as e:
-            logger.warning(f"Error in notification sending: {str(e)}")
-            notification_sent = False
+        # Save the alert (no duplicate found); notifications are queued in the
+        # same transaction and delivered by the background dispatcher. Related
+        # alerts after the first in a digest window are held for one digest.
+        notify_channels = get_notification_channels('created')
+        digest_key = (
+            plan_alert_notification(alert_dict['source'], alert_dict['severity'], alert_dict['message'])
+            if notify_channels else None
+        )
+        saved_alert = save_alert(
+            conn, alert_dict,
+            notify_channels=notify_channels,
+            digest_key=digest_key,
+            digest_window_seconds=ALERT_DIGEST_WINDOW_SECONDS
+        )
+        remember_alert(dedup_key, saved_alert)
+        notification_sent = bool(notify_channels)
         
         # Format created_at timestamp
         created_at = saved_alert.get('created_at')
@@ -329,7 +347,8 @@ async def create_alert(
                         ],
                         "total": 15,
                         "limit": 50,
-                        "offset": 0
+                        "offset": 0,
+                        "nextCursor": "MjAyNS0wMS0yMlQxMDozMDowMHw1NTBlODQwMC1lMjliLTQxZDQtYTcxNi00NDY2NTU0NDAwMDA"
                     }
                 }
             }
@@ -346,6 +365,7 @@ async def get_alerts_list(
     resolved: Optional[bool] = Query(False, description="Include resolved alerts (default: false, only unresolved)"),
     limit: int = Query(50, ge=1, le=100, description="Number of alerts to return (max 100)"),
     offset: int = Query(0, ge=0, description="Pagination offset"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's nextCursor (replaces offset)"),
     current_client: TokenData = Depends(verify_alert_api_key_auth)
 ) -> AlertListResponse:
     """
@@ -362,9 +382,12 @@ async def get_alerts_list(
     - `resolved` (optional): Include resolved alerts (default: false, only shows unresolved)
     - `limit` (optional): Number of alerts to return (default: 50, max: 100)
     - `offset` (optional): Pagination offset (default: 0)
+    - `cursor` (optional): `nextCursor` from the previous page. Cursor pages stay fast
+      at any depth; prefer them over large offsets.
     
     **Response:**
-    Returns a list of alerts with `alerts`, `total`, `limit`, and `offset`.
+    Returns a list of alerts with `alerts`, `total`, `limit`, `offset`, and
+    `nextCursor` (omitted on the last page).
     
     **Example Request:**
     ```bash
@@ -399,11 +422,18 @@ async def get_alerts_list(
         if resolved is not None:
             filters['resolved'] = resolved
         
+        after = None
+        if cursor:
+            try:
+                after = decode_keyset_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        
         # Get database connection
         conn = get_db_connection()
         
         # Get alerts
-        alerts_list, total = get_alerts(conn, filters=filters, limit=limit, offset=offset)
+        alerts_list, total = get_alerts(conn, filters=filters, limit=limit, offset=offset, after=after)
         
         # Format alerts for response
         formatted_alerts = []
@@ -443,8 +473,11 @@ async def get_alerts_list(
             'alerts': formatted_alerts,
             'total': total,
             'limit': limit,
-            'offset': offset,
+            'offset': 0 if after else offset,
         }
+        if len(alerts_list) == limit:
+            last_alert = alerts_list[-1]
+            response_data['nextCursor'] = encode_keyset_cursor(last_alert['created_at'], last_alert['alert_id'])
         
         alert_list_response = AlertListResponse(**response_data)
         response_dict = alert_list_response.model_dump(exclude_none=True, exclude_unset=True, by_alias=False)
@@ -537,20 +570,11 @@ async def resolve_alert_endpoint(
         # Get database connection
         conn = get_db_connection()
         
-        # Resolve the alert
-        resolved_alert = resolve_alert(conn, alertId)
-        
-        # Try to send resolution notification (non-blocking, don't fail if it fails)
-        notification_sent = False
-        try:
-            from app.utils.notifications import send_alert_resolution_notification
-            notification_sent = send_alert_resolution_notification(resolved_alert)
-        except ImportError:
-            logger.debug("Notification service not available, skipping resolution notification")
-            notification_sent = False
-        except Exception as e:
-            logger.warning(f"Failed to send resolution notification: {str(e)}")
-            notification_sent = False
+        # Resolve the alert and queue the resolution notification with it
+        resolved_alert = resolve_alert(
+            conn, alertId, notify_channels=get_notification_channels('resolved')
+        )
+        forget_alert(resolved_alert)
         
         # Format resolved_at timestamp
         resolved_at = resolved_alert.get('resolved_at')
@@ -665,20 +689,11 @@ async def resolve_alert_ui(
         # Get database connection
         conn = get_db_connection()
         
-        # Resolve the alert
-        resolved_alert = resolve_alert(conn, alertId)
-        
-        # Try to send resolution notification (non-blocking, don't fail if it fails)
-        notification_sent = False
-        try:
-            from app.utils.notifications import send_alert_resolution_notification
-            notification_sent = send_alert_resolution_notification(resolved_alert)
-        except ImportError:
-            logger.debug("Notification service not available, skipping resolution notification")
-            notification_sent = False
-        except Exception as e:
-            logger.warning(f"Failed to send resolution notification: {str(e)}")
-            notification_sent = False
+        # Resolve the alert and queue the resolution notification with it
+        resolved_alert = resolve_alert(
+            conn, alertId, notify_channels=get_notification_channels('resolved')
+        )
+        forget_alert(resolved_alert)
         
         # Format resolved_at timestamp
         resolved_at = resolved_alert.get('resolved_at')
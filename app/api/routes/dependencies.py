@@ -49,6 +49,7 @@ templates = Jinja2Templates(directory=str(Path(__file__).parent.parent.parent /
 # Import models
 from app.api.models import (
     PatientPayload,
+    PatientSearchResult,
     PatientCreateRequest,
     StatusUpdateRequest,
     EncounterResponse,
@@ -87,6 +88,7 @@ from app.api.utils import (
     fetch_locations,
     fetch_remote_patients,
     DEFAULT_STATUSES,
+    PATIENT_SYNC_SETTLE_SECONDS,
 )
 
 # Import database functions
@@ -116,6 +118,12 @@ from app.api.services import (
     format_summary_response,
     filter_patients_by_search,
     get_local_patients,
+    get_local_patients_page,
+    get_local_patients_fingerprint,
+    get_patient_changes,
+    encode_sync_position,
+    decode_sync_position,
+    search_patients,
     filter_within_24h,
 )
 
@@ -171,6 +179,7 @@ __all__ = [
     "get_auth_dependency",
     "templates",
     "PatientPayload",
+    "PatientSearchResult",
     "PatientCreateRequest",
     "StatusUpdateRequest",
     "EncounterResponse",
@@ -199,6 +208,7 @@ __all__ = [
     "fetch_locations",
     "fetch_remote_patients",
     "DEFAULT_STATUSES",
+    "PATIENT_SYNC_SETTLE_SECONDS",
     "get_db_connection",
     "save_encounter",
     "save_summary",
@@ -217,6 +227,12 @@ __all__ = [
     "format_summary_response",
     "filter_patients_by_search",
     "get_local_patients",
+    "get_local_patients_page",
+    "get_local_patients_fingerprint",
+    "get_patient_changes",
+    "encode_sync_position",
+    "decode_sync_position",
+    "search_patients",
     "filter_within_24h",
     "call_azure_ai_agent",
     "AzureAIClientError",
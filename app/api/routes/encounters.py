@@ -19,6 +19,7 @@ from app.api.routes.dependencies import (
     create_queue_from_encounter,
     format_encounter_response,
 )
+from app.utils.tracing import span
 
 router = APIRouter()
 
@@ -180,11 +181,13 @@ async def create_encounter(
         conn = get_db_connection()
         
         # Save the encounter
-        saved_encounter = save_encounter(conn, encounter_dict)
+        with span("encounter.save", encounter_id=str(encounter_id)):
+            saved_encounter = save_encounter(conn, encounter_dict)
         
         # Automatically create queue entry from encounter
         try:
-            create_queue_from_encounter(conn, saved_encounter)
+            with span("queue.create", encounter_id=str(encounter_id)):
+                create_queue_from_encounter(conn, saved_encounter)
         except Exception as e:
             # Log error but don't fail the encounter creation
             logger.warning(f"Failed to create queue entry for encounter {encounter_id}: {str(e)}")
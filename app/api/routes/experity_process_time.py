@@ -21,12 +21,19 @@ from app.api.models import (
     ExperityProcessTimeResponse,
     ExperityProcessTimeItem,
     ExperityProcessTimeListResponse,
+    ExperityProcessTimeAnalyticsResponse,
+    ExperityProcessTimeBatchRequest,
+    ExperityProcessTimeBatchResponse,
 )
 from app.api.database import (
     save_experity_process_time,
+    save_experity_process_times,
     get_experity_process_times,
 )
+from app.api.utils import parse_datetime
 from app.utils.auth import verify_api_key_auth
+from app.utils.process_time_analytics import get_process_time_analytics
+from app.utils.tracing import parse_traceparent, record_span
 
 router = APIRouter()
 
@@ -47,6 +54,20 @@ async def verify_experity_api_key_auth(request: Request) -> TokenData:
     return await verify_api_key_auth(request, "Experity process time endpoints", "API_KEY")
 
 
+def _record_process_time_span(saved_process_time: dict) -> None:
+    """Record a newly stored VM process time as a span in its encounter's trace."""
+    if saved_process_time.get('duplicate') or not saved_process_time.get('trace_id'):
+        return
+    record_span(
+        "vm." + saved_process_time['process_name'].lower().replace(' ', '_'),
+        saved_process_time['started_at'],
+        saved_process_time['ended_at'],
+        trace_id=saved_process_time['trace_id'],
+        encounter_id=str(saved_process_time.get('encounter_id') or ''),
+        process_time_id=str(saved_process_time['process_time_id']),
+    )
+
+
 @router.post(
     "/experity/process-time",
     tags=["Experity"],
@@ -93,6 +114,9 @@ async def create_process_time(
     - `startedAt` (required): ISO 8601 timestamp when the process started
     - `endedAt` (required): ISO 8601 timestamp when the process ended
     - `encounterId` (optional): Encounter ID associated with this process time
+    - `idempotencyKey` (optional): Client key for safe retries; repeating a key returns the stored record
+    - `traceId` (optional): Trace id of the encounter; defaults to the `traceparent` header,
+      then to the trace id stored on the encounter's queue entry
     
     **Response:**
     Returns the created process time record with `processTimeId`, `success`, and timestamps.
@@ -121,36 +145,44 @@ async def create_process_time(
         if process_time_data.encounterId:
             process_time_dict['encounter_id'] = process_time_data.encounterId
         
+        if process_time_data.idempotencyKey:
+            process_time_dict['idempotency_key'] = process_time_data.idempotencyKey
+        
+        traceparent = parse_traceparent(request.headers.get("traceparent"))
+        if process_time_data.traceId or traceparent:
+            process_time_dict['trace_id'] = process_time_data.traceId or traceparent['trace_id']
+        
         # Get database connection
         conn = get_db_connection()
         
         # Save the process time record
         saved_process_time = save_experity_process_time(conn, process_time_dict)
+        _record_process_time_span(saved_process_time)
         
         # Format timestamps
         started_at = saved_process_time.get('started_at')
         if isinstance(started_at, datetime):
-            started_at_str = started_at.isoformat() + 'Z'
+            started_at_str = _format_timestamp(started_at)
         elif isinstance(started_at, str):
             started_at_str = started_at
         else:
-            started_at_str = datetime.now(timezone.utc).isoformat() + 'Z'
+            started_at_str = _format_timestamp(datetime.now(timezone.utc))
         
         ended_at = saved_process_time.get('ended_at')
         ended_at_str = None
         if ended_at:
             if isinstance(ended_at, datetime):
-                ended_at_str = ended_at.isoformat() + 'Z'
+                ended_at_str = _format_timestamp(ended_at)
             elif isinstance(ended_at, str):
                 ended_at_str = ended_at
         
         created_at = saved_process_time.get('created_at')
         if isinstance(created_at, datetime):
-            created_at_str = created_at.isoformat() + 'Z'
+            created_at_str = _format_timestamp(created_at)
         elif isinstance(created_at, str):
             created_at_str = created_at
         else:
-            created_at_str = datetime.now(timezone.utc).isoformat() + 'Z'
+            created_at_str = _format_timestamp(datetime.now(timezone.utc))
         
         # Format the response
         response_data = {
@@ -167,6 +199,9 @@ async def create_process_time(
         if saved_process_time.get('encounter_id'):
             response_data['encounterId'] = str(saved_process_time['encounter_id'])
         
+        if saved_process_time.get('trace_id'):
+            response_data['traceId'] = saved_process_time['trace_id']
+        
         # Create response model and serialize
         process_time_response = ExperityProcessTimeResponse(**response_data)
         response_dict = process_time_response.model_dump(exclude_none=True, exclude_unset=True, by_alias=False)
@@ -201,6 +236,136 @@ async def create_process_time(
             conn.close()
 
 
+@router.post(
+    "/experity/process-time/batch",
+    tags=["Experity"],
+    summary="Submit Experity process times in bulk",
+    description=(
+        "Submit up to 1000 process time records in one request, stored with a single multi-row insert. "
+        "Records with a previously seen idempotency key are not stored again. Uses X-API-Key authentication."
+    ),
+    response_model=ExperityProcessTimeBatchResponse,
+    status_code=200,
+    responses={
+        200: {
+            "description": "Process times recorded successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "success": True,
+                        "received": 2,
+                        "inserted": 1,
+                        "duplicates": 1,
+                        "processTimeIds": [
+                            "550e8400-e29b-41d4-a716-446655440000",
+                            "0b7c7a0e-9c55-4a43-9f7d-1e7f0f4c2f3a"
+                        ]
+                    }
+                }
+            }
+        },
+        400: {"description": "Invalid request data"},
+        401: {"description": "X-API-Key header required or invalid"},
+        500: {"description": "Server error"},
+    },
+)
+async def create_process_times_batch(
+    batch_data: ExperityProcessTimeBatchRequest,
+    request: Request,
+    current_client: TokenData = Depends(verify_experity_api_key_auth)
+) -> ExperityProcessTimeBatchResponse:
+    """
+    Submit a batch of process time records.
+    
+    **Authentication:**
+    - Use `X-API-Key` header with your HMAC secret key
+    
+    **Headers:**
+    - `Idempotency-Key` (optional): Key for the whole batch. Records without their own
+      `idempotencyKey` use `<Idempotency-Key>:<position>`, so retrying the same batch
+      does not create duplicates.
+    - `traceparent` (optional): W3C trace context; its trace id applies to records
+      without their own `traceId`
+    
+    **Request Body:**
+    - `processTimes` (required): 1-1000 records with the same fields as
+      `POST /experity/process-time`, including the optional `idempotencyKey`
+    
+    **Response:**
+    Returns `received`, `inserted` and `duplicates` counts and `processTimeIds` in request order.
+    The batch is all-or-nothing: if any record is invalid, nothing is stored.
+    """
+    conn = None
+    
+    try:
+        batch_key = request.headers.get("Idempotency-Key")
+        traceparent = parse_traceparent(request.headers.get("traceparent"))
+        
+        process_time_dicts = []
+        for index, process_time_data in enumerate(batch_data.processTimes):
+            process_time_dict = {
+                'process_name': process_time_data.processName,
+                'started_at': process_time_data.startedAt,
+                'ended_at': process_time_data.endedAt,
+            }
+            if process_time_data.encounterId:
+                process_time_dict['encounter_id'] = process_time_data.encounterId
+            if process_time_data.idempotencyKey:
+                process_time_dict['idempotency_key'] = process_time_data.idempotencyKey
+            elif batch_key:
+                process_time_dict['idempotency_key'] = f"{batch_key}:{index}"
+            if process_time_data.traceId or traceparent:
+                process_time_dict['trace_id'] = process_time_data.traceId or traceparent['trace_id']
+            process_time_dicts.append(process_time_dict)
+        
+        conn = get_db_connection()
+        
+        saved_process_times = save_experity_process_times(conn, process_time_dicts)
+        for saved in saved_process_times:
+            _record_process_time_span(saved)
+        duplicates = sum(1 for saved in saved_process_times if saved.get('duplicate'))
+        
+        response_data = {
+            'success': True,
+            'received': len(saved_process_times),
+            'inserted': len(saved_process_times) - duplicates,
+            'duplicates': duplicates,
+            'processTimeIds': [str(saved['process_time_id']) for saved in saved_process_times],
+        }
+        
+        batch_response = ExperityProcessTimeBatchResponse(**response_data)
+        response_dict = batch_response.model_dump(exclude_none=True, exclude_unset=True, by_alias=False)
+        
+        return JSONResponse(content=response_dict)
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        if conn:
+            conn.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    except psycopg2.Error as e:
+        if conn:
+            conn.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+    finally:
+        if conn:
+            conn.close()
+
+
 @router.get(
     "/experity/process-time",
     tags=["Experity"],
@@ -240,6 +405,7 @@ async def get_process_times_list(
     startedBefore: Optional[str] = Query(None, description="Filter by start time (ISO 8601 timestamp) - only records started before this"),
     completedOnly: Optional[bool] = Query(False, description="Only return completed processes (with endedAt set)"),
     encounterId: Optional[str] = Query(None, description="Filter by encounter ID"),
+    traceId: Optional[str] = Query(None, description="Filter by trace ID"),
     limit: int = Query(50, ge=1, le=100, description="Number of records to return (max 100)"),
     offset: int = Query(0, ge=0, description="Pagination offset")
 ) -> ExperityProcessTimeListResponse:
@@ -252,6 +418,7 @@ async def get_process_times_list(
     - `startedBefore` (optional): Filter by start time - only records started before this timestamp
     - `completedOnly` (optional): Only return completed processes (default: false)
     - `encounterId` (optional): Filter by encounter ID
+    - `traceId` (optional): Filter by trace ID
     - `limit` (optional): Number of records to return (default: 50, max: 100)
     - `offset` (optional): Pagination offset (default: 0)
     
@@ -280,6 +447,8 @@ async def get_process_times_list(
             filters['completed_only'] = True
         if encounterId:
             filters['encounter_id'] = encounterId
+        if traceId:
+            filters['trace_id'] = traceId
         
         # Get database connection
         conn = get_db_connection()
@@ -293,27 +462,27 @@ async def get_process_times_list(
             # Format timestamps
             started_at = process_time.get('started_at')
             if isinstance(started_at, datetime):
-                started_at_str = started_at.isoformat() + 'Z'
+                started_at_str = _format_timestamp(started_at)
             elif isinstance(started_at, str):
                 started_at_str = started_at
             else:
-                started_at_str = datetime.now(timezone.utc).isoformat() + 'Z'
+                started_at_str = _format_timestamp(datetime.now(timezone.utc))
             
             ended_at = process_time.get('ended_at')
             ended_at_str = None
             if ended_at:
                 if isinstance(ended_at, datetime):
-                    ended_at_str = ended_at.isoformat() + 'Z'
+                    ended_at_str = _format_timestamp(ended_at)
                 elif isinstance(ended_at, str):
                     ended_at_str = ended_at
             
             created_at = process_time.get('created_at')
             if isinstance(created_at, datetime):
-                created_at_str = created_at.isoformat() + 'Z'
+                created_at_str = _format_timestamp(created_at)
             elif isinstance(created_at, str):
                 created_at_str = created_at
             else:
-                created_at_str = datetime.now(timezone.utc).isoformat() + 'Z'
+                created_at_str = _format_timestamp(datetime.now(timezone.utc))
             
             formatted_process_time = {
                 'processTimeId': str(process_time['process_time_id']),
@@ -328,6 +497,9 @@ async def get_process_times_list(
             if process_time.get('encounter_id'):
                 formatted_process_time['encounterId'] = str(process_time['encounter_id'])
             
+            if process_time.get('trace_id'):
+                formatted_process_time['traceId'] = process_time['trace_id']
+            
             formatted_process_times.append(ExperityProcessTimeItem(**formatted_process_time))
         
         # Create response
@@ -362,3 +534,138 @@ async def get_process_times_list(
     finally:
         if conn:
             conn.close()
+
+
+def _format_timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Format a timestamp as ISO 8601 UTC with a trailing Z."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat() + 'Z'
+
+
+def _parse_window_bound(value: Optional[str], name: str) -> Optional[datetime]:
+    """Parse an ISO 8601 query parameter as a UTC datetime."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed == datetime.min:
+        raise ValueError(f"Invalid {name} timestamp format: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+@router.get(
+    "/experity/process-time/analytics",
+    tags=["Experity"],
+    summary="Experity process time analytics",
+    description=(
+        "Percentile latencies, throughput per hour and slowest encounters per process over a "
+        "time window. Percentiles are computed in the database; hourly throughput comes from "
+        "incrementally refreshed rollups. Results are cached briefly. No authentication required."
+    ),
+    response_model=ExperityProcessTimeAnalyticsResponse,
+    status_code=200,
+    responses={
+        200: {"description": "Analytics computed successfully"},
+        400: {"description": "Invalid query parameters"},
+        500: {"description": "Server error"},
+    },
+)
+async def get_process_time_analytics_endpoint(
+    processName: Optional[str] = Query(None, description="Restrict to one process (Encounter process time, Experity process time)"),
+    startedAfter: Optional[str] = Query(None, description="Window start (ISO 8601); default: 24 hours before startedBefore"),
+    startedBefore: Optional[str] = Query(None, description="Window end (ISO 8601); default: now"),
+    slowest: int = Query(5, ge=0, le=50, description="Slowest records to return per process (max 50)"),
+) -> ExperityProcessTimeAnalyticsResponse:
+    """
+    Get Experity process time analytics.
+
+    **Query Parameters:**
+    - `processName` (optional): Restrict to one process
+    - `startedAfter` / `startedBefore` (optional): Window on startedAt (default: last 24 hours)
+    - `slowest` (optional): Slowest records per process (default: 5)
+
+    **Response:**
+    One entry per process in `processes` with `completed`, `throughputPerHour`,
+    `meanSeconds`, `p50Seconds`, `p90Seconds`, `p95Seconds`, `p99Seconds`,
+    `maxSeconds`, `hourly` (started/completed per hour) and `slowest`.
+    """
+    conn = None
+
+    try:
+        if processName and processName not in ['Encounter process time', 'Experity process time']:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid processName: {processName}. Must be one of: Encounter process time, Experity process time"
+            )
+
+        started_after = _parse_window_bound(startedAfter, 'startedAfter')
+        started_before = _parse_window_bound(startedBefore, 'startedBefore')
+        if started_after and started_before and started_after >= started_before:
+            raise HTTPException(status_code=400, detail="startedAfter must be before startedBefore")
+
+        conn = get_db_connection()
+        analytics = get_process_time_analytics(
+            conn,
+            process_name=processName,
+            started_after=started_after,
+            started_before=started_before,
+            slowest_limit=slowest,
+        )
+
+        response_data = {
+            'startedAfter': _format_timestamp(analytics['started_after']),
+            'startedBefore': _format_timestamp(analytics['started_before']),
+            'processes': [
+                {
+                    **process,
+                    'hourly': [
+                        {**bucket, 'hour_start': _format_timestamp(bucket['hour_start'])}
+                        for bucket in process['hourly']
+                    ],
+                    'slowest': [
+                        {
+                            'processTimeId': str(record['process_time_id']),
+                            'processName': record['process_name'],
+                            'startedAt': _format_timestamp(record['started_at']),
+                            'endedAt': _format_timestamp(record['ended_at']),
+                            'durationSeconds': record.get('duration_seconds'),
+                            'createdAt': _format_timestamp(record['created_at']),
+                            'encounterId': str(record['encounter_id']) if record.get('encounter_id') else None,
+                        }
+                        for record in process['slowest']
+                    ],
+                }
+                for process in analytics['processes']
+            ],
+        }
+
+        analytics_response = ExperityProcessTimeAnalyticsResponse(**response_data)
+        response_dict = analytics_response.model_dump(exclude_none=True, by_alias=False)
+
+        return JSONResponse(content=response_dict)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except psycopg2.Error as e:
+        if conn:
+            conn.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+    finally:
+        if conn:
+            conn.close()
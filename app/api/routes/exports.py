@@ -0,0 +1,142 @@
+"""
+Export routes.
+
+This module streams whole datasets (patients, encounters, queue) as NDJSON or
+CSV for analysts, replacing paging through the JSON endpoints. Rows are read
+through server-side cursors (see app.utils.export), so exports of any size
+run in constant memory.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi import Path as PathParam
+from fastapi.responses import StreamingResponse
+import psycopg2
+
+from app.api.routes.dependencies import (
+    get_auth_dependency,
+    TokenData,
+    get_db_connection,
+    ensure_client_location_access,
+    resolve_location_id,
+)
+from app.api.database import EXPORT_QUERIES, open_export_cursor
+from app.api.utils import parse_datetime
+from app.utils.export import EXPORT_FETCH_SIZE, EXPORT_MEDIA_TYPES, stream_export
+
+router = APIRouter()
+
+
+def _parse_bound(value: Optional[str], name: str) -> Optional[datetime]:
+    """Parse an ISO 8601 query parameter as a naive UTC datetime (columns are TIMESTAMP)."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed == datetime.min:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} timestamp format: {value}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+@router.get(
+    "/exports/{dataset}",
+    tags=["Exports"],
+    summary="Stream a dataset as NDJSON or CSV",
+    description=(
+        "Streams every matching row of patients, encounters or queue. Rows are read through a "
+        "server-side cursor and sent in chunks, so exports of millions of rows run in constant "
+        "memory. Encounters are dated by when they were queued."
+    ),
+    responses={
+        200: {
+            "description": "Export stream",
+            "content": {
+                "application/x-ndjson": {},
+                "text/csv": {},
+            },
+        },
+        400: {"description": "Invalid dataset, format or date range"},
+        401: {"description": "Authentication required"},
+        403: {"description": "Location not permitted for this client"},
+        500: {"description": "Server error"},
+    },
+)
+async def export_dataset(
+    dataset: str = PathParam(..., description="patients, encounters or queue"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    locationId: Optional[str] = Query(None, alias="locationId", description="Only rows of this location"),
+    createdAfter: Optional[str] = Query(None, description="Only rows created at or after this time (ISO 8601)"),
+    createdBefore: Optional[str] = Query(None, description="Only rows created before this time (ISO 8601)"),
+    current_client: TokenData = get_auth_dependency()
+) -> StreamingResponse:
+    """
+    Stream a dataset export.
+
+    **Query Parameters:**
+    - `format` (optional): `ndjson` (default) or `csv`; CSV writes JSON columns as JSON text
+    - `locationId` (optional): Restrict to one location
+    - `createdAfter` / `createdBefore` (optional): Date range on the creation time
+
+    **Response:**
+    A download streamed in chunks of `EXPORT_FETCH_SIZE` rows. An error after the
+    first chunk ends the stream early.
+    """
+    conn = None
+
+    try:
+        if dataset not in EXPORT_QUERIES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid dataset: {dataset}. Must be one of: {', '.join(EXPORT_QUERIES)}"
+            )
+
+        created_after = _parse_bound(createdAfter, 'createdAfter')
+        created_before = _parse_bound(createdBefore, 'createdBefore')
+        if created_after and created_before and created_after >= created_before:
+            raise HTTPException(status_code=400, detail="createdAfter must be before createdBefore")
+
+        normalized_location_id = resolve_location_id(locationId, required=False)
+        normalized_location_id = ensure_client_location_access(normalized_location_id, current_client)
+
+        conn = get_db_connection()
+        cursor = await asyncio.to_thread(
+            open_export_cursor,
+            conn,
+            dataset,
+            location_id=normalized_location_id,
+            created_after=created_after,
+            created_before=created_before,
+            fetch_size=EXPORT_FETCH_SIZE,
+        )
+
+        filename = f"{dataset}-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.{format}"
+        response = StreamingResponse(
+            stream_export(conn, cursor, dataset, format),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "Cache-Control": "no-store",
+            },
+        )
+        # The stream owns the connection from here and closes it when done
+        conn = None
+        return response
+
+    except HTTPException:
+        raise
+    except psycopg2.Error as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+    finally:
+        if conn:
+            conn.close()
@@ -24,6 +24,7 @@ from app.api.routes.dependencies import (
     BlobServiceClient,
     ContentSettings,
 )
+from app.utils.tracing import span
 
 router = APIRouter()
 
@@ -334,15 +335,17 @@ async def upload_image(
 
         
 
-        blob_client.upload_blob(
+        with span("image.upload", blob_name=blob_name, size_bytes=len(content)):
 
-            content,
+            blob_client.upload_blob(
 
-            content_settings=content_settings,
+                content,
 
-            overwrite=True
+                content_settings=content_settings,
 
-        )
+                overwrite=True
+
+            )
 
         
 
@@ -0,0 +1,49 @@
+"""
+Metrics routes.
+
+This module exposes API internals (request latency, queue depth, mapping
+latency and retries, image cache, database connections, heartbeat ingest)
+in the Prometheus text format.
+
+Scrapes authenticate with X-API-Key (METRICS_API_KEY, falling back to
+API_KEY), e.g. with `http_headers` in the Prometheus scrape config.
+"""
+
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import Response
+
+from app.utils.auth import TokenData, verify_api_key_auth
+from app.utils.metrics import METRICS_ENABLED, render_metrics
+
+router = APIRouter()
+
+
+async def verify_metrics_api_key_auth(request: Request) -> TokenData:
+    """Verify X-API-Key authentication for the metrics endpoint (METRICS_API_KEY, falling back to API_KEY)."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return await verify_api_key_auth(request, "metrics endpoint", "METRICS_API_KEY")
+
+
+@router.get(
+    "/metrics",
+    include_in_schema=False,
+)
+async def get_metrics(
+    current_client: TokenData = Depends(verify_metrics_api_key_auth)
+) -> Response:
+    """
+    Prometheus scrape endpoint.
+
+    Returns 404 when METRICS_ENABLED=false, 401 without a valid X-API-Key
+    and 503 when prometheus-client is not installed. Rendering runs in a
+    worker thread (it reads the shared files in multi-worker mode), and
+    no metric queries the database at scrape time.
+    """
+    try:
+        body, content_type = await asyncio.to_thread(render_metrics)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return Response(content=body, media_type=content_type)
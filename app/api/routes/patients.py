@@ -4,11 +4,13 @@ Patient routes for managing patient records.
 This module contains all routes related to patient data management.
 """
 
+import asyncio
 import logging
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Optional, List, Dict, Any
 
-from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from psycopg2.extras import RealDictCursor
 import psycopg2
 
@@ -17,6 +19,7 @@ from app.api.routes.dependencies import (
     get_auth_dependency,
     TokenData,
     PatientPayload,
+    PatientSearchResult,
     PatientCreateRequest,
     StatusUpdateRequest,
     get_db_connection,
@@ -25,17 +28,51 @@ from app.api.routes.dependencies import (
     normalize_status,
     expand_status_shortcuts,
     DEFAULT_STATUSES,
+    PATIENT_SYNC_SETTLE_SECONDS,
     use_remote_api_for_reads,
     fetch_remote_patients,
     get_local_patients,
+    get_local_patients_fingerprint,
+    get_patient_changes,
+    encode_sync_position,
+    decode_sync_position,
+    search_patients,
     filter_patients_by_search,
+    filter_within_24h,
     build_patient_payload,
     normalize_patient_record,
     insert_patients,
 )
+from app.api.models import PatientBatchRequest, PatientBatchResponse, PatientPromotionResponse
+from app.api.database import fetch_patients_by_emr_ids, upsert_patient_records
+from app.utils.locations import invalidate_location_directory
+from app.utils.etag import weak_etag, etag_matches
+from app.utils.patient_promotion import run_patient_promotion
 
 router = APIRouter()
 
+# Fields a record sent without location_id takes from the stored patient
+PATIENT_MERGE_FIELDS = [
+    "location_id",
+    "location_name",
+    "booking_id",
+    "booking_number",
+    "patient_number",
+    "legal_first_name",
+    "legal_last_name",
+    "dob",
+    "mobile_phone",
+    "sex_at_birth",
+    "reason_for_visit",
+]
+
+
+def _merge_existing_fields(normalized: Dict[str, Any], existing: Dict[str, Any]) -> None:
+    """Keep any newly provided fields, fill gaps from the existing record."""
+    for field in PATIENT_MERGE_FIELDS:
+        if normalized.get(field) is None and existing.get(field) is not None:
+            normalized[field] = existing[field]
+
 
 @router.get(
     "/patient/{emrId}",
@@ -228,23 +265,7 @@ async def create_patient(
             cursor.close()
 
             if existing:
-                # Merge: keep any newly provided fields, fill gaps from existing record.
-                merge_fields = [
-                    "location_id",
-                    "location_name",
-                    "booking_id",
-                    "booking_number",
-                    "patient_number",
-                    "legal_first_name",
-                    "legal_last_name",
-                    "dob",
-                    "mobile_phone",
-                    "sex_at_birth",
-                    "reason_for_visit",
-                ]
-                for field in merge_fields:
-                    if normalized.get(field) is None and existing.get(field) is not None:
-                        normalized[field] = existing[field]
+                _merge_existing_fields(normalized, existing)
 
             # After merge, still no location_id -> cannot create a brand new record without it.
             if not normalized.get("location_id"):
@@ -261,6 +282,8 @@ async def create_patient(
         normalized["location_id"] = normalized_location_id
 
         inserted_count = insert_patients(conn, [normalized], on_conflict='update')
+        # A new location (or name) is picked up by the dropdown right away
+        invalidate_location_directory()
         
         if inserted_count == 0:
             # Record might already exist, try to fetch it
@@ -314,6 +337,187 @@ async def create_patient(
             conn.close()
 
 
+@router.post(
+    "/patients/batch",
+    tags=["Patients"],
+    response_model=PatientBatchResponse,
+    responses={
+        200: {
+            "description": "Per-record outcomes",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "received": 3,
+                        "created": 1,
+                        "updated": 1,
+                        "skipped": 0,
+                        "failed": 1,
+                        "results": [
+                            {"index": 0, "emrId": "EMR12345", "status": "created"},
+                            {"index": 1, "emrId": "EMR12346", "status": "updated"},
+                            {"index": 2, "emrId": "EMR12347", "status": "failed", "error": "location_id is required for new patients."}
+                        ]
+                    }
+                }
+            }
+        },
+        401: {"description": "Authentication required"},
+        422: {"description": "Invalid request body (e.g. more than 1000 patients)"},
+        500: {"description": "Server error"},
+    },
+)
+async def create_patients_batch(
+    batch_data: PatientBatchRequest,
+    current_client: TokenData = get_auth_dependency()
+) -> PatientBatchResponse:
+    """
+    Create or update up to 1000 patient records in one request.
+
+    Each record follows the rules of `POST /patients/create`: a record without
+    `locationId` takes the missing fields from the stored patient with the same
+    `emrId`, and the location must be permitted for the client. Records that
+    break these rules are reported as `failed` without affecting the others.
+    When an `emrId` appears more than once, the last record is saved and the
+    earlier ones are reported as `skipped`.
+
+    Valid records are written in one transaction with a single multi-row upsert.
+    """
+    if not normalize_patient_record:
+        raise HTTPException(
+            status_code=503,
+            detail="Patient save functionality unavailable"
+        )
+
+    conn = None
+    try:
+        results: List[Dict[str, Any]] = []
+        normalized_records: List[Optional[Dict[str, Any]]] = []
+        for index, patient_data in enumerate(batch_data.patients):
+            normalized = normalize_patient_record(patient_data.model_dump(exclude_none=True, by_alias=False))
+            results.append({"index": index, "emrId": normalized.get("emr_id"), "status": "failed"})
+            if not normalized.get("emr_id"):
+                results[index]["error"] = "emr_id is required."
+                normalized_records.append(None)
+            else:
+                normalized_records.append(normalized)
+
+        # The last record for an EMR ID wins; ON CONFLICT cannot touch one row twice
+        last_index = {record["emr_id"]: index for index, record in enumerate(normalized_records) if record}
+        for index, record in enumerate(normalized_records):
+            if record and last_index[record["emr_id"]] != index:
+                results[index].update(status="skipped", error="Superseded by a later record with the same emrId.")
+                normalized_records[index] = None
+
+        conn = get_db_connection()
+
+        # One query fills the gaps of every record sent without a location
+        missing_location = [record["emr_id"] for record in normalized_records if record and not record.get("location_id")]
+        if missing_location:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            existing_by_emr_id = fetch_patients_by_emr_ids(cursor, missing_location)
+            cursor.close()
+            for emr_id in missing_location:
+                existing = existing_by_emr_id.get(emr_id)
+                if existing:
+                    _merge_existing_fields(normalized_records[last_index[emr_id]], existing)
+
+        to_save: List[Dict[str, Any]] = []
+        for index, record in enumerate(normalized_records):
+            if not record:
+                continue
+            if not record.get("location_id"):
+                results[index]["error"] = "location_id is required for new patients."
+                continue
+            try:
+                record["location_id"] = ensure_client_location_access(record["location_id"], current_client)
+            except HTTPException as e:
+                results[index]["error"] = e.detail
+                continue
+            to_save.append(record)
+
+        outcomes = upsert_patient_records(conn, to_save)
+        if outcomes:
+            # A new location (or name) is picked up by the dropdown right away
+            invalidate_location_directory()
+        for record in to_save:
+            result = results[last_index[record["emr_id"]]]
+            result["status"] = outcomes.get(record["emr_id"], "updated")
+
+        counts = {status: sum(1 for result in results if result["status"] == status)
+                  for status in ("created", "updated", "skipped", "failed")}
+        batch_response = PatientBatchResponse(received=len(results), results=results, **counts)
+        return JSONResponse(content=batch_response.model_dump(exclude_none=True, by_alias=False))
+
+    except HTTPException:
+        raise
+    except psycopg2.Error as e:
+        if conn:
+            conn.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+    finally:
+        if conn:
+            conn.close()
+
+
+@router.post(
+    "/patients/promote",
+    tags=["Patients"],
+    summary="Promote pending patients that have an EMR ID",
+    response_model=PatientPromotionResponse,
+    responses={
+        200: {"description": "Promotion run completed"},
+        401: {"description": "Authentication required"},
+        500: {"description": "Server error"},
+    },
+)
+async def promote_pending_patients_now(
+    batchSize: Optional[int] = Query(
+        default=None,
+        ge=1,
+        le=5000,
+        alias="batchSize",
+        description="Pending rows promoted per transaction (default: PATIENT_PROMOTION_BATCH_SIZE)"
+    ),
+    current_client: TokenData = get_auth_dependency()
+) -> PatientPromotionResponse:
+    """
+    Run one promotion pass now instead of waiting for the background job.
+
+    Pending patients with an EMR ID (status `pending` or `ready`) are copied into
+    patients in batches and marked `completed`.
+
+    **Response:**
+    Returns promotion counts, the wait (lag) of the promoted rows and the remaining backlog.
+    """
+    try:
+        result = await asyncio.to_thread(run_patient_promotion, batch_size=batchSize)
+        promotion_response = PatientPromotionResponse(**result)
+        return JSONResponse(content=promotion_response.model_dump(by_alias=False))
+
+    except HTTPException:
+        raise
+    except psycopg2.Error as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+
+
 @router.patch(
     "/patients/{emrId}",
     tags=["Patients"],
@@ -459,6 +663,7 @@ async def update_patient_status(
                 }
             }
         },
+        304: {"description": "Not modified (If-None-Match matches the current ETag)"},
         400: {"description": "Invalid query parameters"},
         401: {"description": "Authentication required"},
         500: {"description": "Server error"},
@@ -466,6 +671,7 @@ async def update_patient_status(
 )
 async def list_patients(
     request: Request,
+    response: Response,
     locationId: Optional[str] = Query(
         default=None,
         alias="locationId",
@@ -482,6 +688,11 @@ async def list_patients(
         alias="statuses",
         description="Filter by status. Use 'active' for active statuses (checked_in, confirmed). Defaults to checked_in, confirmed if not provided."
     ),
+    since: Optional[str] = Query(
+        default=None,
+        alias="since",
+        description="X-Next-Since value of the previous response (or an ISO 8601 timestamp): return only patients changed since then"
+    ),
     current_client: TokenData = get_auth_dependency()
 ):
     """
@@ -489,11 +700,23 @@ async def list_patients(
     - `locationId` (optional) - Required unless DEFAULT_LOCATION_ID is set
     - `statuses` (optional) - Defaults to checked_in, confirmed. Use 'active' for patients with checked_in/confirmed status.
     - `limit` (optional)
+    - `since` (optional) - Incremental sync cursor (see below)
+    
+    **Conditional requests:** the full list carries a weak `ETag`. Send it back in
+    `If-None-Match` to get `304 Not Modified` while nothing in the list changed.
+    
+    **Incremental sync:** every local response carries `X-Next-Since`. Passing it as
+    `since` returns only patients changed after it, oldest change first (at most `limit`;
+    repeat until the list is empty). Changed patients that no longer match the filters
+    (e.g. moved to a status that was not requested) are returned as tombstones with
+    `deleted: true`. Entries include `source` (confirmed or pending). Changes from the
+    last few seconds (PATIENT_SYNC_SETTLE_SECONDS) are returned on the next poll.
     
     **Example:**
     ```
     GET /patients?locationId=AXjwbE&statuses=confirmed&limit=50
     GET /patients?locationId=AXjwbE&statuses=active
+    GET /patients?locationId=AXjwbE&since=MjAyNS0xMS0yMVQxMDozMDowMHxjb25maXJtZWQ6NDI
     ```
     """
     # Check if 'active' shortcut was requested (for 24h filter)
@@ -515,53 +738,22 @@ async def list_patients(
         if not normalized_statuses:
             raise HTTPException(status_code=400, detail="At least one valid status must be provided")
 
-    def filter_within_24h(patients: list) -> list:
-        """Filter patients to only include those captured within the last 24 hours."""
-        cutoff = datetime.now() - timedelta(hours=24)
-        
-        filtered = []
-        for patient in patients:
-            captured_at = patient.get("captured_at") or patient.get("capturedAt")
-            if captured_at:
-                if isinstance(captured_at, str):
-                    # Parse ISO format timestamp
-                    try:
-                        ts = captured_at.replace("Z", "+00:00")
-                        captured_dt = datetime.fromisoformat(ts).replace(tzinfo=None)
-                    except ValueError:
-                        captured_dt = None
-                elif isinstance(captured_at, datetime):
-                    captured_dt = captured_at.replace(tzinfo=None) if captured_at.tzinfo else captured_at
-                else:
-                    captured_dt = None
-                
-                if captured_dt and captured_dt >= cutoff:
-                    filtered.append(patient)
-            # If no captured_at, check created_at as fallback
-            else:
-                created_at = patient.get("created_at") or patient.get("createdAt")
-                if created_at:
-                    if isinstance(created_at, str):
-                        try:
-                            ts = created_at.replace("Z", "+00:00")
-                            created_dt = datetime.fromisoformat(ts).replace(tzinfo=None)
-                        except ValueError:
-                            created_dt = None
-                    elif isinstance(created_at, datetime):
-                        created_dt = created_at.replace(tzinfo=None) if created_at.tzinfo else created_at
-                    else:
-                        created_dt = None
-                    
-                    if created_dt and created_dt >= cutoff:
-                        filtered.append(patient)
-        return filtered
-
     try:
         normalized_location_id = resolve_location_id(locationId, required=False)
         normalized_location_id = ensure_client_location_access(normalized_location_id, current_client)
         use_remote_reads = use_remote_api_for_reads()
 
+        sync_after = None
+        if since is not None:
+            try:
+                sync_after = decode_sync_position(since)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid since value. Use X-Next-Since from a previous response or an ISO 8601 timestamp.")
+
         if use_remote_reads and normalized_location_id:
+            if sync_after is not None:
+                raise HTTPException(status_code=400, detail="since is not supported while reads are served by the remote API")
+
             # Fetch patients directly from production API
             patients_raw = await fetch_remote_patients(normalized_location_id, normalized_statuses, limit)
             
@@ -576,16 +768,59 @@ async def list_patients(
                 for patient in patients_raw
             ]
             # Use by_alias=True to output camelCase field names
-            return [PatientPayload(**patient).model_dump(exclude_none=True, exclude_unset=True, by_alias=True) for patient in filtered_patients]
+            payloads = [PatientPayload(**patient).model_dump(exclude_none=True, exclude_unset=True, by_alias=True) for patient in filtered_patients]
+            # The remote list is cached, so hashing it is cheap; still saves the transfer
+            etag = weak_etag(payloads)
+            if etag_matches(request.headers.get("If-None-Match"), etag):
+                return Response(status_code=304, headers={"ETag": etag})
+            response.headers["ETag"] = etag
+            return payloads
 
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         try:
-            patients_raw = get_local_patients(cursor, normalized_location_id, normalized_statuses, limit)
-            
-            # Apply 24h filter if 'active' shortcut was used
-            if is_active_filter:
-                patients_raw = filter_within_24h(patients_raw)
+            if sync_after is not None:
+                changes, next_after = get_patient_changes(
+                    cursor,
+                    normalized_location_id,
+                    normalized_statuses,
+                    sync_after,
+                    limit,
+                    within_24h=is_active_filter,
+                    settle_seconds=PATIENT_SYNC_SETTLE_SECONDS,
+                )
+                response.headers["X-Next-Since"] = encode_sync_position(next_after)
+                fields_to_exclude = ["status_class", "status_label", "captured_display"]
+                return [
+                    PatientPayload(**{k: v for k, v in patient.items() if k not in fields_to_exclude}).model_dump(
+                        exclude_none=True, exclude_unset=True, by_alias=True
+                    )
+                    for patient in changes
+                ]
+
+            # A count and max(updated_at) decide whether the list changed, before reading it
+            total, last_updated_at, read_at = get_local_patients_fingerprint(
+                cursor,
+                normalized_location_id,
+                normalized_statuses,
+                within_24h=is_active_filter,
+            )
+            etag = weak_etag(normalized_location_id, normalized_statuses, is_active_filter, limit, total, last_updated_at)
+            if etag_matches(request.headers.get("If-None-Match"), etag):
+                return Response(status_code=304, headers={"ETag": etag})
+            response.headers["ETag"] = etag
+            # Changes from the settle window may also be in this list; re-sending them is harmless
+            sync_start = read_at - timedelta(seconds=PATIENT_SYNC_SETTLE_SECONDS)
+            response.headers["X-Next-Since"] = encode_sync_position((sync_start, "", 0))
+
+            # The 24h window for the 'active' shortcut is applied in SQL, before the limit
+            patients_raw = get_local_patients(
+                cursor,
+                normalized_location_id,
+                normalized_statuses,
+                limit,
+                within_24h=is_active_filter,
+            )
             
             # Remove excluded fields
             fields_to_exclude = ["status_class", "status_label", "captured_display", "source"]
@@ -604,3 +839,95 @@ async def list_patients(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+
+
+@router.get(
+    "/patients/search",
+    tags=["Patients"],
+    response_model=List[PatientSearchResult],
+    responses={
+        200: {
+            "description": "Matching patients, best match first",
+            "content": {
+                "application/json": {
+                    "example": [
+                        {
+                            "emrId": "EMR12345",
+                            "locationId": "AXjwbE",
+                            "legalFirstName": "John",
+                            "legalLastName": "Doe",
+                            "mobilePhone": "+1234567890",
+                            "capturedAt": "2025-11-21T10:30:00",
+                            "status": "confirmed",
+                            "source": "confirmed",
+                            "matchType": "prefix",
+                            "score": 0.8
+                        }
+                    ]
+                }
+            }
+        },
+        400: {"description": "Invalid query parameters"},
+        401: {"description": "Authentication required"},
+        500: {"description": "Server error"},
+    },
+)
+async def search_patients_typeahead(
+    request: Request,
+    q: str = Query(
+        ...,
+        min_length=2,
+        max_length=100,
+        description="Search term matched against full name, EMR ID and phone number.",
+    ),
+    locationId: Optional[str] = Query(
+        default=None,
+        alias="locationId",
+        description="Location identifier. Defaults to DEFAULT_LOCATION_ID when set.",
+    ),
+    limit: int = Query(
+        default=10,
+        ge=1,
+        le=50,
+        description="Maximum number of matches to return"
+    ),
+    current_client: TokenData = get_auth_dependency()
+):
+    """
+    Typeahead search over confirmed and pending patients in the local database.
+
+    Exact matches come first, then prefix matches, then other substring
+    matches. Phone numbers match on digits, so `(555) 123` finds `+15551234567`.
+
+    **Example:**
+    ```
+    GET /patients/search?q=doe&locationId=AXjwbE&limit=10
+    ```
+    """
+    conn = None
+
+    try:
+        normalized_location_id = resolve_location_id(locationId, required=False)
+        normalized_location_id = ensure_client_location_access(normalized_location_id, current_client)
+
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            results = search_patients(cursor, q, normalized_location_id, limit)
+        finally:
+            cursor.close()
+
+        return JSONResponse(content=[
+            PatientSearchResult(**result).model_dump(exclude_none=True, by_alias=False)
+            for result in results
+        ])
+
+    except HTTPException:
+        raise
+    except psycopg2.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        if conn:
+            conn.close()
@@ -0,0 +1,109 @@
+"""
+Request profiling routes.
+
+This module exposes the request profiles captured by the profiling
+middleware (see app.utils.profiling) to administrators.
+"""
+
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.api.routes.dependencies import TokenData
+from app.api.models import ProfileListResponse, ProfileResponse
+from app.utils.auth import verify_api_key_auth
+from app.utils.profiling import (
+    PROFILING_ENABLED,
+    get_profile,
+    list_profiles,
+    profile_summary,
+    render_folded,
+)
+
+router = APIRouter()
+
+
+async def verify_admin_api_key_auth(request: Request) -> TokenData:
+    """Verify X-API-Key authentication for admin endpoints (ADMIN_API_KEY, falling back to API_KEY)."""
+    return await verify_api_key_auth(request, "admin endpoints", "ADMIN_API_KEY")
+
+
+def _format_summary(profile: dict) -> dict:
+    summary = profile_summary(profile)
+    summary['started_at'] = summary['started_at'].isoformat().replace('+00:00', 'Z')
+    return summary
+
+
+@router.get(
+    "/admin/profiles",
+    tags=["Admin"],
+    summary="List recent request profiles",
+    description=(
+        "Recent profiles captured by the sampling profiler, newest first. Profiling is enabled with "
+        "PROFILING_SAMPLE_RATE or PROFILING_HEADER_TOKEN. Uses X-API-Key authentication."
+    ),
+    response_model=ProfileListResponse,
+    responses={
+        401: {"description": "X-API-Key header required or invalid"},
+    },
+)
+async def list_request_profiles(
+    route: Optional[str] = Query(None, description="Only profiles of this route template, e.g. /experity/map"),
+    limit: int = Query(50, ge=1, le=500, description="Number of profiles to return"),
+    current_client: TokenData = Depends(verify_admin_api_key_auth)
+) -> ProfileListResponse:
+    """
+    List recent request profiles.
+
+    Profiles are kept in memory by each worker, so only profiles captured by
+    the worker serving this request are returned.
+    """
+    profiles = [_format_summary(profile) for profile in list_profiles(route=route, limit=limit)]
+    response = ProfileListResponse(profiles=profiles)
+    return JSONResponse(content=response.model_dump(by_alias=False))
+
+
+@router.get(
+    "/admin/profiles/{profile_id}",
+    tags=["Admin"],
+    summary="Get a request profile",
+    description=(
+        "One profile with its sampled stacks. format=folded returns the folded-stack text "
+        "(flamegraph.pl, inferno, speedscope). Uses X-API-Key authentication."
+    ),
+    response_model=ProfileResponse,
+    responses={
+        200: {"content": {"text/plain": {}}},
+        401: {"description": "X-API-Key header required or invalid"},
+        404: {"description": "Profile not found"},
+    },
+)
+async def get_request_profile(
+    profile_id: str,
+    format: str = Query("json", pattern="^(json|folded)$", description="json or folded"),
+    current_client: TokenData = Depends(verify_admin_api_key_auth)
+):
+    """
+    Get one request profile.
+
+    **Example:**
+    ```
+    curl -H "X-API-Key: $KEY" "$API/admin/profiles/<profileId>?format=folded" | flamegraph.pl > map.svg
+    ```
+    """
+    profile = get_profile(profile_id)
+    if profile is None:
+        detail = "Profile not found" if PROFILING_ENABLED else "Profile not found (profiling is disabled)"
+        raise HTTPException(status_code=404, detail=detail)
+
+    if format == "folded":
+        return PlainTextResponse(render_folded(profile['stacks']))
+
+    response = ProfileResponse(
+        **_format_summary(profile),
+        stacks=[
+            {'stack': stack, 'samples': samples}
+            for stack, samples in profile['stacks'].most_common()
+        ],
+    )
+    return JSONResponse(content=response.model_dump(by_alias=False))
@@ -0,0 +1,127 @@
+"""
+Query statistics routes.
+
+This module reports statement timings collected by the database layer (see
+app.utils.query_stats) and the EXPLAIN plans captured for slow statements.
+"""
+
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from fastapi.responses import JSONResponse
+import psycopg2
+
+from app.api.routes.dependencies import (
+    TokenData,
+    get_db_connection,
+)
+from app.api.models import QueryStatsResponse, SlowQueryPlanListResponse
+from app.api.database import get_slow_query_plans
+from app.utils.auth import verify_api_key_auth
+from app.utils.query_stats import get_query_stats, reset_query_stats
+
+router = APIRouter()
+
+
+async def verify_admin_api_key_auth(request: Request) -> TokenData:
+    """Verify X-API-Key authentication for admin endpoints (ADMIN_API_KEY, falling back to API_KEY)."""
+    return await verify_api_key_auth(request, "admin endpoints", "ADMIN_API_KEY")
+
+
+def _format_timestamp(value) -> str:
+    return value.isoformat().replace('+00:00', 'Z')
+
+
+@router.get(
+    "/admin/queries",
+    tags=["Admin"],
+    summary="Top SQL statements by time",
+    description=(
+        "Statement timings aggregated per normalized query since the worker started (or the last "
+        "reset), ordered by total time by default. Uses X-API-Key authentication."
+    ),
+    response_model=QueryStatsResponse,
+    responses={
+        401: {"description": "X-API-Key header required or invalid"},
+    },
+)
+async def get_query_report(
+    orderBy: str = Query("total", pattern="^(total|mean|max|calls)$", description="total, mean, max or calls"),
+    limit: int = Query(20, ge=1, le=500, description="Number of statements to return"),
+    current_client: TokenData = Depends(verify_admin_api_key_auth)
+) -> QueryStatsResponse:
+    """
+    Report the most expensive SQL statements.
+
+    Statistics are kept by each worker, so the report covers the worker
+    serving this request. Plans for slow statements are available from
+    `GET /admin/queries/plans`.
+    """
+    report = get_query_stats(order_by=orderBy, limit=limit)
+    report['since'] = _format_timestamp(report['since'])
+    response = QueryStatsResponse(**report)
+    return JSONResponse(content=response.model_dump(by_alias=False))
+
+
+@router.delete(
+    "/admin/queries",
+    tags=["Admin"],
+    summary="Reset SQL statement statistics",
+    status_code=204,
+    responses={
+        401: {"description": "X-API-Key header required or invalid"},
+    },
+)
+async def reset_query_report(
+    current_client: TokenData = Depends(verify_admin_api_key_auth)
+):
+    """Clear the statement statistics of the worker serving this request."""
+    reset_query_stats()
+
+
+@router.get(
+    "/admin/queries/plans",
+    tags=["Admin"],
+    summary="Captured plans for slow SQL statements",
+    description=(
+        "EXPLAIN (ANALYZE, BUFFERS) plans captured in the background for statements slower than "
+        "SLOW_QUERY_THRESHOLD_MS, newest first. Uses X-API-Key authentication."
+    ),
+    response_model=SlowQueryPlanListResponse,
+    responses={
+        401: {"description": "X-API-Key header required or invalid"},
+        500: {"description": "Server error"},
+    },
+)
+async def list_slow_query_plans(
+    queryId: Optional[str] = Query(None, description="Only plans of this statement (queryId from GET /admin/queries)"),
+    limit: int = Query(20, ge=1, le=100, description="Number of plans to return"),
+    current_client: TokenData = Depends(verify_admin_api_key_auth)
+) -> SlowQueryPlanListResponse:
+    """List captured plans for slow statements."""
+    conn = None
+
+    try:
+        conn = get_db_connection()
+        plans = get_slow_query_plans(conn, query_id=queryId, limit=limit)
+        for plan in plans:
+            plan['plan_id'] = str(plan['plan_id'])
+            plan['captured_at'] = _format_timestamp(plan['captured_at'])
+
+        response = SlowQueryPlanListResponse(plans=plans)
+        return JSONResponse(content=response.model_dump(by_alias=False))
+
+    except HTTPException:
+        raise
+    except psycopg2.Error as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+    finally:
+        if conn:
+            conn.close()
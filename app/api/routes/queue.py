@@ -9,7 +9,7 @@ import json
 import os
 import asyncio
 import random
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
 
 from fastapi import APIRouter, HTTPException, Query, Request, Depends, BackgroundTasks
@@ -39,6 +39,10 @@ from app.api.routes.dependencies import (
     REQUEST_TIMEOUT,
     AZURE_AI_AVAILABLE,
 )
+from app.api.models import QueueRecoveryResponse
+from app.utils.queue_recovery import run_queue_recovery
+from app.utils.metrics import AZURE_AGENT_RETRIES, MAPPING_DURATION
+from app.utils.tracing import span, start_span, record_span
 
 router = APIRouter()
 
@@ -373,13 +377,24 @@ async def list_queue(
                     UPDATE queue 
                     SET status = 'PROCESSING', updated_at = CURRENT_TIMESTAMP 
                     WHERE queue_id = %s 
-                    RETURNING *
+                    RETURNING *, EXTRACT(EPOCH FROM (LOCALTIMESTAMP - created_at)) AS wait_seconds
                     """,
                     (result['queue_id'],)
                 )
                 result = cursor.fetchone()
                 conn.commit()
                 results = [result] if result else []
+                
+                # Record the time the entry waited in the queue in the encounter's trace
+                if result and result.get('wait_seconds') is not None:
+                    claimed_at = datetime.now(timezone.utc)
+                    record_span(
+                        "queue.wait",
+                        claimed_at - timedelta(seconds=float(result['wait_seconds'])),
+                        claimed_at,
+                        trace_id=result.get('trace_id'),
+                        queue_id=str(result['queue_id']),
+                    )
             else:
                 # No PENDING items available (all locked or none exist)
                 results = []
@@ -804,6 +819,83 @@ async def requeue_queue_entry(
             conn.close()
 
 
+@router.post(
+    "/queue/recover",
+    tags=["Queue"],
+    summary="Recover queue entries orphaned by dead VMs",
+    description=(
+        "Requeue PROCESSING entries whose VM has stopped sending heartbeats. "
+        "Entries that exceed the retry ceiling are dead-lettered (ERROR with dlq=true). "
+        "This also runs automatically in the background."
+    ),
+    response_model=QueueRecoveryResponse,
+    responses={
+        200: {"description": "Recovery run completed"},
+        400: {"description": "Invalid query parameters"},
+        401: {"description": "Authentication required"},
+        500: {"description": "Server error"},
+    },
+)
+async def recover_orphaned_queue(
+    staleAfterSeconds: Optional[int] = Query(
+        default=None,
+        ge=1,
+        alias="staleAfterSeconds",
+        description="Heartbeat age after which a VM is considered dead (default: QUEUE_RECOVERY_STALE_SECONDS)"
+    ),
+    maxAttempts: Optional[int] = Query(
+        default=None,
+        ge=1,
+        alias="maxAttempts",
+        description="Retry ceiling before an entry is dead-lettered (default: QUEUE_RECOVERY_MAX_ATTEMPTS)"
+    ),
+    current_client: TokenData = get_auth_dependency()
+) -> QueueRecoveryResponse:
+    """
+    Run one reconciliation pass over orphaned queue entries.
+
+    An entry is orphaned when it is `PROCESSING` and the VM whose `processingQueueId`
+    points at it has not sent a heartbeat within `staleAfterSeconds`.
+
+    **Response:**
+    Returns counts of requeued and dead-lettered entries plus the affected entries.
+    """
+    try:
+        result = await asyncio.to_thread(
+            run_queue_recovery,
+            stale_after_seconds=staleAfterSeconds,
+            max_attempts=maxAttempts,
+        )
+
+        response_dict = {
+            'requeued': result['requeued'],
+            'deadLettered': result['dead_lettered'],
+            'entries': [
+                {
+                    'queueId': entry['queue_id'],
+                    'vmId': entry['vm_id'],
+                    'status': entry['status'],
+                    'attempts': entry['attempts'],
+                }
+                for entry in result['entries']
+            ],
+        }
+        return JSONResponse(content=response_dict)
+
+    except HTTPException:
+        raise
+    except psycopg2.Error as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+
+
 @router.post(
     "/experity/map",
     tags=["Queue"],
@@ -1135,6 +1227,7 @@ async def map_queue_to_experity(
         
         # Pre-extract deterministic data (ICD updates, severity, etc.) before LLM processing
         # This reduces AI work and ensures accuracy for deterministic mappings
+        pre_extract_span = start_span("experity_map.pre_extract", encounter_id=str(encounter_id))
         pre_extracted_icd_updates = []
         pre_extracted_severities = {}
         
@@ -1236,6 +1329,10 @@ async def map_queue_to_experity(
             logger.warning(f"Failed to pre-extract lab orders (continuing anyway): {str(lab_orders_error)}")
             # Continue without pre-extraction if it fails
         
+        pre_extract_span.set_attribute("icd_updates", len(pre_extracted_icd_updates))
+        pre_extract_span.set_attribute("lab_orders", len(pre_extracted_lab_orders))
+        pre_extract_span.end()
+        
         # Call Azure AI agent with retry logic at endpoint level
         # This provides additional retries for transient errors beyond the client-level retries
         endpoint_max_retries = 3
@@ -1270,11 +1367,13 @@ async def map_queue_to_experity(
                     logger.warning(f"Could not log Azure AI config: {config_error}")
                 
                 logger.info(f"Calling Azure AI agent with encounter_id: {encounter_id}")
-                experity_mapping = await call_azure_ai_agent(queue_entry)
+                with span("experity_map.agent_run", attempt=endpoint_attempt + 1):
+                    experity_mapping = await call_azure_ai_agent(queue_entry)
                 
                 # Merge pre-extracted deterministic data into LLM response
                 # This overwrites LLM's ICD updates with deterministic extraction
                 if pre_extracted_icd_updates:
+                    merge_span = start_span("experity_map.merge", step="icd_updates")
                     try:
                         from app.utils.experity_mapper import merge_icd_updates_into_response
                         experity_mapping = merge_icd_updates_into_response(
@@ -1286,9 +1385,11 @@ async def map_queue_to_experity(
                     except Exception as merge_error:
                         logger.warning(f"Failed to merge ICD updates (continuing anyway): {str(merge_error)}")
                         # Continue even if merge fails
+                    merge_span.end()
                 
                 # Merge pre-extracted severity into LLM response (always enabled - code-based mapping)
                 if pre_extracted_severities:
+                    merge_span = start_span("experity_map.merge", step="severity")
                     try:
                         from app.utils.experity_mapper import merge_severity_into_complaints
                         
@@ -1305,9 +1406,11 @@ async def map_queue_to_experity(
                     except Exception as merge_error:
                         logger.warning(f"Failed to merge severity (continuing anyway): {str(merge_error)}")
                         # Continue even if merge fails
+                    merge_span.end()
                 
                 # Merge pre-extracted onset into LLM response (always enabled - code-based mapping)
                 if pre_extracted_onsets:
+                    merge_span = start_span("experity_map.merge", step="onset")
                     try:
                         from app.utils.experity_mapper import merge_onset_into_complaints
                         
@@ -1324,9 +1427,11 @@ async def map_queue_to_experity(
                     except Exception as merge_error:
                         logger.warning(f"Failed to merge onset (continuing anyway): {str(merge_error)}")
                         # Continue even if merge fails
+                    merge_span.end()
                 
                 # Merge pre-extracted quality into LLM response (always enabled - code-based mapping)
                 if pre_extracted_qualities:
+                    merge_span = start_span("experity_map.merge", step="quality")
                     try:
                         from app.utils.experity_mapper import merge_quality_into_complaints
                         
@@ -1343,9 +1448,11 @@ async def map_queue_to_experity(
                     except Exception as merge_error:
                         logger.warning(f"Failed to merge quality (continuing anyway): {str(merge_error)}")
                         # Continue even if merge fails
+                    merge_span.end()
                 
                 # Merge pre-extracted vitals into LLM response (always enabled - code-based mapping)
                 if pre_extracted_vitals:
+                    merge_span = start_span("experity_map.merge", step="vitals")
                     try:
                         from app.utils.experity_mapper import merge_vitals_into_response
                         
@@ -1358,8 +1465,10 @@ async def map_queue_to_experity(
                     except Exception as merge_error:
                         logger.warning(f"Failed to merge vitals (continuing anyway): {str(merge_error)}")
                         # Continue even if merge fails
+                    merge_span.end()
                 
                 # Merge gender-specific body part IDs into complaints (always enabled - code-based mapping)
+                merge_span = start_span("experity_map.merge", step="body_part_ids")
                 try:
                     from app.utils.experity_mapper import merge_body_part_ids_into_complaints
                     
@@ -1375,9 +1484,11 @@ async def map_queue_to_experity(
                 except Exception as body_part_id_error:
                     logger.warning(f"Failed to merge body part IDs (continuing anyway): {str(body_part_id_error)}")
                     # Continue even if merge fails
+                merge_span.end()
                 
                 # Merge pre-extracted guardian into LLM response (always enabled - code-based mapping)
                 if pre_extracted_guardian:
+                    merge_span = start_span("experity_map.merge", step="guardian")
                     try:
                         from app.utils.experity_mapper import merge_guardian_into_response
                         
@@ -1390,9 +1501,11 @@ async def map_queue_to_experity(
                     except Exception as merge_error:
                         logger.warning(f"Failed to merge guardian (continuing anyway): {str(merge_error)}")
                         # Continue even if merge fails
+                    merge_span.end()
                 
                 # Merge pre-extracted lab orders into LLM response (always enabled - code-based mapping)
                 if pre_extracted_lab_orders:
+                    merge_span = start_span("experity_map.merge", step="lab_orders")
                     try:
                         from app.utils.experity_mapper import merge_lab_orders_into_response
                         
@@ -1405,8 +1518,10 @@ async def map_queue_to_experity(
                     except Exception as merge_error:
                         logger.warning(f"Failed to merge lab orders (continuing anyway): {str(merge_error)}")
                         # Continue even if merge fails
+                    merge_span.end()
                 
                 # Validate and fix format issues in the response
+                validate_span = start_span("experity_map.validate")
                 try:
                     from app.utils.response_validator import validate_and_fix_experity_response
                     # Get source encounter data for validation
@@ -1416,6 +1531,7 @@ async def map_queue_to_experity(
                 except Exception as validation_error:
                     logger.warning(f"Response validation failed (continuing anyway): {str(validation_error)}")
                     # Continue even if validation fails
+                validate_span.end()
                 
                 # Success - break out of retry loop
                 break
@@ -1469,6 +1585,7 @@ async def map_queue_to_experity(
                         f"Rate limit error on attempt {endpoint_attempt + 1}/{endpoint_max_retries}. "
                         f"Waiting {wait_time:.1f} seconds before retry to allow rate limit to reset..."
                     )
+                    AZURE_AGENT_RETRIES.labels(reason='rate_limit').inc()
                     await asyncio.sleep(wait_time)
                     continue
                 
@@ -1509,6 +1626,7 @@ async def map_queue_to_experity(
                         f"Timeout error on attempt {endpoint_attempt + 1}/{endpoint_max_retries}. "
                         f"Retrying in {wait_time} seconds..."
                     )
+                    AZURE_AGENT_RETRIES.labels(reason='timeout').inc()
                     await asyncio.sleep(wait_time)
                     continue
                 # Exhausted retries
@@ -1550,6 +1668,7 @@ async def map_queue_to_experity(
                         f"Azure AI error on attempt {endpoint_attempt + 1}/{endpoint_max_retries}. "
                         f"Retrying in {wait_time} seconds..."
                     )
+                    AZURE_AGENT_RETRIES.labels(reason='error').inc()
                     await asyncio.sleep(wait_time)
                     continue
                 # Exhausted retries
@@ -1585,6 +1704,8 @@ async def map_queue_to_experity(
         # Log total endpoint processing time
         endpoint_total_time = time.perf_counter() - endpoint_start_time
         logger.info(f"⏱️  Total endpoint processing time: {endpoint_total_time:.3f}s")
+        if experity_mapping is not None:
+            MAPPING_DURATION.observe(endpoint_total_time)
         
         # Check if we got a successful response
         if experity_mapping is None:
@@ -26,9 +26,18 @@ from app.api.models import (
     DashboardServerInfo,
     DashboardVmInfo,
     DashboardStatistics,
+    FleetMetricsResponse,
 )
-from app.utils.resource_alerts import process_resource_alerts
+from app.utils.fleet_metrics import get_fleet_metrics
+from app.utils.heartbeat_state import (
+    resolve_heartbeat_metadata,
+    remember_heartbeat_metadata,
+    forget_heartbeat_metadata,
+    heartbeat_metadata_mode,
+)
+from app.utils.metrics import HEARTBEATS
 from app.api.database import (
+    get_heartbeat_metadata_state,
     save_server_health,
     get_server_health_by_server_id,
     get_vms_by_server_id,
@@ -114,10 +123,17 @@ async def server_heartbeat(
     - `status` (required): Server status: `healthy`, `unhealthy`, or `down`
     - `metadata` (optional): Metadata object with system metrics
       (e.g., cpuUsage, memoryUsage, diskUsage)
+    - `metadataDelta` (optional): Only the metrics that changed since the last
+      heartbeat, instead of `metadata`. A `null` value removes the key.
+      Requires `metadataVersion`.
+    - `metadataVersion` (optional): Metadata version counter, incremented on
+      every metadata change
 
     **Response:**
     Returns the updated server health record with `serverId`, `status`,
-    `lastHeartbeat`, and `metadata`.
+    `lastHeartbeat`, `metadata`, `metadataVersion` and `resyncRequired`.
+    When `resyncRequired` is true the delta was not applied; send the full
+    `metadata` on the next heartbeat.
     """
     conn = None
 
@@ -146,18 +162,39 @@ async def server_heartbeat(
                 ),
             )
 
+        # Get database connection
+        conn = get_db_connection()
+
+        # Resolve full or delta metadata against the last persisted state so
+        # the metadata column is only written when a metric actually changed
+        metadata_state = resolve_heartbeat_metadata(
+            "server",
+            heartbeat_data.serverId,
+            heartbeat_data.metadata,
+            heartbeat_data.metadataDelta,
+            heartbeat_data.metadataVersion,
+            lambda: get_heartbeat_metadata_state(conn, "server", heartbeat_data.serverId),
+        )
+
         # Prepare server health data
         server_health_dict: Dict[str, Any] = {
             "server_id": heartbeat_data.serverId,
             "status": heartbeat_data.status,
-            "metadata": heartbeat_data.metadata,
+            **metadata_state["updates"],
         }
 
-        # Get database connection
-        conn = get_db_connection()
-
         # Save/update the server health record
         saved_server_health = save_server_health(conn, server_health_dict)
+        remember_heartbeat_metadata(
+            "server",
+            saved_server_health["server_id"],
+            saved_server_health.get("metadata_version"),
+            saved_server_health.get("metadata"),
+        )
+        HEARTBEATS.labels(
+            kind="server",
+            metadata=heartbeat_metadata_mode(heartbeat_data.metadata, heartbeat_data.metadataDelta),
+        ).inc()
 
         # Propagate "bad" server states down to its VMs so VM/Server health stay in sync
         try:
@@ -173,27 +210,6 @@ async def server_heartbeat(
                 f"(server_id={saved_server_health.get('server_id')}): {str(e)}"
             )
 
-        # Check resource thresholds and create/resolve alerts if needed
-        try:
-            metadata = heartbeat_data.metadata
-            if metadata:
-                alert_results = process_resource_alerts(
-                    conn,
-                    heartbeat_data.serverId,
-                    metadata
-                )
-                if alert_results['created'] > 0 or alert_results['resolved'] > 0:
-                    logger.info(
-                        f"Resource alerts processed for {heartbeat_data.serverId}: "
-                        f"created={alert_results['created']}, "
-                        f"resolved={alert_results['resolved']}"
-                    )
-        except Exception as e:
-            # Log but don't fail the heartbeat if alert processing fails
-            logger.warning(
-                f"Failed to process resource alerts for {heartbeat_data.serverId}: {str(e)}"
-            )
-
         # Format the response - pass data using field names (camelCase)
         # The model will accept both field names and aliases due to
         # populate_by_name=True
@@ -202,6 +218,8 @@ async def server_heartbeat(
             "status": saved_server_health["status"],
             "lastHeartbeat": saved_server_health["last_heartbeat"],
             "metadata": saved_server_health.get("metadata"),
+            "metadataVersion": saved_server_health.get("metadata_version"),
+            "resyncRequired": metadata_state["resync_required"],
         }
 
         # Create response model and serialize with by_alias=False
@@ -287,7 +305,8 @@ async def patch_server_health(
     **Request Body (all fields optional):**
     - `status` (optional): Server status: `healthy`, `unhealthy`, or `down`
     - `metadata` (optional): Metadata object with system metrics
-      (e.g., cpuUsage, memoryUsage, diskUsage)
+      (e.g., cpuUsage, memoryUsage, diskUsage). Keys are merged into the
+      stored metadata; keys not sent are kept. Send `null` to clear metadata.
 
     **Response:**
     Returns the updated server health record with `serverId`, `status`,
@@ -298,16 +317,6 @@ async def patch_server_health(
     conn = None
 
     try:
-        # Check if server exists
-        conn = get_db_connection()
-        existing_server = get_server_health_by_server_id(conn, serverId)
-        
-        if not existing_server:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Server with ID '{serverId}' not found."
-            )
-
         # Validate status if provided
         if "status" in update_data and update_data["status"]:
             valid_statuses = ["healthy", "unhealthy", "down"]
@@ -320,26 +329,33 @@ async def patch_server_health(
                     ),
                 )
 
-        # Prepare update data - only include fields that are provided
+        # Prepare update data - only include fields that are provided.
+        # Unprovided fields keep their stored values and metadata is merged in SQL.
         server_health_dict: Dict[str, Any] = {
             "server_id": serverId,
         }
-        
+
         if "status" in update_data:
             server_health_dict["status"] = update_data["status"]
-        else:
-            # Keep existing status if not provided
-            server_health_dict["status"] = existing_server["status"]
-        
+
         if "metadata" in update_data:
             server_health_dict["metadata"] = update_data["metadata"]
-        else:
-            # Keep existing metadata if not provided
-            server_health_dict["metadata"] = existing_server.get("metadata")
 
-        # Update the server health record (partial update)
+        conn = get_db_connection()
+
+        # Update the server health record (partial update, single statement)
         saved_server_health = update_server_health_partial(conn, server_health_dict)
 
+        if not saved_server_health:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Server with ID '{serverId}' not found."
+            )
+
+        # Metadata changed outside a heartbeat; drop this worker's cached copy
+        if "metadata" in server_health_dict:
+            forget_heartbeat_metadata("server", serverId)
+
         # Propagate "bad" server states down to its VMs so VM/Server health stay in sync
         try:
             sync_vms_from_server_status(
@@ -353,27 +369,6 @@ async def patch_server_health(
                 f"(server_id={saved_server_health.get('server_id')}): {str(e)}"
             )
 
-        # Check resource thresholds and create/resolve alerts if needed
-        try:
-            metadata = server_health_dict.get("metadata")
-            if metadata:
-                alert_results = process_resource_alerts(
-                    conn,
-                    serverId,
-                    metadata
-                )
-                if alert_results['created'] > 0 or alert_results['resolved'] > 0:
-                    logger.info(
-                        f"Resource alerts processed for {serverId}: "
-                        f"created={alert_results['created']}, "
-                        f"resolved={alert_results['resolved']}"
-                    )
-        except Exception as e:
-            # Log but don't fail the update if alert processing fails
-            logger.warning(
-                f"Failed to process resource alerts for {serverId}: {str(e)}"
-            )
-
         # Format the response
         response_data: Dict[str, Any] = {
             "serverId": saved_server_health["server_id"],
@@ -1005,3 +1000,78 @@ async def get_health_dashboard(
         if conn:
             conn.close()
 
+
+
+@router.get(
+    "/fleet/metrics",
+    tags=["Server"],
+    summary="Get fleet capacity and throughput metrics",
+    description=(
+        "Aggregated throughput, mean processing time and idle ratio per VM, per server and "
+        "fleet-wide, plus queue depth by status. Backed by incrementally maintained counters, "
+        "so the call is cheap enough to poll. Heartbeats are rolled up about once a minute and "
+        "queue depth is recounted every few seconds. Uses X-API-Key authentication."
+    ),
+    response_model=FleetMetricsResponse,
+    status_code=200,
+    responses={
+        200: {"description": "Fleet metrics retrieved successfully"},
+        401: {"description": "X-API-Key header required or invalid"},
+        500: {"description": "Server error"},
+    },
+)
+async def get_fleet_metrics_endpoint(
+    windowMinutes: Optional[int] = Query(
+        None,
+        alias="windowMinutes",
+        ge=1,
+        le=1440,
+        description="Trailing window in minutes (default: FLEET_METRICS_WINDOW_MINUTES, 15)"
+    ),
+    current_client: TokenData = Depends(verify_server_api_key_auth),
+) -> FleetMetricsResponse:
+    """
+    Get fleet capacity and throughput metrics.
+
+    **Authentication:**
+    - Use `X-API-Key` header with your HMAC secret key
+    - Example: `X-API-Key: your-hmac-secret-key`
+
+    **Query Parameters:**
+    - `windowMinutes` (optional): Trailing window to aggregate, 1-1440 minutes
+
+    **Response:**
+    - `fleet`, `servers`, `vms`: completed/failed encounters, `throughputPerMinute`,
+      `meanProcessingSeconds`, `idleRatio` (share of idle heartbeats) and heartbeat count
+    - `queueDepth`: current number of queue entries per status
+    """
+    conn = None
+
+    try:
+        conn = get_db_connection()
+        metrics = get_fleet_metrics(conn, window_minutes=windowMinutes)
+
+        metrics_response = FleetMetricsResponse(**metrics)
+        response_dict = metrics_response.model_dump(by_alias=False)
+
+        return JSONResponse(content=response_dict, status_code=200)
+
+    except HTTPException:
+        raise
+    except psycopg2.Error as e:
+        if conn:
+            conn.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+    finally:
+        if conn:
+            conn.close()
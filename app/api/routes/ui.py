@@ -26,7 +26,8 @@ from app.api.routes.dependencies import (
     use_remote_api_for_reads,
     fetch_remote_patients,
     filter_patients_by_search,
-    get_local_patients,
+    filter_within_24h,
+    get_local_patients_page,
     fetch_locations,
 )
 
@@ -96,6 +97,11 @@ async def root(
     
     normalized_location_id = resolve_location_id(locationId, required=False)
     
+    # The 'active' shortcut also limits the queue to the last 24 hours
+    is_active_filter = statuses is not None and any(
+        s.strip().lower() == "active" for s in statuses if isinstance(s, str)
+    )
+    
     if statuses is None:
         normalized_statuses = DEFAULT_STATUSES.copy()
     else:
@@ -131,10 +137,20 @@ async def root(
                 # Fall through to local database path below
             
             if use_remote_reads:
+                if is_active_filter:
+                    all_patients = filter_within_24h(all_patients)
+                
                 # Apply search filter if provided
                 if search_query:
                     all_patients = filter_patients_by_search(all_patients, search_query)
 
+                # Remote results are paginated in memory
+                total_count = len(all_patients)
+                total_pages = (total_count + page_size - 1) // page_size if total_count > 0 else 1
+                current_page = min(page, total_pages) if total_pages > 0 else 1
+                start_idx = (current_page - 1) * page_size
+                patients = all_patients[start_idx:start_idx + page_size]
+
                 # Location dropdown is limited to the current location in remote mode
                 locations = [
                     {
@@ -147,11 +163,16 @@ async def root(
                 conn = get_db_connection()
                 cursor = conn.cursor(cursor_factory=RealDictCursor)
                 try:
-                    all_patients = get_local_patients(cursor, normalized_location_id, normalized_statuses, None)
-                    
-                    # Apply search filter if provided
-                    if search_query:
-                        all_patients = filter_patients_by_search(all_patients, search_query)
+                    # Filtering, search and pagination run in the database
+                    patients, total_count, current_page = get_local_patients_page(
+                        cursor,
+                        normalized_location_id,
+                        normalized_statuses,
+                        search_query,
+                        page,
+                        page_size,
+                        within_24h=is_active_filter,
+                    )
                     
                     locations = fetch_locations(cursor)
                 finally:
@@ -161,26 +182,23 @@ async def root(
             conn = get_db_connection()
             cursor = conn.cursor(cursor_factory=RealDictCursor)
             try:
-                all_patients = get_local_patients(cursor, normalized_location_id, normalized_statuses, None)
-                
-                # Apply search filter if provided
-                if search_query:
-                    all_patients = filter_patients_by_search(all_patients, search_query)
+                # Filtering, search and pagination run in the database
+                patients, total_count, current_page = get_local_patients_page(
+                    cursor,
+                    normalized_location_id,
+                    normalized_statuses,
+                    search_query,
+                    page,
+                    page_size,
+                    within_24h=is_active_filter,
+                )
                 
                 locations = fetch_locations(cursor)
             finally:
                 cursor.close()
                 conn.close()
 
-        # Calculate pagination
-        total_count = len(all_patients)
         total_pages = (total_count + page_size - 1) // page_size if total_count > 0 else 1
-        current_page = min(page, total_pages) if total_pages > 0 else 1
-        
-        # Apply pagination
-        start_idx = (current_page - 1) * page_size
-        end_idx = start_idx + page_size
-        patients = all_patients[start_idx:end_idx]
 
         status_summary: Dict[str, int] = {}
         for patient in patients:
@@ -15,6 +15,7 @@ from app.api.routes.dependencies import (
     logger,
     require_auth,
 )
+from app.utils.metrics import VALIDATIONS
 
 router = APIRouter()
 
@@ -558,6 +559,10 @@ async def validate_emr_image(
 
             
 
+            outcome = str(validation_result.get("overall_status", "")).upper() if isinstance(validation_result, dict) else ""
+
+            VALIDATIONS.labels(outcome=outcome if outcome in ("PASS", "FAIL", "PARTIAL", "ERROR") else "OTHER").inc()
+
             return validation_result
 
             
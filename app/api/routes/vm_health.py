@@ -24,12 +24,20 @@ from app.api.routes.dependencies import (
     get_latest_vm_health,
 )
 from app.api.database import (
+    get_heartbeat_metadata_state,
     get_vm_health_by_vm_id,
     get_all_vms_health,
     update_vm_health_partial,
     sync_server_health_from_vms,
 )
 from app.utils.auth import verify_api_key_auth
+from app.utils.heartbeat_state import (
+    resolve_heartbeat_metadata,
+    remember_heartbeat_metadata,
+    forget_heartbeat_metadata,
+    heartbeat_metadata_mode,
+)
+from app.utils.metrics import HEARTBEATS
 
 router = APIRouter()
 
@@ -288,9 +296,15 @@ async def vm_heartbeat(
     - `processingQueueId` (optional): Queue ID that the VM is currently processing
     - `workflowStatus` (optional): AI Agent Workflow status (e.g., "running", "stopped", "error")
     - `metadata` (optional): Metadata object with system metrics (e.g., cpuUsage, memoryUsage, diskUsage)
+    - `metadataDelta` (optional): Only the metrics that changed since the last heartbeat, instead of `metadata`.
+      A `null` value removes the key. Requires `metadataVersion`.
+    - `metadataVersion` (optional): Metadata version counter, incremented on every metadata change.
+      A delta is applied only if it is exactly one version ahead of the stored metadata.
     
     **Response:**
-    Returns the updated VM health record with `success`, `vmId`, `serverId`, `lastHeartbeat`, `status`, and `workflowStatus`.
+    Returns the updated VM health record with `success`, `vmId`, `serverId`, `lastHeartbeat`, `status`, and `workflowStatus`,
+    plus `metadataVersion` and `resyncRequired`. When `resyncRequired` is true the delta was not applied;
+    send the full `metadata` (with the current version) on the next heartbeat.
     
     **Example Request:**
     ```json
@@ -332,6 +346,20 @@ async def vm_heartbeat(
                 detail=f"Invalid status: {heartbeat_data.status}. Must be one of: {', '.join(valid_statuses)}"
             )
         
+        # Get database connection
+        conn = get_db_connection()
+        
+        # Resolve full or delta metadata against the last persisted state so
+        # the metadata column is only written when a metric actually changed
+        metadata_state = resolve_heartbeat_metadata(
+            'vm',
+            heartbeat_data.vmId,
+            heartbeat_data.metadata,
+            heartbeat_data.metadataDelta,
+            heartbeat_data.metadataVersion,
+            lambda: get_heartbeat_metadata_state(conn, 'vm', heartbeat_data.vmId),
+        )
+        
         # Prepare VM health data
         vm_health_dict = {
             'vm_id': heartbeat_data.vmId,
@@ -339,14 +367,21 @@ async def vm_heartbeat(
             'status': heartbeat_data.status,
             'processing_queue_id': heartbeat_data.processingQueueId,
             'workflow_status': heartbeat_data.workflowStatus,
-            'metadata': heartbeat_data.metadata,
+            **metadata_state['updates'],
         }
         
-        # Get database connection
-        conn = get_db_connection()
-        
         # Save/update the VM health record
         saved_vm_health = save_vm_health(conn, vm_health_dict)
+        remember_heartbeat_metadata(
+            'vm',
+            saved_vm_health['vm_id'],
+            saved_vm_health.get('metadata_version'),
+            saved_vm_health.get('metadata'),
+        )
+        HEARTBEATS.labels(
+            kind='vm',
+            metadata=heartbeat_metadata_mode(heartbeat_data.metadata, heartbeat_data.metadataDelta),
+        ).inc()
 
         # Keep the parent server's aggregate health in sync with its VMs
         server_id = saved_vm_health.get('server_id')
@@ -369,6 +404,8 @@ async def vm_heartbeat(
             'lastHeartbeat': saved_vm_health['last_heartbeat'],
             'status': saved_vm_health['status'],
             'workflowStatus': saved_vm_health.get('workflow_status'),
+            'metadataVersion': saved_vm_health.get('metadata_version'),
+            'resyncRequired': metadata_state['resync_required'],
         }
         
         # Create response model and serialize with by_alias=False to output camelCase field names
@@ -456,7 +493,8 @@ async def patch_vm_health(
     - `status` (optional): VM status: `healthy`, `unhealthy`, or `idle`
     - `processingQueueId` (optional): Queue ID that the VM is currently processing
     - `workflowStatus` (optional): AI Agent Workflow status (e.g., "running", "stopped", "error")
-    - `metadata` (optional): Metadata object with system metrics (e.g., cpuUsage, memoryUsage, diskUsage)
+    - `metadata` (optional): Metadata keys to merge into the stored metadata (e.g., cpuUsage, memoryUsage, diskUsage).
+      Keys not sent are kept; send `null` to clear metadata.
     
     **Response:**
     Returns the updated VM health record with `success`, `vmId`, `serverId`, `lastHeartbeat`, `status`, and `workflowStatus`.
@@ -466,16 +504,6 @@ async def patch_vm_health(
     conn = None
     
     try:
-        # Check if VM exists
-        conn = get_db_connection()
-        existing_vm = get_vm_health_by_vm_id(conn, vmId)
-        
-        if not existing_vm:
-            raise HTTPException(
-                status_code=404,
-                detail=f"VM with ID '{vmId}' not found."
-            )
-        
         # Validate status if provided
         if "status" in update_data and update_data["status"]:
             valid_statuses = ['healthy', 'unhealthy', 'idle']
@@ -484,22 +512,38 @@ async def patch_vm_health(
                     status_code=400,
                     detail=f"Invalid status: {update_data['status']}. Must be one of: {', '.join(valid_statuses)}"
                 )
-        
-        # Prepare update data - only include fields that are provided
+
+        # Prepare update data - only include fields that are provided.
+        # Unprovided fields keep their stored values and metadata is merged in SQL.
         vm_health_dict = {
             'vm_id': vmId,
         }
-        
-        # Use provided values or keep existing ones
-        vm_health_dict['server_id'] = update_data.get('serverId') if 'serverId' in update_data else existing_vm.get('server_id')
-        vm_health_dict['status'] = update_data.get('status') if 'status' in update_data else existing_vm.get('status')
-        vm_health_dict['processing_queue_id'] = update_data.get('processingQueueId') if 'processingQueueId' in update_data else existing_vm.get('processing_queue_id')
-        vm_health_dict['workflow_status'] = update_data.get('workflowStatus') if 'workflowStatus' in update_data else existing_vm.get('workflow_status')
-        vm_health_dict['metadata'] = update_data.get('metadata') if 'metadata' in update_data else existing_vm.get('metadata')
-        
-        # Update the VM health record (partial update)
+        field_map = {
+            'serverId': 'server_id',
+            'status': 'status',
+            'processingQueueId': 'processing_queue_id',
+            'workflowStatus': 'workflow_status',
+            'metadata': 'metadata',
+        }
+        for request_key, column in field_map.items():
+            if request_key in update_data:
+                vm_health_dict[column] = update_data[request_key]
+
+        conn = get_db_connection()
+
+        # Update the VM health record (partial update, single statement)
         saved_vm_health = update_vm_health_partial(conn, vm_health_dict)
 
+        if not saved_vm_health:
+            raise HTTPException(
+                status_code=404,
+                detail=f"VM with ID '{vmId}' not found."
+            )
+
+        # Metadata changed outside a heartbeat; drop this worker's cached copy
+        if 'metadata' in vm_health_dict:
+            forget_heartbeat_metadata('vm', vmId)
+
         # Keep the parent server's aggregate health in sync with its VMs
         server_id = saved_vm_health.get('server_id')
         if server_id:
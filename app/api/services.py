@@ -9,13 +9,23 @@ This module contains business logic functions that orchestrate operations:
 """
 
 import json
-from typing import Optional, Dict, Any, List
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime, timedelta
 
 # Import utility functions
 from app.api.utils import normalize_status, parse_datetime, expand_status_shortcuts
 # Import database functions
-from app.api.database import fetch_confirmed_records, fetch_pending_records
+from app.api.database import (
+    fetch_confirmed_records,
+    fetch_pending_records,
+    fetch_dashboard_records,
+    count_dashboard_records,
+    fetch_dashboard_fingerprint,
+    fetch_patient_changes,
+    search_patient_records,
+)
+from app.utils.pagination import encode_keyset_cursor, decode_keyset_cursor
 
 
 def format_encounter_response(record: Dict[str, Any]) -> Dict[str, Any]:
@@ -125,6 +135,10 @@ def format_queue_response(record: Dict[str, Any]) -> Dict[str, Any]:
         'updated_at': updated_at_str,  # Add updated_at timestamp
     }
     
+    # Trace id of the request that created the entry (only present when tracing was on)
+    if record.get('trace_id'):
+        formatted['trace_id'] = record['trace_id']
+    
     return formatted
 
 
@@ -157,17 +171,28 @@ def format_summary_response(record: Dict[str, Any]) -> Dict[str, Any]:
     return formatted
 
 
-def build_patient_payload(record: Dict[str, Any]) -> Dict[str, Any]:
-    """Build patient response payload in normalized structure with camelCase field names."""
+PATIENT_DATETIME_FIELDS = ("capturedAt", "createdAt", "updatedAt")
+
+
+def serialize_patient_datetimes(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Format the datetime fields of a patient payload as ISO 8601 strings (in place)."""
+    for field in PATIENT_DATETIME_FIELDS:
+        value = payload.get(field)
+        if isinstance(value, datetime):
+            payload[field] = value.isoformat()
+    return payload
+
+
+def build_patient_payload(record: Dict[str, Any], keep_datetimes: bool = False) -> Dict[str, Any]:
+    """Build patient response payload in normalized structure with camelCase field names.
+
+    With keep_datetimes, capturedAt/createdAt/updatedAt stay datetime objects
+    for sorting, filtering and display formatting; the caller formats them
+    once with serialize_patient_datetimes.
+    """
     captured = record.get("captured_at")
-    if isinstance(captured, datetime):
-        captured = captured.isoformat()
     created = record.get("created_at")
-    if isinstance(created, datetime):
-        created = created.isoformat()
     updated = record.get("updated_at")
-    if isinstance(updated, datetime):
-        updated = updated.isoformat()
     raw_payload = record.get("raw_payload")
 
     payload = {
@@ -192,7 +217,15 @@ def build_patient_payload(record: Dict[str, Any]) -> Dict[str, Any]:
     if status:
         payload["status"] = status
 
-    return payload
+    if keep_datetimes:
+        return payload
+    return serialize_patient_datetimes(payload)
+
+
+@lru_cache(maxsize=4096)
+def _format_captured_display(captured_minute: datetime) -> str:
+    # Minute resolution, so polls and pages of the same patients reuse the string
+    return captured_minute.strftime("%b %d, %Y %I:%M %p").lstrip("0").replace(" 0", " ")
 
 
 def decorate_patient_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -206,9 +239,10 @@ def decorate_patient_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
 
     captured_display = None
     captured_raw = payload.get("capturedAt") or payload.get("captured_at")
-    captured_dt = parse_datetime(captured_raw)
+    # Payloads built with keep_datetimes skip parsing; remote payloads carry strings
+    captured_dt = captured_raw if isinstance(captured_raw, datetime) else parse_datetime(captured_raw)
     if captured_dt > datetime.min:
-        captured_display = captured_dt.strftime("%b %d, %Y %I:%M %p").lstrip("0").replace(" 0", " ")
+        captured_display = _format_captured_display(captured_dt.replace(second=0, microsecond=0))
     payload["captured_display"] = captured_display
 
     return payload
@@ -228,28 +262,28 @@ def prepare_dashboard_patients(
         cursor,
         location_id,
         limit,
+        statuses=selected,
     )
     for record in confirmed_records:
-        payload = build_patient_payload(record)
-        status = normalize_status(payload.get("status")) or "confirmed"
+        payload = build_patient_payload(record, keep_datetimes=True)
+        status = record.get("effective_status") or normalize_status(payload.get("status")) or "confirmed"
         payload["status"] = status
         if selected_set and status not in selected_set:
             continue
         payload["source"] = "confirmed"
-        results.append(decorate_patient_payload(payload))
+        results.append(payload)
 
-    # Sort by capturedAt descending then updatedAt
+    # Sort by capturedAt descending then updatedAt, on the datetimes from the database
     def sort_key(item: Dict[str, Any]):
-        captured = parse_datetime(item.get("capturedAt") or item.get("captured_at"))
-        updated = parse_datetime(item.get("updatedAt") or item.get("updated_at"))
-        return (captured, updated)
+        return (item.get("capturedAt") or datetime.min, item.get("updatedAt") or datetime.min)
 
     results.sort(key=sort_key, reverse=True)
 
     if limit is not None:
         results = results[:limit]
 
-    return results
+    # Display fields and ISO strings only for the rows that are returned
+    return [serialize_patient_datetimes(decorate_patient_payload(payload)) for payload in results]
 
 
 def fetch_pending_payloads(
@@ -260,17 +294,17 @@ def fetch_pending_payloads(
 ) -> List[Dict[str, Any]]:
     selected = [normalize_status(status) for status in statuses if normalize_status(status)]
     selected_set = set(selected)
-    records = fetch_pending_records(cursor, location_id, None)
+    records = fetch_pending_records(cursor, location_id, limit, statuses=selected)
     payloads: List[Dict[str, Any]] = []
 
     for record in records:
-        payload = build_patient_payload(record)
-        status = normalize_status(payload.get("status")) or normalize_status(record.get("status")) or "checked_in"
+        payload = build_patient_payload(record, keep_datetimes=True)
+        status = record.get("effective_status") or normalize_status(payload.get("status")) or normalize_status(record.get("status")) or "checked_in"
         if selected_set and status not in selected_set:
             continue
         payload["status"] = status
         payload["source"] = "pending"
-        payloads.append(decorate_patient_payload(payload))
+        payloads.append(serialize_patient_datetimes(decorate_patient_payload(payload)))
         if limit is not None and len(payloads) >= limit:
             break
 
@@ -320,71 +354,223 @@ def filter_patients_by_search(
     return filtered
 
 
+def _dashboard_filters(
+    statuses: List[str],
+    search_query: Optional[str],
+    within_24h: bool,
+) -> Dict[str, Any]:
+    selected = [normalize_status(status) for status in statuses if normalize_status(status)]
+    search = search_query.strip() if search_query else None
+    return {
+        "statuses": list(dict.fromkeys(selected)),
+        "search": search or None,
+        "captured_since": datetime.now() - timedelta(hours=24) if within_24h else None,
+    }
+
+
+def build_dashboard_payload(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a decorated patient payload from a fetch_dashboard_records row."""
+    payload = build_patient_payload(record, keep_datetimes=True)
+    payload["status"] = record.get("status")
+    payload["source"] = record.get("source")
+    return serialize_patient_datetimes(decorate_patient_payload(payload))
+
+
 def get_local_patients(
     cursor,
     location_id: Optional[str],
     statuses: List[str],
     limit: Optional[int],
+    search_query: Optional[str] = None,
+    within_24h: bool = False,
 ) -> List[Dict[str, Any]]:
     """
     Gather patient payloads from the local database (confirmed + pending) to
     mirror the remote API shape.
+
+    Filtering, ordering and the limit are applied by the database.
     """
-    confirmed = prepare_dashboard_patients(cursor, location_id, statuses, None)
-    pending = fetch_pending_payloads(cursor, location_id, statuses, None)
+    filters = _dashboard_filters(statuses, search_query, within_24h)
+    records = fetch_dashboard_records(cursor, location_id, limit=limit, **filters)
+    return [build_dashboard_payload(record) for record in records]
 
-    combined = confirmed + pending
 
-    def sort_key(item: Dict[str, Any]):
-        captured = parse_datetime(item.get("capturedAt") or item.get("captured_at"))
-        updated = parse_datetime(item.get("updatedAt") or item.get("updated_at"))
-        return (captured, updated)
+def get_local_patients_page(
+    cursor,
+    location_id: Optional[str],
+    statuses: List[str],
+    search_query: Optional[str],
+    page: int,
+    page_size: int,
+    within_24h: bool = False,
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    Fetch one dashboard page of local patients (confirmed + pending).
 
-    combined.sort(key=sort_key, reverse=True)
+    The matching rows are counted first so that a page past the end is clamped
+    to the last page, then only that page is read.
+
+    Returns:
+        Tuple of (patient payloads, total matching count, current page)
+    """
+    filters = _dashboard_filters(statuses, search_query, within_24h)
+    total_count = count_dashboard_records(cursor, location_id, **filters)
+    total_pages = (total_count + page_size - 1) // page_size if total_count > 0 else 1
+    current_page = min(page, total_pages)
+
+    if total_count == 0:
+        return [], 0, current_page
+
+    records = fetch_dashboard_records(
+        cursor,
+        location_id,
+        limit=page_size,
+        offset=(current_page - 1) * page_size,
+        **filters,
+    )
+    return [build_dashboard_payload(record) for record in records], total_count, current_page
+
+
+def encode_sync_position(position: Tuple[datetime, str, int]) -> str:
+    """Encode an (updated_at, source, id) sync position as an opaque `since` cursor."""
+    updated_at, source, row_id = position
+    return encode_keyset_cursor(updated_at, f"{source}:{row_id}")
+
+
+def decode_sync_position(since: str) -> Tuple[datetime, str, int]:
+    """
+    Decode a `since` value: a cursor from encode_sync_position, or an ISO 8601
+    timestamp (every change at or after that time).
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    try:
+        return datetime.fromisoformat(since.replace("Z", "+00:00")).replace(tzinfo=None), "", 0
+    except ValueError:
+        pass
+    updated_at, row_key = decode_keyset_cursor(since, uuid_id=False)
+    source, _, row_id = row_key.partition(":")
+    if source not in ("", "confirmed", "pending") or not row_id.isdigit():
+        raise ValueError(f"Invalid cursor: {since}")
+    return updated_at, source, int(row_id)
+
+
+def build_patient_tombstone(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the sync entry of a patient that no longer matches the requested filters."""
+    payload = build_patient_payload(record)
+    return {
+        "emrId": payload.get("emrId"),
+        "bookingId": payload.get("bookingId"),
+        "locationId": payload.get("locationId"),
+        "updatedAt": payload.get("updatedAt"),
+        "status": record.get("status"),
+        "source": record.get("source"),
+        "deleted": True,
+    }
 
-    if limit is not None:
-        combined = combined[:limit]
 
-    return combined
+def get_local_patients_fingerprint(
+    cursor,
+    location_id: Optional[str],
+    statuses: List[str],
+    within_24h: bool = False,
+) -> Tuple[int, Optional[datetime], datetime]:
+    """
+    Summarize the patients get_local_patients would return (count, latest
+    updated_at) without reading them, for the ETag of GET /patients.
+
+    Returns:
+        Tuple of (matching count, latest updated_at, database time of the read)
+    """
+    filters = _dashboard_filters(statuses, None, within_24h)
+    return fetch_dashboard_fingerprint(cursor, location_id, **filters)
+
+
+def get_patient_changes(
+    cursor,
+    location_id: Optional[str],
+    statuses: List[str],
+    after: Tuple[datetime, str, int],
+    limit: Optional[int],
+    within_24h: bool = False,
+    settle_seconds: float = 0,
+) -> Tuple[List[Dict[str, Any]], Tuple[datetime, str, int]]:
+    """
+    Gather the local patients changed after a sync position, oldest change first.
+
+    Changed patients matching the status filter (and the 24h window) are
+    returned as full payloads. Changed patients that no longer match, e.g.
+    after moving to a status that was not requested, are returned as
+    tombstones with `deleted: true`.
+
+    Returns:
+        Tuple of (payloads and tombstones, position to resume from)
+    """
+    filters = _dashboard_filters(statuses, None, within_24h)
+    selected = set(filters["statuses"])
+    captured_since = filters["captured_since"]
+
+    records = fetch_patient_changes(cursor, location_id, after, settle_seconds, limit)
+    payloads: List[Dict[str, Any]] = []
+    for record in records:
+        shown_at = record.get("captured_at") or record.get("created_at")
+        matches = (not selected or record.get("status") in selected) and (
+            captured_since is None or (shown_at is not None and shown_at >= captured_since)
+        )
+        payloads.append(build_dashboard_payload(record) if matches else build_patient_tombstone(record))
+
+    if not records:
+        return payloads, after
+    last = records[-1]
+    return payloads, (last["updated_at"], last["source"], last["id"])
+
+
+MATCH_TYPES = {0: "exact", 1: "prefix", 2: "contains"}
+
+
+def search_patients(
+    cursor,
+    search_query: str,
+    location_id: Optional[str],
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """
+    Typeahead search over local patients (confirmed + pending), best match first.
+
+    Each payload carries its `source`, `matchType` (exact, prefix or contains)
+    and, when pg_trgm is installed, a similarity `score`.
+    """
+    results: List[Dict[str, Any]] = []
+    for record in search_patient_records(cursor, search_query, location_id, limit):
+        payload = build_patient_payload(record)
+        payload["status"] = record.get("status")
+        payload["source"] = record.get("source")
+        payload["matchType"] = MATCH_TYPES.get(record.get("match_rank"), "contains")
+        if record.get("score") is not None:
+            payload["score"] = round(float(record["score"]), 4)
+        results.append(payload)
+    return results
 
 
 def filter_within_24h(patients: list) -> list:
-    """Filter patients to only include those captured within the last 24 hours."""
+    """Filter patients to only include those captured within the last 24 hours.
+
+    Patients without captured_at fall back to created_at. Each timestamp is
+    parsed at most once (not at all when it is already a datetime).
+    """
     cutoff = datetime.now() - timedelta(hours=24)
-    
+
     filtered = []
     for patient in patients:
-        captured_at = patient.get("captured_at") or patient.get("capturedAt")
-        if captured_at:
-            if isinstance(captured_at, str):
-                # Parse ISO format timestamp
-                try:
-                    ts = captured_at.replace("Z", "+00:00")
-                    captured_dt = datetime.fromisoformat(ts).replace(tzinfo=None)
-                except ValueError:
-                    captured_dt = None
-            elif isinstance(captured_at, datetime):
-                captured_dt = captured_at.replace(tzinfo=None) if captured_at.tzinfo else captured_at
-            else:
-                captured_dt = None
-            
-            if captured_dt and captured_dt >= cutoff:
-                filtered.append(patient)
         # If no captured_at, check created_at as fallback
-        else:
-            created_at = patient.get("created_at") or patient.get("createdAt")
-            if created_at:
-                if isinstance(created_at, str):
-                    try:
-                        ts = created_at.replace("Z", "+00:00")
-                        created_dt = datetime.fromisoformat(ts).replace(tzinfo=None)
-                    except ValueError:
-                        created_dt = None
-                elif isinstance(created_at, datetime):
-                    created_dt = created_at.replace(tzinfo=None) if created_at.tzinfo else created_at
-                else:
-                    created_dt = None
-                
-                if created_dt and created_dt >= cutoff:
-                    filtered.append(patient)
+        timestamp = (
+            patient.get("captured_at") or patient.get("capturedAt")
+            or patient.get("created_at") or patient.get("createdAt")
+        )
+        if not timestamp:
+            continue
+        timestamp = timestamp if isinstance(timestamp, datetime) else parse_datetime(timestamp)
+        if timestamp.replace(tzinfo=None) >= cutoff:
+            filtered.append(patient)
     return filtered
@@ -28,6 +28,13 @@ try:
 except ImportError:
     HTTPX_AVAILABLE = False
 
+from app.utils.remote_reads import cached_remote_read, get_remote_http_client
+from app.utils.locations import (
+    cache_location_directory,
+    get_cached_location_directory,
+    merge_location_directory,
+)
+
 
 def normalize_status(value: Optional[str]) -> Optional[str]:
     if not value:
@@ -65,6 +72,10 @@ STATUS_SHORTCUTS = {
     "active": ACTIVE_STATUSES,
 }
 
+# GET /patients?since=... holds back rows updated in the last N seconds, so a
+# transaction that commits late cannot land behind a cursor already returned
+PATIENT_SYNC_SETTLE_SECONDS = float(os.getenv("PATIENT_SYNC_SETTLE_SECONDS", "5"))
+
 
 def expand_status_shortcuts(statuses: List[str]) -> List[str]:
     """Expand status shortcuts like 'active' to their constituent statuses."""
@@ -147,48 +158,19 @@ def use_remote_api_for_reads() -> bool:
 
 def fetch_locations(cursor) -> List[Dict[str, Optional[str]]]:
     """
-    Fetch locations from database.
-    Merges entries with the same location_id (prefers the one with a name).
+    Fetch the location directory for the location dropdown.
+
+    Reads the trigger-maintained locations table merged with the static
+    LOCATION_MAP, cached in-process for LOCATIONS_CACHE_SECONDS.
     Shows all locations (no restrictions).
     """
-    cursor.execute(
-        """
-        SELECT DISTINCT
-            location_id,
-            location_name
-        FROM (
-            SELECT location_id, location_name FROM pending_patients WHERE location_id IS NOT NULL
-            UNION
-            SELECT location_id, location_name FROM patients WHERE location_id IS NOT NULL
-        ) AS combined
-        ORDER BY location_name NULLS LAST, location_id
-        """
-    )
-    rows = cursor.fetchall()
-    
-    # Merge entries with the same location_id (prefer the one with a name)
-    location_map: Dict[str, Optional[str]] = {}
-    for row in rows:
-        loc_id = row.get("location_id")
-        if not loc_id:
-            continue
-        
-        loc_name = row.get("location_name")
-        
-        # If we haven't seen this location_id, or if current row has a name and stored one doesn't
-        if loc_id not in location_map or (loc_name and not location_map[loc_id]):
-            location_map[loc_id] = loc_name
-    
-    # Convert to list format
-    locations: List[Dict[str, Optional[str]]] = []
-    for loc_id, loc_name in sorted(location_map.items()):
-        locations.append(
-            {
-                "location_id": loc_id,
-                "location_name": loc_name,
-            }
-        )
-    
+    locations = get_cached_location_directory()
+    if locations is not None:
+        return locations
+
+    cursor.execute("SELECT location_id, location_name FROM locations")
+    locations = merge_location_directory(cursor.fetchall())
+    cache_location_directory(locations)
     return locations
 
 
@@ -201,6 +183,8 @@ async def fetch_remote_patients(
     Fetch patient queue data from the remote production API instead of the local DB.
 
     Uses API_URL /patients endpoint with the same query parameters that this API exposes.
+    Requests go through a shared pooled client and a short-lived cache with
+    stale-while-revalidate (see app.utils.remote_reads).
     """
     if not HTTPX_AVAILABLE:
         raise HTTPException(status_code=500, detail="httpx is required for remote API reads")
@@ -219,46 +203,52 @@ async def fetch_remote_patients(
     if limit is not None:
         params["limit"] = limit
 
-    api_key = os.getenv("API_KEY")
-    api_token = os.getenv("API_TOKEN")
-
-    headers: Dict[str, str] = {"Content-Type": "application/json"}
-
-    # Prefer API key if present; otherwise use token / auto-token
-    if api_key:
-        headers["X-API-Key"] = api_key
-    else:
-        if not api_token:
-            # Auto-fetch token using same helper as monitor/api_client
-            from app.utils.api_client import get_api_token
-            token = await get_api_token(api_base_url)
-            api_token = token or ""
-        if api_token:
-            headers["Authorization"] = f"Bearer {api_token}"
-
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:  # type: ignore[attr-defined]
+    async def load() -> List[Dict[str, Any]]:
+        api_key = os.getenv("API_KEY")
+        api_token = os.getenv("API_TOKEN")
+
+        headers: Dict[str, str] = {"Content-Type": "application/json"}
+
+        # Prefer API key if present; otherwise use token / auto-token
+        if api_key:
+            headers["X-API-Key"] = api_key
+        else:
+            if not api_token:
+                # Auto-fetch token using same helper as monitor/api_client
+                from app.utils.api_client import get_api_token
+                token = await get_api_token(api_base_url)
+                api_token = token or ""
+            if api_token:
+                headers["Authorization"] = f"Bearer {api_token}"
+
+        try:
+            client = get_remote_http_client()
             response = await client.get(url, params=params, headers=headers)
 
-        if response.status_code != 200:
-            detail = None
-            try:
-                data = response.json()
-                detail = data.get("detail")
-            except Exception:
-                pass
-            msg = detail or f"Remote API returned {response.status_code}"
-            raise HTTPException(status_code=502, detail=msg)
-
-        data = response.json()
-        if not isinstance(data, list):
-            raise HTTPException(status_code=502, detail="Remote API /patients response is not a list")
-
-        # Data should already be in PatientPayload shape; normalize minimally
-        return data
-
-    except httpx.TimeoutException:  # type: ignore[attr-defined]
-        raise HTTPException(status_code=504, detail="Remote API request timed out")
-    except httpx.RequestError as e:  # type: ignore[attr-defined]
-        raise HTTPException(status_code=502, detail=f"Error calling remote API: {e}")
+            if response.status_code != 200:
+                detail = None
+                try:
+                    data = response.json()
+                    detail = data.get("detail")
+                except Exception:
+                    pass
+                msg = detail or f"Remote API returned {response.status_code}"
+                raise HTTPException(status_code=502, detail=msg)
+
+            data = response.json()
+            if not isinstance(data, list):
+                raise HTTPException(status_code=502, detail="Remote API /patients response is not a list")
+
+            # Data should already be in PatientPayload shape; normalize minimally
+            return data
+
+        except httpx.TimeoutException:  # type: ignore[attr-defined]
+            raise HTTPException(status_code=504, detail="Remote API request timed out")
+        except httpx.RequestError as e:  # type: ignore[attr-defined]
+            raise HTTPException(status_code=502, detail=f"Error calling remote API: {e}")
+
+    # Identical reads within the cache window (e.g. several dashboard tabs) share one upstream call
+    cache_key = (url, location_id, tuple(statuses or ()), limit)
+    patients = await cached_remote_read(cache_key, load)
+    return list(patients)
 
@@ -599,28 +599,22 @@ async def save_patient_data(data) -> Optional[int]:
         if data.get('emr_id'):
             print("   📎 EMR ID available, sending to API")
             
+            api_error = None
             if use_api and HTTPX_AVAILABLE:
                 print("   📡 Sending patient data to API...")
                 api_success = await send_patient_to_api(data)
                 if api_success:
                     print("   ✅ Patient data successfully sent to API")
-                    # Mark as completed in database if enabled
-                    if pending_id and use_database and DB_AVAILABLE:
-                        mark_pending_patient_status(pending_id, 'completed')
                 else:
                     print("   ⚠️  Failed to send to API")
-                    if pending_id and use_database and DB_AVAILABLE:
-                        mark_pending_patient_status(pending_id, 'error', 'Failed to send to API')
+                    api_error = 'Failed to send to API'
             elif use_api and not HTTPX_AVAILABLE:
                 print("   ⚠️  API saving requested but httpx not available. Install with: pip install httpx")
             
-            # Also save to database (if enabled) - secondary to API
-            if use_database and DB_AVAILABLE:
-                saved = save_patient_to_db(data, on_conflict='update')
-                if saved and pending_id:
-                    mark_pending_patient_status(pending_id, 'completed')
-                elif pending_id:
-                    mark_pending_patient_status(pending_id, 'error', 'Failed to upsert into patients table')
+            # The pending row already has the EMR ID; the patient promotion job
+            # copies it into the patients table (see app.utils.patient_promotion)
+            if pending_id and use_database and DB_AVAILABLE:
+                mark_pending_patient_status(pending_id, 'ready', api_error)
         else:
             # No EMR ID yet - mark as pending in database if enabled
             if pending_id and use_database and DB_AVAILABLE:
@@ -801,6 +795,7 @@ async def setup_form_monitor(page, location_id, location_name):
             use_database = str_to_bool(os.getenv('USE_DATABASE', 'true'))
             use_api = str_to_bool(os.getenv('USE_API', 'true'))
             pending_id = patient_data.get('pending_id')
+            api_error = None
             
             # Try to find pending_id from database if not in patient_data and database is enabled
             if not pending_id and use_database and DB_AVAILABLE:
@@ -823,34 +818,23 @@ async def setup_form_monitor(page, location_id, location_name):
                 api_success = await send_patient_to_api(patient_data)
                 if api_success:
                     print(f"   ✅ Patient data successfully sent to API (EMR ID: {patient_data.get('emr_id')})")
-                    # Mark as completed in database if enabled
-                    if pending_id and use_database and DB_AVAILABLE:
-                        mark_pending_patient_status(pending_id, 'completed')
                 else:
                     print(f"   ⚠️  Failed to send to API")
-                    if pending_id and use_database and DB_AVAILABLE:
-                        mark_pending_patient_status(pending_id, 'error', 'Failed to send to API')
+                    api_error = 'Failed to send to API'
             elif use_api and not HTTPX_AVAILABLE:
                 print(f"   ⚠️  API saving requested but httpx not available. Install with: pip install httpx")
             else:
                 print(f"   ⚠️  API sending disabled (USE_API={use_api})")
             print(f"{'='*60}\n")
             
-            # Update pending record in database if enabled (secondary to API)
+            # Record the EMR ID on the pending row (secondary to API); the patient
+            # promotion job copies ready rows into the patients table
             if use_database and DB_AVAILABLE and pending_id:
-                updated = update_pending_patient_record(patient_data, status='ready')
-                if not updated:
+                updated = update_pending_patient_record(patient_data, status='ready', error_message=api_error)
+                if updated:
+                    print(f"   ✅ Pending patient ready for promotion (pending_id={pending_id})")
+                else:
                     print(f"   ⚠️  Failed to update pending patient (pending_id={pending_id}) with EMR ID")
-            
-            # Also save to database (if enabled)
-            if use_database and DB_AVAILABLE:
-                saved = save_patient_to_db(patient_data, on_conflict='update')
-                if saved and pending_id:
-                    mark_pending_patient_status(pending_id, 'completed')
-                    print(f"   ✅ Pending patient promoted to patients table (pending_id={pending_id})")
-                elif pending_id:
-                    mark_pending_patient_status(pending_id, 'error', 'Failed to upsert into patients table after EMR assignment')
-                    print(f"   ❌ Failed to insert pending patient into patients table (pending_id={pending_id})")
 
         except Exception as e:
             pending_id = patient_data.get('pending_id')
@@ -1207,13 +1191,14 @@ async def setup_form_monitor(page, location_id, location_name):
                                 elif use_api and not HTTPX_AVAILABLE:
                                     print(f"   ⚠️  API saving requested but httpx not available")
                                 
-                                # Also save to database (if enabled)
+                                # Also record a pending row (if enabled); the patient promotion
+                                # job copies it into the patients table
                                 use_database = str_to_bool(os.getenv('USE_DATABASE', 'true'))
                                 if use_database and DB_AVAILABLE:
                                     try:
-                                        saved = save_patient_to_db(patient_data_for_api, on_conflict='update')
-                                        if saved:
-                                            print(f"   ✅ Patient data also saved to database")
+                                        pending_id = persist_pending_patient(patient_data_for_api)
+                                        if pending_id:
+                                            print(f"   ✅ Patient data also saved to database (pending_id={pending_id})")
                                         else:
                                             print(f"   ⚠️  Failed to save to database")
                                     except Exception as e:
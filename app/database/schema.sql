@@ -498,9 +498,34 @@ CREATE TRIGGER update_queue_validations_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Alerts are range partitioned by month on created_at (alerts_pYYYYMM), with a
+-- DEFAULT partition for timestamps outside the created months. Recent-alert
+-- lookups filter on created_at and only touch the newest partitions; old,
+-- fully resolved months are detached by the retention job (app/utils/alert_retention.py).
+
+-- Convert a pre-partitioning alerts table: set it aside, rows are copied below
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class
+        WHERE relname = 'alerts'
+        AND relkind = 'r'
+        AND relnamespace = current_schema()::regnamespace
+    ) THEN
+        ALTER TABLE alerts RENAME TO alerts_unpartitioned;
+        IF EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conname = 'alerts_pkey'
+            AND conrelid = 'alerts_unpartitioned'::regclass
+        ) THEN
+            ALTER TABLE alerts_unpartitioned RENAME CONSTRAINT alerts_pkey TO alerts_unpartitioned_pkey;
+        END IF;
+    END IF;
+END $$;
+
 -- Create alerts table for monitoring and alerting system
 CREATE TABLE IF NOT EXISTS alerts (
-    alert_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    alert_id UUID NOT NULL DEFAULT gen_random_uuid(),
     source VARCHAR(50) NOT NULL CHECK (source IN ('vm', 'server', 'workflow', 'monitor')),
     source_id VARCHAR(255) NOT NULL,
     severity VARCHAR(20) NOT NULL CHECK (severity IN ('critical', 'warning', 'info')),
@@ -509,9 +534,122 @@ CREATE TABLE IF NOT EXISTS alerts (
     resolved BOOLEAN DEFAULT FALSE,
     resolved_at TIMESTAMP,
     resolved_by VARCHAR(255),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (alert_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE IF NOT EXISTS alerts_default PARTITION OF alerts DEFAULT;
+
+-- Create the monthly partition containing month_start. Rows for that month that
+-- landed in the DEFAULT partition are moved into it before it is attached.
+CREATE OR REPLACE FUNCTION create_alert_partition(month_start DATE)
+RETURNS BOOLEAN AS $$
+DECLARE
+    partition_start DATE := date_trunc('month', month_start)::date;
+    partition_end DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::date;
+    partition_name TEXT := 'alerts_p' || to_char(month_start, 'YYYYMM');
+    moved_rows BIGINT;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_tables WHERE schemaname = current_schema() AND tablename = partition_name
+    ) THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE alerts INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+        partition_name
+    );
+    EXECUTE format(
+        'WITH moved AS (
+             DELETE FROM alerts_default
+             WHERE created_at >= %L AND created_at < %L
+             RETURNING *
+         )
+         INSERT INTO %I SELECT * FROM moved',
+        partition_start, partition_end, partition_name
+    );
+    GET DIAGNOSTICS moved_rows = ROW_COUNT;
+
+    EXECUTE format(
+        'ALTER TABLE alerts ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, partition_start, partition_end
+    );
+
+    IF moved_rows > 0 THEN
+        -- The DELETE above decremented alert_counts; count the moved rows again
+        EXECUTE format(
+            'INSERT INTO alert_counts (source, severity, resolved, alert_count)
+             SELECT source, severity, COALESCE(resolved, FALSE), COUNT(*)
+             FROM %I
+             GROUP BY source, severity, COALESCE(resolved, FALSE)
+             ON CONFLICT (source, severity, resolved, shard)
+             DO UPDATE SET alert_count = alert_counts.alert_count + EXCLUDED.alert_count',
+            partition_name
+        );
+    END IF;
+
+    RETURN TRUE;
+END;
+$$ language 'plpgsql';
+
+-- Make sure partitions exist from the current month through months_ahead months out
+CREATE OR REPLACE FUNCTION ensure_alert_partitions(months_ahead INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE;
+    created INTEGER := 0;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(
+            date_trunc('month', CURRENT_DATE),
+            date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead),
+            INTERVAL '1 month'
+        )::date
+    LOOP
+        IF create_alert_partition(month_start) THEN
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ language 'plpgsql';
+
+-- Copy rows from a pre-partitioning table into monthly partitions
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_tables WHERE schemaname = current_schema() AND tablename = 'alerts_unpartitioned'
+    ) THEN
+        FOR month_start IN
+            SELECT generate_series(
+                date_trunc('month', MIN(COALESCE(created_at, updated_at, CURRENT_TIMESTAMP))),
+                date_trunc('month', CURRENT_TIMESTAMP),
+                INTERVAL '1 month'
+            )::date
+            FROM alerts_unpartitioned
+        LOOP
+            PERFORM create_alert_partition(month_start);
+        END LOOP;
+
+        INSERT INTO alerts (
+            alert_id, source, source_id, severity, message, details,
+            resolved, resolved_at, resolved_by, created_at, updated_at
+        )
+        SELECT
+            alert_id, source, source_id, severity, message, details,
+            resolved, resolved_at, resolved_by,
+            COALESCE(created_at, updated_at, CURRENT_TIMESTAMP), updated_at
+        FROM alerts_unpartitioned;
+
+        DROP TABLE alerts_unpartitioned;
+    END IF;
+END $$;
+
+SELECT ensure_alert_partitions(3);
 
 -- Create indexes for alerts table
 CREATE INDEX IF NOT EXISTS idx_alerts_source ON alerts(source, source_id);
@@ -558,7 +696,7 @@ BEGIN
     END IF;
 END $$;
 
--- Ensure alert_id is the primary key
+-- Ensure (alert_id, created_at) is the primary key (a partitioned table's key must include created_at)
 DO $$
 BEGIN
     IF EXISTS (
@@ -575,7 +713,7 @@ BEGIN
         WHERE table_name = 'alerts' 
         AND constraint_type = 'PRIMARY KEY'
     ) THEN
-        ALTER TABLE alerts ADD PRIMARY KEY (alert_id);
+        ALTER TABLE alerts ADD PRIMARY KEY (alert_id, created_at);
     END IF;
 END $$;
 
@@ -585,3 +723,677 @@ CREATE TRIGGER update_alerts_updated_at
     BEFORE UPDATE ON alerts
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
+
+-- Alert notification outbox
+-- One row per alert event and channel, written in the same transaction as the
+-- alert so a notification is never lost or sent for a rolled-back alert.
+-- The notification dispatcher claims due rows, delivers them and retries with
+-- backoff; payload is a snapshot of the alert row at the time of the event.
+CREATE TABLE IF NOT EXISTS alert_notification_outbox (
+    outbox_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    alert_id UUID NOT NULL,
+    event VARCHAR(20) NOT NULL CHECK (event IN ('created', 'resolved')),
+    channel VARCHAR(20) NOT NULL CHECK (channel IN ('email', 'slack')),
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'PENDING' CHECK (status IN ('PENDING', 'SENT', 'FAILED')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    sent_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_alert_notification_outbox_due
+    ON alert_notification_outbox(next_attempt_at)
+    WHERE status = 'PENDING';
+CREATE INDEX IF NOT EXISTS idx_alert_notification_outbox_alert_id ON alert_notification_outbox(alert_id);
+
+-- Digest grouping key: rows sharing a digest_key and channel that come due
+-- together are delivered as one digest notification
+ALTER TABLE alert_notification_outbox
+    ADD COLUMN IF NOT EXISTS digest_key VARCHAR(100);
+
+DROP TRIGGER IF EXISTS update_alert_notification_outbox_updated_at ON alert_notification_outbox;
+CREATE TRIGGER update_alert_notification_outbox_updated_at
+    BEFORE UPDATE ON alert_notification_outbox
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- Fleet capacity counters
+-- vm_throughput_minute holds one row per VM per minute, so throughput/capacity
+-- metrics never scan queue or heartbeat history. Heartbeats only bump two
+-- counters on the vm_health row they already rewrite; the rollup job
+-- (rollup_vm_heartbeats) moves the increments into the minute buckets.
+-- Completions are counted once, when the queue entry a VM worked on reaches
+-- its final status.
+ALTER TABLE vm_health
+    ADD COLUMN IF NOT EXISTS processing_started_at TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS heartbeat_count BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS idle_heartbeat_count BIGINT NOT NULL DEFAULT 0;
+
+UPDATE vm_health
+SET processing_started_at = last_heartbeat
+WHERE processing_queue_id IS NOT NULL AND processing_started_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS vm_throughput_minute (
+    vm_id VARCHAR(255) NOT NULL,
+    bucket_start TIMESTAMP NOT NULL,
+    server_id VARCHAR(255),
+    heartbeats INTEGER NOT NULL DEFAULT 0,
+    idle_heartbeats INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    processing_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (vm_id, bucket_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_vm_throughput_minute_bucket ON vm_throughput_minute(bucket_start);
+
+-- Heartbeat counters already moved into vm_throughput_minute, per VM
+CREATE TABLE IF NOT EXISTS vm_heartbeat_rollup_state (
+    vm_id VARCHAR(255) PRIMARY KEY,
+    heartbeat_count BIGINT NOT NULL DEFAULT 0,
+    idle_heartbeat_count BIGINT NOT NULL DEFAULT 0
+);
+
+-- Queue entries a VM picked up and that have not reached a final status yet
+CREATE TABLE IF NOT EXISTS vm_queue_assignments (
+    queue_id UUID PRIMARY KEY,
+    vm_id VARCHAR(255) NOT NULL,
+    server_id VARCHAR(255),
+    started_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_vm_queue_assignments_started ON vm_queue_assignments(started_at);
+
+-- Count heartbeats on the vm_health row and record which VM picked up which entry.
+-- A heartbeat is any write that moves last_heartbeat.
+CREATE OR REPLACE FUNCTION track_vm_throughput()
+RETURNS TRIGGER AS $$
+DECLARE
+    event_time TIMESTAMP := COALESCE(NEW.last_heartbeat, LOCALTIMESTAMP);
+BEGIN
+    IF TG_OP = 'INSERT' OR NEW.last_heartbeat IS DISTINCT FROM OLD.last_heartbeat THEN
+        NEW.heartbeat_count := COALESCE(NEW.heartbeat_count, 0) + 1;
+        IF NEW.status = 'idle' THEN
+            NEW.idle_heartbeat_count := COALESCE(NEW.idle_heartbeat_count, 0) + 1;
+        END IF;
+    END IF;
+
+    IF TG_OP = 'INSERT' OR NEW.processing_queue_id IS DISTINCT FROM OLD.processing_queue_id THEN
+        NEW.processing_started_at := CASE
+            WHEN NEW.processing_queue_id IS NULL THEN NULL
+            ELSE event_time
+        END;
+
+        IF NEW.processing_queue_id IS NOT NULL THEN
+            INSERT INTO vm_queue_assignments (queue_id, vm_id, server_id, started_at)
+            VALUES (NEW.processing_queue_id, NEW.vm_id, NEW.server_id, event_time)
+            ON CONFLICT (queue_id) DO UPDATE SET
+                vm_id = EXCLUDED.vm_id,
+                server_id = EXCLUDED.server_id,
+                started_at = EXCLUDED.started_at;
+        END IF;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS track_vm_health_throughput ON vm_health;
+CREATE TRIGGER track_vm_health_throughput
+    BEFORE INSERT OR UPDATE ON vm_health
+    FOR EACH ROW
+    EXECUTE FUNCTION track_vm_throughput();
+
+-- Count a finished encounter for the VM that picked it up, from the queue entry's status:
+-- completed when it reaches DONE, failed when it reaches ERROR or is requeued
+-- (PROCESSING -> PENDING, e.g. by stale lease recovery). Processing time runs
+-- from pickup to the final status.
+CREATE OR REPLACE FUNCTION track_queue_completions()
+RETURNS TRIGGER AS $$
+DECLARE
+    assignment vm_queue_assignments%ROWTYPE;
+    event_time TIMESTAMP := LOCALTIMESTAMP;
+BEGIN
+    IF NEW.status IS NOT DISTINCT FROM OLD.status
+       OR NOT (NEW.status IN ('DONE', 'ERROR') OR (OLD.status = 'PROCESSING' AND NEW.status = 'PENDING')) THEN
+        RETURN NULL;
+    END IF;
+
+    DELETE FROM vm_queue_assignments
+    WHERE queue_id = NEW.queue_id
+    RETURNING * INTO assignment;
+
+    IF assignment.queue_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO vm_throughput_minute (
+        vm_id, bucket_start, server_id, completed, failed, processing_seconds
+    )
+    VALUES (
+        assignment.vm_id,
+        date_trunc('minute', event_time),
+        assignment.server_id,
+        CASE WHEN NEW.status = 'DONE' THEN 1 ELSE 0 END,
+        CASE WHEN NEW.status = 'DONE' THEN 0 ELSE 1 END,
+        CASE WHEN NEW.status = 'DONE'
+            THEN GREATEST(EXTRACT(EPOCH FROM (event_time - assignment.started_at)), 0)
+            ELSE 0
+        END
+    )
+    ON CONFLICT (vm_id, bucket_start) DO UPDATE SET
+        server_id = COALESCE(EXCLUDED.server_id, vm_throughput_minute.server_id),
+        completed = vm_throughput_minute.completed + EXCLUDED.completed,
+        failed = vm_throughput_minute.failed + EXCLUDED.failed,
+        processing_seconds = vm_throughput_minute.processing_seconds + EXCLUDED.processing_seconds;
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS track_queue_completions ON queue;
+CREATE TRIGGER track_queue_completions
+    AFTER UPDATE OF status ON queue
+    FOR EACH ROW
+    EXECUTE FUNCTION track_queue_completions();
+
+-- Queue depth (PENDING and PROCESSING entries) is counted by a periodic job from
+-- the partial index below; the per-status counter rows serialized every queue
+-- writer on one hot row per status.
+DROP TRIGGER IF EXISTS track_queue_status_counts ON queue;
+DROP TRIGGER IF EXISTS reset_queue_status_counts ON queue;
+DROP FUNCTION IF EXISTS track_queue_status_counts();
+DROP FUNCTION IF EXISTS reset_queue_status_counts();
+DROP TABLE IF EXISTS queue_status_counts;
+CREATE INDEX IF NOT EXISTS idx_queue_in_progress ON queue(status) WHERE status IN ('PENDING', 'PROCESSING');
+
+-- Heartbeat metadata version counters (delta-encoded heartbeats)
+ALTER TABLE vm_health
+    ADD COLUMN IF NOT EXISTS metadata_version BIGINT NOT NULL DEFAULT 0;
+
+ALTER TABLE IF EXISTS server_health
+    ADD COLUMN IF NOT EXISTS metadata_version BIGINT NOT NULL DEFAULT 0;
+
+-- Alert list counters and keyset pagination
+-- alert_counts holds the number of alerts per (source, severity, resolved), maintained
+-- by triggers, so the alerts list can report totals without COUNT(*) over the table.
+-- Each key is spread over 16 shard rows (summed on read) so concurrent alert writes
+-- do not all queue on one counter row. The alerts list pages by (created_at, alert_id);
+-- the partial index serves the default unresolved view.
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_tables WHERE schemaname = current_schema() AND tablename = 'alert_counts'
+    ) THEN
+        CREATE TABLE alert_counts (
+            source VARCHAR(50) NOT NULL,
+            severity VARCHAR(20) NOT NULL,
+            resolved BOOLEAN NOT NULL,
+            shard SMALLINT NOT NULL DEFAULT 0,
+            alert_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (source, severity, resolved, shard)
+        );
+
+        -- Seed once, holding off alert writes until the counting trigger exists
+        LOCK TABLE alerts IN SHARE MODE;
+        INSERT INTO alert_counts (source, severity, resolved, alert_count)
+        SELECT source, severity, COALESCE(resolved, FALSE), COUNT(*)
+        FROM alerts
+        GROUP BY source, severity, COALESCE(resolved, FALSE);
+    END IF;
+END $$;
+
+-- Counter tables created before sharding keyed on (source, severity, resolved)
+ALTER TABLE alert_counts ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = 'alert_counts'::regclass AND i.indisprimary AND a.attname = 'shard'
+    ) THEN
+        ALTER TABLE alert_counts
+            DROP CONSTRAINT alert_counts_pkey,
+            ADD PRIMARY KEY (source, severity, resolved, shard);
+    END IF;
+END $$;
+
+-- Keep alert_counts in step with alert inserts, resolutions and deletes.
+-- Each backend adds to its own shard row; the rows are upserted in key order so
+-- concurrent changes cannot deadlock.
+CREATE OR REPLACE FUNCTION track_alert_counts()
+RETURNS TRIGGER AS $$
+DECLARE
+    counter_shard SMALLINT := pg_backend_pid() % 16;
+    old_key TEXT := NULL;
+    new_key TEXT := NULL;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        old_key := OLD.source || '|' || OLD.severity || '|' || COALESCE(OLD.resolved, FALSE)::text;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        new_key := NEW.source || '|' || NEW.severity || '|' || COALESCE(NEW.resolved, FALSE)::text;
+    END IF;
+
+    IF old_key IS NOT DISTINCT FROM new_key THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO alert_counts (source, severity, resolved, shard, alert_count)
+    SELECT change.source, change.severity, change.resolved, counter_shard, change.delta
+    FROM (VALUES
+        (old_key, OLD.source, OLD.severity, COALESCE(OLD.resolved, FALSE), -1),
+        (new_key, NEW.source, NEW.severity, COALESCE(NEW.resolved, FALSE), 1)
+    ) AS change(key, source, severity, resolved, delta)
+    WHERE change.key IS NOT NULL
+    ORDER BY change.source, change.severity, change.resolved
+    ON CONFLICT (source, severity, resolved, shard)
+    DO UPDATE SET alert_count = alert_counts.alert_count + EXCLUDED.alert_count;
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION reset_alert_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM alert_counts;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS track_alert_counts ON alerts;
+CREATE TRIGGER track_alert_counts
+    AFTER INSERT OR UPDATE OF source, severity, resolved OR DELETE ON alerts
+    FOR EACH ROW
+    EXECUTE FUNCTION track_alert_counts();
+
+DROP TRIGGER IF EXISTS reset_alert_counts ON alerts;
+CREATE TRIGGER reset_alert_counts
+    AFTER TRUNCATE ON alerts
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION reset_alert_counts();
+
+CREATE INDEX IF NOT EXISTS idx_alerts_created_at_alert_id ON alerts(created_at DESC, alert_id DESC);
+CREATE INDEX IF NOT EXISTS idx_alerts_unresolved_created_at
+    ON alerts(created_at DESC, alert_id DESC)
+    WHERE resolved = FALSE;
+
+-- Experity process time
+-- Encounter and Experity processing durations reported by the VMs.
+CREATE TABLE IF NOT EXISTS experity_process_time (
+    process_time_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    process_name VARCHAR(100) NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    ended_at TIMESTAMP WITH TIME ZONE,
+    duration_seconds INTEGER GENERATED ALWAYS AS (
+        (EXTRACT(EPOCH FROM (ended_at - started_at)))::integer
+    ) STORED,
+    encounter_id UUID,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Experity process time analytics
+-- Percentiles and slowest runs are computed per process over a started_at window; the
+-- covering index lets them read (process_name, started_at, duration_seconds) from the
+-- index alone. experity_process_time_hourly holds per-hour rollups, refreshed
+-- incrementally by the API for the hours queued in experity_process_time_dirty_hours.
+CREATE TABLE IF NOT EXISTS experity_process_time_hourly (
+    process_name VARCHAR(100) NOT NULL,
+    hour_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    started_count INTEGER NOT NULL DEFAULT 0,
+    completed_count INTEGER NOT NULL DEFAULT 0,
+    total_duration_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    max_duration_seconds DOUBLE PRECISION,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (process_name, hour_start)
+);
+
+-- Hours whose rollup must be recomputed. Inserts, deletes and updates queue
+-- the hour of the old and the new row, so rows that are deleted or move to
+-- another hour (or process) leave no stale rollup behind. Entries are only
+-- appended (no unique key), so concurrent writers never wait on each other.
+-- Hours that already have rows but no rollup (rows written before the trigger
+-- existed) are queued once, when the table is created.
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_tables
+        WHERE schemaname = current_schema() AND tablename = 'experity_process_time_dirty_hours'
+    ) THEN
+        CREATE TABLE experity_process_time_dirty_hours (
+            entry_id BIGSERIAL PRIMARY KEY,
+            process_name VARCHAR(100) NOT NULL,
+            hour_start TIMESTAMP WITH TIME ZONE NOT NULL
+        );
+
+        -- Hold off process time writes until the marking trigger exists
+        LOCK TABLE experity_process_time IN SHARE MODE;
+        INSERT INTO experity_process_time_dirty_hours (process_name, hour_start)
+        SELECT DISTINCT e.process_name, date_trunc('hour', e.started_at)
+        FROM experity_process_time e
+        WHERE NOT EXISTS (
+            SELECT 1 FROM experity_process_time_hourly h
+            WHERE h.process_name = e.process_name
+              AND h.hour_start = date_trunc('hour', e.started_at)
+        );
+    END IF;
+END $$;
+
+CREATE OR REPLACE FUNCTION mark_experity_process_time_hours()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO experity_process_time_dirty_hours (process_name, hour_start)
+        VALUES (OLD.process_name, date_trunc('hour', OLD.started_at));
+    END IF;
+    IF TG_OP = 'INSERT' OR (
+        TG_OP = 'UPDATE' AND (
+            NEW.process_name IS DISTINCT FROM OLD.process_name
+            OR date_trunc('hour', NEW.started_at) IS DISTINCT FROM date_trunc('hour', OLD.started_at)
+        )
+    ) THEN
+        INSERT INTO experity_process_time_dirty_hours (process_name, hour_start)
+        VALUES (NEW.process_name, date_trunc('hour', NEW.started_at));
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS mark_experity_process_time_hours ON experity_process_time;
+CREATE TRIGGER mark_experity_process_time_hours
+    AFTER INSERT OR DELETE OR UPDATE OF process_name, started_at, ended_at ON experity_process_time
+    FOR EACH ROW
+    EXECUTE FUNCTION mark_experity_process_time_hours();
+
+CREATE OR REPLACE FUNCTION reset_experity_process_time_rollups()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM experity_process_time_dirty_hours;
+    DELETE FROM experity_process_time_hourly;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS reset_experity_process_time_rollups ON experity_process_time;
+CREATE TRIGGER reset_experity_process_time_rollups
+    AFTER TRUNCATE ON experity_process_time
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION reset_experity_process_time_rollups();
+
+-- The high-water mark used before could leave any existing rollup stale, so on
+-- upgrade every rolled-up hour is rebuilt once
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_tables
+        WHERE schemaname = current_schema() AND tablename = 'experity_process_time_rollup_state'
+    ) THEN
+        INSERT INTO experity_process_time_dirty_hours (process_name, hour_start)
+        SELECT process_name, hour_start FROM experity_process_time_hourly;
+        DROP TABLE experity_process_time_rollup_state;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_experity_process_time_name_started
+    ON experity_process_time(process_name, started_at) INCLUDE (duration_seconds);
+CREATE INDEX IF NOT EXISTS idx_experity_process_time_updated_at
+    ON experity_process_time(updated_at);
+
+-- Experity process time batch ingestion
+-- Optional client-supplied idempotency key; retried posts with the same key are
+-- answered with the existing record instead of inserting a duplicate.
+ALTER TABLE experity_process_time
+    ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(255);
+
+-- Conflict target of the batch insert (ON CONFLICT (idempotency_key) WHERE ...)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_experity_process_time_idempotency_key
+    ON experity_process_time(idempotency_key)
+    WHERE idempotency_key IS NOT NULL;
+
+-- Encounter pipeline tracing
+-- Trace id (32 hex chars, W3C trace context) of the request that created the
+-- queue entry; VMs receive it on claim and send it back with their process
+-- times, so one encounter's spans can be joined across services.
+ALTER TABLE queue
+    ADD COLUMN IF NOT EXISTS trace_id VARCHAR(32);
+
+ALTER TABLE experity_process_time
+    ADD COLUMN IF NOT EXISTS trace_id VARCHAR(32);
+
+CREATE INDEX IF NOT EXISTS idx_experity_process_time_trace_id
+    ON experity_process_time(trace_id)
+    WHERE trace_id IS NOT NULL;
+
+-- Slow query plans
+-- EXPLAIN (ANALYZE, BUFFERS) plans captured in the background for statements
+-- that exceeded SLOW_QUERY_THRESHOLD_MS (see app/utils/query_stats.py).
+-- query_id identifies the normalized statement; old plans are pruned after
+-- SLOW_QUERY_PLAN_RETENTION_DAYS.
+CREATE TABLE IF NOT EXISTS slow_query_plans (
+    plan_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    query_id VARCHAR(32) NOT NULL,
+    query TEXT NOT NULL,
+    duration_ms DOUBLE PRECISION NOT NULL,
+    plan JSONB NOT NULL,
+    captured_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_slow_query_plans_query_id
+    ON slow_query_plans(query_id, captured_at DESC);
+CREATE INDEX IF NOT EXISTS idx_slow_query_plans_captured_at
+    ON slow_query_plans(captured_at);
+
+-- Patient search
+-- search_name (lower-cased "first last") and mobile_phone_digits (digits only)
+-- are kept current by PostgreSQL on both patient tables. With pg_trgm they are
+-- GIN-indexed, together with emr_id, so substring search (LIKE '%term%') and
+-- typeahead ranking are index-backed. The extension is optional: without it
+-- search falls back to sequential scans and results carry no similarity score.
+ALTER TABLE patients
+    ADD COLUMN IF NOT EXISTS search_name TEXT GENERATED ALWAYS AS (
+        LOWER(BTRIM(COALESCE(legal_first_name, '') || ' ' || COALESCE(legal_last_name, '')))
+    ) STORED,
+    ADD COLUMN IF NOT EXISTS mobile_phone_digits VARCHAR(50) GENERATED ALWAYS AS (
+        NULLIF(REGEXP_REPLACE(mobile_phone, '[^0-9]', '', 'g'), '')
+    ) STORED;
+
+ALTER TABLE pending_patients
+    ADD COLUMN IF NOT EXISTS search_name TEXT GENERATED ALWAYS AS (
+        LOWER(BTRIM(COALESCE(legal_first_name, '') || ' ' || COALESCE(legal_last_name, '')))
+    ) STORED,
+    ADD COLUMN IF NOT EXISTS mobile_phone_digits VARCHAR(50) GENERATED ALWAYS AS (
+        NULLIF(REGEXP_REPLACE(mobile_phone, '[^0-9]', '', 'g'), '')
+    ) STORED;
+
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'pg_trgm is not available, patient search indexes are skipped: %', SQLERRM;
+END $$;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS idx_patients_search_name_trgm
+            ON patients USING GIN (search_name gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_patients_emr_id_trgm
+            ON patients USING GIN (emr_id gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_patients_mobile_phone_digits_trgm
+            ON patients USING GIN (mobile_phone_digits gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_pending_patients_search_name_trgm
+            ON pending_patients USING GIN (search_name gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_pending_patients_emr_id_trgm
+            ON pending_patients USING GIN (emr_id gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_pending_patients_mobile_phone_digits_trgm
+            ON pending_patients USING GIN (mobile_phone_digits gin_trgm_ops);
+    END IF;
+END $$;
+
+-- Location directory
+-- One row per location seen on a patient or pending patient, kept current by
+-- triggers so the dashboard location dropdown reads a small table instead of
+-- scanning both patient tables. The most recent non-null name wins. Locations
+-- stay listed after their patients are deleted.
+CREATE TABLE IF NOT EXISTS locations (
+    location_id VARCHAR(255) PRIMARY KEY,
+    location_name VARCHAR(255),
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Seed the directory once from existing patients
+INSERT INTO locations (location_id, location_name)
+SELECT location_id, MIN(location_name)
+FROM (
+    SELECT location_id, location_name FROM patients WHERE location_id IS NOT NULL
+    UNION
+    SELECT location_id, location_name FROM pending_patients WHERE location_id IS NOT NULL
+) AS combined
+WHERE NOT EXISTS (SELECT 1 FROM locations)
+GROUP BY location_id
+ON CONFLICT (location_id) DO NOTHING;
+
+-- Record the location of an inserted or relocated/renamed patient.
+-- The existence check keeps the common case (known location, same name) free
+-- of writes and row locks on the directory.
+CREATE OR REPLACE FUNCTION track_patient_location()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.location_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM 1 FROM locations
+    WHERE location_id = NEW.location_id
+      AND (NEW.location_name IS NULL OR location_name IS NOT DISTINCT FROM NEW.location_name);
+    IF FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO locations (location_id, location_name)
+    VALUES (NEW.location_id, NEW.location_name)
+    ON CONFLICT (location_id) DO UPDATE SET
+        location_name = EXCLUDED.location_name,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE EXCLUDED.location_name IS NOT NULL
+      AND locations.location_name IS DISTINCT FROM EXCLUDED.location_name;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_patients_location_insert ON patients;
+CREATE TRIGGER trg_patients_location_insert
+    AFTER INSERT ON patients
+    FOR EACH ROW
+    EXECUTE FUNCTION track_patient_location();
+
+DROP TRIGGER IF EXISTS trg_patients_location_update ON patients;
+CREATE TRIGGER trg_patients_location_update
+    AFTER UPDATE OF location_id, location_name ON patients
+    FOR EACH ROW
+    WHEN (OLD.location_id IS DISTINCT FROM NEW.location_id
+          OR OLD.location_name IS DISTINCT FROM NEW.location_name)
+    EXECUTE FUNCTION track_patient_location();
+
+DROP TRIGGER IF EXISTS trg_pending_patients_location_insert ON pending_patients;
+CREATE TRIGGER trg_pending_patients_location_insert
+    AFTER INSERT ON pending_patients
+    FOR EACH ROW
+    EXECUTE FUNCTION track_patient_location();
+
+DROP TRIGGER IF EXISTS trg_pending_patients_location_update ON pending_patients;
+CREATE TRIGGER trg_pending_patients_location_update
+    AFTER UPDATE OF location_id, location_name ON pending_patients
+    FOR EACH ROW
+    WHEN (OLD.location_id IS DISTINCT FROM NEW.location_id
+          OR OLD.location_name IS DISTINCT FROM NEW.location_name)
+    EXECUTE FUNCTION track_patient_location();
+
+-- Patient listing order
+-- effective_status is the normalized status the dashboard filters on: the
+-- lower-cased status, falling back (for pending patients) from the scraped
+-- raw_payload status to the row status to checked_in, and to confirmed for
+-- confirmed patients. Storing it lets status filters run inside the index
+-- scan instead of extracting raw_payload->>'status' for every row.
+ALTER TABLE patients
+    ADD COLUMN IF NOT EXISTS effective_status VARCHAR(50) GENERATED ALWAYS AS (
+        COALESCE(NULLIF(LOWER(BTRIM(status)), ''), 'confirmed')
+    ) STORED;
+
+ALTER TABLE pending_patients
+    ADD COLUMN IF NOT EXISTS effective_status VARCHAR(255) GENERATED ALWAYS AS (
+        COALESCE(
+            NULLIF(LOWER(BTRIM(raw_payload->>'status')), ''),
+            NULLIF(LOWER(BTRIM(status)), ''),
+            'checked_in'
+        )
+    ) STORED;
+
+-- Match the listing order (captured_at DESC NULLS LAST, updated_at DESC NULLS LAST,
+-- id DESC) within a location, so a page or limit is read from the index
+-- instead of sorting the location's rows.
+CREATE INDEX IF NOT EXISTS idx_patients_location_captured
+    ON patients(location_id, captured_at DESC NULLS LAST, updated_at DESC NULLS LAST, id DESC);
+CREATE INDEX IF NOT EXISTS idx_pending_patients_location_captured
+    ON pending_patients(location_id, captured_at DESC NULLS LAST, updated_at DESC NULLS LAST, pending_id DESC);
+CREATE INDEX IF NOT EXISTS idx_patients_location_status_captured
+    ON patients(location_id, effective_status, captured_at DESC NULLS LAST, updated_at DESC NULLS LAST, id DESC);
+CREATE INDEX IF NOT EXISTS idx_pending_patients_location_status_captured
+    ON pending_patients(location_id, effective_status, captured_at DESC NULLS LAST, updated_at DESC NULLS LAST, pending_id DESC);
+
+-- Patient sync
+-- GET /patients?since=<cursor> reads the rows of a location changed after
+-- (updated_at, id); these indexes keep that proportional to the changes.
+CREATE INDEX IF NOT EXISTS idx_patients_location_updated
+    ON patients(location_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_pending_patients_location_updated
+    ON pending_patients(location_id, updated_at, pending_id);
+
+-- Pending patient promotion
+-- The promotion job copies pending patients that have an EMR ID into patients
+-- in batches and stamps promoted_at. emr_id_set_at records when the EMR ID
+-- arrived, which is when a row starts waiting for promotion. The partial index
+-- holds only rows still waiting, so finding them stays cheap however large the
+-- table grows.
+ALTER TABLE pending_patients
+    ADD COLUMN IF NOT EXISTS promoted_at TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS emr_id_set_at TIMESTAMP;
+
+CREATE OR REPLACE FUNCTION set_pending_patient_emr_id_set_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.emr_id IS NULL OR NEW.emr_id = '' THEN
+        NEW.emr_id_set_at := NULL;
+    ELSIF TG_OP = 'INSERT' OR NEW.emr_id IS DISTINCT FROM OLD.emr_id THEN
+        NEW.emr_id_set_at := CURRENT_TIMESTAMP;
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS set_pending_patients_emr_id_set_at ON pending_patients;
+CREATE TRIGGER set_pending_patients_emr_id_set_at
+    BEFORE INSERT OR UPDATE OF emr_id ON pending_patients
+    FOR EACH ROW
+    EXECUTE FUNCTION set_pending_patient_emr_id_set_at();
+
+-- Rows already waiting before emr_id_set_at existed count from their last update
+UPDATE pending_patients
+SET emr_id_set_at = updated_at
+WHERE emr_id_set_at IS NULL
+  AND emr_id IS NOT NULL
+  AND emr_id <> ''
+  AND status IN ('pending', 'ready');
+
+DROP INDEX IF EXISTS idx_pending_patients_promotable;
+CREATE INDEX IF NOT EXISTS idx_pending_patients_promotable_since
+    ON pending_patients(emr_id_set_at, pending_id)
+    WHERE emr_id IS NOT NULL AND status IN ('pending', 'ready');
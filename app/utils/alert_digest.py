@@ -0,0 +1,164 @@
+"""
+In-memory alert deduplication and notification digesting.
+
+Two kinds of state are kept per worker:
+
+- Recent alerts: the last alert created per (source, source_id, severity[, resource]).
+  A repeat within ALERT_DEDUP_WINDOW_SECONDS is a duplicate. A hit only costs
+  the caller a primary key lookup confirming the alert is still unresolved
+  (forget_alert only clears the worker that resolved it) instead of the range
+  query over recent alerts. On a miss the caller checks the database (another
+  worker may have created the alert) and records the result here.
+- Digest windows: alerts are grouped by source type, severity and a message
+  fingerprint (digits and whitespace normalized, so "CPU usage is 91.2%" and
+  "CPU usage is 97.0%" match). The first alert of a group notifies
+  immediately; further alerts in the same window are queued with a digest key
+  and held until the window closes, when the dispatcher sends one digest with
+  counts per group. Windows are aligned to wall-clock multiples of
+  ALERT_DIGEST_WINDOW_SECONDS, and the hold itself is computed from the
+  database clock when the row is queued, so rows queued by different workers
+  come due together and are digested together.
+
+Configuration (environment variables):
+- ALERT_DEDUP_WINDOW_SECONDS: Window in which a repeated alert is a duplicate (default: 300)
+- ALERT_DIGEST_WINDOW_SECONDS: Digest window for related alerts, 0 disables digesting (default: 300)
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ALERT_DEDUP_WINDOW_SECONDS = int(os.getenv('ALERT_DEDUP_WINDOW_SECONDS', '300'))
+ALERT_DIGEST_WINDOW_SECONDS = int(os.getenv('ALERT_DIGEST_WINDOW_SECONDS', '300'))
+
+_state_size_limit = 10000
+_state_lock = threading.Lock()
+
+# dedup key -> (expires_at monotonic, alert summary)
+_recent_alerts: "OrderedDict[Tuple[Any, ...], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+# fingerprint -> end of the open digest window (epoch seconds)
+_digest_windows: "OrderedDict[str, float]" = OrderedDict()
+
+_DIGITS = re.compile(r'\d+(?:\.\d+)?')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def alert_dedup_key(
+    source: str,
+    source_id: str,
+    severity: str,
+    resource: Optional[str] = None
+) -> Tuple[Any, ...]:
+    """Build the key identifying repeats of the same alert."""
+    return (source, source_id, severity, resource)
+
+
+def get_recent_alert(key: Tuple[Any, ...]) -> Optional[Dict[str, Any]]:
+    """
+    Return the alert recorded for a dedup key if it is still within the window.
+
+    Returns:
+        Dictionary with alert_id and created_at, or None
+    """
+    with _state_lock:
+        entry = _recent_alerts.get(key)
+        if entry is None:
+            return None
+        expires_at, alert = entry
+        if expires_at <= time.monotonic():
+            del _recent_alerts[key]
+            return None
+        return alert
+
+
+def remember_alert(key: Tuple[Any, ...], alert: Dict[str, Any], age_seconds: float = 0.0) -> None:
+    """
+    Record an unresolved alert for a dedup key.
+
+    Args:
+        key: Key from alert_dedup_key()
+        alert: Alert record (alert_id and created_at are kept)
+        age_seconds: How long ago the alert was created, for alerts found in the database
+    """
+    remaining = ALERT_DEDUP_WINDOW_SECONDS - max(age_seconds, 0.0)
+    if remaining <= 0:
+        return
+    summary = {'alert_id': alert.get('alert_id'), 'created_at': alert.get('created_at')}
+    with _state_lock:
+        _recent_alerts[key] = (time.monotonic() + remaining, summary)
+        _recent_alerts.move_to_end(key)
+        while len(_recent_alerts) > _state_size_limit:
+            _recent_alerts.popitem(last=False)
+
+
+def forget_alert(alert: Dict[str, Any]) -> None:
+    """Drop the dedup entries for a resolved alert so the next occurrence is reported."""
+    details = alert.get('details') if isinstance(alert.get('details'), dict) else {}
+    keys = {
+        alert_dedup_key(alert.get('source'), alert.get('source_id'), alert.get('severity')),
+        alert_dedup_key(
+            alert.get('source'), alert.get('source_id'), alert.get('severity'), details.get('resource')
+        ),
+    }
+    with _state_lock:
+        for key in keys:
+            _recent_alerts.pop(key, None)
+
+
+def alert_fingerprint(source: str, severity: str, message: str) -> str:
+    """
+    Fingerprint related alerts: same source type, severity and message shape.
+
+    Numbers in the message are replaced and whitespace/case normalized, so
+    alerts that only differ in a measured value share a fingerprint.
+    """
+    normalized = _WHITESPACE.sub(' ', _DIGITS.sub('#', message or '')).strip().lower()
+    digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+    return f"{source}:{severity}:{digest}"
+
+
+def plan_alert_notification(
+    source: str,
+    severity: str,
+    message: str,
+    now: Optional[float] = None
+) -> Optional[str]:
+    """
+    Decide whether an alert notifies immediately or joins a digest.
+
+    Args:
+        source: Alert source type
+        severity: Alert severity
+        message: Alert message
+        now: Current epoch time (defaults to time.time())
+
+    Returns:
+        None for the first alert of a group in the current window, otherwise
+        the digest key to hold the notification under until the window closes
+    """
+    if ALERT_DIGEST_WINDOW_SECONDS <= 0:
+        return None
+
+    now = time.time() if now is None else now
+    fingerprint = alert_fingerprint(source, severity, message)
+
+    with _state_lock:
+        window_end = _digest_windows.get(fingerprint)
+        if window_end is not None and now < window_end:
+            return fingerprint
+
+        # First alert of this group: notify now and hold the rest until the window closes
+        window = ALERT_DIGEST_WINDOW_SECONDS
+        _digest_windows[fingerprint] = (now // window + 1) * window
+        _digest_windows.move_to_end(fingerprint)
+        while len(_digest_windows) > _state_size_limit:
+            _digest_windows.popitem(last=False)
+
+    return None
@@ -0,0 +1,62 @@
+"""
+Alert partition maintenance and retention.
+
+The alerts table is range partitioned by month on created_at (see schema.sql).
+This module keeps partitions created ahead of time, so new alerts never land
+in the DEFAULT partition, and detaches months that ended more than
+ALERT_RETENTION_DAYS ago once all their alerts are resolved. Detached months
+move to the alerts_archive schema (or are dropped), so recent-alert lookups,
+the alerts list and index maintenance only deal with recent partitions.
+
+Runs under a database advisory lock, so only one worker does the work per run.
+
+Configuration (environment variables):
+- ALERT_PARTITION_MONTHS_AHEAD: Future monthly partitions to keep created (default: 3)
+- ALERT_RETENTION_DAYS: Days after a month ends before it can be archived (default: 90)
+- ALERT_RETENTION_DROP: Drop old partitions instead of archiving them (default: false)
+- ALERT_RETENTION_INTERVAL_SECONDS: Delay between maintenance runs (default: 21600)
+"""
+
+import os
+import logging
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+ALERT_PARTITION_MONTHS_AHEAD = int(os.getenv('ALERT_PARTITION_MONTHS_AHEAD', '3'))
+ALERT_RETENTION_DAYS = int(os.getenv('ALERT_RETENTION_DAYS', '90'))
+ALERT_RETENTION_DROP = os.getenv('ALERT_RETENTION_DROP', 'false').lower() == 'true'
+ALERT_RETENTION_INTERVAL_SECONDS = int(os.getenv('ALERT_RETENTION_INTERVAL_SECONDS', '21600'))
+
+
+def run_alert_partition_maintenance() -> Dict[str, Any]:
+    """Create upcoming alert partitions and archive expired ones."""
+    from app.api.database import (
+        get_db_connection,
+        ensure_alert_partitions,
+        archive_alert_partitions,
+    )
+
+    conn = get_db_connection()
+    try:
+        created = ensure_alert_partitions(conn, months_ahead=ALERT_PARTITION_MONTHS_AHEAD)
+        archived = archive_alert_partitions(
+            conn, retention_days=ALERT_RETENTION_DAYS, drop=ALERT_RETENTION_DROP
+        )
+    finally:
+        conn.close()
+
+    if created:
+        logger.info(f"Created {created} alert partitions")
+    if archived:
+        action = "Dropped" if ALERT_RETENTION_DROP else "Archived"
+        logger.info(f"{action} alert partitions older than {ALERT_RETENTION_DAYS} days: {', '.join(archived)}")
+    return {'created': created, 'archived': archived}
+
+
+def register_alert_retention_jobs() -> None:
+    """Register the periodic partition maintenance job."""
+    from app.utils.background_jobs import register_periodic_job
+    register_periodic_job(
+        'alert_partition_maintenance', ALERT_RETENTION_INTERVAL_SECONDS, run_alert_partition_maintenance
+    )
@@ -0,0 +1,71 @@
+"""
+Periodic background jobs for the API process.
+
+Jobs are plain synchronous functions (they use psycopg2 like the rest of the
+API) that are registered with an interval and run in a worker thread from an
+asyncio loop started on application startup. A failing job is logged and
+retried on its next tick; it never takes the API down.
+
+Each uvicorn worker runs its own copy of every job, so jobs must be safe to
+run concurrently (e.g. by using FOR UPDATE SKIP LOCKED).
+"""
+
+import asyncio
+import logging
+from typing import Callable, Dict, Any, List
+
+from app.utils.metrics import BACKGROUND_JOB_RUNS
+
+logger = logging.getLogger(__name__)
+
+_jobs: Dict[str, Dict[str, Any]] = {}
+_tasks: List[asyncio.Task] = []
+
+
+def register_periodic_job(name: str, interval_seconds: float, func: Callable[[], Any]) -> None:
+    """
+    Register a job to run every interval_seconds once the app has started.
+
+    Registering the same name twice replaces the earlier registration.
+
+    Args:
+        name: Unique job name (used in logs)
+        interval_seconds: Delay between the end of one run and the start of the next
+        func: Synchronous callable with no arguments
+    """
+    _jobs[name] = {
+        'interval': max(float(interval_seconds), 1.0),
+        'func': func,
+    }
+
+
+async def _run_periodically(name: str, interval: float, func: Callable[[], Any]) -> None:
+    """Run func every interval seconds until cancelled."""
+    while True:
+        try:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(func)
+            BACKGROUND_JOB_RUNS.labels(job=name, outcome='success').inc()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            BACKGROUND_JOB_RUNS.labels(job=name, outcome='error').inc()
+            logger.error(f"Background job '{name}' failed: {str(e)}", exc_info=True)
+
+
+def start_background_jobs() -> None:
+    """Start all registered jobs on the running event loop."""
+    if _tasks:
+        return
+    for name, job in _jobs.items():
+        _tasks.append(asyncio.create_task(_run_periodically(name, job['interval'], job['func'])))
+        logger.info(f"Started background job '{name}' (every {job['interval']:.0f}s)")
+
+
+async def stop_background_jobs() -> None:
+    """Cancel all running jobs and wait for them to finish."""
+    for task in _tasks:
+        task.cancel()
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -0,0 +1,45 @@
+"""
+Weak ETags for conditional GET requests.
+
+A list endpoint derives its ETag from a cheap fingerprint of the result set
+(row count and latest updated_at, plus the request filters) instead of the
+response body. A poll that sends the tag back in If-None-Match gets a 304
+without the rows being read or serialized.
+"""
+
+import json
+import hashlib
+from typing import Any, Optional
+
+
+def weak_etag(*parts: Any) -> str:
+    """
+    Build a weak ETag from JSON-serializable parts (datetimes are stringified).
+
+    Returns:
+        ETag header value, e.g. W/"3f2a..."
+    """
+    raw = json.dumps(parts, default=str, sort_keys=True, separators=(',', ':'))
+    return f'W/"{hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag (weak comparison).
+
+    Args:
+        if_none_match: Header value: "*" or a comma-separated list of tags
+        etag: Current ETag of the resource
+
+    Returns:
+        True when the client's copy is current and a 304 can be returned
+    """
+    if not if_none_match:
+        return False
+
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith('W/') else tag
+
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or opaque(etag) in {opaque(tag) for tag in candidates}
@@ -0,0 +1,129 @@
+"""
+Streaming exports of large result sets as NDJSON or CSV.
+
+Export endpoints read through a server-side (named) cursor and fetch
+EXPORT_FETCH_SIZE rows at a time, so memory stays constant however many rows
+are exported. Each batch is encoded and yielded as one chunk of the response
+body; nothing else is buffered.
+
+Configuration (environment variables):
+- EXPORT_FETCH_SIZE: Rows fetched from the database per chunk (default: 2000)
+"""
+
+import io
+import os
+import csv
+import json
+import uuid
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterator, List, Optional, Sequence
+
+from app.utils.metrics import EXPORT_ROWS, EXPORTS
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FETCH_SIZE = int(os.getenv('EXPORT_FETCH_SIZE', '2000'))
+
+EXPORT_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default, separators=(',', ':'))
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_ndjson(columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+    """Encode rows as newline-delimited JSON objects keyed by column name."""
+    return ''.join(
+        json.dumps(dict(zip(columns, row)), default=_json_default, separators=(',', ':')) + '\n'
+        for row in rows
+    )
+
+
+def encode_csv(rows: Sequence[Sequence[Any]]) -> str:
+    """Encode rows as CSV lines; JSON columns are written as compact JSON text."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def stream_export(
+    conn,
+    cursor,
+    dataset: str,
+    export_format: str,
+    fetch_size: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Yield the rows of an executed cursor as NDJSON or CSV chunks.
+
+    The connection is closed when the stream ends, fails or is abandoned by
+    the client. A CSV export starts with a header line even when no rows match.
+    A database error mid-stream is re-raised after the rows already fetched
+    were yielded, so the server aborts the response.
+
+    Args:
+        conn: Connection owning the cursor (closed afterwards)
+        cursor: Executed (named) cursor returning tuples
+        dataset: Dataset name, for metrics and logs
+        export_format: 'ndjson' or 'csv'
+        fetch_size: Rows per chunk (default: EXPORT_FETCH_SIZE)
+    """
+    fetch_size = fetch_size or EXPORT_FETCH_SIZE
+    exported = 0
+    outcome = 'error'
+    try:
+        rows = cursor.fetchmany(fetch_size)
+        # A named cursor only has a description after its first fetch
+        columns: List[str] = [column[0] for column in cursor.description or []]
+        if export_format == 'csv':
+            header = io.StringIO()
+            csv.writer(header, lineterminator='\n').writerow(columns)
+            yield header.getvalue().encode('utf-8')
+
+        while rows:
+            if export_format == 'csv':
+                chunk = encode_csv(rows)
+            else:
+                chunk = encode_ndjson(columns, rows)
+            exported += len(rows)
+            EXPORT_ROWS.labels(dataset=dataset, format=export_format).inc(len(rows))
+            yield chunk.encode('utf-8')
+            rows = cursor.fetchmany(fetch_size)
+        outcome = 'completed'
+    except GeneratorExit:
+        outcome = 'aborted'
+        raise
+    except Exception as e:
+        # Headers are already sent; re-raising aborts the response so the client
+        # gets an incomplete transfer instead of a truncated body that looks complete
+        logger.error(f"Export of {dataset} failed after {exported} rows: {str(e)}")
+        raise
+    finally:
+        EXPORTS.labels(dataset=dataset, outcome=outcome).inc()
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        conn.close()
+
+    logger.info(f"Exported {exported} {dataset} rows as {export_format}")
@@ -0,0 +1,197 @@
+"""
+Fleet capacity and throughput metrics.
+
+Per-VM heartbeat and completion counters are kept per minute in
+vm_throughput_minute. Completions are written by a queue trigger when an
+entry reaches its final status; heartbeats are counted on the vm_health row
+and moved into the minute buckets by a rollup job, so a heartbeat costs no
+extra row write. Queue depth covers the in-progress statuses only (PENDING
+and PROCESSING), counted from a partial index by a refresh job and served
+from memory, so finished entries never make the count grow. This module turns the raw counter sums into
+per-VM, per-server and fleet-wide rates, and prunes old buckets.
+
+Configuration (environment variables):
+- FLEET_METRICS_WINDOW_MINUTES: Default aggregation window (default: 15)
+- FLEET_METRICS_RETENTION_HOURS: How long per-minute buckets are kept (default: 48)
+- FLEET_METRICS_PRUNE_INTERVAL_SECONDS: Delay between pruning runs (default: 3600)
+- FLEET_METRICS_ROLLUP_INTERVAL_SECONDS: Delay between heartbeat rollups (default: 60)
+- QUEUE_DEPTH_REFRESH_SECONDS: Delay between queue depth counts (default: 15)
+"""
+
+import os
+import time
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.utils.metrics import QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+FLEET_METRICS_WINDOW_MINUTES = int(os.getenv('FLEET_METRICS_WINDOW_MINUTES', '15'))
+FLEET_METRICS_RETENTION_HOURS = int(os.getenv('FLEET_METRICS_RETENTION_HOURS', '48'))
+FLEET_METRICS_PRUNE_INTERVAL_SECONDS = int(os.getenv('FLEET_METRICS_PRUNE_INTERVAL_SECONDS', '3600'))
+FLEET_METRICS_ROLLUP_INTERVAL_SECONDS = int(os.getenv('FLEET_METRICS_ROLLUP_INTERVAL_SECONDS', '60'))
+QUEUE_DEPTH_REFRESH_SECONDS = int(os.getenv('QUEUE_DEPTH_REFRESH_SECONDS', '15'))
+
+QUEUE_DEPTH_STATUSES = ('PENDING', 'PROCESSING')
+
+# (counted_at monotonic, status -> count) from the last refresh in this worker
+_queue_depth: Optional[Tuple[float, Dict[str, int]]] = None
+
+
+def _rates(counters: Dict[str, Any], window_minutes: int) -> Dict[str, Any]:
+    """Derive throughput, mean processing time and idle ratio from counter sums."""
+    completed = counters['completed']
+    heartbeats = counters['heartbeats']
+    return {
+        'completed': completed,
+        'failed': counters['failed'],
+        'throughput_per_minute': round(completed / window_minutes, 3) if window_minutes else 0.0,
+        'mean_processing_seconds': (
+            round(counters['processing_seconds'] / completed, 2) if completed else None
+        ),
+        'idle_ratio': round(counters['idle_heartbeats'] / heartbeats, 3) if heartbeats else None,
+        'heartbeats': heartbeats,
+    }
+
+
+def summarize_fleet_metrics(
+    vm_counters: List[Dict[str, Any]],
+    queue_depth: Dict[str, int],
+    window_minutes: int
+) -> Dict[str, Any]:
+    """
+    Roll per-VM counter sums up into VM, server and fleet metrics.
+
+    Args:
+        vm_counters: Per-VM counter sums as returned by get_fleet_throughput_counters
+        queue_depth: Queue entry count per in-progress status
+        window_minutes: Length of the window the counters cover
+
+    Returns:
+        Dictionary with window_minutes, fleet, servers, vms and queue_depth
+    """
+    counter_keys = ('heartbeats', 'idle_heartbeats', 'completed', 'failed', 'processing_seconds')
+    fleet_totals = {key: 0 for key in counter_keys}
+    server_totals: Dict[str, Dict[str, Any]] = {}
+    vms = []
+
+    for vm in vm_counters:
+        vms.append({
+            'vm_id': vm['vm_id'],
+            'server_id': vm.get('server_id'),
+            'status': vm.get('status'),
+            **_rates(vm, window_minutes),
+        })
+
+        server_id = vm.get('server_id') or 'unassigned'
+        totals = server_totals.setdefault(
+            server_id, {'vm_count': 0, **{key: 0 for key in counter_keys}}
+        )
+        totals['vm_count'] += 1
+        for key in counter_keys:
+            totals[key] += vm[key]
+            fleet_totals[key] += vm[key]
+
+    servers = [
+        {'server_id': server_id, 'vm_count': totals['vm_count'], **_rates(totals, window_minutes)}
+        for server_id, totals in sorted(server_totals.items())
+    ]
+
+    return {
+        'window_minutes': window_minutes,
+        'fleet': {'vm_count': len(vms), **_rates(fleet_totals, window_minutes)},
+        'servers': servers,
+        'vms': vms,
+        'queue_depth': {status: queue_depth.get(status, 0) for status in QUEUE_DEPTH_STATUSES},
+    }
+
+
+def get_fleet_metrics(conn, window_minutes: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Read fleet counters and summarize them.
+
+    Args:
+        conn: PostgreSQL database connection
+        window_minutes: Override FLEET_METRICS_WINDOW_MINUTES
+
+    Returns:
+        Summary as returned by summarize_fleet_metrics
+    """
+    from app.api.database import get_fleet_throughput_counters
+
+    window = window_minutes or FLEET_METRICS_WINDOW_MINUTES
+    counters = get_fleet_throughput_counters(conn, window_minutes=window)
+    return summarize_fleet_metrics(counters['vms'], get_queue_depth(conn), window)
+
+
+def get_cached_queue_depth() -> Optional[Dict[str, int]]:
+    """Queue depth from the last refresh in this worker, or None before the first one."""
+    return dict(_queue_depth[1]) if _queue_depth else None
+
+
+def get_queue_depth(conn) -> Dict[str, int]:
+    """Queue entry count per in-progress status; counted on conn when the cached value is missing or stale."""
+    if _queue_depth and time.monotonic() - _queue_depth[0] < 2 * QUEUE_DEPTH_REFRESH_SECONDS:
+        return dict(_queue_depth[1])
+    return _store_queue_depth(conn)
+
+
+def _store_queue_depth(conn) -> Dict[str, int]:
+    global _queue_depth
+    from app.api.database import count_queue_by_status
+
+    counts = count_queue_by_status(conn, QUEUE_DEPTH_STATUSES)
+    _queue_depth = (time.monotonic(), {status: counts.get(status, 0) for status in QUEUE_DEPTH_STATUSES})
+    for status, entry_count in _queue_depth[1].items():
+        QUEUE_DEPTH.labels(status=status).set(entry_count)
+    return dict(_queue_depth[1])
+
+
+def run_queue_depth_refresh() -> Dict[str, int]:
+    """Count in-progress queue entries per status and cache the result."""
+    from app.api.database import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        return _store_queue_depth(conn)
+    finally:
+        conn.close()
+
+
+def run_vm_heartbeat_rollup() -> int:
+    """Move heartbeats counted on vm_health into the per-minute buckets."""
+    from app.api.database import get_db_connection, rollup_vm_heartbeats
+
+    conn = get_db_connection()
+    try:
+        return rollup_vm_heartbeats(conn)
+    finally:
+        conn.close()
+
+
+def run_fleet_metrics_pruning() -> int:
+    """Delete throughput buckets older than FLEET_METRICS_RETENTION_HOURS."""
+    from app.api.database import get_db_connection, prune_vm_throughput
+
+    conn = get_db_connection()
+    try:
+        deleted = prune_vm_throughput(conn, retention_hours=FLEET_METRICS_RETENTION_HOURS)
+    finally:
+        conn.close()
+
+    if deleted:
+        logger.info(f"Pruned {deleted} VM throughput buckets older than {FLEET_METRICS_RETENTION_HOURS}h")
+    return deleted
+
+
+def register_fleet_metrics_jobs() -> None:
+    """Register the heartbeat rollup, queue depth refresh and bucket pruning jobs."""
+    from app.utils.background_jobs import register_periodic_job
+    register_periodic_job(
+        'fleet_heartbeat_rollup', FLEET_METRICS_ROLLUP_INTERVAL_SECONDS, run_vm_heartbeat_rollup
+    )
+    register_periodic_job('queue_depth_refresh', QUEUE_DEPTH_REFRESH_SECONDS, run_queue_depth_refresh)
+    register_periodic_job(
+        'fleet_metrics_pruning', FLEET_METRICS_PRUNE_INTERVAL_SECONDS, run_fleet_metrics_pruning
+    )
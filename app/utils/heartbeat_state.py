@@ -0,0 +1,163 @@
+"""
+In-memory heartbeat metadata state for delta-encoded heartbeats.
+
+VMs and servers may send `metadataDelta` (only the metrics that changed, with
+`null` removing a key) plus a `metadataVersion` counter instead of resending
+the full `metadata` blob on every beat. This module keeps the last persisted
+metadata and version per VM/server so a heartbeat can be resolved without
+reading the row first.
+
+The cache is per worker and may be stale (another worker or a PATCH may have
+written the row since), so it is never used to decide that the database
+already holds a value. Full snapshots are always sent to the database, which
+only replaces the stored JSONB (and its TOAST chunks) when it differs, and
+deltas are persisted as a JSONB merge of the sent keys. A delta whose version
+does not follow the known version is not applied; the response asks the
+client to resend the full metadata.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (kind, entity_id) -> (metadata_version, metadata); kind is 'vm' or 'server'
+_heartbeat_state: "OrderedDict[Tuple[str, str], Tuple[int, Optional[Dict[str, Any]]]]" = OrderedDict()
+_state_size_limit = 5000
+_state_lock = threading.Lock()
+
+
+def _get_state(kind: str, entity_id: str) -> Optional[Tuple[int, Optional[Dict[str, Any]]]]:
+    with _state_lock:
+        return _heartbeat_state.get((kind, entity_id))
+
+
+def remember_heartbeat_metadata(
+    kind: str,
+    entity_id: str,
+    version: Optional[int],
+    metadata: Optional[Dict[str, Any]]
+) -> None:
+    """
+    Record the persisted metadata and version for a VM or server.
+
+    Call after the heartbeat has been saved, with the values returned by the
+    database.
+    """
+    with _state_lock:
+        _heartbeat_state[(kind, entity_id)] = (version or 0, metadata)
+        _heartbeat_state.move_to_end((kind, entity_id))
+        while len(_heartbeat_state) > _state_size_limit:
+            _heartbeat_state.popitem(last=False)
+
+
+def forget_heartbeat_metadata(kind: str, entity_id: str) -> None:
+    """Drop cached state, e.g. after metadata was changed outside a heartbeat."""
+    with _state_lock:
+        _heartbeat_state.pop((kind, entity_id), None)
+
+
+def heartbeat_metadata_mode(
+    metadata: Optional[Dict[str, Any]],
+    metadata_delta: Optional[Dict[str, Any]]
+) -> str:
+    """Describe how a heartbeat sent its metadata: 'delta', 'full' or 'none'."""
+    if metadata_delta is not None:
+        return 'delta'
+    if metadata is not None:
+        return 'full'
+    return 'none'
+
+
+def resolve_heartbeat_metadata(
+    kind: str,
+    entity_id: str,
+    metadata: Optional[Dict[str, Any]],
+    metadata_delta: Optional[Dict[str, Any]],
+    metadata_version: Optional[int],
+    load_persisted: Callable[[], Tuple[int, Optional[Dict[str, Any]]]]
+) -> Dict[str, Any]:
+    """
+    Work out what a heartbeat changes in the stored metadata.
+
+    Args:
+        kind: 'vm' or 'server'
+        entity_id: VM or server identifier
+        metadata: Full metadata snapshot from the request (None if not sent)
+        metadata_delta: Changed metrics from the request (None if not sent);
+            a None value removes the key
+        metadata_version: Client version counter for the resulting metadata
+        load_persisted: Callable returning (version, metadata) from the database,
+            used when this worker has no (or stale) cached state
+
+    Returns:
+        Dictionary with:
+        - updates: fields to pass to save_vm_health/save_server_health
+          (metadata, metadata_delta, metadata_removed, metadata_version), empty
+          when nothing needs to be written
+        - metadata: resolved metadata after the heartbeat
+        - resync_required: True when a delta was rejected because of a version gap
+
+    Raises:
+        ValueError: If both metadata and metadataDelta are sent, or a delta has
+            no version
+    """
+    if metadata is not None and metadata_delta is not None:
+        raise ValueError("Send either metadata or metadataDelta, not both.")
+    if metadata_delta is not None and metadata_version is None:
+        raise ValueError("metadataVersion is required when sending metadataDelta.")
+
+    state = _get_state(kind, entity_id)
+    if state is None:
+        state = load_persisted()
+    known_version, known_metadata = state
+
+    if metadata is None and metadata_delta is None and metadata_version is not None:
+        # Versioned client with nothing changed since the last heartbeat
+        if metadata_version != known_version:
+            known_version, known_metadata = load_persisted()
+        return {
+            'updates': {},
+            'metadata': known_metadata,
+            'resync_required': metadata_version != known_version,
+        }
+
+    if metadata_delta is None:
+        # Full snapshot (or, from unversioned clients, no metadata, which clears it as before).
+        # Always persisted: the database skips the JSONB rewrite when the value is unchanged
+        updates: Dict[str, Any] = {'metadata': metadata}
+        if metadata_version is not None:
+            updates['metadata_version'] = metadata_version
+        return {'updates': updates, 'metadata': metadata, 'resync_required': False}
+
+    if metadata_version != known_version + 1:
+        # Cached state may be behind another worker; check the database once
+        known_version, known_metadata = load_persisted()
+        if metadata_version != known_version + 1:
+            logger.info(
+                f"Heartbeat delta for {kind} {entity_id} has version {metadata_version}, "
+                f"expected {known_version + 1}; requesting full metadata"
+            )
+            return {'updates': {}, 'metadata': known_metadata, 'resync_required': True}
+
+    # Every sent key is merged, even if the cache already has the value: the
+    # stored row may differ from this worker's cache
+    current = known_metadata or {}
+    changed = {key: value for key, value in metadata_delta.items() if value is not None}
+    removed: List[str] = [key for key, value in metadata_delta.items() if value is None]
+
+    merged = {key: value for key, value in current.items() if key not in removed}
+    merged.update(changed)
+
+    updates = {'metadata_version': metadata_version}
+    if changed or removed:
+        updates['metadata_delta'] = changed
+        updates['metadata_removed'] = removed
+
+    return {
+        'updates': updates,
+        'metadata': merged if (merged or known_metadata is not None) else None,
+        'resync_required': False,
+    }
@@ -15,6 +15,8 @@ import logging
 from typing import Optional, Dict
 from collections import OrderedDict
 
+from app.utils.metrics import IMAGE_CACHE_BYTES, IMAGE_CACHE_ENTRIES, IMAGE_CACHE_LOOKUPS
+
 logger = logging.getLogger(__name__)
 
 # In-memory cache configuration
@@ -40,11 +42,19 @@ def get_cached_image(image_path: str) -> Optional[bytes]:
         # Move to end (LRU - most recently used)
         _image_cache.move_to_end(image_path)
         logger.debug(f"Image cache hit: {image_path}")
+        IMAGE_CACHE_LOOKUPS.labels(result='hit').inc()
         return _image_cache[image_path]
     
+    IMAGE_CACHE_LOOKUPS.labels(result='miss').inc()
     return None
 
 
+def _update_cache_gauges() -> None:
+    """Publish current cache size to the metrics gauges."""
+    IMAGE_CACHE_ENTRIES.set(len(_image_cache))
+    IMAGE_CACHE_BYTES.set(_current_cache_size)
+
+
 def cache_image(image_path: str, image_bytes: bytes) -> None:
     """
     Cache image in memory.
@@ -89,6 +99,7 @@ def cache_image(image_path: str, image_bytes: bytes) -> None:
             _image_cache[image_path] = image_bytes
             _current_cache_size += image_size
             logger.debug(f"Image cached: {image_path} ({image_size} bytes)")
+        _update_cache_gauges()
     else:
         logger.debug(f"Image too large to cache: {image_path} ({image_size} bytes)")
 
@@ -116,6 +127,8 @@ def clear_cache(image_path: Optional[str] = None) -> None:
         _image_cache.clear()
         _current_cache_size = 0
         logger.debug("Cleared all images from cache")
+    
+    _update_cache_gauges()
 
 
 def get_cache_stats() -> Dict[str, any]:
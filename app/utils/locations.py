@@ -2,8 +2,21 @@
 """
 Location mapping for Exer Urgent Care locations.
 Maps location names to their corresponding location IDs.
+
+Also holds the in-process cache of the location directory (the locations
+table merged with LOCATION_MAP) used by the dashboard dropdown.
+
+Configuration (environment variables):
+- LOCATIONS_CACHE_SECONDS: How long the location directory is cached (default: 300)
 """
 
+import os
+import time
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+LOCATIONS_CACHE_SECONDS = float(os.getenv('LOCATIONS_CACHE_SECONDS', '300'))
+
 # Mapping of location names to location IDs
 LOCATION_MAP = {
     "Exer Urgent Care - Anaheim - Euclid St": "AWRBj6",
@@ -151,6 +164,58 @@ def list_all_location_ids():
     return sorted(LOCATION_MAP.values())
 
 
+_directory_cache: Optional[List[Dict[str, Optional[str]]]] = None
+_directory_cached_at = 0.0
+_directory_lock = threading.Lock()
+
+
+def merge_location_directory(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Optional[str]]]:
+    """
+    Merge locations table rows with LOCATION_MAP.
+
+    Every location in either source is listed once, sorted by location ID. A
+    name from the database wins; LOCATION_MAP fills in missing names.
+
+    Args:
+        rows: Rows with location_id and location_name
+
+    Returns:
+        List of {"location_id", "location_name"} dictionaries
+    """
+    names: Dict[str, Optional[str]] = dict(LOCATION_ID_TO_NAME)
+    for row in rows:
+        location_id = row.get("location_id")
+        if location_id:
+            names[location_id] = row.get("location_name") or names.get(location_id)
+    return [
+        {"location_id": location_id, "location_name": name}
+        for location_id, name in sorted(names.items())
+    ]
+
+
+def get_cached_location_directory() -> Optional[List[Dict[str, Optional[str]]]]:
+    """Return the cached location directory, or None when missing or expired."""
+    with _directory_lock:
+        if _directory_cache is None or time.monotonic() - _directory_cached_at >= LOCATIONS_CACHE_SECONDS:
+            return None
+        return [dict(location) for location in _directory_cache]
+
+
+def cache_location_directory(locations: List[Dict[str, Optional[str]]]) -> None:
+    """Cache the location directory for LOCATIONS_CACHE_SECONDS."""
+    global _directory_cache, _directory_cached_at
+    with _directory_lock:
+        _directory_cache = [dict(location) for location in locations]
+        _directory_cached_at = time.monotonic()
+
+
+def invalidate_location_directory() -> None:
+    """Drop the cached location directory (after this process adds or renames a location)."""
+    global _directory_cache
+    with _directory_lock:
+        _directory_cache = None
+
+
 if __name__ == "__main__":
     # Example usage
     print("Location Mapping Examples:")
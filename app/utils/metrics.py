@@ -0,0 +1,200 @@
+"""
+Prometheus metrics for API internals.
+
+Counters and histograms are defined here and updated from the routes and
+utilities they describe; GET /metrics renders them in the Prometheus text
+format.
+
+Multiple uvicorn workers: set PROMETHEUS_MULTIPROC_DIR to an empty, writable
+directory (cleared on deploy) before the workers start. Each worker then
+writes its samples to memory-mapped files in that directory and /metrics
+aggregates all workers, whichever worker serves the scrape. Without it,
+each worker only reports its own samples.
+
+prometheus-client is optional: if it is not installed every metric is a
+no-op and /metrics returns 503.
+
+Configuration (environment variables):
+- METRICS_ENABLED: Expose GET /metrics and record request metrics (default: true)
+- METRICS_API_KEY: X-API-Key required by GET /metrics (default: falls back to API_KEY)
+- PROMETHEUS_MULTIPROC_DIR: Shared directory for multi-worker metrics (default: unset)
+"""
+
+import os
+import logging
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        REGISTRY,
+        generate_latest,
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    logger.warning("prometheus-client not installed. GET /metrics will be unavailable.")
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _NoopMetric:
+    """Stand-in used when prometheus-client is not installed."""
+
+    def labels(self, *args: Any, **kwargs: Any) -> "_NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+def _counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Any:
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+def _histogram(name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Optional[Tuple[float, ...]] = None) -> Any:
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    if buckets:
+        return Histogram(name, documentation, labelnames, buckets=buckets)
+    return Histogram(name, documentation, labelnames)
+
+
+def _gauge(name: str, documentation: str, labelnames: Tuple[str, ...] = (), multiprocess_mode: str = 'livesum') -> Any:
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    # livesum (default): sum the values of live workers (per-worker caches, open connections)
+    return Gauge(name, documentation, labelnames, multiprocess_mode=multiprocess_mode)
+
+
+# HTTP (all routes, labelled by route template to keep cardinality bounded)
+HTTP_REQUESTS = _counter(
+    'api_http_requests_total', 'HTTP requests handled', ('method', 'route', 'status')
+)
+HTTP_REQUEST_DURATION = _histogram(
+    'api_http_request_duration_seconds', 'HTTP request latency', ('method', 'route')
+)
+
+# Experity mapping
+MAPPING_DURATION = _histogram(
+    'api_experity_mapping_duration_seconds',
+    'End-to-end latency of successful Experity mappings, including retries',
+    buckets=(1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300),
+)
+AZURE_AGENT_RETRIES = _counter(
+    'api_azure_agent_retries_total', 'Azure AI agent calls retried by the mapping endpoint', ('reason',)
+)
+
+# Validation
+VALIDATIONS = _counter(
+    'api_validations_total', 'Encounter/EMR validations run', ('outcome',)
+)
+
+# Image cache
+IMAGE_CACHE_LOOKUPS = _counter(
+    'api_image_cache_lookups_total', 'Image cache lookups', ('result',)
+)
+IMAGE_CACHE_BYTES = _gauge('api_image_cache_bytes', 'Bytes held in the in-memory image caches')
+IMAGE_CACHE_ENTRIES = _gauge('api_image_cache_entries', 'Images held in the in-memory image caches')
+
+# Remote API reads
+REMOTE_READ_CACHE = _counter(
+    'api_remote_read_cache_total', 'Remote API read cache lookups', ('result',)
+)
+
+# Database
+DB_CONNECTIONS = _counter(
+    'api_db_connections_total', 'Database connections opened', ('outcome',)
+)
+DB_CONNECT_DURATION = _histogram(
+    'api_db_connect_duration_seconds', 'Time to open a database connection',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+# Health
+HEARTBEATS = _counter(
+    'api_heartbeats_total', 'VM and server heartbeats ingested', ('kind', 'metadata')
+)
+
+# Alert notifications
+ALERT_NOTIFICATIONS = _counter(
+    'api_alert_notifications_total', 'Alert notification deliveries from the outbox', ('channel', 'outcome')
+)
+
+# Background jobs
+BACKGROUND_JOB_RUNS = _counter(
+    'api_background_job_runs_total', 'Background job runs', ('job', 'outcome')
+)
+
+# Pending patient promotion
+PATIENT_PROMOTIONS = _counter(
+    'api_patient_promotions_total', 'Pending patients promoted into patients', ('outcome',)
+)
+PATIENT_PROMOTION_LAG = _histogram(
+    'api_patient_promotion_lag_seconds',
+    'Time a pending patient with an EMR ID waited before promotion',
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+
+# Queue depth, counted by the queue_depth_refresh job (see app.utils.fleet_metrics);
+# every worker counts the same table, so report the most recent count
+QUEUE_DEPTH = _gauge(
+    'api_queue_depth', 'In-progress queue entries per status', ('status',), multiprocess_mode='mostrecent'
+)
+
+# Streaming exports
+EXPORT_ROWS = _counter(
+    'api_export_rows_total', 'Rows streamed by export endpoints', ('dataset', 'format')
+)
+EXPORTS = _counter(
+    'api_exports_total', 'Export requests by outcome', ('dataset', 'outcome')
+)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Returns:
+        Tuple of (body, content type)
+
+    Raises:
+        RuntimeError: If prometheus-client is not installed
+    """
+    if not PROMETHEUS_AVAILABLE:
+        raise RuntimeError("prometheus-client is not installed")
+
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        # Aggregate every worker's samples from the shared directory
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_stopped() -> None:
+    """Drop this worker's live gauge samples on shutdown (multi-worker mode only)."""
+    if PROMETHEUS_AVAILABLE and os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(os.getpid())
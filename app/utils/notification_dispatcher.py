@@ -0,0 +1,301 @@
+"""
+Background delivery of queued alert notifications.
+
+Alert endpoints write notifications to the alert_notification_outbox table in
+the same transaction as the alert, so requests never wait on SMTP or Slack.
+This module claims due outbox rows, delivers them and records the outcome:
+
+- Emails in a batch share one SMTP connection (one TLS handshake and login).
+- Slack messages are posted concurrently through a shared httpx.Client, which
+  keeps the connection to the webhook host alive between batches.
+- Rows queued with the same digest key (related alerts held by
+  app.utils.alert_digest) are sent as one digest per channel.
+- Failed deliveries are retried with exponential backoff until
+  ALERT_OUTBOX_MAX_ATTEMPTS, then marked FAILED.
+
+Rows are claimed with FOR UPDATE SKIP LOCKED and a lease, so every worker can
+run the dispatcher; a worker that dies mid-batch releases its rows when the
+lease expires (delivery is at-least-once).
+
+Configuration (environment variables):
+- ALERT_OUTBOX_ENABLED: Run the dispatcher in this process (default: true)
+- ALERT_OUTBOX_INTERVAL_SECONDS: Delay between dispatch runs (default: 5)
+- ALERT_OUTBOX_BATCH_SIZE: Notifications claimed per batch (default: 50)
+- ALERT_OUTBOX_CONCURRENCY: Parallel deliveries per batch (default: 4)
+- ALERT_OUTBOX_MAX_ATTEMPTS: Attempts before a notification is marked FAILED (default: 8)
+- ALERT_OUTBOX_RETRY_BASE_SECONDS: First retry delay, doubled per attempt (default: 30)
+- ALERT_OUTBOX_RETRY_MAX_SECONDS: Upper bound for the retry delay (default: 3600)
+- ALERT_OUTBOX_RETENTION_DAYS: How long SENT/FAILED rows are kept (default: 7)
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils import notifications
+from app.utils.metrics import ALERT_NOTIFICATIONS
+
+logger = logging.getLogger(__name__)
+
+ALERT_OUTBOX_ENABLED = os.getenv('ALERT_OUTBOX_ENABLED', 'true').lower() == 'true'
+ALERT_OUTBOX_INTERVAL_SECONDS = int(os.getenv('ALERT_OUTBOX_INTERVAL_SECONDS', '5'))
+ALERT_OUTBOX_BATCH_SIZE = int(os.getenv('ALERT_OUTBOX_BATCH_SIZE', '50'))
+ALERT_OUTBOX_CONCURRENCY = int(os.getenv('ALERT_OUTBOX_CONCURRENCY', '4'))
+ALERT_OUTBOX_MAX_ATTEMPTS = int(os.getenv('ALERT_OUTBOX_MAX_ATTEMPTS', '8'))
+ALERT_OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('ALERT_OUTBOX_RETRY_BASE_SECONDS', '30'))
+ALERT_OUTBOX_RETRY_MAX_SECONDS = int(os.getenv('ALERT_OUTBOX_RETRY_MAX_SECONDS', '3600'))
+ALERT_OUTBOX_RETENTION_DAYS = int(os.getenv('ALERT_OUTBOX_RETENTION_DAYS', '7'))
+
+# Claimed rows become due again after this long if the batch never completes
+_CLAIM_LEASE_SECONDS = 300
+
+_http_client: Any = None
+_http_client_lock = threading.Lock()
+
+
+def _get_http_client() -> Any:
+    """Return the shared httpx.Client used for Slack webhooks."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None and notifications.HTTPX_AVAILABLE:
+            _http_client = notifications.httpx.Client(timeout=10.0)
+        return _http_client
+
+
+def close_notification_clients() -> None:
+    """Close the shared HTTP client (called on shutdown)."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+
+
+def notification_retry_delay(attempts: int) -> int:
+    """
+    Seconds to wait before retrying a notification.
+
+    Args:
+        attempts: Delivery attempts made so far (1 after the first failure)
+
+    Returns:
+        ALERT_OUTBOX_RETRY_BASE_SECONDS doubled per previous attempt, capped at
+        ALERT_OUTBOX_RETRY_MAX_SECONDS
+    """
+    exponent = max(attempts - 1, 0)
+    if exponent >= 30:
+        return ALERT_OUTBOX_RETRY_MAX_SECONDS
+    return min(ALERT_OUTBOX_RETRY_BASE_SECONDS * (2 ** exponent), ALERT_OUTBOX_RETRY_MAX_SECONDS)
+
+
+def _group_deliveries(rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Group rows into deliveries: one per digest key and channel, one per other row."""
+    deliveries: List[List[Dict[str, Any]]] = []
+    digests: Dict[Any, List[Dict[str, Any]]] = {}
+    for row in rows:
+        digest_key = row.get('digest_key')
+        if digest_key and row['event'] == 'created':
+            group = digests.get((digest_key, row['channel']))
+            if group is None:
+                group = digests[(digest_key, row['channel'])] = []
+                deliveries.append(group)
+            group.append(row)
+        else:
+            deliveries.append([row])
+    return deliveries
+
+
+def _send_email_batch(deliveries: List[List[Dict[str, Any]]]) -> Dict[str, Optional[str]]:
+    """Send queued emails over one SMTP connection; returns outbox_id -> error (None if sent)."""
+    results: Dict[str, Optional[str]] = {}
+    server = None
+
+    try:
+        for group in deliveries:
+            outbox_ids = [str(row['outbox_id']) for row in group]
+            if server is None:
+                try:
+                    server = notifications.open_smtp_connection()
+                except Exception as e:
+                    results.update({outbox_id: f"SMTP connection failed: {str(e)}" for outbox_id in outbox_ids})
+                    continue
+
+            if len(group) > 1:
+                sent = notifications.send_alert_digest_email([row['payload'] for row in group], server=server)
+            elif group[0]['event'] == 'resolved':
+                sent = notifications.send_alert_resolution_email(group[0]['payload'], server=server)
+            else:
+                sent = notifications.send_alert_creation_email(group[0]['payload'], server=server)
+
+            if sent:
+                results.update({outbox_id: None for outbox_id in outbox_ids})
+            else:
+                results.update({outbox_id: "Email delivery failed" for outbox_id in outbox_ids})
+                # The connection may be unusable; reconnect for the next email
+                _close_smtp_connection(server)
+                server = None
+    finally:
+        if server is not None:
+            _close_smtp_connection(server)
+
+    return results
+
+
+def _close_smtp_connection(server: Any) -> None:
+    try:
+        server.quit()
+    except Exception:
+        pass
+
+
+def _send_slack(group: List[Dict[str, Any]]) -> Optional[str]:
+    """Post one queued Slack message or digest; returns an error message or None if sent."""
+    if len(group) > 1:
+        sent = notifications.send_slack_digest_notification(
+            [row['payload'] for row in group], client=_get_http_client()
+        )
+    else:
+        sent = notifications.send_slack_notification(group[0]['payload'], client=_get_http_client())
+    return None if sent else "Slack delivery failed"
+
+
+def deliver_notifications(rows: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    """
+    Deliver claimed outbox rows.
+
+    Rows sharing a digest key and channel are sent as one digest. The email
+    batch and each Slack message run concurrently on a thread pool of
+    ALERT_OUTBOX_CONCURRENCY workers.
+
+    Args:
+        rows: Claimed outbox rows (outbox_id, event, channel, payload, digest_key)
+
+    Returns:
+        Dictionary mapping outbox_id to an error message, or None if delivered
+    """
+    results: Dict[str, Optional[str]] = {}
+    deliveries = _group_deliveries(rows)
+    email_deliveries = [group for group in deliveries if group[0]['channel'] == 'email']
+    slack_deliveries = [group for group in deliveries if group[0]['channel'] == 'slack']
+
+    with ThreadPoolExecutor(max_workers=max(ALERT_OUTBOX_CONCURRENCY, 1)) as executor:
+        email_future = executor.submit(_send_email_batch, email_deliveries) if email_deliveries else None
+        slack_futures = [(group, executor.submit(_send_slack, group)) for group in slack_deliveries]
+
+        if email_future is not None:
+            try:
+                results.update(email_future.result())
+            except Exception as e:
+                for group in email_deliveries:
+                    for row in group:
+                        results[str(row['outbox_id'])] = f"Email delivery failed: {str(e)}"
+
+        for group, future in slack_futures:
+            try:
+                error = future.result()
+            except Exception as e:
+                error = f"Slack delivery failed: {str(e)}"
+            for row in group:
+                results[str(row['outbox_id'])] = error
+
+    return results
+
+
+def dispatch_notification_batch(
+    conn,
+    deliver: Callable[[List[Dict[str, Any]]], Dict[str, Optional[str]]] = deliver_notifications
+) -> int:
+    """
+    Claim, deliver and complete one batch of due notifications.
+
+    Args:
+        conn: Database connection
+        deliver: Delivery function (rows -> outbox_id -> error or None)
+
+    Returns:
+        Number of notifications claimed
+    """
+    from app.api.database import claim_alert_notifications, complete_alert_notifications
+
+    rows = claim_alert_notifications(
+        conn, limit=ALERT_OUTBOX_BATCH_SIZE, lease_seconds=_CLAIM_LEASE_SECONDS
+    )
+    if not rows:
+        return 0
+
+    results = deliver(rows)
+
+    sent_ids = []
+    failures = []
+    for row in rows:
+        outbox_id = str(row['outbox_id'])
+        error = results.get(outbox_id, "Not delivered")
+        if error is None:
+            sent_ids.append(outbox_id)
+            ALERT_NOTIFICATIONS.labels(channel=row['channel'], outcome='sent').inc()
+            continue
+
+        give_up = row['attempts'] >= ALERT_OUTBOX_MAX_ATTEMPTS
+        failures.append((outbox_id, error, give_up, notification_retry_delay(row['attempts'])))
+        ALERT_NOTIFICATIONS.labels(
+            channel=row['channel'], outcome='failed' if give_up else 'retry'
+        ).inc()
+        if give_up:
+            logger.error(
+                f"Giving up on {row['channel']} notification {outbox_id} for alert "
+                f"{row['alert_id']} after {row['attempts']} attempts: {error}"
+            )
+
+    complete_alert_notifications(conn, sent_ids, failures)
+    return len(rows)
+
+
+def run_notification_dispatch() -> int:
+    """Deliver due notifications until the outbox has no full batch left."""
+    from app.api.database import get_db_connection
+
+    conn = get_db_connection()
+    total = 0
+    try:
+        while True:
+            claimed = dispatch_notification_batch(conn)
+            total += claimed
+            if claimed < ALERT_OUTBOX_BATCH_SIZE:
+                break
+    finally:
+        conn.close()
+
+    if total:
+        logger.info(f"Dispatched {total} alert notifications")
+    return total
+
+
+def run_notification_pruning() -> int:
+    """Delete finished outbox rows older than ALERT_OUTBOX_RETENTION_DAYS."""
+    from app.api.database import get_db_connection, prune_alert_notifications
+
+    conn = get_db_connection()
+    try:
+        deleted = prune_alert_notifications(conn, retention_days=ALERT_OUTBOX_RETENTION_DAYS)
+    finally:
+        conn.close()
+
+    if deleted:
+        logger.info(f"Pruned {deleted} alert notifications older than {ALERT_OUTBOX_RETENTION_DAYS} days")
+    return deleted
+
+
+def register_notification_jobs() -> None:
+    """Register the outbox dispatch and pruning jobs."""
+    from app.utils.background_jobs import register_periodic_job
+
+    if not ALERT_OUTBOX_ENABLED:
+        logger.info("Alert notification dispatcher disabled (ALERT_OUTBOX_ENABLED=false)")
+        return
+
+    register_periodic_job(
+        'alert_notification_dispatch', ALERT_OUTBOX_INTERVAL_SECONDS, run_notification_dispatch
+    )
+    register_periodic_job('alert_notification_pruning', 3600, run_notification_pruning)
@@ -3,6 +3,10 @@ Notification service for sending alerts via email and Slack.
 
 This module provides functions to send alert notifications to configured channels.
 Notifications are optional and failures should not block alert creation or resolution.
+
+The alert endpoints do not call these functions directly: they queue notifications
+in the alert_notification_outbox table (see get_notification_channels) and
+app.utils.notification_dispatcher delivers them in the background.
 """
 
 import os
@@ -93,6 +97,56 @@ def _format_datetime(dt: Any) -> str:
         return str(dt) if dt else 'Unknown'
 
 
+def _validate_slack_config() -> bool:
+    """
+    Validate that Slack configuration is complete and enabled.
+    
+    Returns:
+        True if Slack is properly configured, False otherwise
+    """
+    if not ALERT_SLACK_ENABLED:
+        logger.debug("Slack notifications are disabled")
+        return False
+    
+    if not HTTPX_AVAILABLE:
+        logger.warning("httpx not available for Slack notifications")
+        return False
+    
+    if not ALERT_SLACK_WEBHOOK_URL:
+        logger.warning("Slack webhook URL not configured. Set ALERT_SLACK_WEBHOOK_URL environment variable.")
+        return False
+    
+    return True
+
+
+def _summarize_digest(alerts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Summarize a group of related alerts for a digest notification.
+    
+    Args:
+        alerts: Alert records sharing a source type, severity and message fingerprint
+    
+    Returns:
+        Dictionary with source, severity, count, sample message, first/last
+        created_at and per-source_id counts (most frequent first)
+    """
+    ordered = sorted(alerts, key=lambda alert: str(alert.get('created_at') or ''))
+    source_counts: Dict[str, int] = {}
+    for alert in ordered:
+        source_id = str(alert.get('source_id', 'Unknown'))
+        source_counts[source_id] = source_counts.get(source_id, 0) + 1
+    
+    return {
+        'source': ordered[0].get('source', 'Unknown'),
+        'severity': ordered[0].get('severity', 'Unknown'),
+        'count': len(ordered),
+        'message': ordered[-1].get('message', 'No message'),
+        'first_at': _format_datetime(ordered[0].get('created_at')),
+        'last_at': _format_datetime(ordered[-1].get('created_at')),
+        'source_counts': sorted(source_counts.items(), key=lambda item: (-item[1], item[0])),
+    }
+
+
 def _get_email_recipients() -> List[str]:
     """
     Parse and return list of email recipients.
@@ -121,16 +175,16 @@ def _format_alert_creation_email(alert_data: Dict[str, Any]) -> Tuple[str, str,
         Tuple of (subject, plain_text_body, html_body)
     """
     alert_id = str(alert_data.get('alert_id', 'Unknown'))
-        source = alert_data.get('source', 'Unknown')
-        source_id = alert_data.get('source_id', 'Unknown')
-        severity = alert_data.get('severity', 'Unknown')
-        message = alert_data.get('message', 'No message')
-        details = alert_data.get('details', {})
+    source = alert_data.get('source', 'Unknown')
+    source_id = alert_data.get('source_id', 'Unknown')
+    severity = alert_data.get('severity', 'Unknown')
+    message = alert_data.get('message', 'No message')
+    details = alert_data.get('details', {})
     created_at = _format_datetime(alert_data.get('created_at', 'Unknown'))
-        
-        # Format email subject
-        subject = f"[{severity.upper()}] Alert from {source}: {source_id}"
-        
+    
+    # Format email subject
+    subject = f"[{severity.upper()}] Alert from {source}: {source_id}"
+    
     # Severity color mapping
     severity_colors = {
         'critical': '#FF0000',
@@ -149,7 +203,7 @@ Severity: {severity.upper()}
 Message: {message}
 Created At: {created_at}
 """
-        
+    
     # Don't show details in emails - keep emails clean and focused
     # Details are stored in database and can be viewed via API/web UI if needed
     
@@ -275,11 +329,100 @@ This alert has been marked as resolved.
     return subject, text_body, html_body
 
 
+def _format_alert_digest_email(alerts: List[Dict[str, Any]]) -> Tuple[str, str, str]:
+    """
+    Format email content for a digest of related alerts.
+    
+    Args:
+        alerts: Alert records grouped into one digest
+    
+    Returns:
+        Tuple of (subject, plain_text_body, html_body)
+    """
+    digest = _summarize_digest(alerts)
+    severity = str(digest['severity'])
+    
+    subject = (
+        f"[{severity.upper()}] {digest['count']} related alerts from "
+        f"{len(digest['source_counts'])} {digest['source']} sources"
+    )
+    
+    sources_text = "\n".join(
+        f"  {source_id}: {count}" for source_id, count in digest['source_counts']
+    )
+    text_body = f"""Alert Digest
+
+{digest['count']} related alerts were raised between {digest['first_at']} and {digest['last_at']}.
+
+Source: {digest['source']}
+Severity: {severity.upper()}
+Latest Message: {digest['message']}
+
+Alerts per source:
+{sources_text}
+"""
+    
+    sources_rows = "".join(
+        f"""
+            <tr>
+                <td style="padding: 8px; border: 1px solid #ddd;">{source_id}</td>
+                <td style="padding: 8px; border: 1px solid #ddd;">{count}</td>
+            </tr>"""
+        for source_id, count in digest['source_counts']
+    )
+    html_body = f"""
+    <html>
+    <head></head>
+    <body style="font-family: Arial, sans-serif;">
+        <h2>Alert Digest - {severity.upper()}</h2>
+        <p>{digest['count']} related alerts from {digest['source']} sources were raised
+        between {digest['first_at']} and {digest['last_at']}.</p>
+        <p><b>Latest Message:</b> {digest['message']}</p>
+        <table style="border-collapse: collapse; width: 100%;">
+            <tr>
+                <td style="padding: 8px; border: 1px solid #ddd; font-weight: bold;">Source ID</td>
+                <td style="padding: 8px; border: 1px solid #ddd; font-weight: bold;">Alerts</td>
+            </tr>{sources_rows}
+        </table>
+    </body>
+    </html>
+    """
+    
+    return subject, text_body, html_body
+
+
 # ============================================================================
 # Core Email Sending Function (Private)
 # ============================================================================
 
-def _send_email(subject: str, text_body: str, html_body: str) -> bool:
+def open_smtp_connection() -> Any:
+    """
+    Open an authenticated SMTP connection using the ALERT_EMAIL_* settings.
+    
+    The notification dispatcher keeps one connection open for a whole batch of
+    emails instead of connecting, negotiating TLS and logging in per message.
+    The caller is responsible for calling quit() on the returned connection.
+    
+    Returns:
+        Connected and logged-in smtplib.SMTP (or SMTP_SSL) instance
+    
+    Raises:
+        smtplib.SMTPException, OSError: If the connection or login fails
+    """
+    if ALERT_EMAIL_USE_SSL:
+        # Use SSL (port 465)
+        server = smtplib.SMTP_SSL(ALERT_EMAIL_SMTP_HOST, ALERT_EMAIL_SMTP_PORT, timeout=30)
+    else:
+        # Use TLS (port 587)
+        server = smtplib.SMTP(ALERT_EMAIL_SMTP_HOST, ALERT_EMAIL_SMTP_PORT, timeout=30)
+        if ALERT_EMAIL_USE_TLS:
+            server.starttls()
+    
+    server.login(ALERT_EMAIL_SMTP_USER, ALERT_EMAIL_SMTP_PASSWORD)
+    return server
+
+
+def _send_email(subject: str, text_body: str, html_body: str, server: Any = None) -> bool:
     """
     Core function to send email via SMTP.
     
@@ -290,6 +433,8 @@ def _send_email(subject: str, text_body: str, html_body: str) -> bool:
         subject: Email subject line
         text_body: Plain text email body
         html_body: HTML email body
+        server: Open SMTP connection from open_smtp_connection() to send on;
+            if None, a connection is opened and closed for this email
     
     Returns:
         True if email was sent successfully, False otherwise
@@ -316,18 +461,12 @@ def _send_email(subject: str, text_body: str, html_body: str) -> bool:
         msg.attach(MIMEText(html_body, 'html'))
         
         # Send email
-        if ALERT_EMAIL_USE_SSL:
-            # Use SSL (port 465)
-            server = smtplib.SMTP_SSL(ALERT_EMAIL_SMTP_HOST, ALERT_EMAIL_SMTP_PORT)
+        if server is not None:
+            server.sendmail(ALERT_EMAIL_FROM, recipients, msg.as_string())
         else:
-            # Use TLS (port 587)
-            server = smtplib.SMTP(ALERT_EMAIL_SMTP_HOST, ALERT_EMAIL_SMTP_PORT)
-            if ALERT_EMAIL_USE_TLS:
-            server.starttls()
-        
-            server.login(ALERT_EMAIL_SMTP_USER, ALERT_EMAIL_SMTP_PASSWORD)
-        server.sendmail(ALERT_EMAIL_FROM, recipients, msg.as_string())
-        server.quit()
+            server = open_smtp_connection()
+            server.sendmail(ALERT_EMAIL_FROM, recipients, msg.as_string())
+            server.quit()
         
         logger.info(f"Email sent successfully: {subject}")
         return True
@@ -347,7 +486,7 @@ def _send_email(subject: str, text_body: str, html_body: str) -> bool:
 # Public Email Functions
 # ============================================================================
 
-def send_alert_creation_email(alert_data: Dict[str, Any]) -> bool:
+def send_alert_creation_email(alert_data: Dict[str, Any], server: Any = None) -> bool:
     """
     Send an email notification when an alert is created.
     
@@ -360,19 +499,20 @@ def send_alert_creation_email(alert_data: Dict[str, Any]) -> bool:
             - message: str
             - details: dict (optional)
             - created_at: str or datetime
+        server: Optional open SMTP connection to reuse (see open_smtp_connection)
     
     Returns:
         True if email was sent successfully, False otherwise
     """
     try:
         subject, text_body, html_body = _format_alert_creation_email(alert_data)
-        return _send_email(subject, text_body, html_body)
+        return _send_email(subject, text_body, html_body, server=server)
     except Exception as e:
         logger.error(f"Error formatting or sending alert creation email: {str(e)}", exc_info=True)
         return False
 
 
-def send_alert_resolution_email(alert_data: Dict[str, Any]) -> bool:
+def send_alert_resolution_email(alert_data: Dict[str, Any], server: Any = None) -> bool:
     """
     Send an email notification when an alert is resolved.
     
@@ -386,23 +526,43 @@ def send_alert_resolution_email(alert_data: Dict[str, Any]) -> bool:
             - created_at: str or datetime
             - resolved_at: str or datetime
             - resolved_by: str (optional)
+        server: Optional open SMTP connection to reuse (see open_smtp_connection)
     
     Returns:
         True if email was sent successfully, False otherwise
     """
     try:
         subject, text_body, html_body = _format_alert_resolution_email(alert_data)
-        return _send_email(subject, text_body, html_body)
+        return _send_email(subject, text_body, html_body, server=server)
     except Exception as e:
         logger.error(f"Error formatting or sending alert resolution email: {str(e)}", exc_info=True)
         return False
 
 
+def send_alert_digest_email(alerts: List[Dict[str, Any]], server: Any = None) -> bool:
+    """
+    Send one email summarizing a group of related alerts.
+    
+    Args:
+        alerts: Alert records grouped into one digest (see app.utils.alert_digest)
+        server: Optional open SMTP connection to reuse (see open_smtp_connection)
+    
+    Returns:
+        True if email was sent successfully, False otherwise
+    """
+    try:
+        subject, text_body, html_body = _format_alert_digest_email(alerts)
+        return _send_email(subject, text_body, html_body, server=server)
+    except Exception as e:
+        logger.error(f"Error formatting or sending alert digest email: {str(e)}", exc_info=True)
+        return False
+
+
 # ============================================================================
 # Slack Notification Functions
 # ============================================================================
 
-def send_slack_notification(alert_data: Dict[str, Any]) -> bool:
+def send_slack_notification(alert_data: Dict[str, Any], client: Any = None) -> bool:
     """
     Send an alert notification via Slack webhook.
     
@@ -415,20 +575,13 @@ def send_slack_notification(alert_data: Dict[str, Any]) -> bool:
             - message: str
             - details: dict (optional)
             - created_at: str or datetime
+        client: Optional httpx.Client to send with, so its keep-alive
+            connection to the webhook host is reused across messages
     
     Returns:
         True if Slack message was sent successfully, False otherwise
     """
-    if not ALERT_SLACK_ENABLED:
-        logger.debug("Slack notifications are disabled")
-        return False
-    
-    if not HTTPX_AVAILABLE:
-        logger.warning("httpx not available for Slack notifications")
-        return False
-    
-    if not ALERT_SLACK_WEBHOOK_URL:
-        logger.warning("Slack webhook URL not configured. Set ALERT_SLACK_WEBHOOK_URL environment variable.")
+    if not _validate_slack_config():
         return False
     
     try:
@@ -511,8 +664,8 @@ def send_slack_notification(alert_data: Dict[str, Any]) -> bool:
             })
         
         # Send to Slack webhook
-        import httpx as sync_httpx
-        response = sync_httpx.post(
+        post = client.post if client is not None else httpx.post
+        response = post(
             ALERT_SLACK_WEBHOOK_URL,
             json=slack_payload,
             timeout=10.0
@@ -530,10 +683,104 @@ def send_slack_notification(alert_data: Dict[str, Any]) -> bool:
         return False
 
 
+def send_slack_digest_notification(alerts: List[Dict[str, Any]], client: Any = None) -> bool:
+    """
+    Send one Slack message summarizing a group of related alerts.
+    
+    Args:
+        alerts: Alert records grouped into one digest (see app.utils.alert_digest)
+        client: Optional httpx.Client to send with
+    
+    Returns:
+        True if Slack message was sent successfully, False otherwise
+    """
+    if not _validate_slack_config():
+        return False
+    
+    try:
+        digest = _summarize_digest(alerts)
+        severity = str(digest['severity'])
+        color_map = {
+            'critical': '#FF0000',
+            'warning': '#FFA500',
+            'info': '#0066CC',
+        }
+        
+        top_sources = digest['source_counts'][:20]
+        sources_text = "\n".join(f"{source_id}: {count}" for source_id, count in top_sources)
+        if len(digest['source_counts']) > len(top_sources):
+            sources_text += f"\n... and {len(digest['source_counts']) - len(top_sources)} more"
+        
+        slack_payload = {
+            "channel": ALERT_SLACK_CHANNEL,
+            "username": "Alert System",
+            "icon_emoji": ":warning:",
+            "attachments": [
+                {
+                    "color": color_map.get(severity.lower(), '#808080'),
+                    "title": (
+                        f"Alert digest: {digest['count']} {severity.upper()} alerts "
+                        f"from {len(digest['source_counts'])} {digest['source']} sources"
+                    ),
+                    "text": digest['message'],
+                    "fields": [
+                        {
+                            "title": "Window",
+                            "value": f"{digest['first_at']} - {digest['last_at']}",
+                            "short": False
+                        },
+                        {
+                            "title": "Alerts per source",
+                            "value": f"```{sources_text}```",
+                            "short": False
+                        }
+                    ],
+                    "footer": "Alert System"
+                }
+            ]
+        }
+        
+        post = client.post if client is not None else httpx.post
+        response = post(
+            ALERT_SLACK_WEBHOOK_URL,
+            json=slack_payload,
+            timeout=10.0
+        )
+        
+        if response.status_code == 200:
+            logger.info(f"Slack digest sent for {digest['count']} alerts")
+            return True
+        else:
+            logger.warning(f"Slack webhook returned status {response.status_code}: {response.text}")
+            return False
+    
+    except Exception as e:
+        logger.error(f"Failed to send Slack digest: {str(e)}")
+        return False
+
+
 # ============================================================================
 # Public Notification Wrappers
 # ============================================================================
 
+def get_notification_channels(event: str) -> List[str]:
+    """
+    List the channels a notification should be queued for.
+    
+    Args:
+        event: 'created' or 'resolved'
+    
+    Returns:
+        Enabled channels ('email', 'slack'); resolutions are sent by email only
+    """
+    channels = []
+    if ALERT_EMAIL_ENABLED:
+        channels.append('email')
+    if ALERT_SLACK_ENABLED and event == 'created':
+        channels.append('slack')
+    return channels
+
+
 def send_alert_notification(alert_data: Dict[str, Any]) -> bool:
     """
     Send alert notifications via all configured channels when an alert is created.
@@ -0,0 +1,53 @@
+"""
+Keyset (cursor) pagination helpers.
+
+List endpoints ordered by (created_at DESC, id DESC) return an opaque
+`nextCursor` that encodes the last row's sort key. The next page is read
+with `WHERE (created_at, id) < (cursor created_at, cursor id)`, which uses the
+index directly instead of scanning and discarding OFFSET rows.
+"""
+
+import uuid
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Tuple
+
+
+def encode_keyset_cursor(created_at: datetime, row_id: Any) -> str:
+    """
+    Encode a row's sort key as an opaque, URL-safe cursor.
+
+    Args:
+        created_at: The row's created_at timestamp
+        row_id: The row's unique id (tie-breaker for equal timestamps)
+
+    Returns:
+        Cursor string
+    """
+    raw = f"{created_at.isoformat()}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_keyset_cursor(cursor: str, uuid_id: bool = True) -> Tuple[datetime, str]:
+    """
+    Decode a cursor produced by encode_keyset_cursor().
+
+    Args:
+        cursor: Cursor string from a previous page
+        uuid_id: Require the row id to be a UUID (callers with other ids validate them)
+
+    Returns:
+        Tuple of (created_at, row_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|', 1)
+        if uuid_id:
+            uuid.UUID(row_id)
+        return datetime.fromisoformat(created_at), row_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
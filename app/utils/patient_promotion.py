@@ -0,0 +1,106 @@
+"""
+Background promotion of pending patients into the patients table.
+
+Once the EMR ID of a pending patient is known, the row has to be copied into
+patients and marked completed. The monitor only records the EMR ID on the
+pending row; this job promotes every waiting row in batches (see
+promote_pending_patients): one transaction per batch, with a single
+INSERT ... SELECT ... ON CONFLICT, so promotion cost does not scale with
+round trips per patient.
+
+Configuration (environment variables):
+- PATIENT_PROMOTION_ENABLED: Run the periodic job (default: true)
+- PATIENT_PROMOTION_INTERVAL_SECONDS: Delay between runs (default: 15)
+- PATIENT_PROMOTION_BATCH_SIZE: Pending rows promoted per transaction (default: 500)
+- PATIENT_PROMOTION_MAX_BATCHES: Batches per run before yielding to the next run (default: 20)
+"""
+
+import os
+import logging
+from typing import Dict, Any, Optional
+
+from app.utils.metrics import PATIENT_PROMOTIONS, PATIENT_PROMOTION_LAG
+
+logger = logging.getLogger(__name__)
+
+PATIENT_PROMOTION_ENABLED = os.getenv('PATIENT_PROMOTION_ENABLED', 'true').lower() == 'true'
+PATIENT_PROMOTION_INTERVAL_SECONDS = int(os.getenv('PATIENT_PROMOTION_INTERVAL_SECONDS', '15'))
+PATIENT_PROMOTION_BATCH_SIZE = int(os.getenv('PATIENT_PROMOTION_BATCH_SIZE', '500'))
+PATIENT_PROMOTION_MAX_BATCHES = int(os.getenv('PATIENT_PROMOTION_MAX_BATCHES', '20'))
+
+
+def run_patient_promotion(batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Promote waiting pending patients, batch by batch, until none are left
+    (or PATIENT_PROMOTION_MAX_BATCHES batches ran).
+
+    Args:
+        batch_size: Override PATIENT_PROMOTION_BATCH_SIZE
+
+    Returns:
+        Dictionary with:
+        - promoted, inserted, updated, superseded: totals over the batches
+        - batches: number of transactions run
+        - max_lag_seconds / avg_lag_seconds: wait of the promoted rows since their EMR ID was set
+        - waiting: rows still waiting after the run
+        - oldest_waiting_seconds: age of the oldest waiting row (None when none wait)
+    """
+    from app.api.database import (
+        get_db_connection,
+        get_pending_promotion_backlog,
+        promote_pending_patients,
+    )
+
+    batch_size = batch_size or PATIENT_PROMOTION_BATCH_SIZE
+    totals = {'promoted': 0, 'inserted': 0, 'updated': 0, 'superseded': 0}
+    lags = []
+    batches = 0
+
+    conn = get_db_connection()
+    try:
+        while batches < PATIENT_PROMOTION_MAX_BATCHES:
+            result = promote_pending_patients(conn, batch_size=batch_size)
+            batches += 1
+            for key in totals:
+                totals[key] += result[key]
+            lags.extend(result['lag_seconds'])
+            if result['promoted'] < batch_size:
+                break
+        backlog = get_pending_promotion_backlog(conn)
+    finally:
+        conn.close()
+
+    PATIENT_PROMOTIONS.labels(outcome='inserted').inc(totals['inserted'])
+    PATIENT_PROMOTIONS.labels(outcome='updated').inc(totals['updated'])
+    PATIENT_PROMOTIONS.labels(outcome='superseded').inc(totals['superseded'])
+    for lag in lags:
+        PATIENT_PROMOTION_LAG.observe(lag)
+
+    if totals['promoted']:
+        logger.info(
+            f"Promoted {totals['promoted']} pending patients ({totals['inserted']} new, "
+            f"{totals['updated']} updated) in {batches} batches, max lag {max(lags):.1f}s"
+        )
+    if backlog['waiting']:
+        logger.warning(
+            f"{backlog['waiting']} pending patients still waiting for promotion "
+            f"(oldest {backlog['oldest_waiting_seconds']}s)"
+        )
+
+    return {
+        **totals,
+        'batches': batches,
+        'max_lag_seconds': round(max(lags), 3) if lags else None,
+        'avg_lag_seconds': round(sum(lags) / len(lags), 3) if lags else None,
+        **backlog,
+    }
+
+
+def register_patient_promotion_job() -> None:
+    """Register the periodic promotion job if enabled."""
+    if not PATIENT_PROMOTION_ENABLED:
+        logger.info("Patient promotion job disabled (PATIENT_PROMOTION_ENABLED=false)")
+        return
+
+    from app.utils.background_jobs import register_periodic_job
+    register_periodic_job('patient_promotion', PATIENT_PROMOTION_INTERVAL_SECONDS, run_patient_promotion)
@@ -0,0 +1,181 @@
+"""
+Experity process time analytics.
+
+Summarizes process durations per process over a time window: percentile
+latencies (computed in SQL with percentile_cont), throughput per hour and the
+slowest encounters. Hourly throughput is read from the
+experity_process_time_hourly rollups, which a background job refreshes
+incrementally (only hours a trigger queued because records in them were
+inserted, updated or deleted).
+
+Results are cached in-process for PROCESS_TIME_ANALYTICS_CACHE_SECONDS, so
+dashboards polling the same window do not re-run the aggregation.
+
+Configuration (environment variables):
+- PROCESS_TIME_ANALYTICS_WINDOW_HOURS: Default window ending now (default: 24)
+- PROCESS_TIME_ANALYTICS_CACHE_SECONDS: Cache lifetime for results (default: 60)
+- PROCESS_TIME_ROLLUP_INTERVAL_SECONDS: Delay between rollup refreshes (default: 300)
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROCESS_TIME_ANALYTICS_WINDOW_HOURS = int(os.getenv('PROCESS_TIME_ANALYTICS_WINDOW_HOURS', '24'))
+PROCESS_TIME_ANALYTICS_CACHE_SECONDS = int(os.getenv('PROCESS_TIME_ANALYTICS_CACHE_SECONDS', '60'))
+PROCESS_TIME_ROLLUP_INTERVAL_SECONDS = int(os.getenv('PROCESS_TIME_ROLLUP_INTERVAL_SECONDS', '300'))
+
+PROCESS_NAMES = ['Encounter process time', 'Experity process time']
+
+# Percentiles returned by get_experity_process_time_stats, in order
+_PERCENTILE_KEYS = ('p50_seconds', 'p90_seconds', 'p95_seconds', 'p99_seconds')
+
+_cache: Dict[Tuple[Any, ...], Tuple[float, Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(float(value), 2) if value is not None else None
+
+
+def summarize_process_time_analytics(
+    process_names: List[str],
+    stats: List[Dict[str, Any]],
+    hourly: List[Dict[str, Any]],
+    slowest: List[Dict[str, Any]],
+    started_after: datetime,
+    started_before: datetime
+) -> Dict[str, Any]:
+    """
+    Combine per-process statistics, hourly rollups and slowest records.
+
+    Args:
+        process_names: Processes to report (each appears even without records)
+        stats: Rows from get_experity_process_time_stats()['stats']
+        hourly: Rows from get_experity_process_time_stats()['hourly']
+        slowest: Rows from get_experity_process_time_stats()['slowest']
+        started_after: Window start
+        started_before: Window end
+
+    Returns:
+        Dictionary with started_after, started_before and processes, one entry
+        per process with completed, mean/max/percentile seconds,
+        throughput_per_hour, hourly and slowest
+    """
+    window_hours = max((started_before - started_after).total_seconds() / 3600.0, 0.0)
+    stats_by_name = {row['process_name']: row for row in stats}
+
+    processes = []
+    for name in process_names:
+        row = stats_by_name.get(name, {})
+        completed = int(row.get('completed') or 0)
+        percentiles = list(row.get('percentiles') or []) + [None] * len(_PERCENTILE_KEYS)
+
+        process = {
+            'process_name': name,
+            'completed': completed,
+            'mean_seconds': _round(row.get('mean_seconds')),
+            'max_seconds': _round(row.get('max_seconds')),
+            'throughput_per_hour': round(completed / window_hours, 2) if window_hours else None,
+            'hourly': [
+                {
+                    'hour_start': bucket['hour_start'],
+                    'started': bucket['started_count'],
+                    'completed': bucket['completed_count'],
+                    'mean_seconds': _round(
+                        bucket['total_duration_seconds'] / bucket['completed_count']
+                        if bucket['completed_count'] else None
+                    ),
+                    'max_seconds': _round(bucket.get('max_duration_seconds')),
+                }
+                for bucket in hourly
+                if bucket['process_name'] == name
+            ],
+            'slowest': [record for record in slowest if record['process_name'] == name],
+        }
+        process.update({
+            key: _round(value) for key, value in zip(_PERCENTILE_KEYS, percentiles)
+        })
+        processes.append(process)
+
+    return {
+        'started_after': started_after,
+        'started_before': started_before,
+        'processes': processes,
+    }
+
+
+def get_process_time_analytics(
+    conn,
+    process_name: Optional[str] = None,
+    started_after: Optional[datetime] = None,
+    started_before: Optional[datetime] = None,
+    slowest_limit: int = 5
+) -> Dict[str, Any]:
+    """
+    Return process time analytics, cached for PROCESS_TIME_ANALYTICS_CACHE_SECONDS.
+
+    Args:
+        conn: PostgreSQL database connection
+        process_name: Restrict to one process (default: all processes)
+        started_after: Window start (default: PROCESS_TIME_ANALYTICS_WINDOW_HOURS
+            before started_before)
+        started_before: Window end (default: now)
+        slowest_limit: Number of slowest records to return per process
+
+    Returns:
+        Summary as returned by summarize_process_time_analytics
+    """
+    from app.api.database import get_experity_process_time_stats
+
+    cache_key = (process_name, started_after, started_before, slowest_limit)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(cache_key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+    window_end = started_before or datetime.now(timezone.utc)
+    window_start = started_after or window_end - timedelta(hours=PROCESS_TIME_ANALYTICS_WINDOW_HOURS)
+    process_names = [process_name] if process_name else PROCESS_NAMES
+
+    rows = get_experity_process_time_stats(
+        conn, process_names, window_start, window_end, slowest_limit=slowest_limit
+    )
+    result = summarize_process_time_analytics(
+        process_names, rows['stats'], rows['hourly'], rows['slowest'], window_start, window_end
+    )
+
+    with _cache_lock:
+        if len(_cache) >= 256:
+            _cache.clear()
+        _cache[cache_key] = (now + PROCESS_TIME_ANALYTICS_CACHE_SECONDS, result)
+    return result
+
+
+def run_process_time_rollup_refresh() -> int:
+    """Refresh hourly rollups for hours with new, updated or deleted process times."""
+    from app.api.database import get_db_connection, refresh_experity_process_time_rollups
+
+    conn = get_db_connection()
+    try:
+        refreshed = refresh_experity_process_time_rollups(conn)
+    finally:
+        conn.close()
+
+    if refreshed:
+        logger.info(f"Refreshed {refreshed} hourly process time rollups")
+    return refreshed
+
+
+def register_process_time_jobs() -> None:
+    """Register the periodic rollup refresh job."""
+    from app.utils.background_jobs import register_periodic_job
+    register_periodic_job(
+        'process_time_rollup_refresh', PROCESS_TIME_ROLLUP_INTERVAL_SECONDS, run_process_time_rollup_refresh
+    )
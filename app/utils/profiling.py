@@ -0,0 +1,194 @@
+"""
+On-demand request profiling.
+
+A statistical profiler for individual requests: while a sampled request runs,
+a helper thread records the stack of the thread serving it every
+PROFILING_INTERVAL_MS milliseconds. Stacks are kept in the folded format
+("outer;inner;leaf <count>") that flamegraph.pl, inferno and speedscope load
+directly. The most recent profiles are kept in memory per route and served by
+GET /admin/profiles.
+
+A request is profiled when
+- it is picked by random sampling (PROFILING_SAMPLE_RATE, optionally limited
+  to PROFILING_PATHS), or
+- it carries an X-Profile header equal to PROFILING_HEADER_TOKEN.
+
+With both off (the default) the middleware only checks one flag per request.
+
+The sampled thread is the event loop thread, which runs the async endpoints
+(including their blocking database calls). Concurrent requests on the same
+worker can appear in each other's samples, so profiles are statistical and
+best read in aggregate; work offloaded to the threadpool is not sampled.
+
+Configuration (environment variables):
+- PROFILING_SAMPLE_RATE: Fraction of requests to profile, 0 to 1 (default: 0)
+- PROFILING_PATHS: Comma-separated path prefixes eligible for sampling (default: all)
+- PROFILING_HEADER_TOKEN: X-Profile header value that forces profiling (default: unset)
+- PROFILING_INTERVAL_MS: Delay between stack samples (default: 5)
+- PROFILING_MAX_PROFILES_PER_ROUTE: Profiles kept per route (default: 20)
+"""
+
+import os
+import sys
+import uuid
+import random
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+PROFILING_SAMPLE_RATE = min(max(float(os.getenv('PROFILING_SAMPLE_RATE', '0')), 0.0), 1.0)
+PROFILING_PATHS = [p.strip() for p in os.getenv('PROFILING_PATHS', '').split(',') if p.strip()]
+PROFILING_HEADER_TOKEN = os.getenv('PROFILING_HEADER_TOKEN') or None
+PROFILING_INTERVAL_MS = max(float(os.getenv('PROFILING_INTERVAL_MS', '5')), 1.0)
+PROFILING_MAX_PROFILES_PER_ROUTE = int(os.getenv('PROFILING_MAX_PROFILES_PER_ROUTE', '20'))
+
+PROFILING_ENABLED = PROFILING_SAMPLE_RATE > 0 or PROFILING_HEADER_TOKEN is not None
+
+PROFILE_HEADER = 'X-Profile'
+
+_profiles: Dict[str, deque] = {}
+_profiles_by_id: Dict[str, Dict[str, Any]] = {}
+_profiles_lock = threading.Lock()
+
+
+def should_profile(path: str, profile_header: Optional[str] = None) -> bool:
+    """
+    Decide whether a request is profiled.
+
+    Args:
+        path: Request path
+        profile_header: Value of the X-Profile request header
+
+    Returns:
+        True if the header matches PROFILING_HEADER_TOKEN or the request is
+        picked by random sampling
+    """
+    if PROFILING_HEADER_TOKEN is not None and profile_header == PROFILING_HEADER_TOKEN:
+        return True
+    if PROFILING_SAMPLE_RATE <= 0:
+        return False
+    if PROFILING_PATHS and not any(path.startswith(prefix) for prefix in PROFILING_PATHS):
+        return False
+    return random.random() < PROFILING_SAMPLE_RATE
+
+
+def fold_stack(frame) -> str:
+    """
+    Render a frame and its callers as one folded-stack line (root first).
+
+    Each frame is "function (file:line)" with file relative to the project
+    or site-packages, so stacks group the same way across deployments.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = code.co_filename.replace('\\', '/')
+        for marker in ('/site-packages/', '/app/', '/lib/python'):
+            index = filename.rfind(marker)
+            if index != -1:
+                filename = filename[index + 1:]
+                break
+        names.append(f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':'))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread from a helper thread until stopped."""
+
+    def __init__(self, thread_id: Optional[int] = None, interval_ms: float = PROFILING_INTERVAL_MS):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval_ms / 1000.0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[fold_stack(frame)] += 1
+            frame = None  # do not keep the request's frames alive between samples
+
+    def start(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        """Stop sampling and return sample counts per folded stack."""
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def store_profile(
+    route: str,
+    method: str,
+    path: str,
+    status_code: int,
+    started_at: datetime,
+    duration_ms: float,
+    stacks: Counter
+) -> Dict[str, Any]:
+    """
+    Keep a finished profile, dropping the oldest one of the route when full.
+
+    Returns:
+        The stored profile
+    """
+    profile = {
+        'profile_id': str(uuid.uuid4()),
+        'route': route,
+        'method': method,
+        'path': path,
+        'status_code': status_code,
+        'started_at': started_at,
+        'duration_ms': round(duration_ms, 3),
+        'interval_ms': PROFILING_INTERVAL_MS,
+        'samples': sum(stacks.values()),
+        'stacks': stacks,
+    }
+    key = f"{method} {route}"
+    with _profiles_lock:
+        route_profiles = _profiles.setdefault(key, deque())
+        route_profiles.append(profile)
+        _profiles_by_id[profile['profile_id']] = profile
+        while len(route_profiles) > PROFILING_MAX_PROFILES_PER_ROUTE:
+            _profiles_by_id.pop(route_profiles.popleft()['profile_id'], None)
+    return profile
+
+
+def profile_summary(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Profile without its stacks."""
+    return {key: value for key, value in profile.items() if key != 'stacks'}
+
+
+def list_profiles(route: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Return summaries of stored profiles, newest first.
+
+    Args:
+        route: Only profiles of this route template (e.g. "/queue")
+        limit: Maximum number of profiles to return
+    """
+    with _profiles_lock:
+        profiles = [
+            profile
+            for route_profiles in _profiles.values()
+            for profile in route_profiles
+            if route is None or profile['route'] == route
+        ]
+    profiles.sort(key=lambda profile: profile['started_at'], reverse=True)
+    return [profile_summary(profile) for profile in profiles[:limit]]
+
+
+def get_profile(profile_id: str) -> Optional[Dict[str, Any]]:
+    """Return a stored profile including its stacks, or None."""
+    with _profiles_lock:
+        return _profiles_by_id.get(profile_id)
+
+
+def render_folded(stacks: Counter) -> str:
+    """Render sample counts as folded stacks, one "stack count" line each."""
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,347 @@
+"""
+Per-statement timing and slow query plan capture for the database layer.
+
+get_db_connection() opens connections with TimedConnection, whose cursors
+(any cursor_factory, e.g. RealDictCursor) time every execute/executemany.
+Durations are aggregated in-process per normalized statement: literals and
+placeholders become "?" and repeated VALUES rows or ARRAY items collapse, so
+the same query built with different values shares one entry. Statements over
+4 KB (large execute_values batches) are only normalized from their start and
+reported up to their first VALUES row, which keeps timing them cheap.
+GET /admin/queries lists the statements by total time.
+
+When a read-only statement (SELECT/WITH without writes or row locks) takes
+longer than SLOW_QUERY_THRESHOLD_MS, it is queued for plan capture. A
+background job later runs it again under EXPLAIN (ANALYZE, BUFFERS) on its
+own connection, inside a transaction that is rolled back, and stores the plan
+in slow_query_plans for offline review. Each statement is explained at most
+once per SLOW_QUERY_PLAN_COOLDOWN_SECONDS, so plan capture never runs in a
+request and never repeats a hot query.
+
+Statistics are per worker process and reset on restart.
+
+Configuration (environment variables):
+- QUERY_STATS_ENABLED: Time statements and keep statistics (default: true)
+- QUERY_STATS_MAX_STATEMENTS: Distinct statements tracked; later ones are counted as "other" (default: 1000)
+- SLOW_QUERY_THRESHOLD_MS: Duration that marks a statement as slow (default: 500)
+- SLOW_QUERY_EXPLAIN_ENABLED: Capture EXPLAIN plans for slow statements (default: true)
+- SLOW_QUERY_PLAN_COOLDOWN_SECONDS: Minimum delay between plans of one statement (default: 3600)
+- SLOW_QUERY_CAPTURE_INTERVAL_SECONDS: Delay between plan capture runs (default: 30)
+- SLOW_QUERY_EXPLAIN_TIMEOUT_MS: statement_timeout for EXPLAIN ANALYZE (default: 30000)
+- SLOW_QUERY_PLAN_RETENTION_DAYS: Days stored plans are kept (default: 7)
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+import functools
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+QUERY_STATS_ENABLED = os.getenv('QUERY_STATS_ENABLED', 'true').lower() == 'true'
+QUERY_STATS_MAX_STATEMENTS = int(os.getenv('QUERY_STATS_MAX_STATEMENTS', '1000'))
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '500'))
+SLOW_QUERY_EXPLAIN_ENABLED = os.getenv('SLOW_QUERY_EXPLAIN_ENABLED', 'true').lower() == 'true'
+SLOW_QUERY_PLAN_COOLDOWN_SECONDS = int(os.getenv('SLOW_QUERY_PLAN_COOLDOWN_SECONDS', '3600'))
+SLOW_QUERY_CAPTURE_INTERVAL_SECONDS = int(os.getenv('SLOW_QUERY_CAPTURE_INTERVAL_SECONDS', '30'))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv('SLOW_QUERY_EXPLAIN_TIMEOUT_MS', '30000'))
+SLOW_QUERY_PLAN_RETENTION_DAYS = int(os.getenv('SLOW_QUERY_PLAN_RETENTION_DAYS', '7'))
+
+OTHER_QUERY_ID = 'other'
+
+_STRING_LITERAL = re.compile(r"'[^']*(?:''[^']*)*'")
+_PLACEHOLDER = re.compile(r"%(?:\([^)]*\))?s")
+_NUMBER = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?(?![\w.])")
+_ARRAY = re.compile(r"ARRAY\[[^\]]*\]", re.IGNORECASE)
+# A parenthesized group (two levels of nesting) followed by copies of itself
+_REPEATED_GROUP = re.compile(r"(\((?:[^()]|\((?:[^()]|\([^()]*\))*\))*\))(?:\s*,\s*\1)+")
+_WHITESPACE = re.compile(r"\s+")
+_FIRST_VALUES_ROW = re.compile(r"\bVALUES\s*\((?:[^()]|\((?:[^()]|\([^()]*\))*\))*\)", re.IGNORECASE)
+_WRITE_KEYWORDS = re.compile(
+    r"\b(?:insert|update|delete|merge|truncate|create|drop|alter|for\s+update|for\s+share|"
+    r"for\s+no\s+key\s+update|nextval|setval|pg_(?:try_)?advisory\w*)\b"
+)
+
+_stats: Dict[str, Dict[str, Any]] = {}
+_stats_lock = threading.Lock()
+_stats_since = datetime.now(timezone.utc)
+_pending_plans: deque = deque(maxlen=100)
+_last_plan_at: Dict[str, float] = {}
+
+
+def normalize_query(query: str) -> str:
+    """
+    Reduce a statement to its shape: literals and placeholders become "?",
+    repeated VALUES rows and ARRAY items collapse, whitespace is squeezed.
+
+    Args:
+        query: SQL text (template or interpolated statement)
+
+    Returns:
+        Normalized SQL text
+    """
+    normalized = _STRING_LITERAL.sub('?', query)
+    normalized = _PLACEHOLDER.sub('?', normalized)
+    normalized = _NUMBER.sub('?', normalized)
+    normalized = _ARRAY.sub('ARRAY[?]', normalized)
+    normalized = _WHITESPACE.sub(' ', normalized).strip()
+    return _REPEATED_GROUP.sub(r'\1', normalized)
+
+
+# Statement templates repeat, so their normalized form is cached. Longer
+# statements are interpolated batches (execute_values): only their start is
+# normalized and they are reported up to the first VALUES row.
+_normalize_template = functools.lru_cache(maxsize=2048)(normalize_query)
+_MAX_CACHED_QUERY_LENGTH = 4096
+
+
+def _normalize_long_query(query: str) -> str:
+    normalized = normalize_query(query[:2 * _MAX_CACHED_QUERY_LENGTH])
+    match = _FIRST_VALUES_ROW.search(normalized)
+    return (normalized[:match.end()] if match else normalized[:1024]) + ' ...'
+
+
+def query_id_for(normalized_query: str) -> str:
+    """Stable identifier of a normalized statement."""
+    return hashlib.md5(normalized_query.encode('utf-8')).hexdigest()[:16]
+
+
+def is_explainable(statement: str) -> bool:
+    """True for statements that are safe to run again under EXPLAIN ANALYZE."""
+    lowered = statement.lstrip().lower()
+    if not (lowered.startswith('select') or lowered.startswith('with')):
+        return False
+    return not _WRITE_KEYWORDS.search(_STRING_LITERAL.sub("''", lowered))
+
+
+def record_query(
+    query: str,
+    duration_ms: float,
+    rows: Optional[int] = None,
+    statement: Optional[str] = None
+) -> None:
+    """
+    Add one execution to the statistics of its normalized statement.
+
+    Args:
+        query: SQL as passed to execute (template or statement)
+        duration_ms: Execution time in milliseconds
+        rows: Rows returned or affected (cursor.rowcount), if known
+        statement: Interpolated statement as sent to the server; queued for
+            plan capture when the execution was slow
+    """
+    if query.lstrip()[:7].upper() == 'EXPLAIN':
+        return
+
+    if len(query) <= _MAX_CACHED_QUERY_LENGTH:
+        normalized = _normalize_template(query)
+    else:
+        normalized = _normalize_long_query(query)
+    query_id = query_id_for(normalized)
+    slow = duration_ms >= SLOW_QUERY_THRESHOLD_MS
+
+    with _stats_lock:
+        entry = _stats.get(query_id)
+        if entry is None:
+            if len(_stats) >= QUERY_STATS_MAX_STATEMENTS:
+                query_id, normalized = OTHER_QUERY_ID, '(statements beyond QUERY_STATS_MAX_STATEMENTS)'
+                entry = _stats.get(query_id)
+            if entry is None:
+                entry = _stats[query_id] = {
+                    'query_id': query_id,
+                    'query': normalized,
+                    'calls': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'rows': 0,
+                    'slow_calls': 0,
+                }
+        entry['calls'] += 1
+        entry['total_ms'] += duration_ms
+        entry['max_ms'] = max(entry['max_ms'], duration_ms)
+        if rows is not None and rows > 0:
+            entry['rows'] += rows
+        if slow:
+            entry['slow_calls'] += 1
+
+        if (
+            slow
+            and SLOW_QUERY_EXPLAIN_ENABLED
+            and statement
+            and query_id != OTHER_QUERY_ID
+            and time.monotonic() - _last_plan_at.get(query_id, float('-inf')) >= SLOW_QUERY_PLAN_COOLDOWN_SECONDS
+            and is_explainable(statement)
+        ):
+            _last_plan_at[query_id] = time.monotonic()
+            _pending_plans.append({
+                'query_id': query_id,
+                'query': normalized,
+                'statement': statement,
+                'duration_ms': duration_ms,
+            })
+
+
+def get_query_stats(order_by: str = 'total', limit: int = 20) -> Dict[str, Any]:
+    """
+    Return tracked statements ordered by total, mean or max time, or calls.
+
+    Returns:
+        Dictionary with since, threshold_ms, total_ms and queries (each with
+        calls, total/mean/max ms, rows, slow_calls and percent of total time)
+    """
+    with _stats_lock:
+        entries = [dict(entry) for entry in _stats.values()]
+        since = _stats_since
+
+    total_ms = sum(entry['total_ms'] for entry in entries)
+    for entry in entries:
+        entry['mean_ms'] = entry['total_ms'] / entry['calls'] if entry['calls'] else 0.0
+        entry['percent_of_total'] = round(100.0 * entry['total_ms'] / total_ms, 2) if total_ms else 0.0
+        for key in ('total_ms', 'mean_ms', 'max_ms'):
+            entry[key] = round(entry[key], 3)
+
+    sort_key = {'total': 'total_ms', 'mean': 'mean_ms', 'max': 'max_ms', 'calls': 'calls'}[order_by]
+    entries.sort(key=lambda entry: entry[sort_key], reverse=True)
+    return {
+        'since': since,
+        'threshold_ms': SLOW_QUERY_THRESHOLD_MS,
+        'total_ms': round(total_ms, 3),
+        'queries': entries[:limit],
+    }
+
+
+def reset_query_stats() -> None:
+    """Clear all statistics."""
+    global _stats_since
+    with _stats_lock:
+        _stats.clear()
+        _stats_since = datetime.now(timezone.utc)
+
+
+def _query_text(cursor, query: Any) -> str:
+    if isinstance(query, sql.Composable):
+        return query.as_string(cursor)
+    if isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    return str(query)
+
+
+class _TimedCursorMixin:
+    """Times execute/executemany and records them in the query statistics."""
+
+    def _record(self, query: Any, start_time: float, succeeded: bool) -> None:
+        try:
+            statement = None
+            if succeeded and self.query is not None:
+                statement = self.query.decode('utf-8', 'replace')
+            record_query(
+                _query_text(self, query),
+                (time.perf_counter() - start_time) * 1000,
+                rows=self.rowcount if succeeded else None,
+                statement=statement,
+            )
+        except Exception as e:
+            logger.debug(f"Failed to record query statistics: {str(e)}")
+
+    def execute(self, query, vars=None):
+        start_time = time.perf_counter()
+        succeeded = False
+        try:
+            result = super().execute(query, vars)
+            succeeded = True
+            return result
+        finally:
+            self._record(query, start_time, succeeded)
+
+    def executemany(self, query, vars_list):
+        start_time = time.perf_counter()
+        succeeded = False
+        try:
+            result = super().executemany(query, vars_list)
+            succeeded = True
+            return result
+        finally:
+            self._record(query, start_time, succeeded)
+
+
+_timed_cursor_classes: Dict[type, type] = {}
+
+
+def _timed_cursor_class(cursor_class: type) -> type:
+    timed = _timed_cursor_classes.get(cursor_class)
+    if timed is None:
+        timed = type(f"Timed{cursor_class.__name__}", (_TimedCursorMixin, cursor_class), {})
+        _timed_cursor_classes[cursor_class] = timed
+    return timed
+
+
+class TimedConnection(psycopg2.extensions.connection):
+    """Connection whose cursors record statement timings (any cursor_factory)."""
+
+    def cursor(self, *args, **kwargs):
+        if (args[0] if args else kwargs.get('name')) is not None:
+            # Named (server-side) cursors are left as they are
+            return super().cursor(*args, **kwargs)
+        cursor_class = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = _timed_cursor_class(cursor_class)
+        return super().cursor(*args, **kwargs)
+
+
+def get_connection_factory() -> Optional[type]:
+    """Connection class for psycopg2.connect, or None when statistics are disabled."""
+    return TimedConnection if QUERY_STATS_ENABLED else None
+
+
+def run_slow_query_plan_capture() -> int:
+    """Run EXPLAIN (ANALYZE, BUFFERS) for queued slow statements and store the plans."""
+    from app.api.database import (
+        get_db_connection,
+        explain_query,
+        save_slow_query_plan,
+        delete_old_slow_query_plans,
+    )
+
+    pending = []
+    while _pending_plans:
+        pending.append(_pending_plans.popleft())
+    if not pending:
+        return 0
+
+    conn = get_db_connection()
+    try:
+        captured = 0
+        for item in pending:
+            try:
+                plan = explain_query(conn, item['statement'], timeout_ms=SLOW_QUERY_EXPLAIN_TIMEOUT_MS)
+            except psycopg2.Error as e:
+                logger.warning(f"EXPLAIN failed for slow query {item['query_id']}: {str(e)}")
+                continue
+            save_slow_query_plan(conn, item['query_id'], item['query'], item['duration_ms'], plan)
+            captured += 1
+        delete_old_slow_query_plans(conn, SLOW_QUERY_PLAN_RETENTION_DAYS)
+    finally:
+        conn.close()
+
+    if captured:
+        logger.info(f"Captured {captured} slow query plans")
+    return captured
+
+
+def register_query_stats_jobs() -> None:
+    """Register the periodic slow query plan capture job."""
+    if not (QUERY_STATS_ENABLED and SLOW_QUERY_EXPLAIN_ENABLED):
+        return
+    from app.utils.background_jobs import register_periodic_job
+    register_periodic_job(
+        'slow_query_plan_capture', SLOW_QUERY_CAPTURE_INTERVAL_SECONDS, run_slow_query_plan_capture
+    )
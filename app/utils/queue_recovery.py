@@ -0,0 +1,86 @@
+"""
+Automatic recovery of queue entries orphaned by dead VMs.
+
+When a VM dies mid-encounter its queue entry stays PROCESSING and
+vm_health.processing_queue_id keeps pointing at it. This module periodically
+requeues such entries (see recover_orphaned_queue_entries) and dead-letters
+entries that keep failing, so throughput does not silently drop when VMs crash.
+
+Configuration (environment variables):
+- QUEUE_RECOVERY_ENABLED: Run the periodic job (default: true)
+- QUEUE_RECOVERY_INTERVAL_SECONDS: Delay between runs (default: 60)
+- QUEUE_RECOVERY_STALE_SECONDS: Heartbeat age after which a VM is dead (default: 120,
+  the same 2 minute timeout the VM health endpoints use)
+- QUEUE_RECOVERY_MAX_ATTEMPTS: Retry ceiling before dead-lettering (default: 5)
+"""
+
+import os
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUE_RECOVERY_ENABLED = os.getenv('QUEUE_RECOVERY_ENABLED', 'true').lower() == 'true'
+QUEUE_RECOVERY_INTERVAL_SECONDS = int(os.getenv('QUEUE_RECOVERY_INTERVAL_SECONDS', '60'))
+QUEUE_RECOVERY_STALE_SECONDS = int(os.getenv('QUEUE_RECOVERY_STALE_SECONDS', '120'))
+QUEUE_RECOVERY_MAX_ATTEMPTS = int(os.getenv('QUEUE_RECOVERY_MAX_ATTEMPTS', '5'))
+
+
+def run_queue_recovery(
+    stale_after_seconds: Optional[int] = None,
+    max_attempts: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Run one reconciliation pass over orphaned queue entries.
+
+    Args:
+        stale_after_seconds: Override QUEUE_RECOVERY_STALE_SECONDS
+        max_attempts: Override QUEUE_RECOVERY_MAX_ATTEMPTS
+
+    Returns:
+        Dictionary with:
+        - requeued: number of entries moved back to PENDING
+        - dead_lettered: number of entries moved to ERROR with dlq=true
+        - entries: list of recovered entries (queue_id, vm_id, status, attempts)
+    """
+    from app.api.database import get_db_connection, recover_orphaned_queue_entries
+
+    conn = get_db_connection()
+    try:
+        entries = recover_orphaned_queue_entries(
+            conn,
+            stale_after_seconds=stale_after_seconds or QUEUE_RECOVERY_STALE_SECONDS,
+            max_attempts=max_attempts or QUEUE_RECOVERY_MAX_ATTEMPTS,
+        )
+    finally:
+        conn.close()
+
+    requeued = [e for e in entries if e['status'] == 'PENDING']
+    dead_lettered = [e for e in entries if e['status'] == 'ERROR']
+
+    for entry in requeued:
+        logger.warning(
+            f"Requeued orphaned queue entry {entry['queue_id']} from dead VM "
+            f"{entry['vm_id']} (attempts={entry['attempts']})"
+        )
+    for entry in dead_lettered:
+        logger.error(
+            f"Dead-lettered queue entry {entry['queue_id']} after {entry['attempts']} "
+            f"attempts (last VM: {entry['vm_id']})"
+        )
+
+    return {
+        'requeued': len(requeued),
+        'dead_lettered': len(dead_lettered),
+        'entries': entries,
+    }
+
+
+def register_queue_recovery_job() -> None:
+    """Register the periodic recovery job if enabled."""
+    if not QUEUE_RECOVERY_ENABLED:
+        logger.info("Queue recovery job disabled (QUEUE_RECOVERY_ENABLED=false)")
+        return
+
+    from app.utils.background_jobs import register_periodic_job
+    register_periodic_job('queue_recovery', QUEUE_RECOVERY_INTERVAL_SECONDS, run_queue_recovery)
@@ -0,0 +1,178 @@
+"""
+Shared HTTP client and response cache for reads from the remote API.
+
+When USE_REMOTE_API_FOR_READS is on, dashboard renders and GET /patients read
+the patient list from the production API. Every read used to open a new
+client (TCP and TLS handshake) and download the whole list again. This module
+provides:
+
+- One pooled httpx.AsyncClient per event loop, with keep-alive and HTTP/2
+  when the h2 package is installed (httpx[http2]).
+- A small in-process cache. A result is fresh for REMOTE_READ_CACHE_SECONDS
+  and served stale for REMOTE_READ_STALE_SECONDS more while one background
+  request refreshes it (stale-while-revalidate).
+- Request coalescing: concurrent reads of the same key share one upstream
+  call, so tabs refreshing together cost one request.
+
+Errors are never cached; a failed background refresh keeps the stale result
+until it expires.
+
+Configuration (environment variables):
+- REMOTE_READ_CACHE_SECONDS: How long a result is served as fresh (default: 5, 0 disables caching)
+- REMOTE_READ_STALE_SECONDS: How long an expired result is served while it is refreshed (default: 30)
+- REMOTE_READ_HTTP2: Negotiate HTTP/2 when h2 is installed (default: true)
+- REMOTE_READ_MAX_CONNECTIONS: Connection pool size of the shared client (default: 20)
+- REMOTE_READ_TIMEOUT_SECONDS: Request timeout of the shared client (default: 30)
+"""
+
+import os
+import time
+import importlib.util
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from app.utils.metrics import REMOTE_READ_CACHE
+
+logger = logging.getLogger(__name__)
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# h2 is only required by httpx for HTTP/2
+H2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+REMOTE_READ_CACHE_SECONDS = float(os.getenv('REMOTE_READ_CACHE_SECONDS', '5'))
+REMOTE_READ_STALE_SECONDS = float(os.getenv('REMOTE_READ_STALE_SECONDS', '30'))
+REMOTE_READ_HTTP2 = os.getenv('REMOTE_READ_HTTP2', 'true').lower() == 'true'
+REMOTE_READ_MAX_CONNECTIONS = int(os.getenv('REMOTE_READ_MAX_CONNECTIONS', '20'))
+REMOTE_READ_TIMEOUT_SECONDS = float(os.getenv('REMOTE_READ_TIMEOUT_SECONDS', '30'))
+
+# Entries beyond this are dropped oldest first
+_MAX_CACHE_ENTRIES = 512
+
+# Shared clients, one per event loop (an AsyncClient is bound to the loop it first ran on)
+_clients: Dict[int, Tuple[asyncio.AbstractEventLoop, Any]] = {}
+
+# key -> (fetched_at monotonic, value)
+_cache: Dict[Hashable, Tuple[float, Any]] = {}
+
+# key -> in-flight upstream call, shared by concurrent readers
+_inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+
+def get_remote_http_client() -> Any:
+    """
+    Return the shared httpx.AsyncClient for the running event loop.
+
+    Raises:
+        RuntimeError: If httpx is not installed or no event loop is running
+    """
+    if not HTTPX_AVAILABLE:
+        raise RuntimeError("httpx is not installed")
+
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(id(loop))
+    if entry is not None and entry[0] is loop and not entry[1].is_closed:
+        return entry[1]
+
+    # Drop clients of loops that have been closed (e.g. test clients)
+    for key, (other_loop, _client) in list(_clients.items()):
+        if other_loop.is_closed():
+            del _clients[key]
+
+    client = httpx.AsyncClient(
+        http2=REMOTE_READ_HTTP2 and H2_AVAILABLE,
+        timeout=REMOTE_READ_TIMEOUT_SECONDS,
+        limits=httpx.Limits(
+            max_connections=REMOTE_READ_MAX_CONNECTIONS,
+            max_keepalive_connections=REMOTE_READ_MAX_CONNECTIONS,
+        ),
+    )
+    _clients[id(loop)] = (loop, client)
+    return client
+
+
+async def close_remote_http_clients() -> None:
+    """Close the shared clients (called on shutdown)."""
+    loop = asyncio.get_running_loop()
+    for key, (client_loop, client) in list(_clients.items()):
+        if client_loop is loop:
+            await client.aclose()
+        del _clients[key]
+
+
+def clear_remote_read_cache() -> None:
+    """Drop all cached results."""
+    _cache.clear()
+
+
+def _store(key: Hashable, value: Any) -> None:
+    _cache.pop(key, None)
+    _cache[key] = (time.monotonic(), value)
+    while len(_cache) > _MAX_CACHE_ENTRIES:
+        del _cache[next(iter(_cache))]
+
+
+def _start_fetch(key: Hashable, loader: Callable[[], Awaitable[Any]]) -> "asyncio.Task[Any]":
+    """Start (or join) the upstream call for key; the result is cached on success."""
+    task = _inflight.get(key)
+    if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+        REMOTE_READ_CACHE.labels(result='coalesced').inc()
+        return task
+
+    async def fetch() -> Any:
+        try:
+            value = await loader()
+            if REMOTE_READ_CACHE_SECONDS > 0:
+                _store(key, value)
+            return value
+        finally:
+            if _inflight.get(key) is task:
+                del _inflight[key]
+
+    task = asyncio.ensure_future(fetch())
+    _inflight[key] = task
+    return task
+
+
+def _log_refresh_failure(task: "asyncio.Task[Any]") -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Background refresh of remote read failed: {task.exception()}")
+
+
+async def cached_remote_read(key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Read through the cache.
+
+    Fresh results are returned directly. Stale results are returned while a
+    background refresh runs. Otherwise the caller waits for the upstream call,
+    which concurrent callers with the same key share.
+
+    Args:
+        key: Cache key identifying the request
+        loader: Coroutine function performing the upstream call
+
+    Returns:
+        The cached or freshly loaded value (shared between callers; do not mutate)
+    """
+    entry = _cache.get(key)
+    if entry is not None:
+        age = time.monotonic() - entry[0]
+        if age < REMOTE_READ_CACHE_SECONDS:
+            REMOTE_READ_CACHE.labels(result='hit').inc()
+            return entry[1]
+        if age < REMOTE_READ_CACHE_SECONDS + REMOTE_READ_STALE_SECONDS:
+            REMOTE_READ_CACHE.labels(result='stale').inc()
+            if key not in _inflight:
+                _start_fetch(key, loader).add_done_callback(_log_refresh_failure)
+            return entry[1]
+        del _cache[key]
+
+    if key not in _inflight:
+        REMOTE_READ_CACHE.labels(result='miss').inc()
+    # shield: a caller that disconnects must not cancel the call others are waiting on
+    return await asyncio.shield(_start_fetch(key, loader))
@@ -1,18 +1,45 @@
 """
 Resource alert utility for automatic alert creation based on resource thresholds.
 
-This module handles checking resource usage (CPU, Memory, Disk) against configured
-thresholds and automatically creates alerts when thresholds are exceeded. It also
-handles automatic resolution of alerts when resources recover.
+This module checks resource usage (CPU, Memory, Disk) against configured
+thresholds, creates alerts when thresholds are exceeded and resolves them when
+resources recover.
+
+Heartbeats only store the latest metrics. A periodic job evaluates every
+server's latest metrics in one pass: it reads all servers and all open resource
+alerts once, decides what changed in memory, and writes the new alerts and the
+resolutions with one statement each (see sync_resource_alerts).
+
+Thresholds have hysteresis: an alert is raised when usage reaches its
+threshold but only resolved once usage drops RESOURCE_ALERT_HYSTERESIS
+percentage points below it, so values hovering around a threshold do not open
+and resolve alerts on every cycle. While an alert is open no duplicate is
+created for the same server, resource and severity.
+
+Configuration (environment variables):
+- RESOURCE_ALERT_INTERVAL_SECONDS: Delay between evaluation runs (default: 30)
+- RESOURCE_ALERT_HYSTERESIS: Percentage points below a threshold before an
+  alert resolves (default: 5)
+- RESOURCE_THRESHOLD_GROUPS: JSON object of per-group overrides of
+  RESOURCE_THRESHOLDS, e.g.
+  {"database": {"disk": {"warning": 80, "critical": 90}, "hysteresis": 2}}
+- RESOURCE_SERVER_GROUPS: Comma-separated pattern=group pairs assigning servers
+  to groups by server ID (shell-style wildcards), e.g. "db-*=database".
+  A heartbeat metadata "serverGroup" value takes precedence.
 """
 
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timezone
+import os
+import json
+import copy
 import logging
+from fnmatch import fnmatchcase
+from typing import Dict, Any, Optional, List, Tuple
+
+from app.utils.alert_digest import forget_alert
 
 logger = logging.getLogger(__name__)
 
-# Resource thresholds configuration
+# Resource thresholds configuration (defaults for servers without a group override)
 RESOURCE_THRESHOLDS = {
     'cpu': {
         'warning': 80.0,
@@ -28,361 +55,247 @@ RESOURCE_THRESHOLDS = {
     }
 }
 
+RESOURCE_ALERT_INTERVAL_SECONDS = int(os.getenv('RESOURCE_ALERT_INTERVAL_SECONDS', '30'))
+RESOURCE_ALERT_HYSTERESIS = float(os.getenv('RESOURCE_ALERT_HYSTERESIS', '5'))
 
-def check_resource_thresholds(
-    metadata: Optional[Dict[str, Any]],
-    server_id: str
-) -> List[Dict[str, Any]]:
+# Alert resource name, RESOURCE_THRESHOLDS key, metadata metric key
+_RESOURCES = (
+    ('CPU', 'cpu', 'cpuUsage'),
+    ('Memory', 'memory', 'memoryUsage'),
+    ('Disk', 'disk', 'diskUsage'),
+)
+
+_SEVERITY_RANK = {'warning': 1, 'critical': 2}
+
+
+def _parse_threshold_groups(value: str) -> Dict[str, Dict[str, Any]]:
+    """Parse RESOURCE_THRESHOLD_GROUPS; invalid JSON is logged and ignored."""
+    if not value:
+        return {}
+    try:
+        groups = json.loads(value)
+    except ValueError:
+        logger.error("RESOURCE_THRESHOLD_GROUPS is not valid JSON; using default thresholds")
+        return {}
+    if not isinstance(groups, dict):
+        logger.error("RESOURCE_THRESHOLD_GROUPS must be a JSON object; using default thresholds")
+        return {}
+    return groups
+
+
+def _parse_server_groups(value: str) -> List[Tuple[str, str]]:
+    """Parse RESOURCE_SERVER_GROUPS into (pattern, group) pairs, in order."""
+    pairs = []
+    for item in (value or '').split(','):
+        pattern, sep, group = item.partition('=')
+        if sep and pattern.strip() and group.strip():
+            pairs.append((pattern.strip(), group.strip()))
+    return pairs
+
+
+RESOURCE_THRESHOLD_GROUPS = _parse_threshold_groups(os.getenv('RESOURCE_THRESHOLD_GROUPS', ''))
+RESOURCE_SERVER_GROUPS = _parse_server_groups(os.getenv('RESOURCE_SERVER_GROUPS', ''))
+
+
+def get_server_group(server_id: str, metadata: Optional[Dict[str, Any]] = None) -> Optional[str]:
     """
-    Check resource usage against thresholds and return alerts to create.
-    
+    Return the threshold group for a server.
+
     Args:
-        metadata: Server metadata dict with cpuUsage, memoryUsage, diskUsage
         server_id: Server identifier
-        
+        metadata: Server metadata; a "serverGroup" value takes precedence
+
     Returns:
-        List of alert dictionaries to create (empty if no thresholds exceeded)
+        Group name, or None for the default thresholds
     """
-    if not metadata or not isinstance(metadata, dict):
-        return []
-    
-    alerts_to_create = []
-    
-    # Check CPU usage
-    cpu_usage = metadata.get('cpuUsage')
-    if cpu_usage is not None and isinstance(cpu_usage, (int, float)):
-        if cpu_usage >= RESOURCE_THRESHOLDS['cpu']['critical']:
-            alerts_to_create.append({
-                'resource': 'CPU',
-                'usage': float(cpu_usage),
-                'severity': 'critical',
-                'threshold': RESOURCE_THRESHOLDS['cpu']['critical']
-            })
-        elif cpu_usage >= RESOURCE_THRESHOLDS['cpu']['warning']:
-            alerts_to_create.append({
-                'resource': 'CPU',
-                'usage': float(cpu_usage),
-                'severity': 'warning',
-                'threshold': RESOURCE_THRESHOLDS['cpu']['warning']
-            })
-    
-    # Check Memory usage
-    memory_usage = metadata.get('memoryUsage')
-    if memory_usage is not None and isinstance(memory_usage, (int, float)):
-        if memory_usage >= RESOURCE_THRESHOLDS['memory']['critical']:
-            alerts_to_create.append({
-                'resource': 'Memory',
-                'usage': float(memory_usage),
-                'severity': 'critical',
-                'threshold': RESOURCE_THRESHOLDS['memory']['critical']
-            })
-        elif memory_usage >= RESOURCE_THRESHOLDS['memory']['warning']:
-            alerts_to_create.append({
-                'resource': 'Memory',
-                'usage': float(memory_usage),
-                'severity': 'warning',
-                'threshold': RESOURCE_THRESHOLDS['memory']['warning']
-            })
-    
-    # Check Disk usage
-    disk_usage = metadata.get('diskUsage')
-    if disk_usage is not None and isinstance(disk_usage, (int, float)):
-        if disk_usage >= RESOURCE_THRESHOLDS['disk']['critical']:
-            alerts_to_create.append({
-                'resource': 'Disk',
-                'usage': float(disk_usage),
-                'severity': 'critical',
-                'threshold': RESOURCE_THRESHOLDS['disk']['critical']
-            })
-        elif disk_usage >= RESOURCE_THRESHOLDS['disk']['warning']:
-            alerts_to_create.append({
-                'resource': 'Disk',
-                'usage': float(disk_usage),
-                'severity': 'warning',
-                'threshold': RESOURCE_THRESHOLDS['disk']['warning']
-            })
-    
-    return alerts_to_create
+    if isinstance(metadata, dict) and isinstance(metadata.get('serverGroup'), str):
+        return metadata['serverGroup']
+    for pattern, group in RESOURCE_SERVER_GROUPS:
+        if fnmatchcase(server_id, pattern):
+            return group
+    return None
 
 
-def should_create_alert(
-    conn,
-    server_id: str,
-    resource: str,
-    severity: str
-) -> bool:
+def get_resource_thresholds(group: Optional[str] = None) -> Dict[str, Dict[str, float]]:
     """
-    Check if an alert should be created (avoid duplicates).
-    
-    Only create alert if there's no recent unresolved alert for the same
-    resource and severity within the last 5 minutes.
-    
+    Return thresholds for a server group, with group overrides applied.
+
     Args:
-        conn: Database connection
-        server_id: Server identifier
-        resource: Resource name (CPU, Memory, Disk)
-        severity: Alert severity (warning, critical)
-        
+        group: Server group name (None for the defaults)
+
     Returns:
-        True if alert should be created, False otherwise
+        Dictionary of resource key -> {'warning', 'critical', 'hysteresis'}
     """
-    from psycopg2.extras import RealDictCursor
-    
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    
-    try:
-        # Check for recent unresolved alerts for this server/resource/severity
-        query = """
-            SELECT alert_id, created_at
-            FROM alerts
-            WHERE source = 'server'
-              AND source_id = %s
-              AND resolved = FALSE
-              AND severity = %s
-              AND details->>'resource' = %s
-              AND created_at > NOW() - INTERVAL '5 minutes'
-            ORDER BY created_at DESC
-            LIMIT 1
-        """
-        
-        cursor.execute(query, (server_id, severity, resource))
-        result = cursor.fetchone()
-        
-        # If no recent alert exists, we should create one
-        return result is None
-        
-    except Exception as e:
-        logger.warning(f"Error checking for existing alerts: {str(e)}")
-        # On error, allow alert creation (fail open)
-        return True
-    finally:
-        cursor.close()
+    thresholds = copy.deepcopy(RESOURCE_THRESHOLDS)
+    overrides = RESOURCE_THRESHOLD_GROUPS.get(group, {}) if group else {}
+    hysteresis = float(overrides.get('hysteresis', RESOURCE_ALERT_HYSTERESIS))
+
+    for key, levels in thresholds.items():
+        override = overrides.get(key)
+        if isinstance(override, dict):
+            levels.update({
+                level: float(override[level])
+                for level in ('warning', 'critical', 'hysteresis')
+                if isinstance(override.get(level), (int, float))
+            })
+        levels.setdefault('hysteresis', hysteresis)
+
+    return thresholds
 
 
-def create_resource_alerts(
-    conn,
-    server_id: str,
-    metadata: Optional[Dict[str, Any]]
+def check_resource_thresholds(
+    metadata: Optional[Dict[str, Any]],
+    server_id: str
 ) -> List[Dict[str, Any]]:
     """
-    Check resource thresholds and create alerts if needed.
-    
+    Check resource usage against thresholds and return alerts to create.
+
     Args:
-        conn: Database connection
-        server_id: Server identifier
-        metadata: Server metadata with resource usage
-        
+        metadata: Server metadata dict with cpuUsage, memoryUsage, diskUsage
+        server_id: Server identifier (selects the server group's thresholds)
+
     Returns:
-        List of created alert records
+        List of alert dictionaries to create (empty if no thresholds exceeded)
     """
-    from app.api.database import save_alert
-    
-    created_alerts = []
-    
-    # Check thresholds
-    alerts_to_check = check_resource_thresholds(metadata, server_id)
-    
-    for alert_info in alerts_to_check:
-        resource = alert_info['resource']
-        usage = alert_info['usage']
-        severity = alert_info['severity']
-        threshold = alert_info['threshold']
-        
-        # Check if we should create this alert (avoid duplicates)
-        if not should_create_alert(conn, server_id, resource, severity):
-            logger.debug(
-                f"Skipping duplicate alert for {server_id} - {resource} {severity}"
-            )
+    if not metadata or not isinstance(metadata, dict):
+        return []
+
+    thresholds = get_resource_thresholds(get_server_group(server_id, metadata))
+    alerts_to_create = []
+
+    for resource, key, metric in _RESOURCES:
+        usage = metadata.get(metric)
+        if usage is None or isinstance(usage, bool) or not isinstance(usage, (int, float)):
             continue
-        
-        # Create alert
-        try:
-            alert_dict = {
-                'source': 'server',
-                'source_id': server_id,
-                'severity': severity,
-                'message': (
-                    f"{resource} usage is {usage:.1f}% "
-                    f"(threshold: {threshold}%)"
-                ),
-                'details': {
+
+        for severity in ('critical', 'warning'):
+            if usage >= thresholds[key][severity]:
+                alerts_to_create.append({
                     'resource': resource,
-                    'usage': usage,
-                    'threshold': threshold,
-                    'metric': resource.lower() + 'Usage'
-                }
-            }
-            
-            saved_alert = save_alert(conn, alert_dict)
-            created_alerts.append(saved_alert)
-            
-            logger.info(
-                f"Created {severity} alert for {server_id}: "
-                f"{resource} usage {usage:.1f}%"
-            )
-            
-        except Exception as e:
-            logger.error(
-                f"Failed to create alert for {server_id} - {resource}: {str(e)}"
-            )
-            # Continue with other alerts even if one fails
-    
-    return created_alerts
-
-
-def get_unresolved_resource_alerts(
-    conn,
-    server_id: str,
-    resource: Optional[str] = None
-) -> List[Dict[str, Any]]:
+                    'usage': float(usage),
+                    'severity': severity,
+                    'threshold': thresholds[key][severity]
+                })
+                break
+
+    return alerts_to_create
+
+
+def _build_resource_alert(server_id: str, alert_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the alert record for a threshold breach."""
+    resource = alert_info['resource']
+    usage = alert_info['usage']
+    threshold = alert_info['threshold']
+    return {
+        'source': 'server',
+        'source_id': server_id,
+        'severity': alert_info['severity'],
+        'message': (
+            f"{resource} usage is {usage:.1f}% "
+            f"(threshold: {threshold}%)"
+        ),
+        'details': {
+            'resource': resource,
+            'usage': usage,
+            'threshold': threshold,
+            'metric': resource.lower() + 'Usage'
+        }
+    }
+
+
+def evaluate_resource_alerts(
+    servers: List[Dict[str, Any]],
+    open_alerts: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[str]]:
     """
-    Get unresolved alerts for a server, optionally filtered by resource.
-    
+    Decide which resource alerts to create and resolve across all servers.
+
+    An open alert stays open while usage is at or above its threshold minus
+    the hysteresis margin, and is resolved once usage drops below that. A new
+    alert is created for the highest threshold reached unless an alert of the
+    same or higher severity is still open for that server and resource.
+    Resources without a current numeric reading are left unchanged.
+
     Args:
-        conn: Database connection
-        server_id: Server identifier
-        resource: Optional resource name to filter by (CPU, Memory, Disk)
-        
+        servers: Rows with server_id and metadata (latest metrics)
+        open_alerts: Unresolved resource alerts with alert_id, source_id,
+            severity and resource
+
     Returns:
-        List of unresolved alert records
+        Tuple of (alerts to create, alert_ids to resolve)
     """
-    from psycopg2.extras import RealDictCursor
-    
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    
+    open_by_resource: Dict[Tuple[str, str], Dict[str, List[str]]] = {}
+    for alert in open_alerts:
+        by_severity = open_by_resource.setdefault((alert['source_id'], alert['resource']), {})
+        by_severity.setdefault(alert['severity'], []).append(str(alert['alert_id']))
+
+    to_create: List[Dict[str, Any]] = []
+    to_resolve: List[str] = []
+
+    for server in servers:
+        server_id = server['server_id']
+        metadata = server.get('metadata')
+        if not isinstance(metadata, dict):
+            continue
+
+        thresholds = get_resource_thresholds(get_server_group(server_id, metadata))
+        breaches = {
+            alert_info['resource']: alert_info
+            for alert_info in check_resource_thresholds(metadata, server_id)
+        }
+
+        for resource, key, metric in _RESOURCES:
+            usage = metadata.get(metric)
+            if usage is None or isinstance(usage, bool) or not isinstance(usage, (int, float)):
+                continue
+
+            levels = thresholds[key]
+            held_rank = 0
+            for severity, alert_ids in open_by_resource.get((server_id, resource), {}).items():
+                if severity not in _SEVERITY_RANK:
+                    continue
+                if usage >= levels[severity] - levels['hysteresis']:
+                    held_rank = max(held_rank, _SEVERITY_RANK[severity])
+                else:
+                    to_resolve.extend(alert_ids)
+
+            breach = breaches.get(resource)
+            if breach and _SEVERITY_RANK[breach['severity']] > held_rank:
+                to_create.append(_build_resource_alert(server_id, breach))
+
+    return to_create, to_resolve
+
+
+def run_resource_alert_evaluation() -> Dict[str, int]:
+    """Evaluate resource thresholds for all servers and apply the changes."""
+    from app.api.database import get_db_connection, sync_resource_alerts
+
+    conn = get_db_connection()
     try:
-        if resource:
-            query = """
-                SELECT alert_id, source, source_id, severity, message, details,
-                       resolved, resolved_at, resolved_by, created_at, updated_at
-                FROM alerts
-                WHERE source = 'server'
-                  AND source_id = %s
-                  AND resolved = FALSE
-                  AND details->>'resource' = %s
-                ORDER BY created_at DESC
-            """
-            cursor.execute(query, (server_id, resource))
-        else:
-            query = """
-                SELECT alert_id, source, source_id, severity, message, details,
-                       resolved, resolved_at, resolved_by, created_at, updated_at
-                FROM alerts
-                WHERE source = 'server'
-                  AND source_id = %s
-                  AND resolved = FALSE
-                  AND details->>'resource' IS NOT NULL
-                ORDER BY created_at DESC
-            """
-            cursor.execute(query, (server_id,))
-        
-        results = cursor.fetchall()
-        return [dict(row) for row in results]
-        
-    except Exception as e:
-        logger.error(f"Error getting unresolved alerts: {str(e)}")
-        return []
+        result = sync_resource_alerts(conn, evaluate_resource_alerts)
     finally:
-        cursor.close()
+        conn.close()
 
+    if result is None:
+        return {'created': 0, 'resolved': 0}
 
-def resolve_recovered_resource_alerts(
-    conn,
-    server_id: str,
-    metadata: Optional[Dict[str, Any]]
-) -> int:
-    """
-    Resolve alerts for resources that have recovered below thresholds.
-    
-    Args:
-        conn: Database connection
-        server_id: Server identifier
-        metadata: Current server metadata with resource usage
-        
-    Returns:
-        Number of alerts resolved
-    """
-    from app.api.database import resolve_alert
-    
-    if not metadata or not isinstance(metadata, dict):
-        return 0
-    
-    resolved_count = 0
-    
-    # Map resources to their metric keys and warning thresholds
-    resource_map = {
-        'CPU': ('cpuUsage', RESOURCE_THRESHOLDS['cpu']['warning']),
-        'Memory': ('memoryUsage', RESOURCE_THRESHOLDS['memory']['warning']),
-        'Disk': ('diskUsage', RESOURCE_THRESHOLDS['disk']['warning']),
-    }
-    
-    # Get all unresolved resource alerts for this server
-    unresolved_alerts = get_unresolved_resource_alerts(conn, server_id)
-    
-    for alert in unresolved_alerts:
-        details = alert.get('details')
-        if not details or not isinstance(details, dict):
-            continue
-        
-        resource = details.get('resource')
-        if not resource or resource not in resource_map:
-            continue
-        
-        metric_key, warning_threshold = resource_map[resource]
-        current_usage = metadata.get(metric_key)
-        
-        # Check if resource has recovered (below warning threshold)
-        if current_usage is not None and isinstance(current_usage, (int, float)):
-            if float(current_usage) < warning_threshold:
-                # Resource recovered - resolve the alert
-                try:
-                    alert_id = str(alert['alert_id'])
-                    resolved_alert = resolve_alert(
-                        conn,
-                        alert_id,
-                        resolved_by='system-auto-recovery'
-                    )
-                    resolved_count += 1
-                    
-                    logger.info(
-                        f"Auto-resolved alert {alert_id} for {server_id} - "
-                        f"{resource} recovered to {current_usage:.1f}% "
-                        f"(below {warning_threshold}% threshold)"
-                    )
-                    
-                except Exception as e:
-                    logger.error(
-                        f"Failed to resolve alert {alert.get('alert_id')} "
-                        f"for {server_id} - {resource}: {str(e)}"
-                    )
-    
-    return resolved_count
-
-
-def process_resource_alerts(
-    conn,
-    server_id: str,
-    metadata: Optional[Dict[str, Any]]
-) -> Dict[str, Any]:
-    """
-    Main function to process resource alerts: create new alerts and resolve recovered ones.
-    
-    Args:
-        conn: Database connection
-        server_id: Server identifier
-        metadata: Server metadata with resource usage
-        
-    Returns:
-        Dictionary with processing results:
-        - created: number of alerts created
-        - resolved: number of alerts resolved
-        - created_alerts: list of created alert IDs
-    """
-    created_alerts = create_resource_alerts(conn, server_id, metadata)
-    resolved_count = resolve_recovered_resource_alerts(conn, server_id, metadata)
-    
-    return {
-        'created': len(created_alerts),
-        'resolved': resolved_count,
-        'created_alerts': [str(alert['alert_id']) for alert in created_alerts]
-    }
+    for alert in result['created']:
+        logger.info(
+            f"Created {alert['severity']} alert for {alert['source_id']}: {alert['message']}"
+        )
+    for alert in result['resolved']:
+        forget_alert(alert)
+        logger.info(
+            f"Auto-resolved alert {alert['alert_id']} for {alert['source_id']} - "
+            f"{(alert.get('details') or {}).get('resource')} recovered"
+        )
+
+    return {'created': len(result['created']), 'resolved': len(result['resolved'])}
+
+
+def register_resource_alert_jobs() -> None:
+    """Register the periodic resource alert evaluation job."""
+    from app.utils.background_jobs import register_periodic_job
+    register_periodic_job(
+        'resource_alert_evaluation', RESOURCE_ALERT_INTERVAL_SECONDS, run_resource_alert_evaluation
+    )
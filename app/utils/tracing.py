@@ -0,0 +1,430 @@
+"""
+Lightweight span tracing for the encounter pipeline.
+
+A trace follows one encounter from POST /encounter through queue creation,
+claim, /experity/map (pre-extract, agent run, each merge step), VM processing
+and image upload. Spans are recorded in-process and exported in batches by a
+background job, so tracing never adds a network round trip to a request.
+
+The trace id travels with the encounter:
+- HTTP: the W3C ``traceparent`` header is honoured on requests and returned
+  on responses.
+- Queue rows store the trace id of the request that created them (trace_id
+  column); it is returned as traceId when a VM claims the entry.
+- Process time records store the trace id sent by the VM (traceId field or
+  traceparent header), falling back to the queue row of the same encounter.
+  Their started/ended times are recorded as ``vm.<process name>`` spans.
+
+Exporters:
+- none: tracing disabled, every helper is a no-op (default)
+- console: one JSON line per span written to the log
+- file: one JSON line per span appended to TRACING_FILE_PATH
+- otlp: OTLP/HTTP JSON posted to TRACING_OTLP_ENDPOINT (requires httpx), so
+  any OpenTelemetry collector, Jaeger or Tempo can ingest the spans
+
+Configuration (environment variables):
+- TRACING_EXPORTER: none, console, file or otlp (default: none)
+- TRACING_FILE_PATH: Output file for the file exporter (default: traces.jsonl)
+- TRACING_OTLP_ENDPOINT: OTLP/HTTP traces endpoint (default: http://localhost:4318/v1/traces)
+- TRACING_SERVICE_NAME: service.name resource attribute (default: patient-queue-api)
+- TRACING_EXPORT_INTERVAL_SECONDS: Delay between exports (default: 5)
+- TRACING_BUFFER_SIZE: Spans kept while waiting for export; oldest are dropped (default: 10000)
+"""
+
+import os
+import re
+import json
+import time
+import inspect
+import secrets
+import logging
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'none').lower()
+TRACING_FILE_PATH = os.getenv('TRACING_FILE_PATH', 'traces.jsonl')
+TRACING_OTLP_ENDPOINT = os.getenv('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+TRACING_SERVICE_NAME = os.getenv('TRACING_SERVICE_NAME', 'patient-queue-api')
+TRACING_EXPORT_INTERVAL_SECONDS = int(os.getenv('TRACING_EXPORT_INTERVAL_SECONDS', '5'))
+TRACING_BUFFER_SIZE = int(os.getenv('TRACING_BUFFER_SIZE', '10000'))
+
+TRACING_ENABLED = TRACING_EXPORTER in ('console', 'file', 'otlp')
+
+# Try to import httpx for the OTLP exporter
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    if TRACING_EXPORTER == 'otlp':
+        logger.warning("httpx not available. OTLP trace export will be disabled.")
+
+_TRACEPARENT_PATTERN = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+TRACE_ID_PATTERN = r'^[0-9a-f]{32}$'
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    'current_span', default=None
+)
+_buffer: deque = deque(maxlen=TRACING_BUFFER_SIZE)
+_export_lock = threading.Lock()
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = (
+        'trace_id', 'span_id', 'parent_span_id', 'name', 'attributes',
+        'start_time_ns', 'end_time_ns', 'status', 'status_message',
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: Optional[str] = None,
+        parent_span_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        start_time_ns: Optional[int] = None
+    ):
+        self.trace_id = trace_id or new_trace_id()
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start_time_ns = start_time_ns or time.time_ns()
+        self.end_time_ns: Optional[int] = None
+        self.status = 'ok'
+        self.status_message: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.status = 'error'
+        self.status_message = message
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent header value pointing at this span."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self, end_time_ns: Optional[int] = None) -> None:
+        """End the span and queue it for export (ending twice is a no-op)."""
+        if self.end_time_ns is not None:
+            return
+        self.end_time_ns = end_time_ns or time.time_ns()
+        _buffer.append(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Span as a flat dictionary (console and file exporters)."""
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_span_id,
+            'name': self.name,
+            'start_time': _iso(self.start_time_ns),
+            'end_time': _iso(self.end_time_ns),
+            'duration_ms': round(((self.end_time_ns or self.start_time_ns) - self.start_time_ns) / 1e6, 3),
+            'status': self.status,
+            'status_message': self.status_message,
+            'attributes': self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is disabled."""
+
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+    def end(self, end_time_ns: Optional[int] = None) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _iso(time_ns: Optional[int]) -> Optional[str]:
+    if time_ns is None:
+        return None
+    return datetime.fromtimestamp(time_ns / 1e9, timezone.utc).isoformat(timespec='microseconds')
+
+
+def new_trace_id() -> str:
+    """Generate a random 32-character hex trace id."""
+    return secrets.token_hex(16)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    Parse a W3C traceparent header.
+
+    Args:
+        header: Header value, e.g. "00-<32 hex trace id>-<16 hex span id>-01"
+
+    Returns:
+        Dictionary with trace_id and span_id, or None if the header is missing
+        or invalid (including the all-zero ids the spec forbids)
+    """
+    if not header:
+        return None
+    match = _TRACEPARENT_PATTERN.match(header.strip().lower())
+    if not match:
+        return None
+    trace_id, span_id = match.groups()
+    if trace_id == '0' * 32 or span_id == '0' * 16:
+        return None
+    return {'trace_id': trace_id, 'span_id': span_id}
+
+
+def current_span() -> Optional[Span]:
+    """Return the active span of the current request or task."""
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """Return the trace id of the active span, or None outside a trace."""
+    active = _current_span.get()
+    return active.trace_id if active is not None else None
+
+
+@contextmanager
+def span(
+    name: str,
+    trace_id: Optional[str] = None,
+    parent_span_id: Optional[str] = None,
+    **attributes: Any
+) -> Iterator[Span]:
+    """
+    Record the enclosed block as a span.
+
+    The span is a child of the active span unless trace_id is given. An
+    explicit trace_id that differs from the active trace starts the span in
+    that trace and records the caller's trace id as the caller.trace_id
+    attribute, so the two timelines can be linked. Exceptions mark the span
+    as failed and are re-raised.
+
+    Yields:
+        The Span (a no-op stand-in when tracing is disabled)
+    """
+    if not TRACING_ENABLED:
+        yield _NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    if parent is not None:
+        if trace_id is None or trace_id == parent.trace_id:
+            trace_id = parent.trace_id
+            parent_span_id = parent_span_id or parent.span_id
+        else:
+            attributes.setdefault('caller.trace_id', parent.trace_id)
+
+    active = Span(name, trace_id=trace_id, parent_span_id=parent_span_id, attributes=attributes)
+    token = _current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        active.end()
+
+
+def start_span(name: str, **attributes: Any) -> Span:
+    """
+    Start a child span of the active span without making it active.
+
+    For steps that are not a single block; the caller must call end() on the
+    returned span. Returns a no-op stand-in when tracing is disabled.
+    """
+    if not TRACING_ENABLED:
+        return _NOOP_SPAN
+    parent = _current_span.get()
+    if parent is None:
+        return Span(name, attributes=attributes)
+    return Span(name, trace_id=parent.trace_id, parent_span_id=parent.span_id, attributes=attributes)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator recording each call of a sync or async function as a span."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def record_span(
+    name: str,
+    start_time: datetime,
+    end_time: datetime,
+    trace_id: Optional[str] = None,
+    **attributes: Any
+) -> Optional[Span]:
+    """
+    Record a span whose start and end are already known.
+
+    Used for work timed elsewhere, e.g. queue wait time or VM process times
+    reported after the fact.
+
+    Args:
+        name: Span name
+        start_time: Start (timezone-aware or UTC)
+        end_time: End (timezone-aware or UTC)
+        trace_id: Trace to record into (default: the active trace)
+        **attributes: Span attributes
+
+    Returns:
+        The recorded Span, or None when tracing is disabled
+    """
+    if not TRACING_ENABLED:
+        return None
+
+    parent = _current_span.get()
+    parent_span_id = None
+    if parent is not None:
+        if trace_id is None or trace_id == parent.trace_id:
+            trace_id = parent.trace_id
+            parent_span_id = parent.span_id
+        else:
+            attributes.setdefault('caller.trace_id', parent.trace_id)
+
+    recorded = Span(
+        name,
+        trace_id=trace_id,
+        parent_span_id=parent_span_id,
+        attributes=attributes,
+        start_time_ns=_to_ns(start_time),
+    )
+    recorded.end(_to_ns(end_time))
+    return recorded
+
+
+def _to_ns(value: datetime) -> int:
+    if value.tzinfo is None:
+        return int((value - datetime(1970, 1, 1)).total_seconds() * 1e9)
+    return int(value.timestamp() * 1e9)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def build_otlp_payload(spans: List[Span]) -> Dict[str, Any]:
+    """
+    Build an OTLP/HTTP JSON export request for the given spans.
+
+    Args:
+        spans: Ended spans
+
+    Returns:
+        ExportTraceServiceRequest as a JSON-serializable dictionary
+    """
+    return {
+        'resourceSpans': [{
+            'resource': {
+                'attributes': [
+                    {'key': 'service.name', 'value': {'stringValue': TRACING_SERVICE_NAME}},
+                ],
+            },
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [
+                    {
+                        'traceId': s.trace_id,
+                        'spanId': s.span_id,
+                        'parentSpanId': s.parent_span_id or '',
+                        'name': s.name,
+                        'kind': 1,
+                        'startTimeUnixNano': str(s.start_time_ns),
+                        'endTimeUnixNano': str(s.end_time_ns),
+                        'attributes': [
+                            {'key': key, 'value': _otlp_value(value)}
+                            for key, value in s.attributes.items()
+                            if value is not None
+                        ],
+                        'status': (
+                            {'code': 2, 'message': s.status_message or ''}
+                            if s.status == 'error' else {'code': 1}
+                        ),
+                    }
+                    for s in spans
+                ],
+            }],
+        }],
+    }
+
+
+def _export(spans: List[Span]) -> None:
+    if TRACING_EXPORTER == 'console':
+        for s in spans:
+            logger.info(f"span {json.dumps(s.to_dict(), default=str)}")
+    elif TRACING_EXPORTER == 'file':
+        with open(TRACING_FILE_PATH, 'a', encoding='utf-8') as f:
+            for s in spans:
+                f.write(json.dumps(s.to_dict(), default=str) + '\n')
+    elif TRACING_EXPORTER == 'otlp':
+        if not HTTPX_AVAILABLE:
+            return
+        response = httpx.post(TRACING_OTLP_ENDPOINT, json=build_otlp_payload(spans), timeout=10.0)
+        response.raise_for_status()
+
+
+def flush_spans() -> int:
+    """
+    Export all buffered spans.
+
+    Returns:
+        Number of spans exported (spans of a failed export are dropped)
+    """
+    with _export_lock:
+        spans = []
+        while _buffer:
+            spans.append(_buffer.popleft())
+        if not spans:
+            return 0
+        try:
+            _export(spans)
+        except Exception as e:
+            logger.warning(f"Failed to export {len(spans)} spans: {str(e)}")
+            return 0
+    return len(spans)
+
+
+def register_tracing_jobs() -> None:
+    """Register the periodic span export job (only when tracing is enabled)."""
+    if not TRACING_ENABLED:
+        return
+    from app.utils.background_jobs import register_periodic_job
+    register_periodic_job('trace_export', TRACING_EXPORT_INTERVAL_SECONDS, flush_spans)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for building patient list payloads.
+
+Compares the previous payload pipeline, which formatted datetimes as ISO
+strings in build_patient_payload and then parsed them back for the display
+field and for sorting, with the current one, which keeps the database
+datetimes until the payload is serialized. Both pipelines run over the same
+synthetic rows and must produce identical payloads.
+
+Usage:
+    python scripts/benchmark_patient_payloads.py
+    python scripts/benchmark_patient_payloads.py --rows 100000 --repeat 5 --limit 100000
+"""
+
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.api import services
+from app.api.utils import normalize_status, parse_datetime
+
+
+def make_rows(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Build rows shaped like fetch_confirmed_records / fetch_dashboard_records results."""
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    rows = []
+    for index in range(count):
+        captured_at = now - timedelta(seconds=rng.randint(0, 3 * 24 * 3600), microseconds=rng.randint(0, 999999))
+        status = rng.choice(["confirmed", "checked_in"])
+        rows.append({
+            "id": index,
+            "emr_id": f"EMR{index:07d}",
+            "booking_id": f"B{index:06d}",
+            "location_id": "AXjwbE",
+            "location_name": "Demo Clinic",
+            "legal_first_name": f"First{index}",
+            "legal_last_name": f"Last{index}",
+            "dob": "1990-01-15",
+            "mobile_phone": "+1234567890",
+            "sex_at_birth": "F",
+            "captured_at": captured_at if rng.random() > 0.02 else None,
+            "reason_for_visit": "Annual checkup",
+            "created_at": captured_at,
+            "updated_at": captured_at + timedelta(minutes=rng.randint(0, 90)),
+            "status": status,
+            "effective_status": status,
+            "source": "confirmed",
+        })
+    return rows
+
+
+# Previous implementation: strings out of build_patient_payload, parsed again downstream
+
+def legacy_build_patient_payload(record: Dict[str, Any]) -> Dict[str, Any]:
+    payload = {
+        "emrId": record.get("emr_id"),
+        "bookingId": record.get("booking_id"),
+        "locationId": record.get("location_id"),
+        "locationName": record.get("location_name"),
+        "legalFirstName": record.get("legal_first_name"),
+        "legalLastName": record.get("legal_last_name"),
+        "dob": record.get("dob"),
+        "mobilePhone": record.get("mobile_phone"),
+        "sexAtBirth": record.get("sex_at_birth"),
+        "capturedAt": record["captured_at"].isoformat() if record.get("captured_at") else None,
+        "reasonForVisit": record.get("reason_for_visit"),
+        "createdAt": record["created_at"].isoformat() if record.get("created_at") else None,
+        "updatedAt": record["updated_at"].isoformat() if record.get("updated_at") else None,
+    }
+    if record.get("status"):
+        payload["status"] = record["status"]
+    return payload
+
+
+def legacy_decorate_patient_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    status_class = normalize_status(payload.get("status")) or "unknown"
+    payload["status_class"] = status_class
+    payload["status_label"] = status_class.replace("_", " ").title()
+    captured_display = None
+    captured_dt = parse_datetime(payload.get("capturedAt") or payload.get("captured_at"))
+    if captured_dt > datetime.min:
+        captured_display = captured_dt.strftime("%b %d, %Y %I:%M %p").lstrip("0").replace(" 0", " ")
+    payload["captured_display"] = captured_display
+    return payload
+
+
+def legacy_prepare_dashboard_patients(rows: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    results = []
+    for record in rows:
+        payload = legacy_build_patient_payload(record)
+        payload["status"] = record.get("effective_status") or "confirmed"
+        payload["source"] = "confirmed"
+        results.append(legacy_decorate_patient_payload(payload))
+
+    def sort_key(item: Dict[str, Any]):
+        return (parse_datetime(item.get("capturedAt")), parse_datetime(item.get("updatedAt")))
+
+    results.sort(key=sort_key, reverse=True)
+    return results[:limit]
+
+
+def legacy_dashboard_payloads(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    payloads = []
+    for record in rows:
+        payload = legacy_build_patient_payload(record)
+        payload["status"] = record.get("status")
+        payload["source"] = record.get("source")
+        payloads.append(legacy_decorate_patient_payload(payload))
+    return payloads
+
+
+def current_prepare_dashboard_patients(rows: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    services.fetch_confirmed_records = lambda cursor, location_id, limit, statuses=None: rows
+    return services.prepare_dashboard_patients(None, "AXjwbE", [], limit)
+
+
+def current_dashboard_payloads(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [services.build_dashboard_payload(record) for record in rows]
+
+
+def best_of(repeat: int, *funcs: Callable[[], Any]) -> List[float]:
+    """Best wall time of each function; runs are interleaved so noise hits both alike."""
+    timings: List[List[float]] = [[] for _ in funcs]
+    for _ in range(repeat):
+        for func, func_timings in zip(funcs, timings):
+            started = time.perf_counter()
+            func()
+            func_timings.append(time.perf_counter() - started)
+    return [min(func_timings) for func_timings in timings]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark patient payload building")
+    parser.add_argument("--rows", type=int, default=100000, help="Number of synthetic rows (default: 100000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case; the best is reported (default: 5)")
+    parser.add_argument("--limit", type=int, default=50, help="Limit passed to prepare_dashboard_patients (default: 50)")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    cases = [
+        (
+            "build + decorate (get_local_patients)",
+            lambda: legacy_dashboard_payloads(rows),
+            lambda: current_dashboard_payloads(rows),
+        ),
+        (
+            "build + decorate + sort (prepare_dashboard_patients)",
+            lambda: legacy_prepare_dashboard_patients(rows, args.limit),
+            lambda: current_prepare_dashboard_patients(rows, args.limit),
+        ),
+    ]
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    for name, legacy, current in cases:
+        if legacy() != current():
+            raise SystemExit(f"{name}: payloads differ between pipelines")
+        legacy_s, current_s = best_of(args.repeat, legacy, current)
+        print(
+            f"  {name}: before {legacy_s * 1000:.0f} ms, after {current_s * 1000:.0f} ms "
+            f"({(1 - current_s / legacy_s) * 100:.0f}% less time, "
+            f"{current_s / args.rows * 1e6:.2f} us/row)"
+        )
+
+
+if __name__ == "__main__":
+    main()
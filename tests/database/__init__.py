@@ -0,0 +1,3 @@
+"""
+Database-backed tests for SQL in app/api/database.py.
+"""
@@ -0,0 +1,86 @@
+"""
+Fixtures for database-backed tests.
+
+Tests run against the PostgreSQL server in TEST_DATABASE_URL and are skipped
+when it is not set. Each test session applies app/database/schema.sql to a
+fresh, uniquely named schema and drops it afterwards, so the database can be
+shared with other data.
+"""
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+SCHEMA_FILE = Path(__file__).parent.parent.parent / "app" / "database" / "schema.sql"
+
+
+@pytest.fixture(scope="session")
+def db_schema():
+    """Create a throwaway schema with the application tables."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE SCHEMA {schema}")
+    cursor.execute(f"SET search_path TO {schema}, public")
+    cursor.execute(SCHEMA_FILE.read_text())
+    try:
+        yield schema
+    finally:
+        cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.close()
+
+
+@pytest.fixture
+def db_conn(db_schema):
+    """Connection using the test schema; tables are emptied after each test."""
+    conn = psycopg2.connect(TEST_DATABASE_URL, options=f"-c search_path={db_schema},public")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT string_agg(format('%%I.%%I', schemaname, tablename), ', ')
+            FROM pg_tables WHERE schemaname = %s
+            """,
+            (db_schema,)
+        )
+        tables = cursor.fetchone()[0]
+        if tables:
+            cursor.execute(f"TRUNCATE {tables} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+@pytest.fixture
+def api_client(db_schema, monkeypatch):
+    """In-process API client whose database connections use the test schema."""
+    from fastapi.testclient import TestClient
+    from app.api import database
+    from app.api.routes import app
+    from app.api.routes.dependencies import get_current_client
+
+    def connect():
+        return psycopg2.connect(TEST_DATABASE_URL, options=f"-c search_path={db_schema},public")
+
+    # Route modules import get_db_connection by name, so patch every reference
+    original = database.get_db_connection
+    for name, module in list(sys.modules.items()):
+        if name.startswith("app.") and getattr(module, "get_db_connection", None) is original:
+            monkeypatch.setattr(module, "get_db_connection", connect)
+
+    app.dependency_overrides[get_current_client] = lambda: None
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_current_client, None)
@@ -0,0 +1,87 @@
+"""Tests for the sharded, trigger-maintained alert counters."""
+
+import os
+
+import psycopg2
+
+from app.api.database import get_alerts
+
+
+def _insert_alert(cursor, severity='critical'):
+    cursor.execute(
+        """
+        INSERT INTO alerts (source, source_id, severity, message)
+        VALUES ('vm', 'vm-1', %s, 'VM down')
+        RETURNING alert_id
+        """,
+        (severity,)
+    )
+    return cursor.fetchone()[0]
+
+
+def _counts(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT severity, resolved, SUM(alert_count)
+        FROM alert_counts
+        GROUP BY severity, resolved
+        HAVING SUM(alert_count) <> 0
+        ORDER BY severity, resolved
+        """
+    )
+    return cursor.fetchall()
+
+
+def test_counts_follow_inserts_resolutions_and_deletes(db_conn):
+    """Test the summed shard rows match the alerts table after each kind of change."""
+    cursor = db_conn.cursor()
+    first = _insert_alert(cursor)
+    _insert_alert(cursor)
+    _insert_alert(cursor, severity='warning')
+    db_conn.commit()
+    assert _counts(db_conn) == [('critical', False, 2), ('warning', False, 1)]
+
+    cursor.execute("UPDATE alerts SET resolved = TRUE WHERE alert_id = %s", (first,))
+    cursor.execute("UPDATE alerts SET message = 'still down' WHERE severity = 'warning'")
+    db_conn.commit()
+    assert _counts(db_conn) == [('critical', False, 1), ('critical', True, 1), ('warning', False, 1)]
+
+    cursor.execute("DELETE FROM alerts WHERE alert_id = %s", (first,))
+    db_conn.commit()
+    assert _counts(db_conn) == [('critical', False, 1), ('warning', False, 1)]
+
+
+def test_sessions_write_their_own_shards_and_list_sums_them(db_conn, db_schema):
+    """Test writes from different connections are summed into the alerts list total."""
+    _insert_alert(db_conn.cursor())
+    db_conn.commit()
+
+    other = psycopg2.connect(os.environ['TEST_DATABASE_URL'], options=f"-c search_path={db_schema},public")
+    try:
+        other_cursor = other.cursor()
+        other_cursor.execute("SELECT pg_backend_pid() % 16")
+        other_shard = other_cursor.fetchone()[0]
+        _insert_alert(other_cursor)
+        other.commit()
+    finally:
+        other.close()
+
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT pg_backend_pid() % 16")
+    own_shard = cursor.fetchone()[0]
+    cursor.execute("SELECT shard FROM alert_counts ORDER BY shard")
+    assert [row[0] for row in cursor.fetchall()] == sorted({own_shard, other_shard})
+
+    _, total = get_alerts(db_conn, filters={'severity': 'critical'})
+    assert total == 2
+
+
+def test_truncate_resets_counts(db_conn):
+    """Test truncating alerts empties the counters."""
+    cursor = db_conn.cursor()
+    _insert_alert(cursor)
+    cursor.execute("TRUNCATE alerts")
+    db_conn.commit()
+
+    assert _counts(db_conn) == []
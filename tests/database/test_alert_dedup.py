@@ -0,0 +1,48 @@
+"""Tests for POST /alerts de-duplication across workers."""
+
+import pytest
+
+from app.api.routes.alerts import verify_alert_api_key_auth
+from app.utils import alert_digest
+
+ALERT = {'source': 'vm', 'sourceId': 'vm-1', 'severity': 'critical', 'message': 'VM down'}
+
+
+@pytest.fixture
+def alerts_client(api_client):
+    from app.api.routes import app
+
+    alert_digest._recent_alerts.clear()
+    app.dependency_overrides[verify_alert_api_key_auth] = lambda: None
+    try:
+        yield api_client
+    finally:
+        app.dependency_overrides.pop(verify_alert_api_key_auth, None)
+        alert_digest._recent_alerts.clear()
+
+
+def test_repeat_is_answered_with_the_open_alert(db_conn, alerts_client):
+    """Test a repeat within the window returns the remembered alert."""
+    first = alerts_client.post('/alerts', json=ALERT).json()
+    second = alerts_client.post('/alerts', json=ALERT).json()
+
+    assert second['alertId'] == first['alertId']
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM alerts")
+    assert cursor.fetchone()[0] == 1
+
+
+def test_alert_resolved_elsewhere_is_not_a_duplicate(db_conn, alerts_client):
+    """Test a remembered alert resolved through another worker does not swallow a new incident."""
+    first = alerts_client.post('/alerts', json=ALERT).json()
+
+    # Resolved directly in the database, as another worker would, so this
+    # worker's dedup entry is not cleared
+    cursor = db_conn.cursor()
+    cursor.execute("UPDATE alerts SET resolved = TRUE WHERE alert_id = %s", (first['alertId'],))
+    db_conn.commit()
+
+    second = alerts_client.post('/alerts', json=ALERT).json()
+    assert second['alertId'] != first['alertId']
+    third = alerts_client.post('/alerts', json=ALERT).json()
+    assert third['alertId'] == second['alertId']
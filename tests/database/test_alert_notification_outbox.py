@@ -0,0 +1,70 @@
+"""Tests for queueing and claiming alert notifications."""
+
+from app.api.database import claim_alert_notifications, save_alert
+
+
+def _alert(message):
+    return {'source': 'vm', 'source_id': 'vm-1', 'severity': 'critical', 'message': message}
+
+
+def _make_due(conn):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE alert_notification_outbox SET next_attempt_at = CURRENT_TIMESTAMP - INTERVAL '1 second'")
+    conn.commit()
+
+
+def test_digest_hold_ends_at_window_boundary_on_database_clock(db_conn):
+    """Test a digest row is held until the next window boundary of the database clock."""
+    save_alert(db_conn, _alert('VM 1 down'), notify_channels=['email'])
+    save_alert(db_conn, _alert('VM 2 down'), notify_channels=['email'],
+               digest_key='vm:critical:abc', digest_window_seconds=300)
+
+    cursor = db_conn.cursor()
+    cursor.execute(
+        """
+        SELECT digest_key IS NOT NULL,
+               next_attempt_at <= CURRENT_TIMESTAMP,
+               extract(epoch FROM next_attempt_at::timestamptz)::bigint % 300 = 0,
+               next_attempt_at - CURRENT_TIMESTAMP <= INTERVAL '300 seconds'
+        FROM alert_notification_outbox ORDER BY digest_key NULLS FIRST
+        """
+    )
+    immediate, held = cursor.fetchall()
+    assert immediate[:2] == (False, True)
+    assert held == (True, False, True, True)
+
+
+def test_claim_takes_whole_digest_groups(db_conn):
+    """Test a batch that reaches into a digest group claims every due row of it."""
+    save_alert(db_conn, _alert('Disk full'), notify_channels=['email'])
+    for number in range(4):
+        save_alert(db_conn, _alert(f'VM {number} down'), notify_channels=['email'],
+                   digest_key='vm:critical:abc', digest_window_seconds=300)
+    _make_due(db_conn)
+
+    first = claim_alert_notifications(db_conn, limit=2)
+    assert [row['digest_key'] for row in first] == ['vm:critical:abc'] * 4
+    assert all(row['attempts'] == 1 for row in first)
+
+    second = claim_alert_notifications(db_conn, limit=2)
+    assert [row['digest_key'] for row in second] == [None]
+
+
+def test_claim_leaves_other_channels_and_events_of_a_digest_key(db_conn):
+    """Test only rows with the same digest key and channel join the group."""
+    save_alert(db_conn, _alert('VM 1 down'), notify_channels=['email'],
+               digest_key='vm:critical:abc', digest_window_seconds=300)
+    save_alert(db_conn, _alert('VM 2 down'), notify_channels=['email', 'slack'],
+               digest_key='vm:critical:abc', digest_window_seconds=300)
+    cursor = db_conn.cursor()
+    cursor.execute(
+        """
+        UPDATE alert_notification_outbox
+        SET next_attempt_at = CURRENT_TIMESTAMP - CASE channel WHEN 'email' THEN INTERVAL '2 seconds' ELSE INTERVAL '1 second' END
+        """
+    )
+    db_conn.commit()
+
+    first = claim_alert_notifications(db_conn, limit=1)
+    assert sorted(row['channel'] for row in first) == ['email', 'email']
+    assert [row['channel'] for row in claim_alert_notifications(db_conn, limit=1)] == ['slack']
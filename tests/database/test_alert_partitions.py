@@ -0,0 +1,141 @@
+"""Tests for the monthly alert partitions: creation, migration and archiving."""
+
+import os
+import uuid
+from pathlib import Path
+
+import psycopg2
+
+from app.api.database import archive_alert_partitions
+
+SCHEMA_FILE = Path(__file__).parent.parent.parent / "app" / "database" / "schema.sql"
+
+
+def _insert_alert(cursor, created_at, resolved=False, severity='critical'):
+    cursor.execute(
+        """
+        INSERT INTO alerts (source, source_id, severity, message, resolved, created_at)
+        VALUES ('vm', 'vm-1', %s, 'VM down', %s, %s)
+        """,
+        (severity, resolved, created_at)
+    )
+
+
+def _partition_rows(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT tableoid::regclass::text, COUNT(*) FROM alerts GROUP BY 1 ORDER BY 1"
+    )
+    return cursor.fetchall()
+
+
+def _counts(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT severity, resolved, SUM(alert_count)
+        FROM alert_counts
+        GROUP BY severity, resolved
+        HAVING SUM(alert_count) <> 0
+        ORDER BY severity, resolved
+        """
+    )
+    return cursor.fetchall()
+
+
+def _drop_partitions(conn, *names):
+    cursor = conn.cursor()
+    for name in names:
+        cursor.execute(f"DROP TABLE IF EXISTS {name}")
+    conn.commit()
+
+
+def test_create_partition_moves_default_rows_and_keeps_counts(db_conn):
+    """Test rows parked in the DEFAULT partition move into a new month and stay counted."""
+    cursor = db_conn.cursor()
+    _insert_alert(cursor, '2024-03-15 10:00:00')
+    _insert_alert(cursor, '2024-03-31 23:59:59', resolved=True)
+    _insert_alert(cursor, '2024-04-01 00:00:00')
+    db_conn.commit()
+    assert _partition_rows(db_conn) == [('alerts_default', 3)]
+
+    try:
+        cursor.execute("SELECT create_alert_partition('2024-03-10')")
+        assert cursor.fetchone()[0] is True
+        cursor.execute("SELECT create_alert_partition('2024-03-01')")
+        assert cursor.fetchone()[0] is False
+        db_conn.commit()
+
+        assert _partition_rows(db_conn) == [('alerts_default', 1), ('alerts_p202403', 2)]
+        assert _counts(db_conn) == [('critical', False, 2), ('critical', True, 1)]
+    finally:
+        _drop_partitions(db_conn, 'alerts_p202403')
+
+
+def test_archive_detaches_resolved_months_and_adjusts_counts(db_conn):
+    """Test only fully resolved old months are dropped and their alerts leave the counts."""
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT create_alert_partition('2024-01-01'), create_alert_partition('2024-02-01')")
+    _insert_alert(cursor, '2024-01-10 08:00:00', resolved=True)
+    _insert_alert(cursor, '2024-01-20 08:00:00', resolved=True, severity='warning')
+    _insert_alert(cursor, '2024-02-10 08:00:00')
+    _insert_alert(cursor, '2024-02-11 08:00:00', resolved=True)
+    db_conn.commit()
+
+    try:
+        archived = archive_alert_partitions(db_conn, retention_days=90, drop=True)
+
+        assert archived == ['alerts_p202401']
+        assert _partition_rows(db_conn) == [('alerts_p202402', 2)]
+        assert _counts(db_conn) == [('critical', False, 1), ('critical', True, 1)]
+    finally:
+        _drop_partitions(db_conn, 'alerts_p202401', 'alerts_p202402')
+
+
+def test_unpartitioned_table_is_migrated():
+    """Test applying the schema over a plain alerts table copies its rows into monthly partitions."""
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    conn = psycopg2.connect(os.environ['TEST_DATABASE_URL'])
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE SCHEMA {schema}")
+    try:
+        cursor.execute(f"SET search_path TO {schema}, public")
+        cursor.execute(
+            """
+            CREATE TABLE alerts (
+                alert_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                source VARCHAR(50) NOT NULL,
+                source_id VARCHAR(255) NOT NULL,
+                severity VARCHAR(20) NOT NULL,
+                message TEXT NOT NULL,
+                details JSONB,
+                resolved BOOLEAN DEFAULT FALSE,
+                resolved_at TIMESTAMP,
+                resolved_by VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        _insert_alert(cursor, '2024-05-02 12:00:00')
+        _insert_alert(cursor, '2024-06-02 12:00:00', resolved=True)
+        cursor.execute(
+            """
+            INSERT INTO alerts (source, source_id, severity, message, created_at, updated_at)
+            VALUES ('vm', 'vm-2', 'info', 'no created_at', NULL, '2024-05-20 00:00:00')
+            """
+        )
+
+        cursor.execute(SCHEMA_FILE.read_text())
+
+        assert _partition_rows(conn) == [('alerts_p202405', 2), ('alerts_p202406', 1)]
+        assert _counts(conn) == [('critical', False, 1), ('critical', True, 1), ('info', False, 1)]
+        cursor.execute(
+            "SELECT 1 FROM pg_tables WHERE schemaname = %s AND tablename = 'alerts_unpartitioned'",
+            (schema,)
+        )
+        assert cursor.fetchone() is None
+    finally:
+        cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.close()
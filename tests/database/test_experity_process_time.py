@@ -0,0 +1,49 @@
+"""Tests for batch saving of Experity process times."""
+
+from app.api.database import save_experity_process_times
+
+
+def _record(key=None, minute=0):
+    return {
+        'process_name': 'Encounter process time',
+        'started_at': f'2025-01-22T10:{minute:02d}:00Z',
+        'ended_at': f'2025-01-22T10:{minute:02d}:30Z',
+        'idempotency_key': key,
+    }
+
+
+def _count(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM experity_process_time")
+    return cursor.fetchone()[0]
+
+
+def test_duplicate_keys_in_one_batch(db_conn):
+    """Test a key repeated within a batch is stored once and returned for every record."""
+    results = save_experity_process_times(db_conn, [_record('a'), _record('b', 1), _record('a', 2), _record()])
+
+    assert _count(db_conn) == 3
+    assert [r['duplicate'] for r in results] == [False, False, True, False]
+    assert results[2]['process_time_id'] == results[0]['process_time_id']
+    assert results[0]['duration_seconds'] == 30
+
+
+def test_resent_batch(db_conn):
+    """Test re-sending a batch returns the stored records instead of inserting again."""
+    first = save_experity_process_times(db_conn, [_record('a'), _record('b', 1)])
+    again = save_experity_process_times(db_conn, [_record('b', 1), _record('a'), _record('c', 2)])
+
+    assert _count(db_conn) == 3
+    assert [r['duplicate'] for r in again] == [True, True, False]
+    assert again[0]['process_time_id'] == first[1]['process_time_id']
+    assert again[1]['process_time_id'] == first[0]['process_time_id']
+
+
+def test_list_timestamps_are_utc_with_single_suffix(db_conn, api_client):
+    """Test listed timestamps are formatted as UTC with one trailing Z."""
+    save_experity_process_times(db_conn, [_record('a')])
+
+    record = api_client.get('/experity/process-time').json()['processTimes'][0]
+    assert record['startedAt'] == '2025-01-22T10:00:00Z'
+    assert record['endedAt'] == '2025-01-22T10:00:30Z'
+    assert record['createdAt'].endswith('Z') and '+' not in record['createdAt']
@@ -0,0 +1,74 @@
+"""Tests for the single-statement metadata merge of VM health PATCHes."""
+
+import json
+
+from app.api.database import save_vm_health, update_vm_health_partial
+from app.utils.heartbeat_state import (
+    forget_heartbeat_metadata,
+    remember_heartbeat_metadata,
+    resolve_heartbeat_metadata,
+)
+
+
+def _insert_vm(conn, metadata):
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO vm_health (vm_id, server_id, status, metadata) VALUES ('vm-1', 'server-1', 'healthy', %s)",
+        (json.dumps(metadata),)
+    )
+    conn.commit()
+
+
+def _stored_metadata(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT metadata FROM vm_health WHERE vm_id = 'vm-1'")
+    return cursor.fetchone()[0]
+
+
+def test_vm_metadata_keeps_existing_keys_and_overwrites_supplied(db_conn):
+    """Test a PATCH merges its metadata keys into the stored metadata."""
+    _insert_vm(db_conn, {'ip': '10.0.0.1', 'version': '1.0', 'nested': {'a': 1}})
+
+    result = update_vm_health_partial(
+        db_conn, {'vm_id': 'vm-1', 'metadata': {'version': '1.1', 'nested': {'b': 2}, 'region': 'east'}}
+    )
+
+    expected = {'ip': '10.0.0.1', 'version': '1.1', 'nested': {'b': 2}, 'region': 'east'}
+    assert result['metadata'] == expected
+    assert _stored_metadata(db_conn) == expected
+    assert result['status'] == 'healthy' and result['server_id'] == 'server-1'
+
+
+def test_vm_metadata_untouched_without_metadata_and_cleared_by_none(db_conn):
+    """Test omitting metadata leaves it alone and an explicit None clears it."""
+    _insert_vm(db_conn, {'ip': '10.0.0.1'})
+
+    update_vm_health_partial(db_conn, {'vm_id': 'vm-1', 'status': 'idle'})
+    assert _stored_metadata(db_conn) == {'ip': '10.0.0.1'}
+
+    update_vm_health_partial(db_conn, {'vm_id': 'vm-1', 'metadata': None})
+    assert _stored_metadata(db_conn) is None
+
+
+def test_vm_metadata_merge_into_empty_and_missing_vm(db_conn):
+    """Test a merge into NULL metadata starts from an empty object and a missing VM returns None."""
+    cursor = db_conn.cursor()
+    cursor.execute("INSERT INTO vm_health (vm_id, status) VALUES ('vm-1', 'healthy')")
+    db_conn.commit()
+
+    result = update_vm_health_partial(db_conn, {'vm_id': 'vm-1', 'metadata': {'ip': '10.0.0.2'}})
+    assert result['metadata'] == {'ip': '10.0.0.2'}
+    assert update_vm_health_partial(db_conn, {'vm_id': 'vm-missing', 'metadata': {'ip': 'x'}}) is None
+
+
+def test_snapshot_matching_stale_cache_still_corrects_stored_metadata(db_conn):
+    """Test a full snapshot equal to this worker's stale cache overwrites what another worker stored."""
+    _insert_vm(db_conn, {'cpuUsage': 99})
+    remember_heartbeat_metadata('vm', 'vm-1', 3, {'cpuUsage': 10})
+    try:
+        state = resolve_heartbeat_metadata('vm', 'vm-1', {'cpuUsage': 10}, None, 3, lambda: None)
+    finally:
+        forget_heartbeat_metadata('vm', 'vm-1')
+
+    save_vm_health(db_conn, {'vm_id': 'vm-1', 'status': 'healthy', **state['updates']})
+    assert _stored_metadata(db_conn) == {'cpuUsage': 10}
@@ -0,0 +1,128 @@
+"""Tests for batch patient upserts and the EMR ID sync they run."""
+
+from app.api.database import _sync_patient_emr_ids, upsert_patient_records
+from app.utils.patient import normalize_patient_record
+
+
+def _patient(cursor, emr_id, booking_id=None, booking_number=None, patient_number=None, first_name=None):
+    cursor.execute(
+        """
+        INSERT INTO patients (emr_id, booking_id, booking_number, patient_number, location_id, legal_first_name)
+        VALUES (%s, %s, %s, %s, 'loc-1', %s)
+        RETURNING id
+        """,
+        (emr_id, booking_id, booking_number, patient_number, first_name)
+    )
+    return cursor.fetchone()[0]
+
+
+def _emr_ids_by_id(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, emr_id FROM patients ORDER BY id")
+    return dict(cursor.fetchall())
+
+
+def _record(emr_id, **fields):
+    return normalize_patient_record({'emrId': emr_id, 'locationId': 'loc-1', **fields})
+
+
+def test_sync_rekeys_on_booking_then_booking_number_then_patient_number(db_conn):
+    """Test each record re-keys the row matched by its first identifier with a match."""
+    cursor = db_conn.cursor()
+    by_booking = _patient(cursor, 'OLD-1', booking_id='B1', patient_number='P9')
+    by_number = _patient(cursor, 'OLD-2', booking_number='BN2')
+    by_patient = _patient(cursor, 'OLD-3', patient_number='P3')
+    untouched = _patient(cursor, 'OLD-4', booking_id='B4')
+
+    _sync_patient_emr_ids(cursor, [
+        _record('NEW-1', bookingId='B1', patientNumber='P3'),
+        _record('NEW-2', bookingId='missing', bookingNumber='BN2'),
+        _record('NEW-3', patientNumber='P3'),
+        _record('NEW-5'),
+    ])
+
+    assert _emr_ids_by_id(db_conn) == {
+        by_booking: 'NEW-1',
+        by_number: 'NEW-2',
+        by_patient: 'NEW-3',
+        untouched: 'OLD-4',
+    }
+    db_conn.rollback()
+
+
+def test_sync_skips_when_new_emr_id_is_taken(db_conn):
+    """Test a row is not re-keyed onto an EMR ID another row already holds."""
+    cursor = db_conn.cursor()
+    matched = _patient(cursor, 'OLD-1', booking_id='B1')
+    holder = _patient(cursor, 'NEW-1')
+
+    _sync_patient_emr_ids(cursor, [_record('NEW-1', bookingId='B1')])
+
+    assert _emr_ids_by_id(db_conn) == {matched: 'OLD-1', holder: 'NEW-1'}
+    db_conn.rollback()
+
+
+def test_sync_without_identifiers_runs_no_query(db_conn):
+    """Test records without booking or patient numbers leave the table alone."""
+    cursor = db_conn.cursor()
+    _patient(cursor, 'OLD-1', booking_id='B1')
+    cursor.execute("SELECT 'marker'")
+
+    _sync_patient_emr_ids(cursor, [_record('NEW-1')])
+
+    assert cursor.fetchone() == ('marker',)
+    db_conn.rollback()
+
+
+def test_upsert_reports_created_and_updated(db_conn):
+    """Test the batch upsert inserts new EMR IDs and updates existing ones in one call."""
+    cursor = db_conn.cursor()
+    _patient(cursor, 'EMR-1', first_name='Old')
+    db_conn.commit()
+
+    outcomes = upsert_patient_records(db_conn, [
+        _record('EMR-1', legalFirstName='New'),
+        _record('EMR-2', legalFirstName='Other'),
+    ])
+
+    assert outcomes == {'EMR-1': 'updated', 'EMR-2': 'created'}
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT emr_id, legal_first_name FROM patients ORDER BY emr_id")
+    assert cursor.fetchall() == [('EMR-1', 'New'), ('EMR-2', 'Other')]
+
+
+def test_batch_endpoint_dedupes_emr_ids_within_the_batch(db_conn, api_client):
+    """Test the last record of a repeated emrId is saved and earlier ones are skipped."""
+    response = api_client.post('/patients/batch', json={'patients': [
+        {'emrId': 'EMR-1', 'locationId': 'loc-1', 'legalFirstName': 'First'},
+        {'emrId': 'EMR-2', 'locationId': 'loc-1', 'legalFirstName': 'Other'},
+        {'emrId': 'EMR-1', 'locationId': 'loc-1', 'legalFirstName': 'Last'},
+        {'emrId': '  ', 'locationId': 'loc-1'},
+    ]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [(result['index'], result['status']) for result in body['results']] == [
+        (0, 'skipped'), (1, 'created'), (2, 'created'), (3, 'failed')
+    ]
+    assert (body['created'], body['updated'], body['skipped'], body['failed']) == (2, 0, 1, 1)
+
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT emr_id, legal_first_name FROM patients ORDER BY emr_id")
+    assert cursor.fetchall() == [('EMR-1', 'Last'), ('EMR-2', 'Other')]
+
+
+def test_batch_endpoint_fills_missing_location_from_stored_patient(db_conn, api_client):
+    """Test a record without locationId updates the stored patient and fails for a new one."""
+    cursor = db_conn.cursor()
+    _patient(cursor, 'EMR-1', first_name='Old')
+    db_conn.commit()
+
+    response = api_client.post('/patients/batch', json={'patients': [
+        {'emrId': 'EMR-1', 'mobilePhone': '555'},
+        {'emrId': 'EMR-NEW', 'legalFirstName': 'Nobody'},
+    ]})
+
+    assert [result['status'] for result in response.json()['results']] == ['updated', 'failed']
+    cursor.execute("SELECT location_id, legal_first_name, mobile_phone FROM patients WHERE emr_id = 'EMR-1'")
+    assert cursor.fetchone() == ('loc-1', 'Old', '555')
@@ -0,0 +1,144 @@
+"""Tests for promoting pending patients into patients."""
+
+from app.api.database import promote_pending_patients
+
+
+def _pending(cursor, emr_id, first_name, status='ready', updated_seconds_ago=0, booking_id=None):
+    cursor.execute(
+        """
+        INSERT INTO pending_patients (emr_id, booking_id, location_id, legal_first_name, status, updated_at)
+        VALUES (%s, %s, 'loc-1', %s, %s, LOCALTIMESTAMP - make_interval(secs => %s))
+        RETURNING pending_id
+        """,
+        (emr_id, booking_id, first_name, status, updated_seconds_ago)
+    )
+    return cursor.fetchone()[0]
+
+
+def _pending_rows(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT legal_first_name, status, promoted_at IS NOT NULL FROM pending_patients ORDER BY pending_id"
+    )
+    return cursor.fetchall()
+
+
+def _patients(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT emr_id, legal_first_name, booking_id FROM patients ORDER BY emr_id")
+    return cursor.fetchall()
+
+
+def test_latest_row_per_emr_id_wins(db_conn):
+    """Test the most recently updated pending row of an EMR ID is the one copied."""
+    cursor = db_conn.cursor()
+    _pending(cursor, 'EMR-1', 'Newer', updated_seconds_ago=5, booking_id='B2')
+    _pending(cursor, 'EMR-1', 'Older', updated_seconds_ago=60, booking_id='B1')
+    _pending(cursor, 'EMR-2', 'Other', status='pending')
+    db_conn.commit()
+
+    result = promote_pending_patients(db_conn)
+
+    assert (result['promoted'], result['inserted'], result['updated'], result['superseded']) == (3, 2, 0, 1)
+    assert _patients(db_conn) == [('EMR-1', 'Newer', 'B2'), ('EMR-2', 'Other', None)]
+
+
+def test_claimed_rows_completed_and_others_left(db_conn):
+    """Test claimed rows are completed with promoted_at; rows without an EMR ID or already done are untouched."""
+    cursor = db_conn.cursor()
+    _pending(cursor, 'EMR-1', 'Ready')
+    _pending(cursor, None, 'No EMR ID', status='pending')
+    _pending(cursor, 'EMR-3', 'Done', status='completed')
+    cursor.execute("INSERT INTO patients (emr_id, location_id, legal_first_name) VALUES ('EMR-1', 'loc-1', 'Stale')")
+    db_conn.commit()
+
+    result = promote_pending_patients(db_conn)
+
+    assert (result['promoted'], result['inserted'], result['updated']) == (1, 0, 1)
+    assert _pending_rows(db_conn) == [
+        ('Ready', 'completed', True),
+        ('No EMR ID', 'pending', False),
+        ('Done', 'completed', False),
+    ]
+    assert _patients(db_conn) == [('EMR-1', 'Ready', None)]
+    assert promote_pending_patients(db_conn)['promoted'] == 0
+
+
+def test_lag_counts_from_emr_id_assignment(db_conn):
+    """Test the lag runs from when the EMR ID was set, not from the last update."""
+    cursor = db_conn.cursor()
+    pending_id = _pending(cursor, None, 'Waiting', status='pending')
+    cursor.execute(
+        "UPDATE pending_patients SET emr_id = 'EMR-1', status = 'ready' WHERE pending_id = %s", (pending_id,)
+    )
+    cursor.execute(
+        "UPDATE pending_patients SET emr_id_set_at = LOCALTIMESTAMP - INTERVAL '120 seconds' WHERE pending_id = %s",
+        (pending_id,)
+    )
+    db_conn.commit()
+
+    [lag] = promote_pending_patients(db_conn)['lag_seconds']
+    assert 119 <= lag < 180
+
+
+def test_emr_id_set_at_only_moves_when_emr_id_changes(db_conn):
+    """Test re-saving the same EMR ID keeps the original assignment time."""
+    cursor = db_conn.cursor()
+    pending_id = _pending(cursor, 'EMR-1', 'Ready')
+    cursor.execute(
+        "UPDATE pending_patients SET emr_id_set_at = LOCALTIMESTAMP - INTERVAL '1 hour' WHERE pending_id = %s",
+        (pending_id,)
+    )
+    cursor.execute("UPDATE pending_patients SET emr_id = 'EMR-1' WHERE pending_id = %s", (pending_id,))
+    cursor.execute(
+        "SELECT emr_id_set_at < LOCALTIMESTAMP - INTERVAL '59 minutes' FROM pending_patients WHERE pending_id = %s",
+        (pending_id,)
+    )
+    assert cursor.fetchone()[0] is True
+
+    cursor.execute("UPDATE pending_patients SET emr_id = 'EMR-2' WHERE pending_id = %s", (pending_id,))
+    cursor.execute(
+        "SELECT emr_id_set_at > LOCALTIMESTAMP - INTERVAL '1 minute' FROM pending_patients WHERE pending_id = %s",
+        (pending_id,)
+    )
+    assert cursor.fetchone()[0] is True
+    db_conn.rollback()
+
+
+def test_promote_endpoint(db_conn, api_client):
+    """Test POST /patients/promote promotes in batches and reports the backlog."""
+    cursor = db_conn.cursor()
+    _pending(cursor, 'EMR-1', 'First', updated_seconds_ago=30)
+    _pending(cursor, 'EMR-2', 'Second', updated_seconds_ago=20)
+    _pending(cursor, 'EMR-2', 'Second again', updated_seconds_ago=10)
+    db_conn.commit()
+
+    response = api_client.post('/patients/promote?batchSize=2')
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body['promoted'], body['inserted'], body['batches'], body['waiting']) == (3, 2, 2, 0)
+    assert body['oldestWaitingSeconds'] is None
+    assert _patients(db_conn) == [('EMR-1', 'First', None), ('EMR-2', 'Second again', None)]
+    assert [row[1:] for row in _pending_rows(db_conn)] == [('completed', True)] * 3
+
+
+def test_promote_endpoint_rejects_bad_batch_size(api_client):
+    """Test batchSize outside 1-5000 is rejected."""
+    assert api_client.post('/patients/promote?batchSize=0').status_code == 422
+
+
+def test_promotion_keeps_error_message(db_conn):
+    """Test an API failure recorded on the pending row survives promotion."""
+    cursor = db_conn.cursor()
+    pending_id = _pending(cursor, 'EMR-1', 'Ann')
+    cursor.execute(
+        "UPDATE pending_patients SET error_message = 'Failed to send to API' WHERE pending_id = %s",
+        (pending_id,)
+    )
+    db_conn.commit()
+
+    promote_pending_patients(db_conn)
+
+    cursor.execute("SELECT status, error_message FROM pending_patients WHERE pending_id = %s", (pending_id,))
+    assert cursor.fetchone() == ('completed', 'Failed to send to API')
@@ -0,0 +1,62 @@
+"""Tests for the GET /patients/search typeahead."""
+
+import pytest
+
+
+@pytest.fixture
+def patients(db_conn):
+    cursor = db_conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO patients (emr_id, location_id, legal_first_name, legal_last_name, mobile_phone)
+        VALUES ('EMR-100', 'loc-1', 'John', 'Doe', '+1 (555) 123-4567'),
+               ('EMR-200', 'loc-1', 'Jane', 'Doerr', '555-999-0000'),
+               ('EMR-300', 'loc-2', 'John', 'Smith', '(555) 123-0000')
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO pending_patients (location_id, legal_first_name, legal_last_name, mobile_phone)
+        VALUES ('loc-1', 'Mary', 'Doe', '555 123 9999')
+        """
+    )
+    db_conn.commit()
+
+
+def _search(api_client, **params):
+    response = api_client.get('/patients/search', params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_digit_only_search_matches_phone_digits(patients, api_client):
+    """Test a formatted phone number matches on digits across both tables."""
+    results = _search(api_client, q='(555) 123', locationId='loc-1')
+
+    assert sorted((result['source'], result['legalFirstName']) for result in results) == [
+        ('confirmed', 'John'), ('pending', 'Mary')
+    ]
+
+
+def test_name_search_ranks_exact_then_prefix_and_ignores_phones(patients, api_client):
+    """Test a name search matches names (not phone digits) and ranks exact matches first."""
+    results = _search(api_client, q='  JOHN   doe ', locationId='loc-1')
+    assert [(result['emrId'], result['matchType']) for result in results] == [('EMR-100', 'exact')]
+
+    results = _search(api_client, q='doe', locationId='loc-1')
+    assert {result['legalFirstName'] for result in results} == {'John', 'Jane', 'Mary'}
+
+    assert _search(api_client, q='555', locationId='loc-2')[0]['emrId'] == 'EMR-300'
+    assert _search(api_client, q='smith5', locationId='loc-2') == []
+
+
+@pytest.mark.parametrize('params', [
+    {'q': 'j'},
+    {'q': ''},
+    {'q': 'x' * 101},
+    {'q': 'doe', 'limit': 0},
+    {'q': 'doe', 'limit': 51},
+])
+def test_invalid_query_is_rejected(api_client, params):
+    """Test terms shorter than 2 or longer than 100 characters and bad limits are rejected."""
+    assert api_client.get('/patients/search', params=params).status_code == 422
@@ -0,0 +1,80 @@
+"""Tests for the hourly Experity process time rollups."""
+
+from pathlib import Path
+
+from app.api.database import refresh_experity_process_time_rollups
+
+SCHEMA_FILE = Path(__file__).parent.parent.parent / "app" / "database" / "schema.sql"
+
+
+def _insert(cursor, started_at, seconds):
+    cursor.execute(
+        """
+        INSERT INTO experity_process_time (process_name, started_at, ended_at)
+        VALUES ('Encounter process time', %s::timestamptz, %s::timestamptz + make_interval(secs => %s))
+        RETURNING process_time_id
+        """,
+        (started_at, started_at, seconds)
+    )
+    return cursor.fetchone()[0]
+
+
+def _rollups(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT to_char(hour_start AT TIME ZONE 'UTC', 'HH24'), started_count, total_duration_seconds
+        FROM experity_process_time_hourly ORDER BY hour_start
+        """
+    )
+    return cursor.fetchall()
+
+
+def test_moved_and_deleted_rows_refresh_their_old_hours(db_conn):
+    """Test an hour is recomputed when a row leaves it by update or delete."""
+    cursor = db_conn.cursor()
+    moved = _insert(cursor, '2025-01-22T10:10:00Z', 30)
+    deleted = _insert(cursor, '2025-01-22T10:20:00Z', 60)
+    _insert(cursor, '2025-01-22T11:05:00Z', 10)
+    db_conn.commit()
+
+    assert refresh_experity_process_time_rollups(db_conn) == 2
+    assert _rollups(db_conn) == [('10', 2, 90), ('11', 1, 10)]
+    assert refresh_experity_process_time_rollups(db_conn) == 0
+
+    cursor.execute(
+        "UPDATE experity_process_time SET started_at = '2025-01-22T12:00:00Z', "
+        "ended_at = '2025-01-22T12:00:30Z' WHERE process_time_id = %s",
+        (moved,)
+    )
+    cursor.execute("DELETE FROM experity_process_time WHERE process_time_id = %s", (deleted,))
+    db_conn.commit()
+
+    assert refresh_experity_process_time_rollups(db_conn) == 2
+    assert _rollups(db_conn) == [('10', 0, 0), ('11', 1, 10), ('12', 1, 30)]
+
+
+def test_refresh_in_batches(db_conn):
+    """Test queued hours beyond the batch size are left for the next refresh."""
+    cursor = db_conn.cursor()
+    for hour in range(3):
+        _insert(cursor, f'2025-01-22T0{hour}:00:00Z', 5)
+    db_conn.commit()
+
+    assert refresh_experity_process_time_rollups(db_conn, batch_size=2) == 2
+    assert refresh_experity_process_time_rollups(db_conn, batch_size=2) == 1
+    assert len(_rollups(db_conn)) == 3
+
+
+def test_reapplying_schema_does_not_requeue_hours(db_conn):
+    """Test the backfill of unrolled hours only runs when the queue table is created."""
+    cursor = db_conn.cursor()
+    _insert(cursor, '2025-01-22T10:10:00Z', 30)
+    cursor.execute("DELETE FROM experity_process_time_dirty_hours")
+    db_conn.commit()
+
+    cursor.execute(SCHEMA_FILE.read_text())
+    db_conn.commit()
+
+    cursor.execute("SELECT COUNT(*) FROM experity_process_time_dirty_hours")
+    assert cursor.fetchone()[0] == 0
@@ -0,0 +1,19 @@
+"""Tests for the in-progress queue depth count."""
+
+import uuid
+
+from app.api.database import count_queue_by_status
+
+
+def test_only_in_progress_statuses_are_counted(db_conn):
+    """Test finished entries are left out of the default count."""
+    cursor = db_conn.cursor()
+    for status in ('PENDING', 'PENDING', 'PROCESSING', 'DONE', 'ERROR'):
+        cursor.execute(
+            "INSERT INTO queue (queue_id, encounter_id, status) VALUES (%s, %s, %s)",
+            (str(uuid.uuid4()), str(uuid.uuid4()), status)
+        )
+    db_conn.commit()
+
+    assert count_queue_by_status(db_conn) == {'PENDING': 2, 'PROCESSING': 1}
+    assert count_queue_by_status(db_conn, ('DONE',)) == {'DONE': 1}
@@ -0,0 +1,85 @@
+"""Tests for requeueing queue entries orphaned by dead VMs."""
+
+import uuid
+
+from app.api.database import recover_orphaned_queue_entries
+
+
+def _processing_entry(cursor, vm_id, heartbeat_seconds_ago, attempts=0):
+    queue_id = str(uuid.uuid4())
+    cursor.execute(
+        "INSERT INTO queue (queue_id, encounter_id, status, attempts) VALUES (%s, %s, 'PROCESSING', %s)",
+        (queue_id, str(uuid.uuid4()), attempts)
+    )
+    cursor.execute(
+        """
+        INSERT INTO vm_health (vm_id, server_id, last_heartbeat, status, processing_queue_id)
+        VALUES (%s, 'server-1', LOCALTIMESTAMP - make_interval(secs => %s), 'healthy', %s)
+        """,
+        (vm_id, heartbeat_seconds_ago, queue_id)
+    )
+    return queue_id
+
+
+def _entry(conn, queue_id):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT status, attempts, parsed_payload ? 'dlq', parsed_payload ? 'requeue_message'
+        FROM queue WHERE queue_id = %s
+        """,
+        (queue_id,)
+    )
+    return cursor.fetchone()
+
+
+def _processing_queue_id(conn, vm_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT processing_queue_id::text FROM vm_health WHERE vm_id = %s", (vm_id,))
+    return cursor.fetchone()[0]
+
+
+def test_expired_lease_is_requeued(db_conn):
+    """Test an entry whose VM stopped sending heartbeats goes back to PENDING."""
+    queue_id = _processing_entry(db_conn.cursor(), 'vm-dead', heartbeat_seconds_ago=600, attempts=1)
+    db_conn.commit()
+
+    recovered = recover_orphaned_queue_entries(db_conn, stale_after_seconds=120, max_attempts=5)
+
+    assert recovered == [{'queue_id': queue_id, 'vm_id': 'vm-dead', 'status': 'PENDING', 'attempts': 2}]
+    assert _entry(db_conn, queue_id) == ('PENDING', 2, False, True)
+    assert _processing_queue_id(db_conn, 'vm-dead') is None
+    assert recover_orphaned_queue_entries(db_conn, stale_after_seconds=120, max_attempts=5) == []
+
+
+def test_live_lease_is_untouched(db_conn):
+    """Test an entry whose VM is still sending heartbeats is left PROCESSING."""
+    queue_id = _processing_entry(db_conn.cursor(), 'vm-alive', heartbeat_seconds_ago=30)
+    db_conn.commit()
+
+    assert recover_orphaned_queue_entries(db_conn, stale_after_seconds=120, max_attempts=5) == []
+    assert _entry(db_conn, queue_id) == ('PROCESSING', 0, None, None)
+    assert _processing_queue_id(db_conn, 'vm-alive') == queue_id
+
+
+def test_attempt_limit_dead_letters(db_conn):
+    """Test an entry past the attempt limit is moved to ERROR with dlq set."""
+    queue_id = _processing_entry(db_conn.cursor(), 'vm-dead', heartbeat_seconds_ago=600, attempts=5)
+    db_conn.commit()
+
+    recovered = recover_orphaned_queue_entries(db_conn, stale_after_seconds=120, max_attempts=5)
+
+    assert [(row['status'], row['attempts']) for row in recovered] == [('ERROR', 6)]
+    assert _entry(db_conn, queue_id) == ('ERROR', 6, True, False)
+    assert _processing_queue_id(db_conn, 'vm-dead') is None
+
+
+def test_only_processing_entries_are_recovered(db_conn):
+    """Test a finished entry still referenced by a dead VM is not requeued."""
+    cursor = db_conn.cursor()
+    queue_id = _processing_entry(cursor, 'vm-dead', heartbeat_seconds_ago=600)
+    cursor.execute("UPDATE queue SET status = 'DONE' WHERE queue_id = %s", (queue_id,))
+    db_conn.commit()
+
+    assert recover_orphaned_queue_entries(db_conn, stale_after_seconds=120, max_attempts=5) == []
+    assert _entry(db_conn, queue_id)[:2] == ('DONE', 0)
@@ -0,0 +1,92 @@
+"""Unit tests for in-memory alert dedup and digest planning."""
+
+import pytest
+from app.utils import alert_digest
+from app.utils.alert_digest import (
+    alert_dedup_key,
+    alert_fingerprint,
+    forget_alert,
+    get_recent_alert,
+    plan_alert_notification,
+    remember_alert,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_state():
+    """Start every test with empty dedup and digest state."""
+    alert_digest._recent_alerts.clear()
+    alert_digest._digest_windows.clear()
+    yield
+    alert_digest._recent_alerts.clear()
+    alert_digest._digest_windows.clear()
+
+
+class TestAlertFingerprint:
+    """Test alert_fingerprint function."""
+
+    def test_ignores_numbers_and_spacing(self):
+        """Test alerts differing only in measured values share a fingerprint."""
+        assert alert_fingerprint('server', 'warning', 'CPU usage is 91.2%') == \
+            alert_fingerprint('server', 'warning', 'cpu usage  is 97%')
+
+    def test_separates_source_and_severity(self):
+        """Test source type and severity are part of the fingerprint."""
+        fingerprint = alert_fingerprint('vm', 'critical', 'Workflow stopped')
+        assert fingerprint != alert_fingerprint('server', 'critical', 'Workflow stopped')
+        assert fingerprint != alert_fingerprint('vm', 'warning', 'Workflow stopped')
+
+
+class TestPlanAlertNotification:
+    """Test plan_alert_notification function."""
+
+    def test_first_alert_is_immediate_rest_are_held(self, monkeypatch):
+        """Test only the first alert of a group notifies immediately."""
+        monkeypatch.setattr(alert_digest, 'ALERT_DIGEST_WINDOW_SECONDS', 300)
+        assert plan_alert_notification('vm', 'critical', 'VM 1 down', now=1000.0) is None
+
+        digest_key = plan_alert_notification('vm', 'critical', 'VM 2 down', now=1010.0)
+        assert digest_key == alert_fingerprint('vm', 'critical', 'VM 1 down')
+
+    def test_window_aligned_to_boundary(self, monkeypatch):
+        """Test a window closes at the next multiple of the window length."""
+        monkeypatch.setattr(alert_digest, 'ALERT_DIGEST_WINDOW_SECONDS', 300)
+        plan_alert_notification('vm', 'critical', 'VM 1 down', now=1190.0)
+        assert plan_alert_notification('vm', 'critical', 'VM 2 down', now=1195.0) is not None
+        assert plan_alert_notification('vm', 'critical', 'VM 3 down', now=1200.0) is None
+
+    def test_new_window_after_close(self, monkeypatch):
+        """Test the first alert after a window closes notifies immediately again."""
+        monkeypatch.setattr(alert_digest, 'ALERT_DIGEST_WINDOW_SECONDS', 300)
+        plan_alert_notification('vm', 'critical', 'VM 1 down', now=1000.0)
+        assert plan_alert_notification('vm', 'critical', 'VM 2 down', now=1200.0) is None
+
+    def test_disabled(self, monkeypatch):
+        """Test a zero window disables digesting."""
+        monkeypatch.setattr(alert_digest, 'ALERT_DIGEST_WINDOW_SECONDS', 0)
+        plan_alert_notification('vm', 'critical', 'VM 1 down', now=1000.0)
+        assert plan_alert_notification('vm', 'critical', 'VM 2 down', now=1001.0) is None
+
+
+class TestRecentAlerts:
+    """Test in-memory alert dedup."""
+
+    def test_remember_and_forget(self):
+        """Test a remembered alert is a duplicate until it is resolved."""
+        key = alert_dedup_key('server', 'server1', 'warning', 'CPU')
+        alert = {
+            'alert_id': 'a1', 'source': 'server', 'source_id': 'server1',
+            'severity': 'warning', 'details': {'resource': 'CPU'}, 'created_at': 'now',
+        }
+        remember_alert(key, alert)
+        assert get_recent_alert(key) == {'alert_id': 'a1', 'created_at': 'now'}
+
+        forget_alert(alert)
+        assert get_recent_alert(key) is None
+
+    def test_expired_alert_not_remembered(self, monkeypatch):
+        """Test an alert older than the dedup window is not cached."""
+        monkeypatch.setattr(alert_digest, 'ALERT_DEDUP_WINDOW_SECONDS', 300)
+        key = alert_dedup_key('vm', 'vm1', 'critical')
+        remember_alert(key, {'alert_id': 'a1'}, age_seconds=301)
+        assert get_recent_alert(key) is None
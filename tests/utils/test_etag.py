@@ -0,0 +1,29 @@
+"""Unit tests for weak ETags."""
+
+import pytest
+from datetime import datetime
+from app.utils.etag import weak_etag, etag_matches
+
+
+class TestWeakEtag:
+    """Test weak_etag and etag_matches functions."""
+
+    def test_changes_with_parts(self):
+        """Test the tag is stable for equal parts and changes with any part."""
+        updated_at = datetime(2025, 1, 22, 10, 30, 0, 123456)
+        etag = weak_etag('AXjwbE', ['checked_in', 'confirmed'], 12, updated_at)
+        assert etag.startswith('W/"') and etag.endswith('"')
+        assert etag == weak_etag('AXjwbE', ['checked_in', 'confirmed'], 12, updated_at)
+        assert etag != weak_etag('AXjwbE', ['checked_in', 'confirmed'], 13, updated_at)
+
+    @pytest.mark.parametrize("header, expected", [
+        (None, False),
+        ('W/"abc"', True),
+        ('"abc"', True),
+        ('"other", W/"abc"', True),
+        ('*', True),
+        ('W/"abcd"', False),
+    ])
+    def test_if_none_match(self, header, expected):
+        """Test weak comparison against single, listed and wildcard tags."""
+        assert etag_matches(header, 'W/"abc"') is expected
@@ -0,0 +1,83 @@
+"""Unit tests for streaming exports."""
+
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+from app.utils.export import encode_csv, encode_ndjson, stream_export
+
+
+class FakeCursor:
+    def __init__(self, rows, fail_after=None):
+        self.rows = list(rows)
+        self.description = None
+        self.fail_after = fail_after
+        self.fetches = 0
+        self.closed = False
+
+    def fetchmany(self, size):
+        if self.fail_after is not None and self.fetches >= self.fail_after:
+            raise RuntimeError('connection lost')
+        self.fetches += 1
+        self.description = [('id',), ('payload',), ('created_at',)]
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+ROWS = [
+    (1, {'a': [1, 2]}, datetime(2025, 1, 2, 3, 4, 5)),
+    (2, None, None),
+    (3, {'note': 'x,"y"'}, datetime(2025, 1, 3)),
+]
+
+
+def test_encoders():
+    """Test NDJSON objects and CSV escaping of JSON columns and empty values."""
+    lines = encode_ndjson(['id', 'key'], [(1, uuid.UUID(int=1)), (2, None)]).splitlines()
+    assert json.loads(lines[0]) == {'id': 1, 'key': '00000000-0000-0000-0000-000000000001'}
+    assert json.loads(lines[1]) == {'id': 2, 'key': None}
+    assert encode_csv([(3, {'note': 'x,"y"'}, None)]) == '3,"{""note"":""x,\\""y\\""""}",\n'
+
+
+@pytest.mark.parametrize('export_format', ['ndjson', 'csv'])
+def test_stream_in_chunks(export_format):
+    """Test rows are fetched and yielded per batch and the connection is closed."""
+    conn, cursor = FakeConnection(), FakeCursor(ROWS)
+    chunks = list(stream_export(conn, cursor, 'patients', export_format, fetch_size=2))
+
+    text = b''.join(chunks).decode('utf-8')
+    if export_format == 'csv':
+        assert len(chunks) == 3
+        assert text.splitlines()[0] == 'id,payload,created_at'
+        assert text.splitlines()[1] == '1,"{""a"":[1,2]}",2025-01-02T03:04:05'
+    else:
+        assert len(chunks) == 2
+        assert [json.loads(line)['id'] for line in text.splitlines()] == [1, 2, 3]
+    assert cursor.closed and conn.closed
+
+
+def test_stream_closes_connection_on_error_and_abort():
+    """Test a failed stream re-raises after its first chunk and, like an abandoned one, closes its connection."""
+    conn = FakeConnection()
+    chunks = []
+    with pytest.raises(RuntimeError):
+        for chunk in stream_export(conn, FakeCursor(ROWS, fail_after=1), 'queue', 'ndjson', fetch_size=2):
+            chunks.append(chunk)
+    assert len(chunks) == 1 and conn.closed
+
+    conn = FakeConnection()
+    stream = stream_export(conn, FakeCursor(ROWS), 'queue', 'ndjson', fetch_size=1)
+    next(stream)
+    stream.close()
+    assert conn.closed
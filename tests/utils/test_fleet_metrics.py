@@ -0,0 +1,95 @@
+"""Unit tests for fleet metrics summarization."""
+
+import pytest
+from app.api import database
+from app.utils import fleet_metrics
+from app.utils.fleet_metrics import get_cached_queue_depth, get_queue_depth, summarize_fleet_metrics
+
+
+def _vm(vm_id, server_id, heartbeats=10, idle=0, completed=0, failed=0, seconds=0.0):
+    return {
+        'vm_id': vm_id,
+        'server_id': server_id,
+        'status': 'healthy',
+        'heartbeats': heartbeats,
+        'idle_heartbeats': idle,
+        'completed': completed,
+        'failed': failed,
+        'processing_seconds': seconds,
+    }
+
+
+class TestSummarizeFleetMetrics:
+    """Test summarize_fleet_metrics function."""
+
+    def test_vm_rates(self):
+        """Test throughput, mean processing time and idle ratio for one VM."""
+        result = summarize_fleet_metrics(
+            [_vm('vm1', 's1', heartbeats=20, idle=5, completed=10, seconds=600.0)], {}, 10
+        )
+        vm = result['vms'][0]
+        assert vm['throughput_per_minute'] == 1.0
+        assert vm['mean_processing_seconds'] == 60.0
+        assert vm['idle_ratio'] == 0.25
+
+    def test_no_completions_or_heartbeats(self):
+        """Test that undefined ratios are None rather than zero."""
+        result = summarize_fleet_metrics([_vm('vm1', 's1', heartbeats=0)], {}, 15)
+        vm = result['vms'][0]
+        assert vm['mean_processing_seconds'] is None
+        assert vm['idle_ratio'] is None
+        assert vm['throughput_per_minute'] == 0.0
+
+    def test_server_and_fleet_rollup(self):
+        """Test that server and fleet metrics sum their VMs' counters."""
+        result = summarize_fleet_metrics(
+            [
+                _vm('vm1', 's1', completed=3, seconds=300.0),
+                _vm('vm2', 's1', completed=1, failed=1, seconds=100.0, idle=10),
+                _vm('vm3', 's2', completed=2, seconds=60.0),
+            ],
+            {},
+            5,
+        )
+        servers = {s['server_id']: s for s in result['servers']}
+        assert servers['s1']['vm_count'] == 2
+        assert servers['s1']['completed'] == 4
+        assert servers['s1']['failed'] == 1
+        assert servers['s1']['mean_processing_seconds'] == 100.0
+        assert servers['s1']['idle_ratio'] == 0.5
+        assert result['fleet']['vm_count'] == 3
+        assert result['fleet']['completed'] == 6
+        assert result['fleet']['throughput_per_minute'] == pytest.approx(1.2)
+
+    def test_unassigned_vms_grouped(self):
+        """Test VMs without a server are grouped under 'unassigned'."""
+        result = summarize_fleet_metrics([_vm('vm1', None)], {}, 15)
+        assert result['servers'][0]['server_id'] == 'unassigned'
+
+    def test_queue_depth_has_all_statuses(self):
+        """Test queue depth always reports every in-progress status."""
+        result = summarize_fleet_metrics([], {'PENDING': 4}, 15)
+        assert result['queue_depth'] == {'PENDING': 4, 'PROCESSING': 0}
+        assert result['fleet']['vm_count'] == 0
+
+
+class TestQueueDepth:
+    """Test the cached queue depth."""
+
+    def test_counted_once_then_cached(self, monkeypatch):
+        """Test the in-progress count runs when nothing is cached and is reused afterwards."""
+        calls = []
+
+        def count(conn, statuses):
+            calls.append((conn, statuses))
+            return {'PENDING': 3}
+
+        monkeypatch.setattr(database, 'count_queue_by_status', count)
+        monkeypatch.setattr(fleet_metrics, '_queue_depth', None)
+        assert get_cached_queue_depth() is None
+
+        expected = {'PENDING': 3, 'PROCESSING': 0}
+        assert get_queue_depth('conn') == expected
+        assert get_queue_depth('conn') == expected
+        assert get_cached_queue_depth() == expected
+        assert calls == [('conn', ('PENDING', 'PROCESSING'))]
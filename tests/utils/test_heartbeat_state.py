@@ -0,0 +1,104 @@
+"""Unit tests for delta-encoded heartbeat metadata resolution."""
+
+import pytest
+from app.utils.heartbeat_state import (
+    resolve_heartbeat_metadata,
+    remember_heartbeat_metadata,
+    forget_heartbeat_metadata,
+)
+
+
+@pytest.fixture
+def vm_id():
+    """Cached state for a VM at version 3, cleared after the test."""
+    remember_heartbeat_metadata('vm', 'test-vm', 3, {'cpuUsage': 10, 'memoryUsage': 20})
+    yield 'test-vm'
+    forget_heartbeat_metadata('vm', 'test-vm')
+
+
+def _unreachable():
+    raise AssertionError("database should not be read")
+
+
+class TestResolveHeartbeatMetadata:
+    """Test resolve_heartbeat_metadata function."""
+
+    def test_delta_merges_sent_keys(self, vm_id):
+        """Test a delta that follows the cached version merges the sent keys."""
+        result = resolve_heartbeat_metadata(
+            'vm', vm_id, None, {'cpuUsage': 50, 'memoryUsage': 20}, 4, _unreachable
+        )
+        assert result['updates'] == {
+            'metadata_version': 4,
+            'metadata_delta': {'cpuUsage': 50, 'memoryUsage': 20},
+            'metadata_removed': [],
+        }
+        assert result['metadata'] == {'cpuUsage': 50, 'memoryUsage': 20}
+        assert result['resync_required'] is False
+
+    def test_delta_null_removes_key(self, vm_id):
+        """Test a null value in the delta removes the metric."""
+        result = resolve_heartbeat_metadata('vm', vm_id, None, {'memoryUsage': None}, 4, _unreachable)
+        assert result['updates']['metadata_removed'] == ['memoryUsage']
+        assert result['metadata'] == {'cpuUsage': 10}
+
+    def test_delta_matching_cache_is_still_written(self, vm_id):
+        """Test a delta equal to the cached values is merged; the stored row may differ from the cache."""
+        result = resolve_heartbeat_metadata('vm', vm_id, None, {'cpuUsage': 10}, 4, _unreachable)
+        assert result['updates'] == {
+            'metadata_version': 4,
+            'metadata_delta': {'cpuUsage': 10},
+            'metadata_removed': [],
+        }
+
+    def test_empty_delta_only_bumps_version(self, vm_id):
+        """Test a delta without keys does not touch the metadata."""
+        result = resolve_heartbeat_metadata('vm', vm_id, None, {}, 4, _unreachable)
+        assert result['updates'] == {'metadata_version': 4}
+
+    def test_snapshot_matching_cache_is_still_written(self, vm_id):
+        """Test resending the cached full metadata is persisted; the database skips unchanged values."""
+        result = resolve_heartbeat_metadata(
+            'vm', vm_id, {'cpuUsage': 10, 'memoryUsage': 20}, None, 3, _unreachable
+        )
+        assert result['updates'] == {
+            'metadata': {'cpuUsage': 10, 'memoryUsage': 20},
+            'metadata_version': 3,
+        }
+
+    def test_version_gap_requests_resync(self, vm_id):
+        """Test a delta that skips versions is rejected after re-reading the database."""
+        result = resolve_heartbeat_metadata(
+            'vm', vm_id, None, {'cpuUsage': 50}, 6, lambda: (4, {'cpuUsage': 30})
+        )
+        assert result['updates'] == {}
+        assert result['resync_required'] is True
+
+    def test_stale_cache_reloads_from_database(self, vm_id):
+        """Test a delta ahead of the cache is applied against the persisted version."""
+        result = resolve_heartbeat_metadata(
+            'vm', vm_id, None, {'cpuUsage': 50}, 6, lambda: (5, {'cpuUsage': 30})
+        )
+        assert result['resync_required'] is False
+        assert result['metadata'] == {'cpuUsage': 50}
+
+    def test_versioned_heartbeat_without_metadata_keeps_it(self, vm_id):
+        """Test a versioned client sending no metadata does not clear it."""
+        result = resolve_heartbeat_metadata('vm', vm_id, None, None, 3, _unreachable)
+        assert result['updates'] == {}
+        assert result['metadata'] == {'cpuUsage': 10, 'memoryUsage': 20}
+
+    def test_unversioned_heartbeat_without_metadata_clears_it(self, vm_id):
+        """Test legacy heartbeats without metadata still clear it."""
+        result = resolve_heartbeat_metadata('vm', vm_id, None, None, None, _unreachable)
+        assert result['updates'] == {'metadata': None}
+
+    def test_rejects_metadata_and_delta_together(self, vm_id):
+        """Test sending both metadata and metadataDelta is an error."""
+        with pytest.raises(ValueError):
+            resolve_heartbeat_metadata('vm', vm_id, {'a': 1}, {'b': 2}, 4, _unreachable)
+
+    def test_delta_requires_version(self, vm_id):
+        """Test a delta without metadataVersion is an error."""
+        with pytest.raises(ValueError):
+            resolve_heartbeat_metadata('vm', vm_id, None, {'b': 2}, None, _unreachable)
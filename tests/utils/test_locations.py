@@ -0,0 +1,44 @@
+"""Unit tests for the location directory."""
+
+import pytest
+from app.utils import locations
+from app.utils.locations import (
+    cache_location_directory,
+    get_cached_location_directory,
+    invalidate_location_directory,
+    merge_location_directory,
+)
+
+
+@pytest.fixture(autouse=True)
+def small_map(monkeypatch):
+    monkeypatch.setattr(locations, 'LOCATION_ID_TO_NAME', {'AXjwbE': 'Exer Urgent Care - Demo', 'gZ867B': 'Virtual'})
+    monkeypatch.setattr(locations, 'LOCATIONS_CACHE_SECONDS', 60.0)
+    invalidate_location_directory()
+    yield
+    invalidate_location_directory()
+
+
+def test_merge_prefers_database_names():
+    """Test database names win and the static map fills gaps and missing locations."""
+    rows = [
+        {'location_id': 'gZ867B', 'location_name': None},
+        {'location_id': 'AXjwbE', 'location_name': 'Demo Clinic'},
+        {'location_id': 'NEW001', 'location_name': None},
+    ]
+    assert merge_location_directory(rows) == [
+        {'location_id': 'AXjwbE', 'location_name': 'Demo Clinic'},
+        {'location_id': 'NEW001', 'location_name': None},
+        {'location_id': 'gZ867B', 'location_name': 'Virtual'},
+    ]
+
+
+def test_cache_invalidation():
+    """Test the cached directory is returned until it is invalidated."""
+    assert get_cached_location_directory() is None
+    cache_location_directory([{'location_id': 'AXjwbE', 'location_name': 'Demo'}])
+    cached = get_cached_location_directory()
+    cached[0]['location_name'] = 'changed by caller'
+    assert get_cached_location_directory() == [{'location_id': 'AXjwbE', 'location_name': 'Demo'}]
+    invalidate_location_directory()
+    assert get_cached_location_directory() is None
@@ -0,0 +1,107 @@
+"""Unit tests for alert notification delivery from the outbox."""
+
+import pytest
+from app.utils import notifications
+from app.utils import notification_dispatcher
+from app.utils.notification_dispatcher import deliver_notifications, notification_retry_delay
+
+
+class _FakeSMTP:
+    def __init__(self, opened):
+        opened.append(self)
+        self.closed = False
+
+    def quit(self):
+        self.closed = True
+
+
+def _row(outbox_id, channel, event='created'):
+    return {
+        'outbox_id': outbox_id,
+        'alert_id': 'a1',
+        'event': event,
+        'channel': channel,
+        'payload': {'alert_id': 'a1', 'severity': 'critical'},
+        'attempts': 1,
+    }
+
+
+class TestNotificationRetryDelay:
+    """Test notification_retry_delay function."""
+
+    def test_doubles_per_attempt(self, monkeypatch):
+        """Test the delay doubles from the base delay."""
+        monkeypatch.setattr(notification_dispatcher, 'ALERT_OUTBOX_RETRY_BASE_SECONDS', 30)
+        assert [notification_retry_delay(n) for n in (1, 2, 3)] == [30, 60, 120]
+
+    def test_capped(self, monkeypatch):
+        """Test the delay never exceeds the maximum."""
+        monkeypatch.setattr(notification_dispatcher, 'ALERT_OUTBOX_RETRY_MAX_SECONDS', 3600)
+        assert notification_retry_delay(50) == 3600
+
+
+class TestDeliverNotifications:
+    """Test deliver_notifications function."""
+
+    @pytest.fixture
+    def opened(self, monkeypatch):
+        opened = []
+        monkeypatch.setattr(notifications, 'open_smtp_connection', lambda: _FakeSMTP(opened))
+        return opened
+
+    def test_emails_share_one_connection(self, monkeypatch, opened):
+        """Test a batch of emails is sent over a single SMTP connection."""
+        servers = []
+        monkeypatch.setattr(
+            notifications, 'send_alert_creation_email',
+            lambda data, server=None: servers.append(server) or True
+        )
+        monkeypatch.setattr(
+            notifications, 'send_alert_resolution_email',
+            lambda data, server=None: servers.append(server) or True
+        )
+        results = deliver_notifications(
+            [_row('1', 'email'), _row('2', 'email', 'resolved'), _row('3', 'email')]
+        )
+        assert results == {'1': None, '2': None, '3': None}
+        assert len(opened) == 1
+        assert servers == [opened[0]] * 3
+        assert opened[0].closed
+
+    def test_failed_email_reconnects(self, monkeypatch, opened):
+        """Test a failed send drops the connection and the next email reconnects."""
+        outcomes = iter([False, True])
+        monkeypatch.setattr(
+            notifications, 'send_alert_creation_email', lambda data, server=None: next(outcomes)
+        )
+        results = deliver_notifications([_row('1', 'email'), _row('2', 'email')])
+        assert results['1'] == "Email delivery failed"
+        assert results['2'] is None
+        assert len(opened) == 2
+
+    def test_slack_failure_reported(self, monkeypatch):
+        """Test Slack results are reported per outbox row."""
+        monkeypatch.setattr(
+            notifications, 'send_slack_notification',
+            lambda data, client=None: data['severity'] == 'critical'
+        )
+        failing = _row('2', 'slack')
+        failing['payload'] = {'alert_id': 'a2', 'severity': 'info'}
+        results = deliver_notifications([_row('1', 'slack'), failing])
+        assert results == {'1': None, '2': "Slack delivery failed"}
+
+    def test_digest_rows_sent_once(self, monkeypatch, opened):
+        """Test rows sharing a digest key are sent as one digest per channel."""
+        digests = []
+        monkeypatch.setattr(
+            notifications, 'send_alert_digest_email',
+            lambda alerts, server=None: digests.append(alerts) or True
+        )
+        monkeypatch.setattr(
+            notifications, 'send_alert_creation_email', lambda data, server=None: True
+        )
+        rows = [_row('1', 'email'), _row('2', 'email'), _row('3', 'email')]
+        rows[0]['digest_key'] = rows[1]['digest_key'] = 'vm:critical:abc'
+        results = deliver_notifications(rows)
+        assert results == {'1': None, '2': None, '3': None}
+        assert len(digests) == 1 and len(digests[0]) == 2
@@ -0,0 +1,33 @@
+"""Unit tests for keyset pagination cursors."""
+
+import pytest
+from datetime import datetime
+from app.utils.pagination import encode_keyset_cursor, decode_keyset_cursor
+
+
+class TestKeysetCursor:
+    """Test encode_keyset_cursor and decode_keyset_cursor."""
+
+    def test_round_trip_keeps_microseconds(self):
+        """Test a cursor decodes to the exact sort key it was built from."""
+        created_at = datetime(2025, 1, 22, 10, 30, 0, 123456)
+        cursor = encode_keyset_cursor(created_at, '550e8400-e29b-41d4-a716-446655440000')
+        assert decode_keyset_cursor(cursor) == (created_at, '550e8400-e29b-41d4-a716-446655440000')
+
+    def test_cursor_is_url_safe(self):
+        """Test cursors need no escaping in a query string."""
+        cursor = encode_keyset_cursor(datetime(2025, 1, 22), 'a?b&c')
+        assert all(ch.isalnum() or ch in '-_' for ch in cursor)
+
+    @pytest.mark.parametrize("cursor", ["zzz", "bm90LWEtY3Vyc29y", "!!"])
+    def test_malformed_cursor(self, cursor):
+        """Test malformed cursors raise ValueError."""
+        with pytest.raises(ValueError):
+            decode_keyset_cursor(cursor)
+
+    def test_non_uuid_row_id(self):
+        """Test a valid timestamp with a garbage id is rejected unless ids are not UUIDs."""
+        cursor = encode_keyset_cursor(datetime(2025, 1, 22), "1' OR '1'='1")
+        with pytest.raises(ValueError):
+            decode_keyset_cursor(cursor)
+        assert decode_keyset_cursor(cursor, uuid_id=False)[1] == "1' OR '1'='1"
@@ -0,0 +1,91 @@
+"""Unit tests for patient record normalization."""
+
+from datetime import datetime, timezone
+
+from app.utils.patient import normalize_patient_record
+
+
+class TestNormalizePatientRecord:
+    """Test normalize_patient_record function."""
+
+    def test_camel_case_fields(self):
+        """Test the camelCase request fields map onto the database columns."""
+        record = normalize_patient_record({
+            'emrId': 'EMR1',
+            'bookingId': 'B1',
+            'bookingNumber': 'BN1',
+            'patientNumber': 'PN1',
+            'locationId': 'L1',
+            'locationName': 'Demo Clinic',
+            'legalFirstName': 'Ann',
+            'legalLastName': 'Lee',
+            'dob': '1990-01-15',
+            'mobilePhone': '+1234567890',
+            'sexAtBirth': 'F',
+            'capturedAt': '2025-01-02T03:04:05Z',
+            'reasonForVisit': 'Checkup',
+            'status': 'Checked In',
+        })
+
+        assert record == {
+            'emr_id': 'EMR1',
+            'booking_id': 'B1',
+            'booking_number': 'BN1',
+            'patient_number': 'PN1',
+            'location_id': 'L1',
+            'location_name': 'Demo Clinic',
+            'legal_first_name': 'Ann',
+            'legal_last_name': 'Lee',
+            'dob': '1990-01-15',
+            'mobile_phone': '+1234567890',
+            'sex_at_birth': 'F',
+            'captured_at': datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            'reason_for_visit': 'Checkup',
+            'status': 'checked_in',
+        }
+
+    def test_snake_case_and_fallback_fields(self):
+        """Test snake_case names and the alternative field names are accepted."""
+        record = normalize_patient_record({
+            'emr_id': 'EMR1',
+            'location_id': 'L1',
+            'firstName': 'Ann',
+            'legal_last_name': 'Lee',
+            'phone': '555',
+            'gender': 'F',
+            'reason': 'Cough',
+            'status': 'check-in',
+        })
+
+        assert record['location_id'] == 'L1'
+        assert (record['legal_first_name'], record['legal_last_name']) == ('Ann', 'Lee')
+        assert (record['mobile_phone'], record['sex_at_birth']) == ('555', 'F')
+        assert record['reason_for_visit'] == 'Cough'
+        assert record['status'] == 'checked_in'
+
+    def test_strips_values_and_blanks_become_none(self):
+        """Test strings are trimmed and empty strings are stored as NULL."""
+        record = normalize_patient_record({
+            'emrId': '  EMR1 ',
+            'legalFirstName': '  Ann ',
+            'legalLastName': '   ',
+            'reasonForVisit': '',
+        })
+
+        assert record['emr_id'] == 'EMR1'
+        assert record['legal_first_name'] == 'Ann'
+        assert record['legal_last_name'] is None
+        assert record['reason_for_visit'] is None
+        assert record['status'] is None
+
+    def test_numeric_emr_id_and_missing_captured_at(self):
+        """Test a numeric EMR ID becomes text and captured_at defaults to now."""
+        before = datetime.now()
+        record = normalize_patient_record({'emr_id': 12345.0})
+
+        assert record['emr_id'] == '12345'
+        assert before <= record['captured_at'] <= datetime.now()
+
+    def test_missing_emr_id(self):
+        """Test a record without an EMR ID normalizes to emr_id None."""
+        assert normalize_patient_record({'legalFirstName': 'Ann'})['emr_id'] is None
@@ -0,0 +1,47 @@
+"""Unit tests for patient search term normalization."""
+
+import pytest
+from app.api.database import _patient_search_condition, normalize_search_term
+
+
+class TestNormalizeSearchTerm:
+    """Test normalize_search_term function."""
+
+    @pytest.mark.parametrize('search, digits', [
+        ('(555) 123-4567', '5551234567'),
+        ('+1 555', '1555'),
+        ('12', '12'),
+    ])
+    def test_phone_like_terms_yield_digits(self, search, digits):
+        """Test digit-only terms (with phone punctuation) are searched as phone numbers."""
+        assert normalize_search_term(search)[1] == digits
+
+    @pytest.mark.parametrize('search', ['john', 'Room 12', 'EMR-12a'])
+    def test_terms_with_letters_are_not_phone_searches(self, search):
+        """Test a term containing letters has no phone digits."""
+        assert normalize_search_term(search)[1] is None
+
+    def test_lower_cases_and_collapses_whitespace(self):
+        """Test the name term is lower-cased with runs of whitespace collapsed."""
+        assert normalize_search_term('  John   DOE ') == ('john doe', None)
+
+
+class TestPatientSearchCondition:
+    """Test _patient_search_condition function."""
+
+    def test_name_search(self):
+        """Test a name search matches name and EMR ID only."""
+        condition, params = _patient_search_condition('Doe')
+        assert condition == '(search_name LIKE %s OR emr_id ILIKE %s)'
+        assert params == ['%doe%', '%doe%']
+
+    def test_phone_search_adds_digits_clause(self):
+        """Test a phone search also matches the phone digits column."""
+        condition, params = _patient_search_condition('(555) 123')
+        assert condition.endswith('OR mobile_phone_digits LIKE %s)')
+        assert params[-1] == '%555123%'
+
+    def test_like_wildcards_are_escaped(self):
+        """Test % and _ in the term match literally."""
+        _, params = _patient_search_condition('50%_x')
+        assert params == ['%50\\%\\_x%', '%50\\%\\_x%']
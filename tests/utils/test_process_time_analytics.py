@@ -0,0 +1,57 @@
+"""Unit tests for Experity process time analytics summarization."""
+
+from datetime import datetime, timedelta
+from app.utils.process_time_analytics import summarize_process_time_analytics
+
+END = datetime(2025, 1, 22, 12, 0)
+START = END - timedelta(hours=10)
+NAMES = ['Encounter process time', 'Experity process time']
+
+
+def _stats(name, completed=50, percentiles=(240.0, 420.0, 515.0, 600.0)):
+    return {
+        'process_name': name,
+        'completed': completed,
+        'mean_seconds': 284.456,
+        'max_seconds': 610.0,
+        'percentiles': list(percentiles),
+    }
+
+
+class TestSummarizeProcessTimeAnalytics:
+    """Test summarize_process_time_analytics function."""
+
+    def test_percentiles_and_throughput(self):
+        """Test percentiles are mapped by position and throughput is per hour."""
+        result = summarize_process_time_analytics(NAMES, [_stats(NAMES[0])], [], [], START, END)
+        process = result['processes'][0]
+        assert process['p50_seconds'] == 240.0
+        assert process['p99_seconds'] == 600.0
+        assert process['mean_seconds'] == 284.46
+        assert process['throughput_per_hour'] == 5.0
+
+    def test_process_without_records(self):
+        """Test processes without records are reported with empty statistics."""
+        result = summarize_process_time_analytics(NAMES, [_stats(NAMES[0])], [], [], START, END)
+        empty = result['processes'][1]
+        assert empty['process_name'] == NAMES[1]
+        assert empty['completed'] == 0
+        assert empty['p50_seconds'] is None
+        assert empty['throughput_per_hour'] == 0.0
+
+    def test_hourly_and_slowest_split_by_process(self):
+        """Test rollups and slowest records are attached to their process."""
+        hourly = [
+            {'process_name': NAMES[0], 'hour_start': START, 'started_count': 4, 'completed_count': 2,
+             'total_duration_seconds': 500.0, 'max_duration_seconds': 300.0},
+            {'process_name': NAMES[1], 'hour_start': START, 'started_count': 1, 'completed_count': 0,
+             'total_duration_seconds': 0.0, 'max_duration_seconds': None},
+        ]
+        slowest = [{'process_name': NAMES[1], 'duration_seconds': 900}]
+        result = summarize_process_time_analytics(NAMES, [], hourly, slowest, START, END)
+        first, second = result['processes']
+        assert first['hourly'] == [
+            {'hour_start': START, 'started': 4, 'completed': 2, 'mean_seconds': 250.0, 'max_seconds': 300.0}
+        ]
+        assert second['hourly'][0]['mean_seconds'] is None
+        assert first['slowest'] == [] and second['slowest'] == slowest
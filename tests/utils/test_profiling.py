@@ -0,0 +1,80 @@
+"""Unit tests for request profiling helpers."""
+
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from app.utils import profiling
+from app.utils.profiling import (
+    fold_stack,
+    get_profile,
+    list_profiles,
+    render_folded,
+    should_profile,
+    store_profile,
+)
+
+START = datetime(2025, 1, 22, 10, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def empty_store(monkeypatch):
+    monkeypatch.setattr(profiling, '_profiles', {})
+    monkeypatch.setattr(profiling, '_profiles_by_id', {})
+    monkeypatch.setattr(profiling, 'PROFILING_MAX_PROFILES_PER_ROUTE', 2)
+
+
+def _store(route, offset_seconds=0, stacks=None):
+    return store_profile(route, 'GET', route, 200, START + timedelta(seconds=offset_seconds), 12.5,
+                         Counter(stacks or {'a;b': 3}))
+
+
+class TestShouldProfile:
+    """Test should_profile function."""
+
+    def test_header_token(self, monkeypatch):
+        """Test the X-Profile token forces profiling even without sampling."""
+        monkeypatch.setattr(profiling, 'PROFILING_HEADER_TOKEN', 'secret')
+        monkeypatch.setattr(profiling, 'PROFILING_SAMPLE_RATE', 0.0)
+        assert should_profile('/queue', 'secret') is True
+        assert should_profile('/queue', 'wrong') is False
+
+    def test_sampling_limited_to_paths(self, monkeypatch):
+        """Test random sampling only applies to the configured path prefixes."""
+        monkeypatch.setattr(profiling, 'PROFILING_HEADER_TOKEN', None)
+        monkeypatch.setattr(profiling, 'PROFILING_SAMPLE_RATE', 1.0)
+        monkeypatch.setattr(profiling, 'PROFILING_PATHS', ['/experity/map'])
+        assert should_profile('/experity/map') is True
+        assert should_profile('/queue') is False
+
+
+class TestProfileStore:
+    """Test store_profile, list_profiles and get_profile functions."""
+
+    def test_oldest_profile_of_route_dropped(self):
+        """Test each route keeps only its most recent profiles."""
+        first = _store('/queue', 0)
+        _store('/queue', 1)
+        _store('/queue', 2)
+        other = _store('/experity/map', 3)
+        assert get_profile(first['profile_id']) is None
+        assert [p['started_at'] for p in list_profiles()] == [
+            START + timedelta(seconds=s) for s in (3, 2, 1)
+        ]
+        assert [p['profile_id'] for p in list_profiles(route='/experity/map')] == [other['profile_id']]
+        assert 'stacks' not in list_profiles()[0]
+
+    def test_render_folded(self):
+        """Test stacks are rendered most sampled first."""
+        assert render_folded(Counter({'a;b': 1, 'a;c': 4})) == "a;c 4\na;b 1\n"
+
+
+def test_fold_stack_root_first():
+    """Test folded stacks list the caller before the callee."""
+    def inner():
+        return fold_stack(sys._getframe())
+
+    frames = inner().split(';')
+    assert frames[-1].startswith('inner (')
+    assert frames[-2].startswith('test_fold_stack_root_first (')
@@ -0,0 +1,101 @@
+"""Unit tests for query statistics and slow query capture."""
+
+import pytest
+from app.utils import query_stats
+from app.utils.query_stats import (
+    get_query_stats,
+    is_explainable,
+    normalize_query,
+    record_query,
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_stats(monkeypatch):
+    monkeypatch.setattr(query_stats, '_stats', {})
+    monkeypatch.setattr(query_stats, '_last_plan_at', {})
+    monkeypatch.setattr(query_stats, 'SLOW_QUERY_THRESHOLD_MS', 100.0)
+    monkeypatch.setattr(query_stats, 'SLOW_QUERY_EXPLAIN_ENABLED', True)
+    query_stats._pending_plans.clear()
+    yield
+    query_stats._pending_plans.clear()
+
+
+class TestNormalizeQuery:
+    """Test normalize_query function."""
+
+    def test_literals_and_placeholders(self):
+        """Test values become ? so templates and statements normalize alike."""
+        template = "SELECT * FROM queue\n  WHERE status = %s AND attempts > %(attempts)s LIMIT 5"
+        statement = "SELECT * FROM queue WHERE status = 'PENDING' AND attempts > 3 LIMIT 10"
+        assert normalize_query(template) == normalize_query(statement) == (
+            "SELECT * FROM queue WHERE status = ? AND attempts > ? LIMIT ?"
+        )
+
+    def test_identifiers_keep_digits(self):
+        """Test digits inside identifiers are not treated as numbers."""
+        assert normalize_query("SELECT p1.col2 FROM alerts_2025_01 p1") == (
+            "SELECT p1.col2 FROM alerts_2025_01 p1"
+        )
+
+    def test_batches_collapse(self):
+        """Test multi-row VALUES and arrays of any size share one shape."""
+        two = "INSERT INTO t (a, b) VALUES ('x', 1), ('y', 2)"
+        three = "INSERT INTO t (a, b) VALUES ('x', 1), ('y', 2), ('z', 3)"
+        assert normalize_query(two) == normalize_query(three) == "INSERT INTO t (a, b) VALUES (?, ?)"
+        assert normalize_query("SELECT 1 FROM t WHERE id = ANY(ARRAY['a','b'])") == (
+            "SELECT ? FROM t WHERE id = ANY(ARRAY[?])"
+        )
+
+
+class TestIsExplainable:
+    """Test is_explainable function."""
+
+    @pytest.mark.parametrize('statement', [
+        "SELECT * FROM queue WHERE status = 'PENDING'",
+        "WITH recent AS (SELECT 1) SELECT * FROM recent",
+        "SELECT * FROM alerts WHERE message = 'update failed'",
+    ])
+    def test_read_only(self, statement):
+        """Test plain reads may be explained."""
+        assert is_explainable(statement) is True
+
+    @pytest.mark.parametrize('statement', [
+        "UPDATE queue SET status = 'DONE'",
+        "WITH moved AS (DELETE FROM queue RETURNING *) SELECT * FROM moved",
+        "SELECT * FROM queue LIMIT 1 FOR UPDATE SKIP LOCKED",
+        "SELECT pg_try_advisory_xact_lock(hashtext('job'))",
+    ])
+    def test_writes_and_locks(self, statement):
+        """Test statements with side effects are never re-run."""
+        assert is_explainable(statement) is False
+
+
+class TestRecordQuery:
+    """Test record_query and get_query_stats functions."""
+
+    def test_aggregates_by_shape(self):
+        """Test executions of one statement shape are aggregated."""
+        record_query("SELECT * FROM queue WHERE status = %s", 30.0, rows=2)
+        record_query("SELECT * FROM queue WHERE status = %s", 10.0, rows=0)
+        record_query("SELECT 1", 60.0)
+        report = get_query_stats()
+        first, second = report['queries']
+        assert first['query'] == 'SELECT ?' and first['percent_of_total'] == 60.0
+        assert (second['calls'], second['total_ms'], second['mean_ms'], second['max_ms'], second['rows']) == (
+            2, 40.0, 20.0, 30.0, 2
+        )
+        assert get_query_stats(order_by='calls')['queries'][0]['calls'] == 2
+
+    def test_slow_read_queued_once(self):
+        """Test a slow read is queued for EXPLAIN once per cooldown."""
+        statement = "SELECT * FROM queue WHERE status = 'PENDING'"
+        record_query("SELECT * FROM queue WHERE status = %s", 250.0, statement=statement)
+        record_query("SELECT * FROM queue WHERE status = %s", 300.0, statement=statement)
+        assert [item['statement'] for item in query_stats._pending_plans] == [statement]
+        assert get_query_stats()['queries'][0]['slow_calls'] == 2
+
+    def test_slow_write_not_queued(self):
+        """Test slow writes are counted but never queued for EXPLAIN."""
+        record_query("UPDATE queue SET status = %s", 250.0, statement="UPDATE queue SET status = 'DONE'")
+        assert len(query_stats._pending_plans) == 0
@@ -0,0 +1,64 @@
+"""Unit tests for the remote read cache."""
+
+import asyncio
+
+import pytest
+from app.utils import remote_reads
+from app.utils.remote_reads import cached_remote_read
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(remote_reads, '_cache', {})
+    monkeypatch.setattr(remote_reads, '_inflight', {})
+    monkeypatch.setattr(remote_reads, 'REMOTE_READ_CACHE_SECONDS', 60.0)
+    monkeypatch.setattr(remote_reads, 'REMOTE_READ_STALE_SECONDS', 60.0)
+
+
+def _loader(calls, value='v', delay=0.01):
+    async def load():
+        calls.append(value)
+        await asyncio.sleep(delay)
+        if isinstance(value, Exception):
+            raise value
+        return [value, len(calls)]
+    return load
+
+
+class TestCachedRemoteRead:
+    """Test cached_remote_read function."""
+
+    def test_concurrent_reads_coalesced(self):
+        """Test concurrent reads of one key share a single upstream call."""
+        calls = []
+
+        async def run():
+            return await asyncio.gather(*[cached_remote_read('k', _loader(calls)) for _ in range(5)])
+
+        assert asyncio.run(run()) == [['v', 1]] * 5
+        assert asyncio.run(cached_remote_read('k', _loader(calls))) == ['v', 1]
+        assert len(calls) == 1
+
+    def test_stale_served_while_refreshing(self, monkeypatch):
+        """Test an expired result is returned while one background call refreshes it."""
+        calls = []
+        monkeypatch.setattr(remote_reads, 'REMOTE_READ_CACHE_SECONDS', 0.02)
+
+        async def run():
+            remote_reads._store('k', ['old', 0])
+            await asyncio.sleep(0.03)
+            first = await cached_remote_read('k', _loader(calls))
+            second = await cached_remote_read('k', _loader(calls))
+            await asyncio.sleep(0.05)
+            return first, second, remote_reads._cache['k'][1]
+
+        assert asyncio.run(run()) == (['old', 0], ['old', 0], ['v', 1])
+        assert len(calls) == 1
+
+    def test_errors_not_cached(self):
+        """Test a failed upstream call is raised and retried on the next read."""
+        calls = []
+
+        with pytest.raises(ValueError):
+            asyncio.run(cached_remote_read('k', _loader(calls, ValueError('boom'))))
+        assert asyncio.run(cached_remote_read('k', _loader(calls))) == ['v', 2]
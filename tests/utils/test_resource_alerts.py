@@ -0,0 +1,109 @@
+"""Unit tests for resource alert threshold evaluation."""
+
+import pytest
+from app.utils import resource_alerts
+from app.utils.resource_alerts import (
+    evaluate_resource_alerts,
+    get_resource_thresholds,
+    get_server_group,
+)
+
+
+def _server(server_id, **metrics):
+    return {'server_id': server_id, 'metadata': metrics}
+
+
+def _open(alert_id, server_id, resource, severity):
+    return {'alert_id': alert_id, 'source_id': server_id, 'resource': resource, 'severity': severity}
+
+
+@pytest.fixture(autouse=True)
+def hysteresis(monkeypatch):
+    monkeypatch.setattr(resource_alerts, 'RESOURCE_ALERT_HYSTERESIS', 5.0)
+    monkeypatch.setattr(resource_alerts, 'RESOURCE_THRESHOLD_GROUPS', {})
+    monkeypatch.setattr(resource_alerts, 'RESOURCE_SERVER_GROUPS', [])
+
+
+class TestServerGroups:
+    """Test get_server_group and get_resource_thresholds functions."""
+
+    def test_metadata_group_wins(self, monkeypatch):
+        """Test a serverGroup in metadata takes precedence over patterns."""
+        monkeypatch.setattr(resource_alerts, 'RESOURCE_SERVER_GROUPS', [('db-*', 'database')])
+        assert get_server_group('db-1') == 'database'
+        assert get_server_group('db-1', {'serverGroup': 'build'}) == 'build'
+        assert get_server_group('web-1') is None
+
+    def test_group_overrides(self, monkeypatch):
+        """Test group overrides replace only the configured levels."""
+        monkeypatch.setattr(
+            resource_alerts, 'RESOURCE_THRESHOLD_GROUPS',
+            {'database': {'disk': {'warning': 80}, 'hysteresis': 2}}
+        )
+        thresholds = get_resource_thresholds('database')
+        assert thresholds['disk'] == {'warning': 80.0, 'critical': 95.0, 'hysteresis': 2.0}
+        assert thresholds['cpu']['warning'] == 80.0
+        assert get_resource_thresholds()['disk']['warning'] == 90.0
+
+
+class TestEvaluateResourceAlerts:
+    """Test evaluate_resource_alerts function."""
+
+    def test_creates_highest_breach(self):
+        """Test one alert is created at the highest threshold reached."""
+        to_create, to_resolve = evaluate_resource_alerts([_server('s1', cpuUsage=97.0)], [])
+        assert [(a['source_id'], a['severity'], a['details']['resource']) for a in to_create] == [
+            ('s1', 'critical', 'CPU')
+        ]
+        assert to_resolve == []
+
+    def test_open_alert_not_duplicated(self):
+        """Test no alert is created while one of the same severity is open."""
+        to_create, to_resolve = evaluate_resource_alerts(
+            [_server('s1', cpuUsage=85.0)], [_open('a1', 's1', 'CPU', 'warning')]
+        )
+        assert to_create == [] and to_resolve == []
+
+    def test_hysteresis_holds_alert(self):
+        """Test an alert stays open within the hysteresis margin and resolves below it."""
+        held = evaluate_resource_alerts(
+            [_server('s1', cpuUsage=76.0)], [_open('a1', 's1', 'CPU', 'warning')]
+        )
+        assert held == ([], [])
+        resolved = evaluate_resource_alerts(
+            [_server('s1', cpuUsage=74.0)], [_open('a1', 's1', 'CPU', 'warning')]
+        )
+        assert resolved == ([], ['a1'])
+
+    def test_held_critical_suppresses_warning(self):
+        """Test a critical alert within its margin is not joined by a warning."""
+        to_create, to_resolve = evaluate_resource_alerts(
+            [_server('s1', cpuUsage=92.0)], [_open('a1', 's1', 'CPU', 'critical')]
+        )
+        assert to_create == [] and to_resolve == []
+
+    def test_escalation_keeps_warning(self):
+        """Test crossing the critical threshold adds a critical alert."""
+        to_create, to_resolve = evaluate_resource_alerts(
+            [_server('s1', cpuUsage=96.0)], [_open('a1', 's1', 'CPU', 'warning')]
+        )
+        assert [a['severity'] for a in to_create] == ['critical']
+        assert to_resolve == []
+
+    def test_missing_metric_leaves_alert(self):
+        """Test alerts are left alone when the metric is not reported."""
+        result = evaluate_resource_alerts(
+            [_server('s1', memoryUsage=10.0)], [_open('a1', 's1', 'CPU', 'critical')]
+        )
+        assert result == ([], [])
+
+    def test_group_thresholds(self, monkeypatch):
+        """Test servers are evaluated against their group's thresholds."""
+        monkeypatch.setattr(
+            resource_alerts, 'RESOURCE_THRESHOLD_GROUPS', {'database': {'disk': {'warning': 70}}}
+        )
+        monkeypatch.setattr(resource_alerts, 'RESOURCE_SERVER_GROUPS', [('db-*', 'database')])
+        to_create, _ = evaluate_resource_alerts(
+            [_server('db-1', diskUsage=75.0), _server('web-1', diskUsage=75.0)], []
+        )
+        assert [a['source_id'] for a in to_create] == ['db-1']
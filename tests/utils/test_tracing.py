@@ -0,0 +1,93 @@
+"""Unit tests for span tracing helpers."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from app.utils import tracing
+from app.utils.tracing import (
+    build_otlp_payload,
+    current_trace_id,
+    parse_traceparent,
+    record_span,
+    span,
+)
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(tracing, 'TRACING_ENABLED', True)
+    tracing._buffer.clear()
+    yield tracing._buffer
+    tracing._buffer.clear()
+
+
+class TestParseTraceparent:
+    """Test parse_traceparent function."""
+
+    def test_valid_header(self):
+        """Test trace and parent span ids are extracted."""
+        parsed = parse_traceparent(f"00-{TRACE_ID.upper()}-00f067aa0ba902b7-01")
+        assert parsed == {'trace_id': TRACE_ID, 'span_id': '00f067aa0ba902b7'}
+
+    @pytest.mark.parametrize('header', [
+        None,
+        '',
+        'not-a-traceparent',
+        f"00-{TRACE_ID}-00f067aa0ba902b7",
+        f"00-{'0' * 32}-00f067aa0ba902b7-01",
+    ])
+    def test_invalid_header(self, header):
+        """Test missing, malformed and all-zero headers are ignored."""
+        assert parse_traceparent(header) is None
+
+
+class TestSpan:
+    """Test span and record_span functions."""
+
+    def test_disabled_is_noop(self, monkeypatch):
+        """Test nothing is recorded while tracing is disabled."""
+        monkeypatch.setattr(tracing, 'TRACING_ENABLED', False)
+        with span('work') as active:
+            active.set_attribute('key', 'value')
+            assert current_trace_id() is None
+        assert len(tracing._buffer) == 0
+
+    def test_nested_spans_share_trace(self, enabled):
+        """Test child spans join the active trace with the parent's span id."""
+        with span('request', trace_id=TRACE_ID) as parent:
+            with span('step', step='merge') as child:
+                assert current_trace_id() == TRACE_ID
+        assert child.trace_id == TRACE_ID
+        assert child.parent_span_id == parent.span_id
+        assert [s.name for s in enabled] == ['step', 'request']
+        assert current_trace_id() is None
+
+    def test_exception_marks_error(self, enabled):
+        """Test a failing block ends the span with an error status."""
+        with pytest.raises(ValueError):
+            with span('fails'):
+                raise ValueError('boom')
+        assert enabled[0].status == 'error'
+        assert 'boom' in enabled[0].status_message
+
+    def test_record_span_into_other_trace(self, enabled):
+        """Test spans recorded into another trace link back to the caller."""
+        ended = datetime(2025, 1, 22, 10, 35, tzinfo=timezone.utc)
+        with span('request') as parent:
+            recorded = record_span('vm.encounter_process_time', ended - timedelta(minutes=5), ended,
+                                   trace_id=TRACE_ID)
+        assert recorded.trace_id == TRACE_ID
+        assert recorded.parent_span_id is None
+        assert recorded.attributes['caller.trace_id'] == parent.trace_id
+        assert recorded.to_dict()['duration_ms'] == 300000.0
+
+    def test_otlp_payload(self, enabled):
+        """Test spans are exported in the OTLP/JSON layout."""
+        with span('step', trace_id=TRACE_ID, attempt=2):
+            pass
+        otlp_span = build_otlp_payload(list(enabled))['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+        assert otlp_span['traceId'] == TRACE_ID
+        assert otlp_span['attributes'] == [{'key': 'attempt', 'value': {'intValue': '2'}}]
+        assert otlp_span['status'] == {'code': 1}